@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark de formatos de aterrizaje Bronze: JSON, NDJSON gzip y Parquet.
+
+Genera un dataset sintético de reclamos, lo escribe en los tres formatos con
+los mismos escritores que usa la Cloud Function de ingesta y mide en Spark
+local, para cada formato:
+
+- tamaño en disco,
+- bytes leídos y tiempo de una lectura completa de las columnas Silver,
+- bytes leídos y tiempo de una consulta selectiva (2 columnas + filtro por fecha).
+
+Uso:
+    python benchmarks/bench_bronze_formats.py --rows 1000000 --output bench_output.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../cloud_functions/ingest_sftp_to_gcs'))
+
+from pyspark.sql.functions import col
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType
+
+from main import CLAIM_FIELDS, GzipNDJSONBronzeWriter, ParquetBronzeWriter
+from spark_bench_utils import local_spark, measure
+from synthetic_claims import write_ndjson
+
+# Mismo esquema explícito con el que aterriza Bronze (ver bronze_arrow_schema)
+BRONZE_SPARK_SCHEMA = StructType([
+    StructField(field, DoubleType() if types == (int, float) else StringType())
+    for field, types, _ in CLAIM_FIELDS
+])
+
+
+def land_formats(workdir: str, rows: int, seed: int) -> dict:
+    """Escribir el dataset en los tres formatos de aterrizaje"""
+    json_path = write_ndjson(os.path.join(workdir, 'claims.json'), rows, seed)
+    paths = {'json': json_path}
+
+    for name, writer_class, extension in (
+        ('ndjson.gz', GzipNDJSONBronzeWriter, '.json.gz'),
+        ('parquet', ParquetBronzeWriter, '.parquet'),
+    ):
+        path = os.path.join(workdir, 'claims' + extension)
+        with open(json_path, 'rb') as source, open(path, 'wb') as target:
+            writer = writer_class(target)
+            for block in iter(lambda: source.read(8 * 1024 * 1024), b''):
+                # Cortar en el último salto de línea para entregar líneas completas
+                cut = block.rfind(b'\n') + 1
+                source.seek(cut - len(block), os.SEEK_CUR)
+                writer.write(block[:cut])
+            writer.close()
+        paths[name] = path
+    return paths
+
+
+def read_format(spark, fmt: str, path: str):
+    if fmt == 'parquet':
+        return spark.read.parquet(path)
+    return spark.read.schema(BRONZE_SPARK_SCHEMA).json(path)
+
+
+def best_of(spark, repeat: int, query) -> dict:
+    """Ejecutar la consulta `repeat` veces y quedarse con la de menor tiempo"""
+    runs = []
+    for _ in range(repeat):
+        result = {}
+        with measure(spark, result):
+            query().write.format('noop').mode('overwrite').save()
+        runs.append(result)
+    best = min(runs, key=lambda r: r['wall_seconds'])
+    return {k: best[k] for k in ('wall_seconds', 'inputBytes', 'inputRecords')}
+
+
+def run(rows: int, seed: int, cores: int, repeat: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix='bronze_formats_')
+    spark = local_spark('BenchBronzeFormats', cores=cores)
+    try:
+        paths = land_formats(workdir, rows, seed)
+        # Calentar la JVM para que el primer formato medido no pague el arranque
+        read_format(spark, 'json', paths['json']).limit(1000).collect()
+
+        results = {}
+        for fmt, path in paths.items():
+            results[fmt] = {
+                'file_bytes': os.path.getsize(path),
+                'full_scan': best_of(spark, repeat, lambda: read_format(spark, fmt, path)),
+                'selective': best_of(spark, repeat, lambda: read_format(spark, fmt, path)
+                                     .where(col('claim_date') >= '2024-12-01')
+                                     .select('claim_id', 'claim_amount'))
+            }
+
+        baseline = results['json']
+        for entry in results.values():
+            entry['size_vs_json'] = round(entry['file_bytes'] / baseline['file_bytes'], 3)
+            entry['selective_bytes_vs_json'] = round(
+                entry['selective']['inputBytes'] / max(baseline['selective']['inputBytes'], 1), 3
+            )
+        return {'rows': rows, 'seed': seed, 'cores': cores, 'repeat': repeat, 'formats': results}
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de formatos de aterrizaje Bronze')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Ruta donde guardar el resultado JSON')
+    args = parser.parse_args()
+
+    result = run(args.rows, args.seed, args.cores, args.repeat)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
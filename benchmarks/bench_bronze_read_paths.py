@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las dos lecturas de Bronze del job PySpark: tabla externa de
+BigQuery (spark-bigquery) frente a la lectura directa de los archivos que
+informa la ingesta (--bronze-uri).
+
+Modo local (por defecto): genera Bronze sintético con el layout de la ingesta
+(`ingest_date=YYYY-MM-DD/claims.<ext>`) en NDJSON, NDJSON gzip y Parquet, y
+mide la lectura directa de cada formato hasta Silver (escritura noop): tiempo
+de planificación, tiempo total, bytes leídos y tareas de lectura (los .json.gz
+no se dividen, los demás se parten en splits de spark.sql.files.maxPartitionBytes).
+
+Modo nube (--project, --bronze-uri y --ingest-date): mide ambas lecturas sobre
+los mismos días, la tabla externa con el conector y los archivos gs:// con el
+conector de GCS. Requiere credenciales y ambos conectores (p. ej. en Dataproc).
+
+Uso:
+    python benchmarks/bench_bronze_read_paths.py --rows 2000000 --days 4
+    gcloud dataproc jobs submit pyspark benchmarks/bench_bronze_read_paths.py ... -- \\
+        --project my-project --bronze-table claims_external --ingest-date 2024-03-01 \\
+        --bronze-uri gs://bucket/bronze/retail-claims/ingest_date=2024-03-01/claims_2024-02-29.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dataproc/jobs'))
+
+from pyspark.sql import SparkSession
+
+from bronze_to_silver_transform import BronzeToSilverTransformer, LocalParquetSink
+from spark_bench_utils import local_spark, measure
+from synthetic_claims import FORMATS, write_claims
+
+START_INGEST_DATE = date(2024, 1, 1)
+
+
+def silver_batch(transformer: BronzeToSilverTransformer):
+    """Mismo plan que transform() hasta la escritura de Silver"""
+    df = transformer.apply_bronze_schema(transformer.read_bronze_data())
+    return transformer.select_silver_columns(transformer.add_technical_columns(transformer.clean_and_standardize(df)))
+
+
+def timed_read(spark, transformer: BronzeToSilverTransformer) -> dict:
+    result = {}
+    with measure(spark, result):
+        started = time.perf_counter()
+        df = silver_batch(transformer)
+        df._jdf.queryExecution().executedPlan()
+        result['planning_seconds'] = round(time.perf_counter() - started, 3)
+        df.write.format('noop').mode('overwrite').save()
+    entry = {k: result[k] for k in ('planning_seconds', 'wall_seconds', 'inputBytes', 'inputRecords', 'stages')}
+    entry['bronze_read_report'] = transformer.bronze_read_report
+    return entry
+
+
+def best_of(spark, repeat: int, build_transformer) -> dict:
+    runs = [timed_read(spark, build_transformer()) for _ in range(repeat)]
+    return min(runs, key=lambda r: r['wall_seconds'])
+
+
+def run_local(rows: int, days: int, formats, seed: int, cores: int, repeat: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix='bronze_read_paths_')
+    spark = local_spark('BenchBronzeReadPaths', cores=cores)
+    try:
+        ingest_dates = [(START_INGEST_DATE + timedelta(days=n)).isoformat() for n in range(days)]
+        sink = LocalParquetSink(os.path.join(workdir, 'silver'))
+        landed = {
+            fmt: write_claims(os.path.join(workdir, fmt), rows, seed, fmt=fmt, partitions=days,
+                              start_ingest_date=START_INGEST_DATE)
+            for fmt in formats
+        }
+        # Calentar la JVM para que el primer formato medido no pague el arranque
+        spark.read.text(landed[formats[0]][0]).limit(1000).collect()
+
+        results = {}
+        for fmt, uris in landed.items():
+            entry = best_of(spark, repeat, lambda: BronzeToSilverTransformer(
+                'bench', 'retail_claims_silver', 'bench/temp',
+                ingest_dates=ingest_dates, sink=sink, bronze_uris=uris
+            ))
+            entry['file_bytes'] = sum(os.path.getsize(uri) for uri in uris)
+            entry['records_per_second'] = round(rows / entry['wall_seconds'], 1) if entry['wall_seconds'] > 0 else None
+            results[fmt] = {'files': entry}
+        return {
+            'mode': 'local', 'rows': rows, 'ingest_days': days, 'seed': seed, 'cores': cores,
+            'repeat': repeat, 'formats': results
+        }
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_cloud(project: str, bucket: str, bronze_table: str, ingest_dates, uris, repeat: int) -> dict:
+    spark = SparkSession.builder \
+        .appName('BenchBronzeReadPaths') \
+        .config('spark.ui.enabled', 'true') \
+        .getOrCreate()
+    spark.sparkContext.setLogLevel('ERROR')
+    try:
+        def transformer(bronze_uris):
+            return BronzeToSilverTransformer(
+                project, 'retail_claims_silver', f'{bucket}/temp', bronze_table=bronze_table,
+                ingest_dates=ingest_dates, bronze_uris=bronze_uris
+            )
+
+        paths = {
+            'bigquery': best_of(spark, repeat, lambda: transformer(None)),
+            'files': best_of(spark, repeat, lambda: transformer(uris)),
+        }
+        baseline = paths['bigquery']
+        for entry in paths.values():
+            entry['wall_vs_bigquery'] = round(entry['wall_seconds'] / max(baseline['wall_seconds'], 1e-3), 3)
+        return {
+            'mode': 'cloud', 'bronze_table': bronze_table, 'ingest_dates': ingest_dates,
+            'files': len(uris), 'repeat': repeat, 'paths': paths
+        }
+    finally:
+        spark.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de lectura de Bronze: tabla externa vs archivos')
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--days', type=int, default=4, help='Particiones ingest_date generadas (modo local)')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cores', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--project', help='Proyecto GCP: activa el modo nube')
+    parser.add_argument('--bucket', default='retail-claims-etl', help='Bucket de temporales del conector')
+    parser.add_argument('--bronze-table', default='claims_external')
+    parser.add_argument('--ingest-date', action='append', dest='ingest_dates', default=[])
+    parser.add_argument('--bronze-uri', action='append', dest='bronze_uris', default=[])
+    parser.add_argument('--output', help='Ruta donde guardar el resultado JSON')
+    args = parser.parse_args()
+
+    if args.project:
+        if not args.ingest_dates or not args.bronze_uris:
+            parser.error('El modo nube requiere --ingest-date y --bronze-uri de los mismos días')
+        result = run_cloud(
+            args.project, args.bucket, args.bronze_table, args.ingest_dates, args.bronze_uris, args.repeat
+        )
+    else:
+        result = run_local(args.rows, args.days, args.formats, args.seed, args.cores, args.repeat)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la lectura de Bronze con esquema declarado frente a la lectura sin esquema.
+
+Genera un Bronze "ancho" (los campos de reclamos más `--extra-columns`
+columnas que Silver no usa) particionado por ingest_date, en JSON y Parquet,
+y mide en Spark local tres variantes de la lectura del job:
+
+- schemaless: sin esquema (inferencia en JSON), todas las columnas y
+  conversiones de tipo después de la lectura (flujo previo),
+- declared: CLAIMS_SCHEMA aplicado al leer (solo las columnas de Silver),
+- declared_filtered: además, filtro por una partición ingest_date y un rango
+  de claim_date.
+
+Para cada una se reporta el tiempo de planificación (hasta el plan físico,
+incluida la inferencia de esquema), los bytes leídos y el tiempo total. La
+escritura a Silver se sustituye por el formato noop de Spark.
+
+Uso:
+    python benchmarks/bench_bronze_schema.py --rows 500000 --extra-columns 80
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dataproc/jobs'))
+
+from pyspark.sql.functions import col, to_date
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType
+
+from bronze_to_silver_transform import CLAIMS_SCHEMA, BronzeToSilverTransformer
+from spark_bench_utils import local_spark, measure
+from synthetic_claims import generate_claims
+
+START_INGEST_DATE = date(2024, 1, 1)
+
+
+def source_type(field: StructField):
+    """Tipo con el que llega cada campo de reclamos en el NDJSON de Bronze"""
+    return DoubleType() if isinstance(field.dataType, DoubleType) else StringType()
+
+
+def read_schema(extra_columns: int = 0) -> StructType:
+    fields = [StructField(f.name, source_type(f)) for f in CLAIMS_SCHEMA.fields]
+    fields += [StructField(f'attr_{i:03d}', StringType()) for i in range(extra_columns)]
+    return StructType(fields)
+
+
+def write_wide_bronze(workdir: str, spark, rows: int, extra_columns: int, days: int, seed: int) -> dict:
+    """Bronze ancho en JSON y Parquet, con particiones ingest_date=YYYY-MM-DD"""
+    rng = random.Random(seed)
+    filler = [''.join(rng.choices(string.ascii_letters, k=24)) for _ in range(256)]
+    raw_path = os.path.join(workdir, 'raw.json')
+    with open(raw_path, 'w') as f:
+        for i, claim in enumerate(generate_claims(rows, seed)):
+            for column in range(extra_columns):
+                claim[f'attr_{column:03d}'] = filler[(i + column) % len(filler)]
+            claim['ingest_date'] = (START_INGEST_DATE + timedelta(days=i % days)).isoformat()
+            f.write(json.dumps(claim))
+            f.write('\n')
+
+    raw = spark.read.schema(read_schema(extra_columns).add('ingest_date', StringType())).json(raw_path)
+    paths = {}
+    for fmt in ('json', 'parquet'):
+        paths[fmt] = os.path.join(workdir, fmt)
+        raw.write.partitionBy('ingest_date').format(fmt).save(paths[fmt])
+    os.remove(raw_path)
+    return paths
+
+
+def schemaless(spark, transformer, fmt: str, path: str):
+    """Flujo previo: esquema inferido, todas las columnas, conversiones tras la lectura"""
+    df = spark.read.format(fmt).load(path) \
+        .withColumn('claim_amount', col('claim_amount').cast(DoubleType())) \
+        .withColumn('claim_date', to_date(col('claim_date'), 'yyyy-MM-dd')) \
+        .withColumn('created_at', col('created_at').cast('timestamp')) \
+        .withColumn('updated_at', col('updated_at').cast('timestamp'))
+    return transformer.add_technical_columns(transformer.clean_and_standardize(df))
+
+
+def declared(spark, transformer, fmt: str, path: str, filtered: bool = False):
+    # En el job el esquema de origen sale de los metadatos de BigQuery; con
+    # archivos locales se declara en el lector (solo los campos de reclamos)
+    df = spark.read.format(fmt).schema(read_schema().add('ingest_date', 'date')).load(path)
+    if filtered:
+        df = df.where(f"ingest_date = DATE '{START_INGEST_DATE.isoformat()}'") \
+            .where("claim_date >= '2024-06-01' AND claim_date <= '2024-06-30'")
+    df = transformer.apply_bronze_schema(df)
+    return transformer.select_silver_columns(transformer.add_technical_columns(transformer.clean_and_standardize(df)))
+
+
+def timed_run(spark, build) -> dict:
+    result = {}
+    with measure(spark, result):
+        started = time.perf_counter()
+        df = build()
+        df._jdf.queryExecution().executedPlan()
+        result['planning_seconds'] = round(time.perf_counter() - started, 3)
+        df.write.format('noop').mode('overwrite').save()
+    return {k: result[k] for k in ('planning_seconds', 'wall_seconds', 'inputBytes', 'stages')}
+
+
+def best_of(spark, repeat: int, build) -> dict:
+    runs = [timed_run(spark, build) for _ in range(repeat)]
+    return min(runs, key=lambda r: r['wall_seconds'])
+
+
+def run(rows: int, extra_columns: int, days: int, seed: int, cores: int, repeat: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix='bronze_schema_')
+    spark = local_spark('BenchBronzeSchema', cores=cores)
+    try:
+        paths = write_wide_bronze(workdir, spark, rows, extra_columns, days, seed)
+        transformer = BronzeToSilverTransformer('bench', 'retail_claims_silver', 'bench/temp')
+
+        results = {}
+        for fmt, path in paths.items():
+            variants = {
+                'schemaless': best_of(spark, repeat, lambda: schemaless(spark, transformer, fmt, path)),
+                'declared': best_of(spark, repeat, lambda: declared(spark, transformer, fmt, path)),
+                'declared_filtered': best_of(
+                    spark, repeat, lambda: declared(spark, transformer, fmt, path, filtered=True)
+                ),
+            }
+            baseline = variants['schemaless']
+            for entry in variants.values():
+                entry['bytes_vs_schemaless'] = round(entry['inputBytes'] / max(baseline['inputBytes'], 1), 3)
+                entry['planning_vs_schemaless'] = round(
+                    entry['planning_seconds'] / max(baseline['planning_seconds'], 1e-3), 3
+                )
+            results[fmt] = variants
+        return {
+            'rows': rows, 'extra_columns': extra_columns, 'ingest_days': days,
+            'seed': seed, 'cores': cores, 'repeat': repeat, 'formats': results
+        }
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de lectura de Bronze con esquema declarado')
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--extra-columns', type=int, default=80)
+    parser.add_argument('--days', type=int, default=10, help='Particiones ingest_date generadas')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Ruta donde guardar el resultado JSON')
+    args = parser.parse_args()
+
+    result = run(args.rows, args.extra_columns, args.days, args.seed, args.cores, args.repeat)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark del validador NDJSON de la Cloud Function de ingesta.
+
+Mide líneas/s en un solo núcleo alimentando el validador con bloques del mismo
+tamaño que usa la transferencia SFTP -> GCS. Objetivo: >= 100k líneas/s para
+que la validación no sea el cuello de botella de la ingesta.
+
+Uso:
+    python benchmarks/bench_ndjson_validator.py --lines 500000 --invalid-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../cloud_functions/ingest_sftp_to_gcs'))
+
+from main import DEFAULT_CHUNK_SIZE, NDJSONClaimsValidator
+from synthetic_claims import generate_claims
+
+TARGET_LINES_PER_SECOND = 100_000
+
+
+def build_payload(lines: int, invalid_rate: float, seed: int) -> bytes:
+    """Generar un NDJSON de reclamos con una fracción de líneas inválidas"""
+    rng = random.Random(seed)
+    rows = []
+    for record in generate_claims(lines, seed):
+        if rng.random() < invalid_rate:
+            rows.append('{"claim_id": "%s", "claim_amount": ' % record['claim_id'])
+        else:
+            rows.append(json.dumps(record))
+    return ('\n'.join(rows) + '\n').encode('utf-8')
+
+
+def run(lines: int, invalid_rate: float, chunk_size: int, seed: int) -> dict:
+    payload = build_payload(lines, invalid_rate, seed)
+    validator = NDJSONClaimsValidator()
+    start = time.perf_counter()
+    for offset in range(0, len(payload), chunk_size):
+        validator.feed(payload[offset:offset + chunk_size])
+    validator.close()
+    elapsed = time.perf_counter() - start
+
+    lines_per_second = validator.line_number / elapsed
+    return {
+        'lines': validator.line_number,
+        'valid_records': validator.valid_records,
+        'invalid_records': validator.invalid_records,
+        'payload_mb': round(len(payload) / (1024 * 1024), 2),
+        'seconds': round(elapsed, 3),
+        'lines_per_second': round(lines_per_second),
+        'mb_per_second': round(len(payload) / (1024 * 1024) / elapsed, 2),
+        'meets_target': lines_per_second >= TARGET_LINES_PER_SECOND
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del validador NDJSON')
+    parser.add_argument('--lines', type=int, default=500_000)
+    parser.add_argument('--invalid-rate', type=float, default=0.01)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    result = run(args.lines, args.invalid_rate, args.chunk_size, args.seed)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result['meets_target'] else 1)
+
+
+if __name__ == '__main__':
+    main()
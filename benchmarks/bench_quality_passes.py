@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark de lecturas de Bronze por corrida de BronzeToSilverTransformer.
+
+Compara, sobre un NDJSON sintético leído en Spark local:
+
+- legacy: count() al leer + cuatro count() de calidad + escritura (seis lecturas),
+- aggregate: una agregación y la escritura sobre el DataFrame persistido,
+- observe: métricas de calidad adjuntas a la escritura (una lectura).
+
+La escritura a Silver se sustituye por el formato noop de Spark.
+
+Uso:
+    python benchmarks/bench_quality_passes.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dataproc/jobs'))
+
+from pyspark.sql.functions import col
+
+from bronze_to_silver_transform import BronzeToSilverTransformer
+from bench_bronze_formats import BRONZE_SPARK_SCHEMA
+from spark_bench_utils import local_spark, measure
+from synthetic_claims import write_ndjson
+
+
+def noop_write(df, mode='append'):
+    df.write.format('noop').mode('overwrite').save()
+
+
+def run_legacy(transformer, read):
+    """Flujo previo: cada acción vuelve a leer Bronze"""
+    df = read()
+    df.count()
+    df = transformer.add_technical_columns(transformer.clean_and_standardize(df))
+    df.count()
+    df.filter(col('claim_id').isNull()).count()
+    df.filter(col('claim_amount').isNull()).count()
+    df.filter(col('claim_amount') < 0).count()
+    noop_write(df)
+
+
+def run_transform(transformer, read):
+    with mock.patch.object(transformer, 'read_bronze_data', side_effect=read), \
+            mock.patch.object(transformer, 'write_to_silver', side_effect=noop_write):
+        transformer.transform()
+
+
+def run(rows: int, seed: int, cores: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix='quality_passes_')
+    spark = local_spark('BenchQualityPasses', cores=cores)
+    try:
+        path = write_ndjson(os.path.join(workdir, 'claims.json'), rows, seed)
+        read = lambda: spark.read.schema(BRONZE_SPARK_SCHEMA).json(path)
+        read().limit(1000).collect()
+
+        results = {}
+        for name in ('legacy', 'aggregate', 'observe'):
+            transformer = BronzeToSilverTransformer(
+                'bench', 'retail_claims_silver', 'bench/temp',
+                quality_mode='observe' if name == 'legacy' else name
+            )
+            result = {}
+            with measure(spark, result):
+                if name == 'legacy':
+                    run_legacy(transformer, read)
+                else:
+                    run_transform(transformer, read)
+            # Incluye bloques leídos de la caché (modo aggregate), no solo de Bronze
+            result['input_vs_file'] = round(result['inputBytes'] / os.path.getsize(path), 2)
+            results[name] = result
+        return {'rows': rows, 'seed': seed, 'cores': cores, 'file_bytes': os.path.getsize(path), 'modes': results}
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de pasadas de calidad de datos')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--output', help='Ruta donde guardar el resultado JSON')
+    args = parser.parse_args()
+
+    result = run(args.rows, args.seed, args.cores)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la descarga SFTP por rangos en paralelo frente a la secuencial.
+
+Levanta el servidor SFTP local de sftp_stub_server.py (en un proceso aparte)
+con latencia inyectada y
+descarga archivos de distintos tamaños con los dos caminos de la ingesta:
+
+- secuencial: un canal, ventanas de readv (iter_readv_chunks),
+- por rangos: ParallelRangeReader con `--concurrency` canales.
+
+Solo se mide la descarga (sin validación ni subida a GCS) y se verifica que
+ambos caminos entreguen los mismos bytes.
+
+Uso:
+    python benchmarks/bench_ranged_download.py --sizes-mb 16 64 256 --latencies-ms 0 20 50
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../cloud_functions/ingest_sftp_to_gcs'))
+
+import paramiko
+
+from main import DEFAULT_PREFETCH_CHUNKS, ParallelRangeReader, iter_readv_chunks
+from sftp_stub_server import stub_server_process
+
+
+# main.py configura logging en INFO; aquí solo interesan los resultados
+logging.getLogger('paramiko').setLevel(logging.WARNING)
+
+
+def write_file(root: str, size: int) -> str:
+    """Archivo de `size` bytes pseudoaleatorios (no comprimibles)"""
+    name = f'claims_{size}.bin'
+    block = os.urandom(1024 * 1024)
+    with open(os.path.join(root, name), 'wb') as f:
+        for offset in range(0, size, len(block)):
+            f.write(block[:min(len(block), size - offset)])
+    return name
+
+
+def timed_download(chunks) -> dict:
+    checksum = hashlib.md5()
+    start = time.perf_counter()
+    total = 0
+    for chunk in chunks:
+        checksum.update(chunk)
+        total += len(chunk)
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': round(seconds, 3),
+        'mb_per_second': round(total / (1024 * 1024) / seconds, 2),
+        'md5': checksum.hexdigest()
+    }
+
+
+def download_sequential(transport, path: str, size: int, chunk_size: int) -> dict:
+    sftp = paramiko.SFTPClient.from_transport(transport)
+    try:
+        with sftp.file(path, 'rb') as remote:
+            return timed_download(iter_readv_chunks(remote, size, chunk_size, DEFAULT_PREFETCH_CHUNKS))
+    finally:
+        sftp.close()
+
+
+def download_ranged(transport, path: str, size: int, chunk_size: int, concurrency: int) -> dict:
+    reader = ParallelRangeReader(
+        lambda: paramiko.SFTPClient.from_transport(transport), path, size, chunk_size, concurrency
+    )
+    return timed_download(reader)
+
+
+def run(sizes_mb, latencies_ms, concurrency: int, chunk_size: int) -> dict:
+    root = tempfile.mkdtemp(prefix='sftp_stub_')
+    results = []
+    try:
+        files = {size_mb: write_file(root, size_mb * 1024 * 1024) for size_mb in sizes_mb}
+        for latency_ms in latencies_ms:
+            with stub_server_process(root, latency_ms=latency_ms) as server:
+                transport = server.connect()
+                try:
+                    for size_mb, name in files.items():
+                        size = size_mb * 1024 * 1024
+                        sequential = download_sequential(transport, name, size, chunk_size)
+                        ranged = download_ranged(transport, name, size, chunk_size, concurrency)
+                        if sequential['md5'] != ranged['md5']:
+                            raise RuntimeError(f"Contenido distinto entre caminos para {name}")
+                        results.append({
+                            'size_mb': size_mb,
+                            'latency_ms': latency_ms,
+                            'sequential': sequential,
+                            'ranged': ranged,
+                            'speedup': round(sequential['seconds'] / ranged['seconds'], 2)
+                        })
+                        print(json.dumps(results[-1]), file=sys.stderr)
+                finally:
+                    transport.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {
+        'concurrency': concurrency,
+        'chunk_size_mb': chunk_size / (1024 * 1024),
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de descarga SFTP por rangos')
+    parser.add_argument('--sizes-mb', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--latencies-ms', type=float, nargs='+', default=[0, 20, 50])
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--chunk-size-mb', type=float, default=8)
+    parser.add_argument('--output', help='Ruta donde guardar el resultado JSON')
+    args = parser.parse_args()
+
+    result = run(args.sizes_mb, args.latencies_ms, args.concurrency, int(args.chunk_size_mb * 1024 * 1024))
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark del layout de escritura de Silver (repartición y orden por clustering).
+
+Genera Bronze sintético con skew en customer_id/store_id, lo transforma con
+BronzeToSilverTransformer y escribe Silver con el sink local-parquet de dos
+formas:
+
+- read_layout: el particionado que sale de la lectura (flujo previo),
+- cluster_layout: layout_for_silver (processing_date + hash de customer_id,
+  salting de clientes frecuentes, orden por customer_id, store_id).
+
+Para cada una reporta archivos escritos, tamaño medio de archivo, tiempo de
+escritura y los bytes leídos por consultas de Gold sobre Silver (un cliente,
+el cliente más frecuente y una tienda concreta de un grupo de clientes). Los
+row groups de Parquet se reducen (--row-group-mb) para emular los bloques de
+BigQuery sobre los que actúa el pruning por clustering.
+
+Uso:
+    python benchmarks/bench_silver_layout.py --rows 2000000 --skew 1.1 --target-file-mb 64
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dataproc/jobs'))
+
+from pyspark import StorageLevel
+from pyspark.sql.functions import col, count, sum as spark_sum
+
+from bronze_to_silver_transform import BronzeToSilverTransformer, LocalParquetSink
+from spark_bench_utils import local_spark, measure
+from synthetic_claims import generate_claims, write_claims
+from bench_transformer_stages import BRONZE_SOURCE_DDL
+
+
+def silver_files(path: str) -> list:
+    return [
+        os.path.join(root, name)
+        for root, _, names in os.walk(path) for name in names
+        if name.endswith('.parquet') and not name.startswith('.')
+    ]
+
+
+def gold_queries(rows: int, seed: int, skew: float) -> dict:
+    """Consultas de Gold: un cliente típico, el más frecuente y una tienda de un grupo de clientes"""
+    customers = Counter(claim['customer_id'] for claim in generate_claims(min(rows, 200_000), seed, skew=skew))
+    ranked = [customer for customer, _ in customers.most_common()]
+    typical = ranked[len(ranked) // 2]
+    group = ", ".join(f"'{c}'" for c in ranked[len(ranked) // 2:len(ranked) // 2 + 20])
+    return {
+        'customer': f"customer_id = '{typical}'",
+        'hot_customer': f"customer_id = '{ranked[0]}'",
+        'store_for_customers': f"customer_id IN ({group}) AND store_id = 'STORE0001'",
+    }
+
+
+def run_variant(spark, transformer, silver, df, use_layout: bool, queries: dict) -> dict:
+    transformer.sink = LocalParquetSink(silver)
+    result = {}
+    with measure(spark, result):
+        layout = transformer.plan_silver_layout(df, detect_skew=True) if use_layout else None
+        output = transformer.layout_for_silver(df, layout) if use_layout else df
+        transformer.write_to_silver(transformer.select_silver_columns(output), 'append')
+
+    files = silver_files(silver)
+    sizes = [os.path.getsize(f) for f in files]
+    report = {
+        'write_seconds': result['wall_seconds'],
+        'files': len(files),
+        'avg_file_bytes': sum(sizes) // max(len(sizes), 1),
+        'total_bytes': sum(sizes),
+        'salted_customers': layout['salted_customers'] if layout else 0,
+        'gold_queries': {}
+    }
+    for name, condition in queries.items():
+        stats = {}
+        with measure(spark, stats):
+            transformer.sink.read(spark).where(condition) \
+                .agg(count('*'), spark_sum(col('claim_amount'))).collect()
+        report['gold_queries'][name] = {'inputBytes': stats['inputBytes'], 'wall_seconds': stats['wall_seconds']}
+    return report
+
+
+def run(rows: int, seed: int, skew: float, cores: int, target_file_mb: int, row_group_mb: int,
+        max_partition_mb: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix='silver_layout_')
+    spark = local_spark(
+        'BenchSilverLayout', cores=cores,
+        **{
+            'spark.hadoop.parquet.block.size': str(row_group_mb * 1024 * 1024),
+            # Lectura en muchas particiones pequeñas, como la de BigQuery en el clúster
+            'spark.sql.files.maxPartitionBytes': f'{max_partition_mb}m'
+        }
+    )
+    try:
+        bronze = os.path.join(workdir, 'bronze')
+        write_claims(bronze, rows, seed, 'parquet', partitions=2, skew=skew)
+        transformer = BronzeToSilverTransformer(
+            'bench', 'retail_claims_silver', 'bench/temp', target_file_mb=target_file_mb
+        )
+        df = transformer.apply_bronze_schema(spark.read.schema(BRONZE_SOURCE_DDL).parquet(bronze))
+        df = transformer.add_technical_columns(transformer.clean_and_standardize(df)) \
+            .persist(StorageLevel.MEMORY_AND_DISK)
+        df.count()
+
+        queries = gold_queries(rows, seed, skew)
+        variants = {
+            'read_layout': run_variant(spark, transformer, os.path.join(workdir, 'silver_read'), df, False, queries),
+            'cluster_layout': run_variant(spark, transformer, os.path.join(workdir, 'silver_cluster'), df, True, queries),
+        }
+        before, after = variants['read_layout'], variants['cluster_layout']
+        after['gold_bytes_vs_read_layout'] = {
+            name: round(after['gold_queries'][name]['inputBytes'] / max(before['gold_queries'][name]['inputBytes'], 1), 3)
+            for name in queries
+        }
+        df.unpersist()
+        return {
+            'rows': rows, 'seed': seed, 'skew': skew, 'cores': cores, 'target_file_mb': target_file_mb,
+            'row_group_mb': row_group_mb, 'queries': queries, 'variants': variants
+        }
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del layout de escritura de Silver')
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--target-file-mb', type=int, default=64)
+    parser.add_argument('--row-group-mb', type=int, default=1)
+    parser.add_argument('--max-partition-mb', type=int, default=8)
+    parser.add_argument('--output', help='Ruta donde guardar el resultado JSON')
+    args = parser.parse_args()
+
+    result = run(args.rows, args.seed, args.skew, args.cores, args.target_file_mb, args.row_group_mb,
+                 args.max_partition_mb)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark por etapa de BronzeToSilverTransformer en Spark local.
+
+Genera Bronze sintético (synthetic_claims: tamaño, skew, nulos y valores
+sucios configurables), siembra Silver con una fracción de los registros para
+que la deduplicación encuentre duplicados, y ejecuta las etapas del job en
+orden. La salida de cada etapa se persiste antes de medir la siguiente, de
+modo que cada medición cubre solo su etapa:
+
+    read -> clean -> technical -> dedup -> quality -> write
+
+Por etapa se registran tiempo de pared, bytes de shuffle, spill y picos de
+memoria (de ejecución y heap de la JVM). Cada corrida se agrega a un
+historial JSON; la corrida se compara con la última del historial con los
+mismos parámetros y se reportan las etapas que empeoraron más allá de la
+tolerancia (con --fail-on-regression el proceso termina con código 1, para
+CI antes de desplegar a Dataproc).
+
+Uso:
+    python benchmarks/bench_transformer_stages.py --rows 1000000 --skew 1.1 \\
+        --null-rate 0.01 --dirty-rate 0.02 --fail-on-regression
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dataproc/jobs'))
+
+from pyspark import StorageLevel
+
+from bronze_to_silver_transform import BronzeToSilverTransformer, LocalParquetSink
+from spark_bench_utils import local_spark, measure
+from synthetic_claims import write_claims
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), 'history', 'transformer_stages.json')
+
+# Métricas de etapa comparadas contra la corrida anterior
+REGRESSION_METRICS = ('wall_seconds', 'shuffleWriteBytes', 'peakExecutionMemory')
+
+# Columnas de Bronze tal como aterrizan (fechas y timestamps como texto)
+BRONZE_SOURCE_DDL = (
+    'claim_id string, customer_id string, store_id string, claim_date string, claim_amount double, '
+    'description string, status string, created_at string, updated_at string, ingest_date date'
+)
+
+
+def materialize(df):
+    """Persistir la salida de una etapa para que la siguiente no la recalcule"""
+    df = df.persist(StorageLevel.MEMORY_AND_DISK)
+    df.count()
+    return df
+
+
+def seed_silver(transformer, df, fraction: float) -> int:
+    """Escribir en Silver una fracción del lote (los duplicados que encontrará dedup)"""
+    existing = df.sample(fraction=fraction, seed=7) if fraction < 1 else df
+    return transformer.sink.write(transformer.select_silver_columns(existing), 'append')['rows']
+
+
+def run_stages(spark, transformer, bronze_path: str, fmt: str, existing_fraction: float) -> Dict[str, Any]:
+    """Ejecutar y medir cada etapa del job sobre la salida persistida de la anterior"""
+    stages: Dict[str, Dict[str, Any]] = {}
+    persisted = []
+
+    def stage(name: str, run: Callable[[], Any]):
+        result: Dict[str, Any] = {}
+        with measure(spark, result):
+            output = run()
+        stages[name] = result
+        return output
+
+    reader = 'json' if fmt.startswith('ndjson') else 'parquet'
+    try:
+        df = stage('read', lambda: materialize(transformer.apply_bronze_schema(
+            spark.read.schema(BRONZE_SOURCE_DDL).format(reader).load(bronze_path)
+        )))
+        persisted.append(df)
+        df = stage('clean', lambda: materialize(transformer.clean_and_standardize(df)))
+        persisted.append(df)
+        df = stage('technical', lambda: materialize(transformer.add_technical_columns(df)))
+        persisted.append(df)
+
+        seeded = seed_silver(transformer, df, existing_fraction) if existing_fraction > 0 else 0
+
+        def dedup():
+            # Construcción del Bloom filter y prueba sobre el lote
+            deduplicated, _ = transformer.deduplicate(df)
+            return materialize(deduplicated)
+        df = stage('dedup', dedup)
+        stages['dedup']['seeded_silver_records'] = seeded
+        persisted.append(df)
+
+        quality = stage('quality', lambda: transformer.validate_data_quality(df))
+        stage('write', lambda: transformer.write_to_silver(transformer.select_silver_columns(df), 'append'))
+        stages['write']['sink_report'] = transformer.sink_report
+        return {'stages': stages, 'quality_report': quality}
+    finally:
+        for cached in persisted:
+            cached.unpersist()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)['runs']
+
+
+def save_history(path: str, runs: List[Dict[str, Any]]) -> None:
+    """Reemplazar el historial de forma atómica (una corrida interrumpida no lo corrompe)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'runs': runs}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def find_regressions(previous: Dict[str, Any], current: Dict[str, Any], tolerance: float,
+                     min_seconds: float) -> List[Dict[str, Any]]:
+    """Etapas cuyas métricas superan la corrida anterior en más de `tolerance` (fracción)"""
+    regressions = []
+    for name, metrics in current['stages'].items():
+        baseline = previous['stages'].get(name)
+        if not baseline:
+            continue
+        for metric in REGRESSION_METRICS:
+            before, after = baseline.get(metric, 0), metrics.get(metric, 0)
+            # Por debajo del umbral absoluto de tiempo la diferencia es ruido
+            if metric == 'wall_seconds' and after - before < min_seconds:
+                continue
+            if after > before * (1 + tolerance) and after > 0:
+                regressions.append({
+                    'stage': name, 'metric': metric, 'previous': before, 'current': after,
+                    'ratio': round(after / before, 2) if before else None
+                })
+    return regressions
+
+
+def run(rows: int, seed: int, fmt: str, skew: float, null_rate: float, dirty_rate: float,
+        partitions: int, cores: int, existing_fraction: float) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix='transformer_stages_')
+    spark = local_spark('BenchTransformerStages', cores=cores)
+    try:
+        bronze_path = os.path.join(workdir, 'bronze')
+        write_claims(
+            bronze_path, rows, seed, fmt, partitions,
+            skew=skew, null_rate=null_rate, dirty_rate=dirty_rate
+        )
+        transformer = BronzeToSilverTransformer(
+            'bench', 'retail_claims_silver', 'bench/temp',
+            quality_mode='aggregate',
+            dedup_lookback_days=7,
+            sink=LocalParquetSink(os.path.join(workdir, 'silver'))
+        )
+        result = run_stages(spark, transformer, bronze_path, fmt, existing_fraction)
+        result['total_wall_seconds'] = round(sum(s['wall_seconds'] for s in result['stages'].values()), 3)
+        return result
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark por etapa del job Bronze -> Silver')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=('ndjson', 'ndjson.gz', 'parquet'), default='ndjson')
+    parser.add_argument('--skew', type=float, default=1.1, help='Exponente Zipf de customer_id/store_id')
+    parser.add_argument('--null-rate', type=float, default=0.01)
+    parser.add_argument('--dirty-rate', type=float, default=0.02)
+    parser.add_argument('--partitions', type=int, default=3, help='Particiones ingest_date de Bronze')
+    parser.add_argument('--existing-fraction', type=float, default=0.1,
+                        help='Fracción del lote sembrada en Silver antes de deduplicar')
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='Historial JSON de corridas')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Empeoramiento relativo máximo por etapa y métrica')
+    parser.add_argument('--min-seconds', type=float, default=0.5,
+                        help='Diferencia mínima de tiempo considerada regresión')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    params = {
+        'rows': args.rows, 'seed': args.seed, 'format': args.format, 'skew': args.skew,
+        'null_rate': args.null_rate, 'dirty_rate': args.dirty_rate, 'partitions': args.partitions,
+        'existing_fraction': args.existing_fraction, 'cores': args.cores
+    }
+    entry = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'git_commit': git_commit(),
+        'params': params,
+        **run(args.rows, args.seed, args.format, args.skew, args.null_rate, args.dirty_rate,
+              args.partitions, args.cores, args.existing_fraction)
+    }
+
+    history = load_history(args.history)
+    previous = next((r for r in reversed(history) if r['params'] == params), None)
+    entry['regressions'] = find_regressions(
+        previous, entry, args.tolerance, args.min_seconds
+    ) if previous else []
+    entry['compared_to'] = previous['timestamp'] if previous else None
+    save_history(args.history, history + [entry])
+
+    print(json.dumps(entry, indent=2))
+    if args.fail_on_regression and entry['regressions']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Servidor SFTP local basado en paramiko para benchmarks de la ingesta.
+
+Sirve en solo lectura los archivos de un directorio local y acepta cualquier
+usuario/contraseña. Opcionalmente se antepone un relay TCP que retrasa cada
+segmento en ambos sentidos para simular la latencia de un enlace remoto sin
+perder el pipelining de SSH (las solicitudes siguen en vuelo mientras otras
+esperan), de modo que el ancho de banda efectivo queda limitado por la
+ventana de SSH/SFTP y el RTT como en un enlace real.
+
+Para medir sin que el cifrado del servidor compita por el GIL con el cliente,
+`stub_server_process` lo ejecuta en un proceso aparte.
+
+Uso:
+    with stub_server_process('/tmp/sftp_root', latency_ms=50) as server:
+        transport = server.connect()
+        sftp = paramiko.SFTPClient.from_transport(transport)
+"""
+
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import paramiko
+
+_HOST_KEY = None
+
+
+def _host_key() -> paramiko.RSAKey:
+    """Clave de host generada una sola vez por proceso"""
+    global _HOST_KEY
+    if _HOST_KEY is None:
+        _HOST_KEY = paramiko.RSAKey.generate(2048)
+    return _HOST_KEY
+
+
+class _StubServer(paramiko.ServerInterface):
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class _StubSFTPHandle(paramiko.SFTPHandle):
+
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class _StubSFTPServer(paramiko.SFTPServerInterface):
+    """Vista de solo lectura de `root` a través de SFTP"""
+
+    def __init__(self, server, root: str, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def _local_path(self, path: str) -> str:
+        return os.path.join(self.root, os.path.normpath('/' + path).lstrip('/'))
+
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            readfile = open(self._local_path(path), 'rb')
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        handle = _StubSFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = readfile
+        return handle
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local_path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def list_folder(self, path):
+        local_path = self._local_path(path)
+        try:
+            return [
+                paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local_path, name)), name)
+                for name in os.listdir(local_path)
+            ]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+def _relay(source: socket.socket, target: socket.socket, delay: float) -> None:
+    """Reenviar bytes de `source` a `target` entregando cada segmento `delay` s después"""
+    segments = queue.Queue()
+
+    def receive():
+        while True:
+            try:
+                data = source.recv(256 * 1024)
+            except OSError:
+                data = b''
+            segments.put((time.monotonic() + delay, data))
+            if not data:
+                return
+
+    def deliver():
+        while True:
+            due, data = segments.get()
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                if not data:
+                    target.shutdown(socket.SHUT_WR)
+                    return
+                target.sendall(data)
+            except OSError:
+                return
+
+    for target_fn in (receive, deliver):
+        threading.Thread(target=target_fn, daemon=True).start()
+
+
+class SFTPStubServer:
+    """Servidor SFTP en 127.0.0.1 con latencia de ida y vuelta configurable"""
+
+    def __init__(self, root: str, latency_ms: float = 0):
+        self.root = root
+        self.latency_ms = latency_ms
+        self._sockets: List[socket.socket] = []
+        self._transports: List[paramiko.Transport] = []
+        self._closed = threading.Event()
+        self.port: Optional[int] = None
+
+    def start(self) -> 'SFTPStubServer':
+        sftp_listener = self._listen(self._serve_sftp)
+        if self.latency_ms:
+            target_port = sftp_listener.getsockname()[1]
+            self.port = self._listen(lambda client: self._serve_relay(client, target_port)).getsockname()[1]
+        else:
+            self.port = sftp_listener.getsockname()[1]
+        return self
+
+    def connect(self, username: str = 'bench', password: str = 'bench') -> paramiko.Transport:
+        """Transporte SSH autenticado contra el servidor (como hace la ingesta)"""
+        transport = paramiko.Transport(('127.0.0.1', self.port))
+        transport.connect(username=username, password=password)
+        return transport
+
+    def close(self) -> None:
+        self._closed.set()
+        for transport in self._transports:
+            transport.close()
+        for sock in self._sockets:
+            sock.close()
+
+    def __enter__(self) -> 'SFTPStubServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _listen(self, handler) -> socket.socket:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(16)
+        self._sockets.append(listener)
+
+        def accept_loop():
+            while not self._closed.is_set():
+                try:
+                    client, _ = listener.accept()
+                except OSError:
+                    return
+                self._sockets.append(client)
+                handler(client)
+
+        threading.Thread(target=accept_loop, daemon=True).start()
+        return listener
+
+    def _serve_sftp(self, client: socket.socket) -> None:
+        transport = paramiko.Transport(client)
+        transport.add_server_key(_host_key())
+        transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _StubSFTPServer, self.root)
+        transport.start_server(server=_StubServer())
+        self._transports.append(transport)
+
+    def _serve_relay(self, client: socket.socket, target_port: int) -> None:
+        upstream = socket.create_connection(('127.0.0.1', target_port))
+        self._sockets.append(upstream)
+        one_way = self.latency_ms / 2000
+        _relay(client, upstream, one_way)
+        _relay(upstream, client, one_way)
+
+
+class _RemoteStubServer:
+    """Referencia a un servidor que corre en otro proceso"""
+
+    def __init__(self, port: int):
+        self.port = port
+
+    connect = SFTPStubServer.connect
+
+
+def _run_server_process(root: str, latency_ms: float, conn) -> None:
+    server = SFTPStubServer(root, latency_ms).start()
+    conn.send(server.port)
+    # Mantener el servidor vivo hasta que el proceso padre cierre la conexión
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    server.close()
+
+
+@contextmanager
+def stub_server_process(root: str, latency_ms: float = 0) -> Iterator[_RemoteStubServer]:
+    """Servidor SFTP de prueba en un proceso separado"""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=_run_server_process, args=(root, latency_ms, child_conn), daemon=True
+    )
+    process.start()
+    try:
+        yield _RemoteStubServer(parent_conn.recv())
+    finally:
+        parent_conn.close()
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
@@ -0,0 +1,72 @@
+"""
+Utilidades comunes de los benchmarks Spark en modo local.
+
+Las métricas por stage (bytes leídos, shuffle, spill, GC, picos de memoria) se
+toman de la API REST de estado de Spark, alimentada por el AppStatusListener
+del driver.
+"""
+
+import json
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from pyspark.sql import SparkSession
+
+STAGE_COUNTERS = (
+    'executorRunTime', 'inputBytes', 'inputRecords', 'outputBytes', 'outputRecords',
+    'shuffleReadBytes', 'shuffleWriteBytes', 'memoryBytesSpilled', 'diskBytesSpilled',
+    'jvmGcTime'
+)
+
+# Picos por stage: se reporta el máximo, no la suma. Los de la JVM del ejecutor
+# requieren el muestreo de métricas (spark.executor.metrics.pollingInterval)
+STAGE_PEAKS = ('peakExecutionMemory',)
+EXECUTOR_PEAKS = ('JVMHeapMemory', 'OnHeapStorageMemory')
+
+
+def local_spark(app_name: str, cores: int = 2, **conf: str) -> SparkSession:
+    """SparkSession local con UI habilitada (necesaria para la API REST de métricas)"""
+    builder = SparkSession.builder \
+        .master(f"local[{cores}]") \
+        .appName(app_name) \
+        .config("spark.ui.enabled", "true") \
+        .config("spark.ui.showConsoleProgress", "false") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .config("spark.executor.metrics.pollingInterval", "100ms")
+    for key, value in conf.items():
+        builder = builder.config(key, value)
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    return spark
+
+
+def completed_stages(spark: SparkSession) -> List[Dict[str, Any]]:
+    """Stages completados de la aplicación según la API REST de Spark"""
+    sc = spark.sparkContext
+    url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages?status=complete"
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+@contextmanager
+def measure(spark: SparkSession, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Medir tiempo de pared y sumar contadores de los stages ejecutados en el bloque"""
+    seen = {(s['stageId'], s['attemptId']) for s in completed_stages(spark)}
+    start = time.perf_counter()
+    yield result
+    result['wall_seconds'] = round(time.perf_counter() - start, 3)
+    new_stages = [
+        s for s in completed_stages(spark)
+        if (s['stageId'], s['attemptId']) not in seen
+    ]
+    result['stages'] = len(new_stages)
+    for counter in STAGE_COUNTERS:
+        result[counter] = sum(s.get(counter, 0) for s in new_stages)
+    for peak in STAGE_PEAKS:
+        result[peak] = max((s.get(peak, 0) for s in new_stages), default=0)
+    for peak in EXECUTOR_PEAKS:
+        result[f'peak{peak}'] = max(
+            ((s.get('peakExecutorMetrics') or {}).get(peak, 0) for s in new_stages), default=0
+        )
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Generador determinista de reclamos sintéticos para benchmarks.
+
+Produce registros con los campos del esquema de reclamos (los mismos que valida
+la ingesta) a partir de una semilla, de modo que dos ejecuciones con los mismos
+parámetros generan exactamente el mismo dataset.
+
+Opcionalmente reproduce lo que complica al job en producción:
+
+- skew: customer_id y store_id siguen una distribución Zipf con ese exponente
+  (0 = uniforme), de modo que pocos clientes y tiendas concentran los reclamos,
+- null_rate: fracción de campos nulos (incluidos los obligatorios),
+- dirty_rate: fracción de valores sucios que Silver debe limpiar o detectar
+  (espacios, estados en minúsculas, fechas inválidas, montos negativos).
+
+Uso:
+    python benchmarks/synthetic_claims.py --rows 10000000 --format parquet \\
+        --skew 1.1 --null-rate 0.01 --dirty-rate 0.02 --partitions 7 --output /tmp/bronze
+"""
+
+import argparse
+import bisect
+import gzip
+import itertools
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+STATUSES = ['PENDING', 'APPROVED', 'REJECTED', 'CLOSED']
+DESCRIPTIONS = [
+    'Producto defectuoso',
+    'Envío retrasado',
+    'Producto no entregado',
+    'Producto en mal estado',
+    'Defecto crítico',
+]
+CUSTOMERS = 50000
+STORES = 500
+FORMATS = ('ndjson', 'ndjson.gz', 'parquet')
+PARQUET_BATCH_ROWS = 100_000
+
+# Campos que pueden llegar nulos y valores sucios por campo
+NULLABLE_FIELDS = ('customer_id', 'claim_amount', 'description', 'created_at', 'updated_at')
+DIRTY_VALUES = {
+    'claim_id': lambda value, rng: f'  {value} ',
+    'store_id': lambda value, rng: f'{value} ',
+    'status': lambda value, rng: rng.choice([value.lower(), f' {value.title()} ']),
+    'claim_date': lambda value, rng: rng.choice(['2024-13-45', value.replace('-', '/'), '']),
+    'claim_amount': lambda value, rng: -value,
+    'created_at': lambda value, rng: rng.choice(['sin-fecha', value.replace('T', ' ').rstrip('Z')]),
+}
+
+
+def zipf_sampler(rng: random.Random, keys: int, skew: float):
+    """Índice en [0, keys) uniforme (skew 0) o con distribución Zipf de exponente `skew`"""
+    if skew <= 0:
+        return lambda: rng.randrange(1, keys)
+    cum_weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, keys)))
+    total = cum_weights[-1]
+    return lambda: bisect.bisect(cum_weights, rng.random() * total) + 1
+
+
+def generate_claims(rows: int, seed: int = 42, start_date: date = date(2024, 1, 1),
+                    days: int = 365, skew: float = 0.0, null_rate: float = 0.0,
+                    dirty_rate: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """Generar `rows` reclamos sintéticos"""
+    rng = random.Random(seed)
+    customer = zipf_sampler(rng, CUSTOMERS, skew)
+    store = zipf_sampler(rng, STORES, skew)
+    for i in range(rows):
+        claim_date = start_date + timedelta(days=rng.randrange(days))
+        created_at = f"{claim_date.isoformat()}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00Z"
+        record = {
+            'claim_id': f'CLM{i:010d}',
+            'customer_id': f'CUST{customer():06d}',
+            'store_id': f'STORE{store():04d}',
+            'claim_date': claim_date.isoformat(),
+            'claim_amount': round(rng.uniform(1, 6000), 2),
+            'description': rng.choice(DESCRIPTIONS),
+            'status': rng.choice(STATUSES),
+            'created_at': created_at,
+            'updated_at': created_at
+        }
+        # Sin consumir la semilla cuando las tasas son 0: el dataset base no cambia
+        if dirty_rate > 0 and rng.random() < dirty_rate:
+            field = rng.choice(list(DIRTY_VALUES))
+            record[field] = DIRTY_VALUES[field](record[field], rng)
+        if null_rate > 0 and rng.random() < null_rate:
+            record[rng.choice(NULLABLE_FIELDS + ('claim_id',))] = None
+        yield record
+
+
+def write_ndjson(path: str, rows: int, seed: int = 42, compress: bool = False,
+                 records: Optional[Iterator[Dict[str, Any]]] = None) -> str:
+    """Escribir el dataset como NDJSON (opcionalmente gzip)"""
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        for record in records if records is not None else generate_claims(rows, seed):
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+    return path
+
+
+def write_parquet(path: str, records: Iterator[Dict[str, Any]]) -> str:
+    """Escribir el dataset como Parquet con el esquema de Bronze, por lotes acotados en memoria"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (field, pa.float64() if field == 'claim_amount' else pa.string())
+        for field in ('claim_id', 'customer_id', 'store_id', 'claim_date', 'claim_amount',
+                      'description', 'status', 'created_at', 'updated_at')
+    ])
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        while True:
+            batch: List[Dict[str, Any]] = list(itertools.islice(records, PARQUET_BATCH_ROWS))
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return path
+
+
+def write_claims(output: str, rows: int, seed: int = 42, fmt: str = 'ndjson', partitions: int = 0,
+                 start_ingest_date: date = date(2024, 1, 1), **profile: float) -> List[str]:
+    """Escribir el dataset en `fmt`.
+
+    Con `partitions` > 0 `output` es un directorio con el layout de Bronze
+    (`ingest_date=YYYY-MM-DD/claims.<ext>`, filas repartidas por igual);
+    si no, `output` es el archivo a escribir. `profile` son los parámetros
+    skew, null_rate y dirty_rate de `generate_claims`.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato no soportado: {fmt}')
+    extension = {'ndjson': '.json', 'ndjson.gz': '.json.gz', 'parquet': '.parquet'}[fmt]
+    records = generate_claims(rows, seed, **profile)
+
+    targets = [(output, rows)]
+    if partitions > 0:
+        targets = []
+        for index in range(partitions):
+            directory = os.path.join(output, f'ingest_date={start_ingest_date + timedelta(days=index)}')
+            os.makedirs(directory, exist_ok=True)
+            share = rows // partitions + (1 if index < rows % partitions else 0)
+            targets.append((os.path.join(directory, f'claims{extension}'), share))
+
+    paths = []
+    for path, share in targets:
+        chunk = itertools.islice(records, share)
+        if fmt == 'parquet':
+            paths.append(write_parquet(path, chunk))
+        else:
+            paths.append(write_ndjson(path, share, compress=fmt == 'ndjson.gz', records=chunk))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar reclamos sintéticos deterministas')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--skew', type=float, default=0.0, help='Exponente Zipf de customer_id/store_id (0 = uniforme)')
+    parser.add_argument('--null-rate', type=float, default=0.0)
+    parser.add_argument('--dirty-rate', type=float, default=0.0)
+    parser.add_argument('--partitions', type=int, default=0, help='Particiones ingest_date (0 = un solo archivo)')
+    parser.add_argument('--output', required=True, help='Archivo, o directorio Bronze si --partitions > 0')
+    args = parser.parse_args()
+
+    paths = write_claims(
+        args.output, args.rows, args.seed, args.format, args.partitions,
+        skew=args.skew, null_rate=args.null_rate, dirty_rate=args.dirty_rate
+    )
+    print(json.dumps({'rows': args.rows, 'files': paths}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,106 @@ CREATE SCHEMA IF NOT EXISTS `{project_id}.retail_claims_bronze`
     location="us-central1"
   );
 
+-- Layout Bronze con particiones estilo hive escritas por la ingesta, cada uno
+-- en su propia raíz (la detección hive rechaza particiones con distintas claves
+-- bajo el mismo prefijo):
+--   bronze/retail-claims/ingest_date=YYYY-MM-DD/<archivo>
+--   bronze/retail-claims-by-claim-day/ingest_date=YYYY-MM-DD/claim_day=YYYY-MM-DD/<archivo>
+--     (con BRONZE_PARTITION_BY_CLAIM_DATE=true; tablas *_by_claim_day)
+-- Las columnas de partición se detectan del layout (ingest_date y, en la raíz
+-- by-claim-day, claim_day, ambas DATE); filtrar por ellas limita los archivos leídos.
+-- Los objetos del layout anterior (YYYY/MM/DD/) deben moverse a ingest_date=
+-- antes de recrear las tablas: todo archivo bajo cada raíz debe seguir su layout.
+
 -- Tabla externa desde archivos JSON en GCS
+-- (BigQuery admite un único comodín por URI y este abarca subdirectorios)
 CREATE OR REPLACE EXTERNAL TABLE `{project_id}.retail_claims_bronze.claims_external`
+WITH PARTITION COLUMNS
+OPTIONS (
+  format = 'NEWLINE_DELIMITED_JSON',
+  uris = ['gs://{gcs_bucket}/bronze/retail-claims/*.json'],
+  hive_partition_uri_prefix = 'gs://{gcs_bucket}/bronze/retail-claims',
+  require_hive_partition_filter = false,
+  allow_jagged_rows = true,
+  allow_quoted_newlines = true,
+  ignore_unknown_values = true
+);
+
+-- Tabla externa sobre NDJSON comprimido con gzip (BRONZE_LANDING_FORMAT=ndjson.gz)
+CREATE OR REPLACE EXTERNAL TABLE `{project_id}.retail_claims_bronze.claims_external_gz`
+(
+  claim_id STRING,
+  customer_id STRING,
+  store_id STRING,
+  claim_date STRING,
+  claim_amount FLOAT64,
+  status STRING,
+  description STRING,
+  created_at STRING,
+  updated_at STRING
+)
+WITH PARTITION COLUMNS
+OPTIONS (
+  format = 'NEWLINE_DELIMITED_JSON',
+  compression = 'GZIP',
+  uris = ['gs://{gcs_bucket}/bronze/retail-claims/*.json.gz'],
+  hive_partition_uri_prefix = 'gs://{gcs_bucket}/bronze/retail-claims',
+  require_hive_partition_filter = false,
+  ignore_unknown_values = true
+);
+
+-- Tabla externa sobre Parquet (BRONZE_LANDING_FORMAT=parquet)
+-- El esquema se toma de los archivos, escritos con el esquema explícito de la ingesta
+CREATE OR REPLACE EXTERNAL TABLE `{project_id}.retail_claims_bronze.claims_external_parquet`
+WITH PARTITION COLUMNS
+OPTIONS (
+  format = 'PARQUET',
+  uris = ['gs://{gcs_bucket}/bronze/retail-claims/*.parquet'],
+  hive_partition_uri_prefix = 'gs://{gcs_bucket}/bronze/retail-claims',
+  require_hive_partition_filter = false
+);
+
+-- Layout ingest_date=/claim_day=/ (BRONZE_PARTITION_BY_CLAIM_DATE=true): mismas
+-- tres tablas sobre su propia raíz
+CREATE OR REPLACE EXTERNAL TABLE `{project_id}.retail_claims_bronze.claims_external_by_claim_day`
+WITH PARTITION COLUMNS
 OPTIONS (
   format = 'NEWLINE_DELIMITED_JSON',
-  uris = ['gs://{gcs_bucket}/bronze/retail-claims/**/*.json'],
+  uris = ['gs://{gcs_bucket}/bronze/retail-claims-by-claim-day/*.json'],
+  hive_partition_uri_prefix = 'gs://{gcs_bucket}/bronze/retail-claims-by-claim-day',
+  require_hive_partition_filter = false,
   allow_jagged_rows = true,
   allow_quoted_newlines = true,
   ignore_unknown_values = true
 );
+
+CREATE OR REPLACE EXTERNAL TABLE `{project_id}.retail_claims_bronze.claims_external_gz_by_claim_day`
+(
+  claim_id STRING,
+  customer_id STRING,
+  store_id STRING,
+  claim_date STRING,
+  claim_amount FLOAT64,
+  status STRING,
+  description STRING,
+  created_at STRING,
+  updated_at STRING
+)
+WITH PARTITION COLUMNS
+OPTIONS (
+  format = 'NEWLINE_DELIMITED_JSON',
+  compression = 'GZIP',
+  uris = ['gs://{gcs_bucket}/bronze/retail-claims-by-claim-day/*.json.gz'],
+  hive_partition_uri_prefix = 'gs://{gcs_bucket}/bronze/retail-claims-by-claim-day',
+  require_hive_partition_filter = false,
+  ignore_unknown_values = true
+);
+
+CREATE OR REPLACE EXTERNAL TABLE `{project_id}.retail_claims_bronze.claims_external_parquet_by_claim_day`
+WITH PARTITION COLUMNS
+OPTIONS (
+  format = 'PARQUET',
+  uris = ['gs://{gcs_bucket}/bronze/retail-claims-by-claim-day/*.parquet'],
+  hive_partition_uri_prefix = 'gs://{gcs_bucket}/bronze/retail-claims-by-claim-day',
+  require_hive_partition_filter = false
+);
@@ -19,6 +19,8 @@ CREATE OR REPLACE TABLE `{project_id}.retail_claims_gold.claims_business_rules`
   risk_score FLOAT64,
   processing_timestamp TIMESTAMP,
   processing_date DATE NOT NULL,
+  -- updated_at de la versión de origen aplicada: la MERGE no aplica versiones anteriores
+  source_updated_at TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
 )
 PARTITION BY processing_date
@@ -27,5 +29,131 @@ OPTIONS(
   description="Tabla con reglas de negocio aplicadas - Capa Gold"
 );
 
+-- Staging de Gold: reclamos aptos del lote con las reglas ya calculadas por el
+-- motor Bronze -> Silver (dataproc/jobs/business_rules.py). Cada corrida
+-- reemplaza su partición processing_date; sp_merge_gold_staging la lleva a Gold.
+-- Las particiones vencen a los 7 días: el backfill no escribe staging y carga Gold desde Silver.
+CREATE OR REPLACE TABLE `{project_id}.retail_claims_gold.claims_business_rules_staging` (
+  claim_id STRING NOT NULL,
+  customer_id STRING NOT NULL,
+  store_id STRING NOT NULL,
+  claim_date DATE NOT NULL,
+  claim_amount FLOAT64 NOT NULL,
+  description STRING,
+  status STRING NOT NULL,
+  created_at TIMESTAMP,
+  updated_at TIMESTAMP,
+  claim_priority STRING,
+  days_since_claim INT64,
+  requires_escalation BOOL,
+  period_category STRING,
+  risk_score FLOAT64,
+  processing_timestamp TIMESTAMP,
+  processing_date DATE NOT NULL
+)
+PARTITION BY processing_date
+OPTIONS(
+  description="Staging de Gold con reglas de negocio calculadas en el job Bronze -> Silver",
+  partition_expiration_days=7
+);
+
+-- Agregados para dashboards, mantenidos por sp_merge_gold_batch con el delta de
+-- cada MERGE (versión anterior -1, versión nueva +1) en lugar de recalcularse.
+-- sp_rebuild_gold_aggregates los reconstruye desde claims_business_rules.
+CREATE OR REPLACE TABLE `{project_id}.retail_claims_gold.claims_daily_store_summary` (
+  claim_date DATE NOT NULL,
+  store_id STRING NOT NULL,
+  claim_priority STRING NOT NULL,
+  period_category STRING NOT NULL,
+  claims INT64 NOT NULL,
+  pending_claims INT64 NOT NULL,
+  escalated_claims INT64 NOT NULL,
+  total_amount FLOAT64 NOT NULL,
+  total_risk_score FLOAT64 NOT NULL,
+  max_risk_score FLOAT64,
+  updated_at TIMESTAMP
+)
+PARTITION BY claim_date
+CLUSTER BY store_id, claim_priority, period_category
+OPTIONS(
+  description="Reclamos por día, tienda, prioridad y período - Capa Gold (agregado incremental)"
+);
+
+CREATE OR REPLACE TABLE `{project_id}.retail_claims_gold.claims_customer_summary` (
+  customer_id STRING NOT NULL,
+  claims INT64 NOT NULL,
+  pending_claims INT64 NOT NULL,
+  escalated_claims INT64 NOT NULL,
+  total_amount FLOAT64 NOT NULL,
+  total_risk_score FLOAT64 NOT NULL,
+  last_claim_date DATE,
+  updated_at TIMESTAMP
+)
+CLUSTER BY customer_id
+OPTIONS(
+  description="Reclamos por cliente - Capa Gold (agregado incremental)"
+);
+
+-- Índice de reclamos PENDING aún sin escalar, con la fecha en que superan los 7
+-- días de antigüedad. sp_merge_gold_batch lo mantiene con cada lote y
+-- sp_age_pending_claims escala solo los que vencen en la fecha de corrida: el
+-- costo diario depende de los pendientes abiertos, no del tamaño de Gold.
+CREATE OR REPLACE TABLE `{project_id}.retail_claims_gold.claims_pending_index` (
+  claim_id STRING NOT NULL,
+  processing_date DATE NOT NULL,
+  customer_id STRING NOT NULL,
+  store_id STRING NOT NULL,
+  claim_date DATE NOT NULL,
+  claim_priority STRING NOT NULL,
+  period_category STRING NOT NULL,
+  created_date DATE NOT NULL,
+  escalation_date DATE NOT NULL
+)
+CLUSTER BY escalation_date
+OPTIONS(
+  description="Reclamos PENDING sin escalar y su fecha de escalado por antigüedad - Capa Gold"
+);
+
 CREATE INDEX idx_priority ON `{project_id}.retail_claims_gold.claims_business_rules`(claim_priority);
 CREATE INDEX idx_escalation ON `{project_id}.retail_claims_gold.claims_business_rules`(requires_escalation);
+
+-- Vistas de consulta para BI. Los dashboards apuntan a estas vistas, que leen
+-- los agregados (miles de filas) en lugar de claims_business_rules:
+-- - claims_dashboard: reclamos, pendientes, escalados, montos y riesgo por
+--   día (claim_date), tienda, prioridad y período,
+-- - claims_customer_dashboard: los mismos indicadores por cliente.
+-- El detalle por reclamo sigue consultándose en claims_business_rules.
+CREATE OR REPLACE VIEW `{project_id}.retail_claims_gold.claims_dashboard`
+OPTIONS(
+  description="Indicadores de reclamos por día, tienda, prioridad y período (lee claims_daily_store_summary)"
+)
+AS
+SELECT
+  claim_date,
+  store_id,
+  claim_priority,
+  period_category,
+  claims,
+  pending_claims,
+  escalated_claims,
+  total_amount,
+  SAFE_DIVIDE(total_amount, claims) AS avg_claim_amount,
+  SAFE_DIVIDE(total_risk_score, claims) AS avg_risk_score,
+  max_risk_score
+FROM `{project_id}.retail_claims_gold.claims_daily_store_summary`;
+
+CREATE OR REPLACE VIEW `{project_id}.retail_claims_gold.claims_customer_dashboard`
+OPTIONS(
+  description="Indicadores de reclamos por cliente (lee claims_customer_summary)"
+)
+AS
+SELECT
+  customer_id,
+  claims,
+  pending_claims,
+  escalated_claims,
+  total_amount,
+  SAFE_DIVIDE(total_amount, claims) AS avg_claim_amount,
+  SAFE_DIVIDE(total_risk_score, claims) AS avg_risk_score,
+  last_claim_date
+FROM `{project_id}.retail_claims_gold.claims_customer_summary`;
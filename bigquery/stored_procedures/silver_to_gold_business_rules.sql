@@ -1,91 +1,515 @@
-CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_silver_to_gold_transformation`()
+-- Reglas de negocio de Gold. Las mismas reglas están en dataproc/jobs/business_rules.py:
+-- el motor Bronze -> Silver las calcula al escribir Silver y deja el resultado en
+-- claims_business_rules_staging, de donde sp_merge_gold_staging hace solo la MERGE.
+-- sp_silver_to_gold_transformation (releyendo Silver) queda para reprocesos manuales y
+-- backfills, cuyas particiones del staging ya pueden haber vencido.
+-- Ambos delegan en sp_merge_gold_batch.
+--
+-- sp_merge_gold_batch recibe el rango de processing_date a llevar a Gold y:
+-- - deja una sola fila por claim_id (la versión más reciente del rango), de modo
+--   que cada fila de Gold coincide con a lo sumo una fila de origen,
+-- - descarta los reclamos con fecha futura (claim_date o created_at posterior al
+--   processing_date del lote): quedan en Silver pero no entran a Gold,
+-- - restringe Gold a processing_date >= prune_date, la menor fecha de alta
+--   (DATE(created_at)) del lote. Una fila de Gold se inserta con el
+--   processing_date de su primera carga, que por el descarte anterior no es
+--   anterior a su fecha de alta, y la MERGE no modifica processing_date.
+--   created_at no cambia entre versiones de un reclamo, así que una corrección
+--   de claim_date sigue encontrando su fila de Gold. Para los reclamos sin
+--   created_at se busca la partición actual de su fila (solo claim_id y
+--   processing_date de Gold); la MERGE solo lee las particiones recientes,
+-- - no aplica versiones más antiguas que la de Gold (source_updated_at): un
+--   reproceso o backfill de días viejos no pisa el estado más reciente,
+-- - actualiza los agregados de dashboards con el delta de la MERGE (versión
+--   anterior de cada reclamo -1, versión nueva +1), en la misma transacción,
+-- - renueva en claims_pending_index los reclamos del lote que siguen PENDING
+--   sin escalar (ver sp_age_pending_claims).
+CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_merge_gold_batch`(
+  date_from DATE,
+  date_to DATE,
+  batch_source STRING
+)
 BEGIN
   DECLARE execution_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP();
+  DECLARE prune_date DATE;
+  DECLARE min_delta_date DATE;
   
-  -- Tabla temporal para validaciones
-  CREATE TEMP TABLE temp_processed_claims AS
-  SELECT
-    claim_id,
-    customer_id,
-    store_id,
-    claim_date,
-    claim_amount,
-    description,
-    status,
-    created_at,
-    updated_at,
-    -- Regla 1: Clasificación de reclamos por monto
-    CASE 
-      WHEN claim_amount <= 100 THEN 'LOW'
-      WHEN claim_amount <= 500 THEN 'MEDIUM'
-      WHEN claim_amount <= 2000 THEN 'HIGH'
-      ELSE 'CRITICAL'
-    END AS claim_priority,
+  IF batch_source = 'staging' THEN
+    -- Reglas ya calculadas por el motor Bronze -> Silver: sin segunda lectura de Silver
+    CREATE TEMP TABLE gold_batch AS
+    SELECT *
+    FROM `{project_id}.retail_claims_gold.claims_business_rules_staging`
+    WHERE processing_date BETWEEN date_from AND date_to
+    -- Una fila por reclamo: la versión más reciente del rango
+    QUALIFY ROW_NUMBER() OVER (
+      PARTITION BY claim_id
+      ORDER BY processing_date DESC, updated_at DESC, processing_timestamp DESC
+    ) = 1;
+  ELSEIF batch_source = 'silver' THEN
+    CREATE TEMP TABLE gold_batch AS
+    SELECT
+      claim_id,
+      customer_id,
+      store_id,
+      claim_date,
+      claim_amount,
+      description,
+      status,
+      created_at,
+      updated_at,
+      -- Regla 1: Clasificación de reclamos por monto
+      CASE 
+        WHEN claim_amount <= 100 THEN 'LOW'
+        WHEN claim_amount <= 500 THEN 'MEDIUM'
+        WHEN claim_amount <= 2000 THEN 'HIGH'
+        ELSE 'CRITICAL'
+      END AS claim_priority,
+      
+      -- Regla 2: Validar edad del reclamo (al processing_date del lote, como el job)
+      DATE_DIFF(processing_date, DATE(created_at), DAY) AS days_since_claim,
+      
+      -- Regla 3: Determinar si requiere escalado
+      CASE 
+        WHEN status = 'PENDING' AND DATE_DIFF(processing_date, DATE(created_at), DAY) > 7 THEN true
+        WHEN claim_amount > 2000 THEN true
+        ELSE false
+      END AS requires_escalation,
+      
+      -- Regla 4: Categorizar por período
+      CASE 
+        WHEN EXTRACT(MONTH FROM claim_date) IN (11, 12) THEN 'HOLIDAY_SEASON'
+        WHEN EXTRACT(MONTH FROM claim_date) IN (1) THEN 'POST_HOLIDAY'
+        WHEN EXTRACT(DAYOFWEEK FROM claim_date) IN (6, 7) THEN 'WEEKEND'
+        ELSE 'REGULAR'
+      END AS period_category,
+      
+      -- Regla 5: Score de riesgo
+      CASE 
+        WHEN status = 'REJECTED' THEN 0.8
+        WHEN status = 'PENDING' THEN 0.6
+        WHEN status = 'APPROVED' THEN 0.2
+        WHEN status = 'CLOSED' THEN 0.1
+        ELSE 0.5
+      END * (CASE 
+        WHEN claim_amount > 5000 THEN 1.5
+        WHEN claim_amount > 1000 THEN 1.2
+        ELSE 1.0
+      END) AS risk_score,
+      
+      execution_timestamp AS processing_timestamp,
+      processing_date
     
-    -- Regla 2: Validar edad del reclamo
-    DATE_DIFF(CURRENT_DATE(), DATE(created_at), DAY) AS days_since_claim,
+    FROM `{project_id}.retail_claims_silver.claims_structured`
+    WHERE processing_date BETWEEN date_from AND date_to
+      AND data_quality_score >= 0.7
+    -- Una fila por reclamo: la versión más reciente del rango
+    QUALIFY ROW_NUMBER() OVER (
+      PARTITION BY claim_id
+      ORDER BY processing_date DESC, updated_at DESC, ingestion_timestamp DESC
+    ) = 1;
+  ELSE
+    RAISE USING MESSAGE = FORMAT('Origen de Gold no soportado: %s', batch_source);
+  END IF;
+  
+  -- Reclamos con fecha futura: romperían la poda de Gold y la de los agregados por claim_date
+  DELETE FROM gold_batch
+  WHERE claim_date > processing_date
+    OR DATE(created_at) > processing_date;
+  
+  SET prune_date = (SELECT MIN(DATE(created_at)) FROM gold_batch);
+  
+  -- Sin created_at no hay fecha de alta inmutable: la poda baja hasta la partición
+  -- actual de esos reclamos en Gold (o su claim_date si son nuevos)
+  IF EXISTS (SELECT 1 FROM gold_batch WHERE created_at IS NULL) THEN
+    SET prune_date = (
+      SELECT MIN(bound)
+      FROM UNNEST([
+        prune_date,
+        (
+          SELECT MIN(processing_date)
+          FROM `{project_id}.retail_claims_gold.claims_business_rules`
+          WHERE claim_id IN (SELECT claim_id FROM gold_batch WHERE created_at IS NULL)
+        ),
+        (SELECT MIN(claim_date) FROM gold_batch WHERE created_at IS NULL)
+      ]) AS bound
+    );
+  END IF;
+  
+  -- Versiones más antiguas que la de Gold: no cambian Gold, el índice ni los agregados
+  DELETE FROM gold_batch
+  WHERE claim_id IN (
+    SELECT T.claim_id
+    FROM `{project_id}.retail_claims_gold.claims_business_rules` T
+    JOIN gold_batch S
+    ON T.claim_id = S.claim_id
+    WHERE T.processing_date >= prune_date
+      AND T.source_updated_at > IFNULL(S.updated_at, TIMESTAMP '0001-01-01')
+  );
+  
+  -- Delta del lote para los agregados: versión actual en Gold (-1) y la que deja la MERGE (+1).
+  -- La MERGE solo actualiza las columnas de reglas y el estado: el resto se conserva de Gold.
+  CREATE TEMP TABLE gold_delta AS
+  SELECT change.*
+  FROM gold_batch S
+  LEFT JOIN (
+    SELECT *
+    FROM `{project_id}.retail_claims_gold.claims_business_rules`
+    WHERE processing_date >= prune_date
+  ) T
+  ON T.claim_id = S.claim_id
+  CROSS JOIN UNNEST([
+    STRUCT(
+      -1 AS sign, T.claim_date AS claim_date, T.store_id AS store_id, T.customer_id AS customer_id,
+      T.claim_priority AS claim_priority, T.period_category AS period_category, T.status AS status,
+      T.requires_escalation AS requires_escalation, T.claim_amount AS claim_amount, T.risk_score AS risk_score
+    ),
+    STRUCT(
+      1 AS sign, IFNULL(T.claim_date, S.claim_date) AS claim_date, IFNULL(T.store_id, S.store_id) AS store_id,
+      IFNULL(T.customer_id, S.customer_id) AS customer_id, S.claim_priority AS claim_priority,
+      S.period_category AS period_category, S.status AS status, S.requires_escalation AS requires_escalation,
+      IFNULL(T.claim_amount, S.claim_amount) AS claim_amount, S.risk_score AS risk_score
+    )
+  ]) AS change
+  WHERE change.sign = 1 OR T.claim_id IS NOT NULL;
+  
+  SET min_delta_date = (SELECT MIN(claim_date) FROM gold_delta);
+  
+  BEGIN
+    BEGIN TRANSACTION;
+    
+    -- Insertar en tabla Gold con deduplicación
+    MERGE INTO `{project_id}.retail_claims_gold.claims_business_rules` T
+    USING gold_batch S
+    ON T.claim_id = S.claim_id
+      AND T.processing_date >= prune_date
+    -- Solo versiones iguales o más recientes que la de Gold (las más antiguas ya se descartaron)
+    WHEN MATCHED AND (
+      T.source_updated_at IS NULL OR S.updated_at >= T.source_updated_at
+    ) THEN
+      UPDATE SET 
+        status = S.status,
+        claim_priority = S.claim_priority,
+        days_since_claim = S.days_since_claim,
+        requires_escalation = S.requires_escalation,
+        period_category = S.period_category,
+        risk_score = S.risk_score,
+        source_updated_at = S.updated_at,
+        updated_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN
+      INSERT (
+        claim_id, customer_id, store_id, claim_date, claim_amount,
+        description, status, claim_priority, days_since_claim,
+        requires_escalation, period_category, risk_score,
+        processing_timestamp, processing_date, source_updated_at
+      )
+      VALUES (
+        S.claim_id, S.customer_id, S.store_id, S.claim_date, S.claim_amount,
+        S.description, S.status, S.claim_priority, S.days_since_claim,
+        S.requires_escalation, S.period_category, S.risk_score,
+        S.processing_timestamp, S.processing_date, S.updated_at
+      );
+    
+    -- Índice de pendientes: los reclamos del lote salen y vuelven a entrar si siguen
+    -- PENDING sin escalar; escalan el primer día con más de 7 días de antigüedad
+    DELETE FROM `{project_id}.retail_claims_gold.claims_pending_index`
+    WHERE claim_id IN (SELECT claim_id FROM gold_batch);
     
-    -- Regla 3: Determinar si requiere escalado
-    CASE 
-      WHEN status = 'PENDING' AND DATE_DIFF(CURRENT_DATE(), DATE(created_at), DAY) > 7 THEN true
-      WHEN claim_amount > 2000 THEN true
-      ELSE false
-    END AS requires_escalation,
+    INSERT INTO `{project_id}.retail_claims_gold.claims_pending_index` (
+      claim_id, processing_date, customer_id, store_id, claim_date,
+      claim_priority, period_category, created_date, escalation_date
+    )
+    SELECT
+      G.claim_id, G.processing_date, G.customer_id, G.store_id, G.claim_date,
+      G.claim_priority, G.period_category, DATE(S.created_at),
+      DATE_ADD(DATE(S.created_at), INTERVAL 8 DAY)
+    FROM gold_batch S
+    JOIN (
+      SELECT *
+      FROM `{project_id}.retail_claims_gold.claims_business_rules`
+      WHERE processing_date >= prune_date
+    ) G
+    ON G.claim_id = S.claim_id
+    WHERE G.status = 'PENDING'
+      AND NOT G.requires_escalation
+      AND S.created_at IS NOT NULL;
     
-    -- Regla 4: Categorizar por período
-    CASE 
-      WHEN EXTRACT(MONTH FROM claim_date) IN (11, 12) THEN 'HOLIDAY_SEASON'
-      WHEN EXTRACT(MONTH FROM claim_date) IN (1) THEN 'POST_HOLIDAY'
-      WHEN EXTRACT(DAYOFWEEK FROM claim_date) IN (6, 7) THEN 'WEEKEND'
-      ELSE 'REGULAR'
-    END AS period_category,
+    -- Agregado diario por tienda: conteos y sumas se ajustan con el delta
+    MERGE INTO `{project_id}.retail_claims_gold.claims_daily_store_summary` A
+    USING (
+      SELECT
+        claim_date,
+        store_id,
+        claim_priority,
+        period_category,
+        SUM(sign) AS claims,
+        SUM(IF(status = 'PENDING', sign, 0)) AS pending_claims,
+        SUM(IF(requires_escalation, sign, 0)) AS escalated_claims,
+        SUM(sign * claim_amount) AS total_amount,
+        SUM(sign * risk_score) AS total_risk_score,
+        MAX(IF(sign > 0, risk_score, NULL)) AS max_added_risk,
+        MAX(IF(sign < 0, risk_score, NULL)) AS max_removed_risk
+      FROM gold_delta
+      GROUP BY claim_date, store_id, claim_priority, period_category
+    ) D
+    ON A.claim_date = D.claim_date
+      AND A.store_id = D.store_id
+      AND A.claim_priority = D.claim_priority
+      AND A.period_category = D.period_category
+      AND A.claim_date >= min_delta_date
+    WHEN MATCHED AND A.claims + D.claims = 0 THEN
+      DELETE
+    WHEN MATCHED THEN
+      UPDATE SET 
+        claims = A.claims + D.claims,
+        pending_claims = A.pending_claims + D.pending_claims,
+        escalated_claims = A.escalated_claims + D.escalated_claims,
+        total_amount = A.total_amount + D.total_amount,
+        total_risk_score = A.total_risk_score + D.total_risk_score,
+        -- Si salió el máximo del grupo sin entrar otro igual o mayor, se recalcula abajo
+        max_risk_score = CASE
+          WHEN D.max_added_risk >= A.max_risk_score THEN D.max_added_risk
+          WHEN D.max_removed_risk >= A.max_risk_score THEN NULL
+          ELSE A.max_risk_score
+        END,
+        updated_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED AND D.claims > 0 THEN
+      INSERT (
+        claim_date, store_id, claim_priority, period_category, claims, pending_claims,
+        escalated_claims, total_amount, total_risk_score, max_risk_score, updated_at
+      )
+      VALUES (
+        D.claim_date, D.store_id, D.claim_priority, D.period_category, D.claims, D.pending_claims,
+        D.escalated_claims, D.total_amount, D.total_risk_score, D.max_added_risk, CURRENT_TIMESTAMP()
+      );
     
-    -- Regla 5: Score de riesgo
-    CASE 
-      WHEN status = 'REJECTED' THEN 0.8
-      WHEN status = 'PENDING' THEN 0.6
-      WHEN status = 'APPROVED' THEN 0.2
-      WHEN status = 'CLOSED' THEN 0.1
-      ELSE 0.5
-    END * (CASE 
-      WHEN claim_amount > 5000 THEN 1.5
-      WHEN claim_amount > 1000 THEN 1.2
-      ELSE 1.0
-    END) AS risk_score,
+    -- Máximos invalidados: solo sus grupos, desde las particiones de Gold del lote
+    IF EXISTS (
+      SELECT 1
+      FROM `{project_id}.retail_claims_gold.claims_daily_store_summary`
+      WHERE claim_date >= min_delta_date AND max_risk_score IS NULL
+    ) THEN
+      UPDATE `{project_id}.retail_claims_gold.claims_daily_store_summary` A
+      SET max_risk_score = R.max_risk_score
+      FROM (
+        SELECT claim_date, store_id, claim_priority, period_category, MAX(risk_score) AS max_risk_score
+        FROM `{project_id}.retail_claims_gold.claims_business_rules`
+        WHERE processing_date >= min_delta_date
+          AND claim_date >= min_delta_date
+        GROUP BY claim_date, store_id, claim_priority, period_category
+      ) R
+      WHERE A.claim_date >= min_delta_date
+        AND A.max_risk_score IS NULL
+        AND A.claim_date = R.claim_date
+        AND A.store_id = R.store_id
+        AND A.claim_priority = R.claim_priority
+        AND A.period_category = R.period_category;
+    END IF;
     
-    execution_timestamp AS processing_timestamp,
-    CURRENT_DATE() AS processing_date,
-    row_number() OVER (PARTITION BY customer_id ORDER BY created_at DESC) AS recency_rank
+    -- Agregado por cliente
+    MERGE INTO `{project_id}.retail_claims_gold.claims_customer_summary` A
+    USING (
+      SELECT
+        customer_id,
+        SUM(sign) AS claims,
+        SUM(IF(status = 'PENDING', sign, 0)) AS pending_claims,
+        SUM(IF(requires_escalation, sign, 0)) AS escalated_claims,
+        SUM(sign * claim_amount) AS total_amount,
+        SUM(sign * risk_score) AS total_risk_score,
+        MAX(IF(sign > 0, claim_date, NULL)) AS last_claim_date
+      FROM gold_delta
+      GROUP BY customer_id
+    ) D
+    ON A.customer_id = D.customer_id
+    WHEN MATCHED AND A.claims + D.claims = 0 THEN
+      DELETE
+    WHEN MATCHED THEN
+      UPDATE SET 
+        claims = A.claims + D.claims,
+        pending_claims = A.pending_claims + D.pending_claims,
+        escalated_claims = A.escalated_claims + D.escalated_claims,
+        total_amount = A.total_amount + D.total_amount,
+        total_risk_score = A.total_risk_score + D.total_risk_score,
+        last_claim_date = GREATEST(A.last_claim_date, IFNULL(D.last_claim_date, A.last_claim_date)),
+        updated_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED AND D.claims > 0 THEN
+      INSERT (
+        customer_id, claims, pending_claims, escalated_claims, total_amount,
+        total_risk_score, last_claim_date, updated_at
+      )
+      VALUES (
+        D.customer_id, D.claims, D.pending_claims, D.escalated_claims, D.total_amount,
+        D.total_risk_score, D.last_claim_date, CURRENT_TIMESTAMP()
+      );
     
-  FROM `{project_id}.retail_claims_silver.claims_structured`
-  WHERE processing_date = CURRENT_DATE()
-    AND data_quality_score >= 0.7;
+    COMMIT TRANSACTION;
+  EXCEPTION WHEN ERROR THEN
+    -- Gold y sus agregados quedan como estaban
+    ROLLBACK TRANSACTION;
+    RAISE USING MESSAGE = @@error.message;
+  END;
+
+END;
+
+CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_merge_gold_staging`(
+  date_from DATE,
+  date_to DATE
+)
+BEGIN
+  CALL `{project_id}.retail_claims_gold.sp_merge_gold_batch`(date_from, date_to, 'staging');
+END;
+
+CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_silver_to_gold_transformation`(
+  date_from DATE,
+  date_to DATE
+)
+BEGIN
+  CALL `{project_id}.retail_claims_gold.sp_merge_gold_batch`(date_from, date_to, 'silver');
+END;
+
+-- Envejecimiento diario de los pendientes: days_since_claim y la regla "PENDING con
+-- más de 7 días" dependen de la fecha, pero la MERGE solo los recalcula para los
+-- reclamos que vuelven a llegar. En lugar de reescribir Gold, se escalan solo los
+-- reclamos de claims_pending_index que vencen hasta run_date (fecha de corrida, o
+-- la de un backfill): lee el índice y las particiones de Gold de esos reclamos.
+CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_age_pending_claims`(
+  run_date DATE
+)
+BEGIN
+  DECLARE aged_partitions ARRAY<DATE>;
+  DECLARE min_claim_date DATE;
   
-  -- Insertar en tabla Gold con deduplicación
-  MERGE INTO `{project_id}.retail_claims_gold.claims_business_rules` T
-  USING temp_processed_claims S
-  ON T.claim_id = S.claim_id
-  WHEN MATCHED AND S.recency_rank = 1 THEN
-    UPDATE SET 
-      status = S.status,
-      claim_priority = S.claim_priority,
-      days_since_claim = S.days_since_claim,
-      requires_escalation = S.requires_escalation,
-      period_category = S.period_category,
-      risk_score = S.risk_score,
-      updated_at = CURRENT_TIMESTAMP()
-  WHEN NOT MATCHED THEN
-    INSERT (
-      claim_id, customer_id, store_id, claim_date, claim_amount,
-      description, status, claim_priority, days_since_claim,
-      requires_escalation, period_category, risk_score,
-      processing_timestamp, processing_date
-    )
-    VALUES (
-      S.claim_id, S.customer_id, S.store_id, S.claim_date, S.claim_amount,
-      S.description, S.status, S.claim_priority, S.days_since_claim,
-      S.requires_escalation, S.period_category, S.risk_score,
-      S.processing_timestamp, S.processing_date
-    );
+  CREATE TEMP TABLE aged_claims AS
+  SELECT *
+  FROM `{project_id}.retail_claims_gold.claims_pending_index`
+  WHERE escalation_date <= run_date;
+  
+  SET aged_partitions = (SELECT ARRAY_AGG(DISTINCT processing_date) FROM aged_claims);
+  SET min_claim_date = (SELECT MIN(claim_date) FROM aged_claims);
+  
+  IF IFNULL(ARRAY_LENGTH(aged_partitions), 0) > 0 THEN
+    BEGIN
+      BEGIN TRANSACTION;
+      
+      UPDATE `{project_id}.retail_claims_gold.claims_business_rules` T
+      SET requires_escalation = true,
+        days_since_claim = DATE_DIFF(run_date, A.created_date, DAY),
+        updated_at = CURRENT_TIMESTAMP()
+      FROM aged_claims A
+      WHERE T.processing_date IN UNNEST(aged_partitions)
+        AND T.processing_date = A.processing_date
+        AND T.claim_id = A.claim_id;
+      
+      -- Los agregados solo cambian en escalated_claims (el riesgo no depende del escalado)
+      UPDATE `{project_id}.retail_claims_gold.claims_daily_store_summary` S
+      SET escalated_claims = S.escalated_claims + D.claims,
+        updated_at = CURRENT_TIMESTAMP()
+      FROM (
+        SELECT claim_date, store_id, claim_priority, period_category, COUNT(*) AS claims
+        FROM aged_claims
+        GROUP BY claim_date, store_id, claim_priority, period_category
+      ) D
+      WHERE S.claim_date >= min_claim_date
+        AND S.claim_date = D.claim_date
+        AND S.store_id = D.store_id
+        AND S.claim_priority = D.claim_priority
+        AND S.period_category = D.period_category;
+      
+      UPDATE `{project_id}.retail_claims_gold.claims_customer_summary` S
+      SET escalated_claims = S.escalated_claims + D.claims,
+        updated_at = CURRENT_TIMESTAMP()
+      FROM (
+        SELECT customer_id, COUNT(*) AS claims
+        FROM aged_claims
+        GROUP BY customer_id
+      ) D
+      WHERE S.customer_id = D.customer_id;
+      
+      DELETE FROM `{project_id}.retail_claims_gold.claims_pending_index`
+      WHERE escalation_date <= run_date;
+      
+      COMMIT TRANSACTION;
+    EXCEPTION WHEN ERROR THEN
+      ROLLBACK TRANSACTION;
+      RAISE USING MESSAGE = @@error.message;
+    END;
+  END IF;
+
+END;
+
+-- Carga inicial de claims_pending_index: Gold no guarda created_at, se toma de la
+-- última versión de cada reclamo en Silver.
+CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_rebuild_pending_index`()
+BEGIN
+  BEGIN TRANSACTION;
+  
+  DELETE FROM `{project_id}.retail_claims_gold.claims_pending_index` WHERE true;
+  INSERT INTO `{project_id}.retail_claims_gold.claims_pending_index` (
+    claim_id, processing_date, customer_id, store_id, claim_date,
+    claim_priority, period_category, created_date, escalation_date
+  )
+  SELECT
+    G.claim_id, G.processing_date, G.customer_id, G.store_id, G.claim_date,
+    G.claim_priority, G.period_category, DATE(S.created_at),
+    DATE_ADD(DATE(S.created_at), INTERVAL 8 DAY)
+  FROM `{project_id}.retail_claims_gold.claims_business_rules` G
+  JOIN (
+    SELECT claim_id, created_at
+    FROM `{project_id}.retail_claims_silver.claims_structured`
+    WHERE created_at IS NOT NULL
+    QUALIFY ROW_NUMBER() OVER (
+      PARTITION BY claim_id
+      ORDER BY processing_date DESC, updated_at DESC, ingestion_timestamp DESC
+    ) = 1
+  ) S
+  ON S.claim_id = G.claim_id
+  WHERE G.status = 'PENDING'
+    AND NOT G.requires_escalation;
+  
+  COMMIT TRANSACTION;
+END;
 
+-- Reconstrucción completa de los agregados desde claims_business_rules (carga
+-- inicial o reparación); las corridas diarias los mantienen con el delta.
+CREATE OR REPLACE PROCEDURE `{project_id}.retail_claims_gold.sp_rebuild_gold_aggregates`()
+BEGIN
+  BEGIN TRANSACTION;
+  
+  DELETE FROM `{project_id}.retail_claims_gold.claims_daily_store_summary` WHERE true;
+  INSERT INTO `{project_id}.retail_claims_gold.claims_daily_store_summary` (
+    claim_date, store_id, claim_priority, period_category, claims, pending_claims,
+    escalated_claims, total_amount, total_risk_score, max_risk_score, updated_at
+  )
+  SELECT
+    claim_date,
+    store_id,
+    claim_priority,
+    period_category,
+    COUNT(*),
+    COUNTIF(status = 'PENDING'),
+    COUNTIF(requires_escalation),
+    SUM(claim_amount),
+    SUM(risk_score),
+    MAX(risk_score),
+    CURRENT_TIMESTAMP()
+  FROM `{project_id}.retail_claims_gold.claims_business_rules`
+  GROUP BY claim_date, store_id, claim_priority, period_category;
+  
+  DELETE FROM `{project_id}.retail_claims_gold.claims_customer_summary` WHERE true;
+  INSERT INTO `{project_id}.retail_claims_gold.claims_customer_summary` (
+    customer_id, claims, pending_claims, escalated_claims, total_amount,
+    total_risk_score, last_claim_date, updated_at
+  )
+  SELECT
+    customer_id,
+    COUNT(*),
+    COUNTIF(status = 'PENDING'),
+    COUNTIF(requires_escalation),
+    SUM(claim_amount),
+    SUM(risk_score),
+    MAX(claim_date),
+    CURRENT_TIMESTAMP()
+  FROM `{project_id}.retail_claims_gold.claims_business_rules`
+  GROUP BY customer_id;
+  
+  COMMIT TRANSACTION;
 END;
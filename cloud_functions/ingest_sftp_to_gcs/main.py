@@ -1,15 +1,999 @@
+from __future__ import annotations
+
+import time
+
+# Inicio de la carga del módulo: mide el import en frío de la instancia
+_MODULE_LOAD_START = time.perf_counter()
+
 import functions_framework
-import paramiko
 import logging
-from google.cloud import storage
-from datetime import datetime
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import fnmatch
+import gzip
+import hashlib
+import io
 import json
-from typing import Dict, Any
+import math
+from typing import TYPE_CHECKING, Dict, Any, Callable, Iterator, List, Optional, Tuple
+import importlib
 import os
+import posixpath
+import queue
+import resource
+import stat
+import sys
+import threading
+import uuid
+
+if TYPE_CHECKING:
+    import paramiko
+    from google.cloud import storage
+
+try:
+    # Parser JSON nativo (varias veces más rápido); opcional, con fallback a json
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Segundos gastados en imports diferidos (paramiko, google.cloud.storage) por módulo
+_lazy_import_seconds: Dict[str, float] = {}
+_lazy_import_lock = threading.Lock()
+
+
+def _lazy_import(module_name: str):
+    """Importar un módulo pesado en su primer uso y registrar cuánto tardó.
+    
+    paramiko y google.cloud.storage suman ~250 ms de arranque en frío; se
+    difieren hasta que una invocación los necesita. Tras el primer import es
+    una búsqueda en sys.modules.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with _lazy_import_lock:
+        if module_name not in sys.modules:
+            start = time.perf_counter()
+            importlib.import_module(module_name)
+            _lazy_import_seconds[module_name] = time.perf_counter() - start
+        return sys.modules[module_name]
+
+
+def _paramiko():
+    return _lazy_import('paramiko')
+
+
+def _gcs_exceptions():
+    return _lazy_import('google.api_core.exceptions')
+
+
+def lazy_import_seconds() -> float:
+    """Total de segundos de imports diferidos realizados en esta instancia"""
+    return sum(_lazy_import_seconds.values())
+
+
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
+
+def get_storage_client() -> storage.Client:
+    """Cliente de GCS de la instancia, creado en la primera invocación y reutilizado"""
+    global _storage_client
+    if _storage_client is None:
+        with _storage_client_lock:
+            if _storage_client is None:
+                _storage_client = _lazy_import('google.cloud.storage').Client()
+    return _storage_client
+
+
+class SSHTransportCache:
+    """Conexiones SSH abiertas reutilizadas entre invocaciones, por host.
+    
+    La clave es (host, puerto, usuario). Un transporte se reutiliza si sigue
+    activo y no lleva más de `max_idle_seconds` sin uso; se le activa el
+    keep-alive de SSH para que el servidor no lo cierre entre invocaciones
+    cercanas. Si una invocación falla con un transporte prestado, este se
+    descarta por si la conexión quedó en mal estado.
+    """
+    
+    def __init__(self):
+        self._entries: Dict[Tuple[str, int, str], Tuple[paramiko.SSHClient, float]] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def connection(
+        self,
+        key: Tuple[str, int, str],
+        connect: Callable[[], paramiko.SSHClient],
+        keepalive_seconds: int,
+        max_idle_seconds: float
+    ) -> Iterator[Tuple[paramiko.SSHClient, bool]]:
+        """Prestar la conexión del host (o abrir una nueva); devuelve (ssh, reutilizada)"""
+        ssh, reused = self._take(key, max_idle_seconds)
+        if ssh is None:
+            ssh = connect()
+            ssh.get_transport().set_keepalive(keepalive_seconds)
+        try:
+            yield ssh, reused
+        except Exception:
+            ssh.close()
+            raise
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = (ssh, time.monotonic())
+        if previous and previous[0] is not ssh:
+            previous[0].close()
+    
+    def _take(self, key: Tuple[str, int, str], max_idle_seconds: float):
+        with self._lock:
+            ssh, last_used = self._entries.pop(key, (None, 0.0))
+        if ssh is None:
+            return None, False
+        transport = ssh.get_transport()
+        if transport is None or not transport.is_active() or \
+                time.monotonic() - last_used > max_idle_seconds:
+            ssh.close()
+            return None, False
+        return ssh, True
+    
+    def close(self) -> None:
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for ssh, _ in entries.values():
+            ssh.close()
+
+
+_ssh_transports = SSHTransportCache()
+
+_invocation_count = 0
+_invocation_lock = threading.Lock()
+
+
+def _begin_invocation() -> bool:
+    """Registrar una invocación; True si es la primera de la instancia (arranque en frío)"""
+    global _invocation_count
+    with _invocation_lock:
+        _invocation_count += 1
+        return _invocation_count == 1
+
+
+class InvocationTimings:
+    """Tiempos de una invocación por fase: init de clientes, conexión y transferencia.
+    
+    El tiempo de los imports diferidos que ocurren dentro de una fase se
+    descuenta de ella y se reporta aparte en `lazy_import_seconds`, de modo que
+    una invocación en frío y una en caliente sean comparables fase a fase.
+    La memoria de la invocación es la RSS actual al inicio y al final; el pico
+    de ru_maxrss abarca todas las invocaciones de la instancia y se reporta
+    como `process_peak_rss_mb`.
+    """
+    
+    PHASES = ('client_init', 'connect', 'transfer')
+    
+    def __init__(self, cold_start: bool = False):
+        self.cold_start = cold_start
+        self.ssh_transport_reused = False
+        self.seconds = {name: 0.0 for name in self.PHASES}
+        self.import_seconds = 0.0
+        self._rss_start_mb = _rss_mb()
+        self._start = time.perf_counter()
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        imports_before = lazy_import_seconds()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            imported = lazy_import_seconds() - imports_before
+            self.import_seconds += imported
+            self.seconds[name] += time.perf_counter() - start - imported
+    
+    def report(self) -> Dict[str, Any]:
+        return {
+            'cold_start': self.cold_start,
+            # Carga de main.py (functions_framework incluido): solo la paga la primera invocación
+            'module_import_seconds': round(MODULE_IMPORT_SECONDS, 3) if self.cold_start else 0.0,
+            'lazy_import_seconds': round(self.import_seconds, 3),
+            **{f"{name}_seconds": round(value, 3) for name, value in self.seconds.items()},
+            'ssh_transport_reused': self.ssh_transport_reused,
+            'total_seconds': round(time.perf_counter() - self._start, 3),
+            **_rss_report(self._rss_start_mb)
+        }
+
+# Tamaño de bloque de transferencia: múltiplo de 256 KiB (requisito de la subida reanudable de GCS)
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# Bloques solicitados por adelantado al servidor SFTP en cada ventana de lectura
+DEFAULT_PREFETCH_CHUNKS = 4
+# Límite de longitud de una línea NDJSON para acotar el buffer del validador
+DEFAULT_MAX_LINE_BYTES = 1024 * 1024
+# Canales SFTP abiertos sobre el mismo transporte SSH (y transferencias concurrentes) en modo batch
+DEFAULT_MAX_CONCURRENT_TRANSFERS = 4
+# Formato de aterrizaje en Bronze: json (NDJSON tal cual), ndjson.gz o parquet
+DEFAULT_LANDING_FORMAT = 'json'
+# Raíz Bronze de cada layout: las tablas externas con detección hive rechazan
+# particiones con distintas claves, así que ingest_date=/ y
+# ingest_date=/claim_day=/ nunca comparten prefijo
+DEFAULT_BRONZE_PREFIX = 'bronze/retail-claims'
+CLAIM_DAY_BRONZE_PREFIX = 'bronze/retail-claims-by-claim-day'
+# NDJSON válido acumulado por row group Parquet (acota la memoria del conversor)
+DEFAULT_PARQUET_ROW_GROUP_BYTES = 32 * 1024 * 1024
+# Canales SFTP que descargan rangos de un mismo archivo grande en paralelo
+DEFAULT_RANGE_CONCURRENCY = 4
+# Tamaño a partir del cual un archivo se descarga por rangos en paralelo
+DEFAULT_RANGE_MIN_FILE_BYTES = 64 * 1024 * 1024
+# Bloques en vuelo por canal en la descarga por rangos (acota la memoria a
+# chunk_size * concurrencia * este valor)
+RANGE_WINDOW_PER_CHANNEL = 2
+# Bloque de subida de cada objeto cuando un archivo se reparte por claim_date
+# (hay una subida abierta por fecha; mínimo admitido por GCS)
+PARTITION_CHUNK_SIZE = 256 * 1024
+
+# Segundos de keep-alive SSH de los transportes cacheados entre invocaciones
+DEFAULT_SSH_KEEPALIVE_SECONDS = 30
+# Un transporte cacheado sin uso por más tiempo se descarta (el servidor pudo cerrarlo)
+DEFAULT_SSH_MAX_IDLE_SECONDS = 300
+
+# Campos de reclamo según retail_claims_silver.claims_structured: (campo, tipos JSON, requerido).
+# Los campos numéricos también se aceptan como texto numérico ("125.50"): se
+# reescriben como número en Bronze para que todos los lectores los tipen igual.
+CLAIM_FIELDS = (
+    ('claim_id', (str,), True),
+    ('customer_id', (str,), True),
+    ('store_id', (str,), True),
+    ('claim_date', (str,), True),
+    ('claim_amount', (int, float), True),
+    ('status', (str,), True),
+    ('description', (str,), False),
+    ('created_at', (str,), False),
+    ('updated_at', (str,), False),
+)
+
+
+_REQUIRED_STRING_FIELDS = tuple(f for f, types, required in CLAIM_FIELDS if required and types == (str,))
+_OPTIONAL_STRING_FIELDS = tuple(f for f, types, required in CLAIM_FIELDS if not required)
+
+
+def _numeric_string(value: str) -> Optional[float]:
+    """Valor de un número enviado como texto (None si no es un número finito)"""
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _field_error(field: str, value: Any) -> str:
+    if value is None:
+        return f"Campo requerido ausente: {field}"
+    return f"Tipo inválido en {field}: {type(value).__name__}"
+
+
+def _claim_error(record: Any) -> Optional[str]:
+    """Motivo por el que un registro no cumple el esquema Silver (None si es válido).
+    
+    Se comparan tipos exactos (`type(x) is str`) en lugar de isinstance: es el
+    camino caliente de la validación y así bool no pasa como número.
+    """
+    if type(record) is not dict:
+        return "El registro no es un objeto JSON"
+    get = record.get
+    for field in _REQUIRED_STRING_FIELDS:
+        value = get(field)
+        if type(value) is not str:
+            return _field_error(field, value)
+    amount = get('claim_amount')
+    if type(amount) is not float and type(amount) is not int:
+        if type(amount) is not str or _numeric_string(amount) is None:
+            return _field_error('claim_amount', amount)
+    for field in _OPTIONAL_STRING_FIELDS:
+        value = get(field)
+        if value is not None and type(value) is not str:
+            return _field_error(field, value)
+    claim_date = record['claim_date']
+    try:
+        if len(claim_date) != 10:
+            raise ValueError
+        date.fromisoformat(claim_date)
+    except ValueError:
+        return f"claim_date no tiene formato YYYY-MM-DD: {claim_date!r}"
+    return None
+
+
+class NDJSONClaimsValidator:
+    """Validación incremental de NDJSON registro a registro a medida que pasan los bytes.
+    
+    Cada línea completa se parsea y se contrasta con los campos requeridos y
+    tipos del esquema Silver. `feed` devuelve las líneas válidas (listas para
+    escribirse en Bronze, con claim_amount numérico) y las inválidas con su
+    número de línea y motivo.
+    """
+    
+    def __init__(self, max_line_bytes: int = DEFAULT_MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self.line_number = 0
+        self.valid_records = 0
+        self.invalid_records = 0
+        self._pending = b''
+    
+    def feed(self, chunk: bytes) -> Tuple[bytes, List[Tuple[int, str, bytes]]]:
+        """Validar las líneas completas del bloque y retener la línea parcial"""
+        complete = self._complete_lines(chunk)
+        return self._validate_block(complete) if complete is not None else (b'', [])
+    
+    def close(self) -> Tuple[bytes, List[Tuple[int, str, bytes]]]:
+        """Validar la última línea (sin salto de línea final)"""
+        pending = self._take_pending()
+        return self._validate_block(pending) if pending else (b'', [])
+    
+    def feed_by_claim_date(self, chunk: bytes) -> Tuple[Dict[str, bytes], List[Tuple[int, str, bytes]]]:
+        """Como `feed`, pero con las líneas válidas agrupadas por claim_date"""
+        complete = self._complete_lines(chunk)
+        return self._validate_block(complete, by_claim_date=True) if complete is not None else ({}, [])
+    
+    def close_by_claim_date(self) -> Tuple[Dict[str, bytes], List[Tuple[int, str, bytes]]]:
+        """Como `close`, pero con las líneas válidas agrupadas por claim_date"""
+        pending = self._take_pending()
+        return self._validate_block(pending, by_claim_date=True) if pending else ({}, [])
+    
+    def _complete_lines(self, chunk: bytes) -> Optional[bytes]:
+        """Líneas completas acumuladas (None si aún no hay ninguna)"""
+        buffer = self._pending + chunk
+        cut = buffer.rfind(b'\n')
+        if cut < 0:
+            self._pending = buffer
+            complete = None
+        else:
+            self._pending = buffer[cut + 1:]
+            complete = buffer[:cut]
+        if len(self._pending) > self.max_line_bytes:
+            raise ValueError(
+                f"Línea {self.line_number + 1} excede {self.max_line_bytes} bytes"
+            )
+        return complete
+    
+    def _take_pending(self) -> bytes:
+        pending = self._pending
+        self._pending = b''
+        return pending
+    
+    def _validate_block(self, block: bytes, by_claim_date: bool = False):
+        """Validar un bloque de líneas completas.
+        
+        El bloque se decodifica una sola vez y el parser trabaja sobre str, lo
+        que evita la detección de codificación por línea. Si ninguna línea es
+        inválida ni se reescribe (claim_amount como texto numérico) se devuelve
+        el bloque original sin recodificar. Con
+        `by_claim_date` las líneas válidas se devuelven agrupadas por fecha.
+        """
+        try:
+            lines = block.decode('utf-8').split('\n')
+        except UnicodeDecodeError:
+            lines = block.split(b'\n')
+        valid_count = 0
+        skipped = 0
+        rewritten = 0
+        invalid = []
+        groups = {}
+        loads = json_loads
+        line_number = self.line_number
+        for offset, line in enumerate(lines):
+            line_number += 1
+            if not line or line.isspace():
+                skipped += 1
+                continue
+            try:
+                record = loads(line)
+                error = _claim_error(record)
+            except ValueError as e:
+                error = f"JSON inválido: {str(e)}"
+            if error is None:
+                valid_count += 1
+                if type(record['claim_amount']) is str:
+                    record['claim_amount'] = _numeric_string(record['claim_amount'])
+                    line = lines[offset] = json.dumps(record, ensure_ascii=False)
+                    rewritten += 1
+                if by_claim_date:
+                    groups.setdefault(record['claim_date'], []).append(line)
+            else:
+                invalid.append((line_number, error, line))
+        self.line_number = line_number
+        self.valid_records += valid_count
+        self.invalid_records += len(invalid)
+        invalid = [
+            (line_number, error, line.encode('utf-8') if isinstance(line, str) else line)
+            for line_number, error, line in invalid
+        ]
+        
+        if by_claim_date:
+            if len(groups) == 1 and not invalid and not skipped and not rewritten:
+                return {next(iter(groups)): block + b'\n'}, invalid
+            return {claim_date: _join_lines(kept) for claim_date, kept in groups.items()}, invalid
+        
+        if not valid_count:
+            valid = b''
+        elif not invalid and not skipped and not rewritten:
+            valid = block + b'\n'
+        else:
+            bad_lines = {line_number for line_number, _, _ in invalid}
+            first_line = line_number - len(lines) + 1
+            valid = _join_lines([
+                line for offset, line in enumerate(lines)
+                if line and not line.isspace() and first_line + offset not in bad_lines
+            ])
+        return valid, invalid
+
+
+def _join_lines(lines: List[Any]) -> bytes:
+    """Unir líneas (str o bytes) en un bloque NDJSON"""
+    return b'\n'.join(
+        line.encode('utf-8') if isinstance(line, str) else line for line in lines
+    ) + b'\n'
+
+
+class BronzeFileWriter:
+    """Escritura de un objeto Bronze a partir de bloques de líneas NDJSON válidas"""
+    
+    extension = '.json'
+    content_type = 'application/json'
+    
+    def __init__(self, blob_writer):
+        self.blob_writer = blob_writer
+    
+    def write(self, ndjson: bytes) -> None:
+        if ndjson:
+            self.blob_writer.write(ndjson)
+    
+    def close(self) -> int:
+        """Finalizar el objeto en GCS; devuelve los bytes aterrizados"""
+        self._finish()
+        bytes_landed = self.blob_writer.tell()
+        self.blob_writer.close()
+        return bytes_landed
+    
+    @property
+    def buffered_bytes(self) -> int:
+        """NDJSON retenido en memoria por el formato a la espera de escribirse"""
+        return 0
+    
+    def flush(self) -> None:
+        """Escribir lo retenido por el formato (no finaliza el objeto)"""
+    
+    def _finish(self) -> None:
+        """Volcar lo pendiente del formato antes de cerrar la subida"""
+    
+    def abort(self) -> None:
+        self.blob_writer.abort()
+
+
+class GzipNDJSONBronzeWriter(BronzeFileWriter):
+    """NDJSON comprimido con gzip en streaming (leído por BigQuery con compression=GZIP)"""
+    
+    extension = '.json.gz'
+    content_type = 'application/gzip'
+    
+    def __init__(self, blob_writer, compresslevel: int = 6):
+        super().__init__(blob_writer)
+        self._gzip = gzip.GzipFile(fileobj=blob_writer, mode='wb', compresslevel=compresslevel, mtime=0)
+    
+    def write(self, ndjson: bytes) -> None:
+        if ndjson:
+            self._gzip.write(ndjson)
+    
+    def _finish(self) -> None:
+        self._gzip.close()
+    
+    def abort(self) -> None:
+        self.blob_writer.abort()
+        try:
+            self._gzip.close()
+        except ValueError:
+            # El trailer gzip ya no puede escribirse sobre la subida descartada
+            pass
+
+
+class ParquetBronzeWriter(BronzeFileWriter):
+    """Conversión a Parquet con esquema explícito de reclamos.
+    
+    Las líneas válidas se acumulan hasta `row_group_bytes` de NDJSON y se
+    convierten con el lector JSON de Arrow en un único row group, de modo que
+    Spark pueda repartir el archivo por row groups. pyarrow se importa solo si
+    se usa este formato.
+    """
+    
+    extension = '.parquet'
+    content_type = 'application/vnd.apache.parquet'
+    
+    def __init__(self, blob_writer, row_group_bytes: int = DEFAULT_PARQUET_ROW_GROUP_BYTES):
+        super().__init__(blob_writer)
+        import pyarrow.json as pa_json
+        import pyarrow.parquet as pq
+        
+        self._pa_json = pa_json
+        self.schema = bronze_arrow_schema()
+        self.row_group_bytes = row_group_bytes
+        self._parse_options = pa_json.ParseOptions(
+            explicit_schema=self.schema,
+            unexpected_field_behavior='ignore'
+        )
+        self._read_options = pa_json.ReadOptions(block_size=max(2 * DEFAULT_MAX_LINE_BYTES, 16 * 1024 * 1024))
+        self._writer = pq.ParquetWriter(blob_writer, self.schema, compression='snappy')
+        self._blocks = []
+        self._buffered = 0
+        self.row_groups = 0
+    
+    def write(self, ndjson: bytes) -> None:
+        if not ndjson:
+            return
+        self._blocks.append(ndjson)
+        self._buffered += len(ndjson)
+        if self._buffered >= self.row_group_bytes:
+            self.flush()
+    
+    @property
+    def buffered_bytes(self) -> int:
+        return self._buffered
+    
+    def flush(self) -> None:
+        if not self._blocks:
+            return
+        table = self._pa_json.read_json(
+            io.BytesIO(b''.join(self._blocks)),
+            read_options=self._read_options,
+            parse_options=self._parse_options
+        )
+        self._blocks = []
+        self._buffered = 0
+        self._writer.write_table(table, row_group_size=max(table.num_rows, 1))
+        self.row_groups += 1
+    
+    def _finish(self) -> None:
+        self.flush()
+        self._writer.close()
+    
+    def abort(self) -> None:
+        # Sin convertir lo acumulado; el ParquetWriter se cierra aquí para que su
+        # finalizador no escriba el pie sobre la subida ya descartada
+        self._blocks = []
+        self._buffered = 0
+        try:
+            self._writer.close()
+        except Exception as e:
+            logger.warning(f"Error cerrando el ParquetWriter descartado: {str(e)}")
+        finally:
+            self.blob_writer.abort()
+
+
+def bronze_arrow_schema():
+    """Esquema Arrow de la capa Bronze: tipos JSON crudos de los campos de reclamo"""
+    import pyarrow as pa
+    
+    return pa.schema([
+        (field, pa.float64() if types == (int, float) else pa.string())
+        for field, types, _ in CLAIM_FIELDS
+    ])
+
+
+BRONZE_WRITERS = {
+    'json': BronzeFileWriter,
+    'ndjson.gz': GzipNDJSONBronzeWriter,
+    'parquet': ParquetBronzeWriter,
+}
+
+
+class PartitionedBronzeWriter:
+    """Un objeto Bronze por claim_date dentro de la misma partición ingest_date.
+    
+    Los escritores se abren perezosamente con `open_writer(claim_date)` a medida
+    que aparecen fechas en el stream. Lo que cada formato retiene en memoria
+    (row groups Parquet) se acota en conjunto a `buffer_budget_bytes`: al
+    superarse se vuelca la partición con más datos pendientes.
+    """
+    
+    def __init__(self, open_writer: Callable[[str], BronzeFileWriter], buffer_budget_bytes: int):
+        self.open_writer = open_writer
+        self.buffer_budget_bytes = buffer_budget_bytes
+        self.writers: Dict[str, BronzeFileWriter] = {}
+    
+    def write(self, groups: Dict[str, bytes]) -> None:
+        for claim_date, ndjson in groups.items():
+            writer = self.writers.get(claim_date)
+            if writer is None:
+                writer = self.writers[claim_date] = self.open_writer(claim_date)
+            writer.write(ndjson)
+        while sum(w.buffered_bytes for w in self.writers.values()) > self.buffer_budget_bytes:
+            max(self.writers.values(), key=lambda w: w.buffered_bytes).flush()
+    
+    def close(self) -> int:
+        """Finalizar todos los objetos; devuelve el total de bytes aterrizados"""
+        return sum(writer.close() for writer in self.writers.values())
+    
+    def abort(self) -> None:
+        for writer in self.writers.values():
+            writer.abort()
+
+
+class QuarantineWriter:
+    """Escritura perezosa de líneas inválidas al prefijo de cuarentena.
+    
+    Cada línea se guarda como JSON con su número de línea, el motivo y el
+    contenido original; el objeto solo se crea si aparece alguna línea inválida.
+    """
+    
+    CHUNK_SIZE = 256 * 1024
+    
+    def __init__(self, bucket: storage.Bucket, path: str, staging_prefix: str):
+        self.bucket = bucket
+        self.path = path
+        self.staging_prefix = staging_prefix
+        self.records = 0
+        self._writer = None
+    
+    def write(self, invalid: List[Tuple[int, str, bytes]]) -> None:
+        if not invalid:
+            return
+        if self._writer is None:
+            self._writer = StagedUpload(
+                self.bucket, self.path, self.staging_prefix,
+                chunk_size=self.CHUNK_SIZE, content_type='application/json'
+            )
+        payload = ''.join(
+            json.dumps({
+                'line_number': line_number,
+                'error': error,
+                'raw': line.decode('utf-8', errors='replace')
+            }, ensure_ascii=False) + '\n'
+            for line_number, error, line in invalid
+        )
+        self._writer.write(payload.encode('utf-8'))
+        self.records += len(invalid)
+    
+    @property
+    def written(self) -> bool:
+        return self._writer is not None
+    
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+    
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.abort()
+
+
+def iter_readv_chunks(remote, file_size: int, chunk_size: int, prefetch_chunks: int) -> Iterator[bytes]:
+    """Leer un archivo SFTP abierto en bloques de tamaño fijo con prefetch acotado.
+    
+    Cada ventana de `prefetch_chunks` bloques se solicita con readv, que
+    encola las lecturas en paralelo sobre el canal SFTP; la memoria en vuelo
+    queda limitada a chunk_size * prefetch_chunks.
+    """
+    window = chunk_size * prefetch_chunks
+    offset = 0
+    while offset < file_size:
+        end = min(offset + window, file_size)
+        ranges = [
+            (start, min(chunk_size, end - start))
+            for start in range(offset, end, chunk_size)
+        ]
+        for data in remote.readv(ranges):
+            yield data
+        offset = end
+
+
+class ParallelRangeReader:
+    """Descarga de un archivo SFTP por rangos de bytes sobre varios canales.
+    
+    Cada hilo abre su propio canal SFTP (sobre el mismo transporte SSH) y su
+    propio handle del archivo, toma el siguiente rango libre y lo lee con
+    readv. Los bloques se entregan en orden, de modo que el resto del
+    pipeline (checksum, validación, subida reanudable) no cambia. Como los
+    rangos se toman en orden y un hilo solo toma uno nuevo si hay hueco en la
+    ventana, la memoria queda acotada a `window` bloques.
+    """
+    
+    def __init__(
+        self,
+        open_channel: Callable[[], paramiko.SFTPClient],
+        remote_path: str,
+        file_size: int,
+        chunk_size: int,
+        concurrency: int,
+        window: Optional[int] = None
+    ):
+        self.open_channel = open_channel
+        self.remote_path = remote_path
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.window = window or concurrency * RANGE_WINDOW_PER_CHANNEL
+    
+    def __iter__(self) -> Iterator[bytes]:
+        ranges = [
+            (offset, min(self.chunk_size, self.file_size - offset))
+            for offset in range(0, self.file_size, self.chunk_size)
+        ]
+        pending = queue.Queue()
+        for index, byte_range in enumerate(ranges):
+            pending.put((index, byte_range))
+        results: Dict[int, bytes] = {}
+        errors: List[Exception] = []
+        ready = threading.Condition()
+        slots = threading.Semaphore(self.window)
+        stop = threading.Event()
+        
+        def worker():
+            try:
+                sftp = self.open_channel()
+                try:
+                    with sftp.file(self.remote_path, 'rb') as remote:
+                        while True:
+                            slots.acquire()
+                            if stop.is_set():
+                                return
+                            try:
+                                index, (offset, size) = pending.get_nowait()
+                            except queue.Empty:
+                                slots.release()
+                                return
+                            data = b''.join(remote.readv([(offset, size)]))
+                            with ready:
+                                results[index] = data
+                                ready.notify_all()
+                finally:
+                    sftp.close()
+            except Exception as e:
+                with ready:
+                    errors.append(e)
+                    ready.notify_all()
+        
+        workers = [
+            threading.Thread(target=worker, daemon=True)
+            for _ in range(min(self.concurrency, len(ranges)))
+        ]
+        for thread in workers:
+            thread.start()
+        try:
+            for index in range(len(ranges)):
+                with ready:
+                    while index not in results and not errors:
+                        ready.wait()
+                    if errors:
+                        raise errors[0]
+                    data = results.pop(index)
+                slots.release()
+                yield data
+        finally:
+            stop.set()
+            for _ in workers:
+                slots.release()
+            for thread in workers:
+                thread.join()
+
+
+class SFTPChannelPool:
+    """Pool de canales SFTP sobre un único transporte SSH.
+    
+    Los canales se abren de forma perezosa hasta `size` y se reutilizan entre
+    transferencias, evitando un handshake SSH por archivo.
+    """
+    
+    def __init__(self, transport: paramiko.Transport, size: int):
+        self.transport = transport
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._channels = []
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def channel(self) -> Iterator[paramiko.SFTPClient]:
+        """Tomar un canal del pool y devolverlo al terminar"""
+        sftp = self._acquire()
+        try:
+            yield sftp
+        finally:
+            self._idle.put(sftp)
+    
+    def _acquire(self) -> paramiko.SFTPClient:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = len(self._channels) < self.size
+            if can_open:
+                sftp = _paramiko().SFTPClient.from_transport(self.transport)
+                self._channels.append(sftp)
+        if can_open:
+            return sftp
+        return self._idle.get()
+    
+    def close(self) -> None:
+        for sftp in self._channels:
+            sftp.close()
+        self._channels = []
+
+
+class IngestionManifest:
+    """Manifiesto de ingesta persistido como objeto JSON en el bucket.
+    
+    Indexa cada archivo remoto por su ruta con tamaño, mtime, checksum MD5 y
+    ruta GCS de destino. Se guarda con precondición de generación para no
+    perder entradas cuando dos ejecuciones lo actualizan a la vez.
+    """
+    
+    MAX_SAVE_ATTEMPTS = 5
+    
+    def __init__(self, bucket: storage.Bucket, path: str):
+        self.bucket = bucket
+        self.path = path
+        self.entries = {}
+        self._generation = 0
+        self._updated = {}
+        self._lock = threading.Lock()
+    
+    def load(self) -> 'IngestionManifest':
+        """Leer el manifiesto (vacío si aún no existe)"""
+        blob = self.bucket.get_blob(self.path)
+        if blob is None:
+            self.entries = {}
+            self._generation = 0
+        else:
+            payload = json.loads(blob.download_as_bytes(if_generation_match=blob.generation))
+            self.entries = payload.get('files', {})
+            self._generation = blob.generation
+        logger.info(f"Manifiesto de ingesta cargado: {len(self.entries)} archivos")
+        return self
+    
+    def get(self, remote_path: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(remote_path)
+    
+    def record(self, remote_path: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries[remote_path] = entry
+            self._updated[remote_path] = entry
+    
+    def save(self) -> None:
+        """Persistir las entradas nuevas; ante una escritura concurrente se recarga y reintenta"""
+        if not self._updated:
+            return
+        for _ in range(self.MAX_SAVE_ATTEMPTS):
+            blob = self.bucket.blob(self.path)
+            payload = json.dumps({
+                'files': self.entries,
+                'updated_at': datetime.utcnow().isoformat()
+            }, sort_keys=True)
+            try:
+                blob.upload_from_string(
+                    payload,
+                    content_type='application/json',
+                    if_generation_match=self._generation
+                )
+                self._generation = blob.generation
+                self._updated = {}
+                logger.info(f"Manifiesto de ingesta guardado: gs://{self.bucket.name}/{self.path}")
+                return
+            except _gcs_exceptions().PreconditionFailed:
+                logger.warning("Manifiesto modificado por otra ejecución, recargando")
+                updated = self._updated
+                self.load()
+                self.entries.update(updated)
+                self._updated = updated
+        raise RuntimeError(f"No se pudo guardar el manifiesto tras {self.MAX_SAVE_ATTEMPTS} intentos")
+
+
+# Tamaño de página para convertir /proc/self/statm (en páginas) a bytes
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _process_peak_rss_mb() -> float:
+    """Pico de memoria residente desde el arranque del proceso en MB (ru_maxrss en KB en Linux).
+    
+    En una instancia caliente incluye las invocaciones anteriores.
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+
+def _rss_mb() -> Optional[float]:
+    """Memoria residente actual del proceso en MB (None fuera de Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(resident_pages * _PAGE_SIZE / (1024 * 1024), 2)
+
+
+def _rss_report(rss_start_mb: Optional[float]) -> Dict[str, Any]:
+    """RSS al inicio y al final de la invocación y pico del proceso"""
+    rss_end_mb = _rss_mb()
+    return {
+        'rss_start_mb': rss_start_mb,
+        'rss_end_mb': rss_end_mb,
+        'rss_delta_mb': round(rss_end_mb - rss_start_mb, 2)
+        if rss_start_mb is not None and rss_end_mb is not None else None,
+        'process_peak_rss_mb': _process_peak_rss_mb()
+    }
+
+
+def _valid_size(valid) -> int:
+    """Bytes de NDJSON válido (bloque único o agrupado por claim_date)"""
+    if isinstance(valid, dict):
+        return sum(len(block) for block in valid.values())
+    return len(valid)
+
+
+def _entry_gcs_paths(entry: Dict[str, Any]) -> List[str]:
+    """Objetos Bronze de una entrada del manifiesto (las previas solo tienen gcs_path)"""
+    return entry.get('gcs_paths') or [entry['gcs_path']]
+
+
+class StagedUpload:
+    """Subida reanudable a un objeto temporal que solo se publica al cerrar con éxito.
+    
+    El BlobWriter escribe en `staging_path`, fuera del prefijo Bronze; close()
+    lo copia a `path` (copia dentro del bucket, sin volver a subir los datos) y
+    elimina el temporal. abort() finaliza la subida temporal y la elimina, sin
+    depender de los internos de BlobWriter: un fallo (o el recolector de basura,
+    que también cierra el BlobWriter) nunca deja un objeto parcial en Bronze.
+    """
+    
+    def __init__(self, bucket: storage.Bucket, path: str, staging_prefix: str, **open_kwargs: Any):
+        self.bucket = bucket
+        self.path = path
+        self.staging_path = f"{staging_prefix}/{uuid.uuid4().hex}/{path}"
+        self._writer = bucket.blob(self.staging_path).open('wb', **open_kwargs)
+        self._done = False
+    
+    @property
+    def closed(self) -> bool:
+        return self._done
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data: bytes) -> int:
+        if self._done:
+            raise ValueError('I/O operation on closed file.')
+        return self._writer.write(data)
+    
+    def tell(self) -> int:
+        return self._writer.tell()
+    
+    def flush(self) -> None:
+        self._writer.flush()
+    
+    def close(self) -> None:
+        """Finalizar el temporal y publicarlo con su nombre definitivo"""
+        if self._done:
+            return
+        self._done = True
+        self._writer.close()
+        staged = self.bucket.blob(self.staging_path)
+        self.bucket.copy_blob(staged, self.bucket, self.path)
+        self._delete_staged()
+    
+    def abort(self) -> None:
+        """Descartar la subida: el objeto definitivo no se crea ni se modifica"""
+        if self._done:
+            return
+        self._done = True
+        try:
+            self._writer.close()
+        except Exception as e:
+            logger.warning(f"Error cerrando la subida temporal gs://{self.bucket.name}/{self.staging_path}: {str(e)}")
+        self._delete_staged()
+    
+    def _delete_staged(self) -> None:
+        try:
+            self.bucket.blob(self.staging_path).delete()
+        except _gcs_exceptions().NotFound:
+            pass
+
 
 class SFTPToGCSIngestion:
     """Ingesta de archivos JSON desde SFTP a Google Cloud Storage"""
@@ -22,14 +1006,60 @@ class SFTPToGCSIngestion:
         self.sftp_remote_path = config.get('sftp_remote_path')
         
         self.gcs_bucket = config.get('gcs_bucket')
-        self.gcs_prefix = config.get('gcs_prefix', 'bronze/retail-claims')
+        # Subpartición claim_day=YYYY-MM-DD por fecha del reclamo, repartida en streaming
+        self.partition_by_claim_date = config.get('partition_by_claim_date', False)
+        # Cada layout en su propia raíz (sus propias tablas externas)
+        self.gcs_prefix = config.get('gcs_prefix') or (
+            CLAIM_DAY_BRONZE_PREFIX if self.partition_by_claim_date else DEFAULT_BRONZE_PREFIX
+        )
+        if self.gcs_prefix.rstrip('/') == (
+            DEFAULT_BRONZE_PREFIX if self.partition_by_claim_date else CLAIM_DAY_BRONZE_PREFIX
+        ):
+            raise ValueError(
+                f"El prefijo {self.gcs_prefix} es de otro layout Bronze "
+                f"(partition_by_claim_date={self.partition_by_claim_date})"
+            )
+        # El manifiesto vive fuera del prefijo Bronze para no ser leído por claims_external
+        self.manifest_path = config.get(
+            'manifest_path', f"manifests/{self.gcs_prefix}/ingestion_manifest.json"
+        )
+        self.use_manifest = config.get('use_manifest', True)
+        self.quarantine_prefix = config.get('quarantine_prefix', 'quarantine/retail-claims')
+        # Subidas en curso (objetos temporales hasta que la transferencia termina), también
+        # fuera del prefijo Bronze; una regla de ciclo de vida elimina los huérfanos
+        self.upload_staging_prefix = config.get('upload_staging_prefix') or f"uploads/{self.gcs_prefix}"
+        self.landing_format = config.get('landing_format', DEFAULT_LANDING_FORMAT)
+        if self.landing_format not in BRONZE_WRITERS:
+            raise ValueError(f"Formato de aterrizaje no soportado: {self.landing_format}")
+        self.parquet_row_group_bytes = config.get('parquet_row_group_bytes', DEFAULT_PARQUET_ROW_GROUP_BYTES)
+        # Partición hive ingest_date=YYYY-MM-DD (por defecto, la fecha UTC de la ingesta)
+        self.ingest_date = date.fromisoformat(
+            config.get('ingest_date') or datetime.utcnow().date().isoformat()
+        ).isoformat()
+        
+        self.chunk_size = config.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        self.prefetch_chunks = config.get('prefetch_chunks', DEFAULT_PREFETCH_CHUNKS)
+        self.max_concurrent_transfers = config.get(
+            'max_concurrent_transfers', DEFAULT_MAX_CONCURRENT_TRANSFERS
+        )
+        # Descarga por rangos: cada transferencia abre hasta range_concurrency canales
+        # adicionales (el servidor debe admitir max_concurrent_transfers * range_concurrency)
+        self.range_concurrency = config.get('range_concurrency', DEFAULT_RANGE_CONCURRENCY)
+        self.range_min_file_bytes = config.get('range_min_file_bytes', DEFAULT_RANGE_MIN_FILE_BYTES)
         
-        self.storage_client = storage.Client()
+        # Caché de conexiones SSH entre invocaciones (keep-alive por host)
+        self.reuse_ssh_transport = config.get('reuse_ssh_transport', False)
+        self.ssh_keepalive_seconds = config.get('ssh_keepalive_seconds', DEFAULT_SSH_KEEPALIVE_SECONDS)
+        self.ssh_max_idle_seconds = config.get('ssh_max_idle_seconds', DEFAULT_SSH_MAX_IDLE_SECONDS)
+        
+        # Cliente compartido por todas las invocaciones de la instancia
+        self.storage_client = get_storage_client()
         self.bucket = self.storage_client.bucket(self.gcs_bucket)
     
     def connect_sftp(self) -> paramiko.SSHClient:
         """Establecer conexión SFTP con manejo de errores"""
         try:
+            paramiko = _paramiko()
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(
@@ -45,6 +1075,34 @@ class SFTPToGCSIngestion:
             logger.error(f"Error conectando a SFTP: {str(e)}")
             raise
     
+    @contextmanager
+    def ssh_session(self, timings: InvocationTimings) -> Iterator[paramiko.SSHClient]:
+        """Conexión SSH de la invocación.
+        
+        Con `reuse_ssh_transport` la conexión se toma de la caché por host y se
+        devuelve a ella al terminar; si no, se abre y se cierra aquí.
+        """
+        def connect() -> paramiko.SSHClient:
+            with timings.phase('connect'):
+                return self.connect_sftp()
+        
+        if not self.reuse_ssh_transport:
+            ssh = connect()
+            try:
+                yield ssh
+            finally:
+                ssh.close()
+            return
+        
+        key = (self.sftp_host, self.sftp_port, self.sftp_username)
+        with _ssh_transports.connection(
+            key, connect, self.ssh_keepalive_seconds, self.ssh_max_idle_seconds
+        ) as (ssh, reused):
+            timings.ssh_transport_reused = reused
+            if reused:
+                logger.info(f"Reutilizando conexión SSH a {self.sftp_host}")
+            yield ssh
+    
     def download_from_sftp(self, ssh: paramiko.SSHClient, remote_file: str) -> bytes:
         """Descargar archivo desde SFTP"""
         try:
@@ -59,20 +1117,70 @@ class SFTPToGCSIngestion:
             raise
     
     def validate_json(self, data: bytes) -> bool:
-        """Validar que el archivo es un JSON válido"""
-        try:
-            json.loads(data)
-            logger.info("Validación JSON exitosa")
-            return True
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON inválido: {str(e)}")
+        """Validar que el contenido es NDJSON con el esquema de reclamos"""
+        validator = NDJSONClaimsValidator(max_line_bytes=len(data) + 1)
+        _, invalid = validator.feed(data)
+        invalid += validator.close()[1]
+        if invalid:
+            line_number, error, _ = invalid[0]
+            logger.error(f"NDJSON inválido en línea {line_number}: {error}")
             return False
+        logger.info("Validación JSON exitosa")
+        return True
+    
+    def build_gcs_path(self, filename: str, claim_date: Optional[str] = None) -> str:
+        """Ruta de destino en la capa Bronze con particiones estilo hive.
+        
+        `{prefix}/ingest_date=YYYY-MM-DD/[claim_day=YYYY-MM-DD/]{filename}`. La
+        clave de la fecha del reclamo es claim_day porque una columna de
+        partición no puede llamarse igual que un campo de los archivos; el
+        layout con claim_day usa su propia raíz (CLAIM_DAY_BRONZE_PREFIX).
+        """
+        partition = f"ingest_date={self.ingest_date}"
+        if claim_date:
+            partition += f"/claim_day={claim_date}"
+        return f"{self.gcs_prefix}/{partition}/{filename}"
+    
+    def landed_filename(self, remote_file: str) -> str:
+        """Nombre del objeto Bronze según el formato de aterrizaje"""
+        base = remote_file
+        for suffix in ('.jsonl', '.ndjson', '.json'):
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+                break
+        return base + BRONZE_WRITERS[self.landing_format].extension
+    
+    def open_bronze_writer(self, gcs_path: str, chunk_size: Optional[int] = None) -> BronzeFileWriter:
+        """Abrir la subida reanudable y el escritor del formato de aterrizaje"""
+        writer_class = BRONZE_WRITERS[self.landing_format]
+        blob_writer = StagedUpload(
+            self.bucket, gcs_path, self.upload_staging_prefix,
+            chunk_size=chunk_size or self.chunk_size,
+            content_type=writer_class.content_type,
+            ignore_flush=True
+        )
+        if writer_class is ParquetBronzeWriter:
+            return ParquetBronzeWriter(blob_writer, self.parquet_row_group_bytes)
+        return writer_class(blob_writer)
+    
+    def open_partitioned_writer(self, landed_filename: str) -> PartitionedBronzeWriter:
+        """Escritor que reparte las líneas válidas en un objeto por claim_date"""
+        return PartitionedBronzeWriter(
+            lambda claim_date: self.open_bronze_writer(
+                self.build_gcs_path(landed_filename, claim_date), PARTITION_CHUNK_SIZE
+            ),
+            buffer_budget_bytes=self.parquet_row_group_bytes
+        )
+    
+    def build_quarantine_path(self, gcs_path: str) -> str:
+        """Ruta de cuarentena equivalente a una ruta Bronze"""
+        relative_path = gcs_path[len(self.gcs_prefix):].lstrip('/')
+        return f"{self.quarantine_prefix}/{relative_path}"
     
     def upload_to_gcs(self, data: bytes, filename: str) -> str:
         """Cargar archivo a Google Cloud Storage"""
         try:
-            timestamp = datetime.utcnow().strftime('%Y/%m/%d')
-            gcs_path = f"{self.gcs_prefix}/{timestamp}/{filename}"
+            gcs_path = self.build_gcs_path(filename)
             
             blob = self.bucket.blob(gcs_path)
             blob.upload_from_string(
@@ -85,26 +1193,411 @@ class SFTPToGCSIngestion:
             logger.error(f"Error cargando a GCS: {str(e)}")
             raise
     
-    def process(self, remote_filename: str) -> Dict[str, Any]:
-        """Proceso principal de ingesta"""
-        ssh = None
+    def iter_sftp_chunks(self, remote, file_size: int) -> Iterator[bytes]:
+        """Leer el archivo remoto en bloques de tamaño fijo con prefetch acotado"""
+        return iter_readv_chunks(remote, file_size, self.chunk_size, self.prefetch_chunks)
+    
+    def use_ranged_download(self, file_size: int) -> bool:
+        """Los archivos grandes se descargan por rangos en paralelo"""
+        return self.range_concurrency > 1 and file_size >= self.range_min_file_bytes
+    
+    def read_remote_chunks(
+        self,
+        sftp: paramiko.SFTPClient,
+        remote_path: str,
+        file_size: int
+    ) -> Iterator[bytes]:
+        """Bloques del archivo remoto en orden, por rangos en paralelo o secuencial.
+        
+        Los canales adicionales de la descarga por rangos se abren sobre el
+        transporte SSH del canal recibido y se cierran al terminar el archivo.
+        """
+        if self.use_ranged_download(file_size):
+            transport = sftp.get_channel().get_transport()
+            yield from ParallelRangeReader(
+                lambda: _paramiko().SFTPClient.from_transport(transport),
+                remote_path,
+                file_size,
+                self.chunk_size,
+                self.range_concurrency
+            )
+        else:
+            with sftp.file(remote_path, 'rb') as remote:
+                yield from self.iter_sftp_chunks(remote, file_size)
+    
+    def stream_sftp_to_gcs(
+        self,
+        ssh: paramiko.SSHClient,
+        remote_file: str,
+        manifest: Optional[IngestionManifest] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """Transferir un archivo SFTP -> GCS en streaming abriendo su propio canal SFTP"""
+        sftp = ssh.open_sftp()
         try:
-            ssh = self.connect_sftp()
+            return self.transfer_file(sftp, remote_file, manifest, force)
+        finally:
+            sftp.close()
+    
+    def load_manifest(self) -> Optional[IngestionManifest]:
+        """Cargar el manifiesto de ingesta si está habilitado"""
+        if not self.use_manifest:
+            return None
+        return IngestionManifest(self.bucket, self.manifest_path).load()
+    
+    def transfer_file(
+        self,
+        sftp: paramiko.SFTPClient,
+        remote_file: str,
+        manifest: Optional[IngestionManifest] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """Transferir SFTP -> GCS en streaming con memoria acotada.
+        
+        Los bloques leídos se validan registro a registro: las líneas válidas se
+        escriben en una subida reanudable de GCS y las inválidas van al prefijo
+        de cuarentena con su número de línea, sin materializar el archivo. Con
+        `partition_by_claim_date` cada fecha de reclamo va a su propio objeto
+        bajo `claim_day=`.
+        
+        Con manifiesto, un archivo con el mismo tamaño y mtime no se descarga;
+        uno modificado se publica en la partición ingest_date actual y sus
+        objetos previos se eliminan; si su checksum coincide con el registrado,
+        la subida se descarta.
+        """
+        try:
+            remote_path = f"{self.sftp_remote_path}/{remote_file}"
+            attrs = sftp.stat(remote_path)
+            file_size = attrs.st_size
+            previous = manifest.get(remote_path) if manifest else None
+            
+            if previous and not force and \
+                    previous['size'] == file_size and previous['mtime'] == attrs.st_mtime:
+                logger.info(f"Archivo sin cambios según manifiesto, se omite: {remote_file}")
+                return self._skipped_result(previous, 'unchanged')
             
-            # Descargar archivo
-            data = self.download_from_sftp(ssh, remote_filename)
+            landed_filename = self.landed_filename(remote_file)
+            base_path = self.build_gcs_path(landed_filename)
+            quarantine_path = self.build_quarantine_path(base_path)
             
-            # Validar JSON
-            if not self.validate_json(data):
-                raise ValueError("Archivo JSON inválido")
+            validator = NDJSONClaimsValidator()
+            if self.partition_by_claim_date:
+                writer = self.open_partitioned_writer(landed_filename)
+                validator_feed, validator_close = validator.feed_by_claim_date, validator.close_by_claim_date
+            else:
+                writer = self.open_bronze_writer(base_path)
+                validator_feed, validator_close = validator.feed, validator.close
+            quarantine = QuarantineWriter(self.bucket, quarantine_path, self.upload_staging_prefix)
+            checksum = hashlib.md5(usedforsecurity=False)
+            bytes_transferred = 0
+            bytes_written = 0
+            start = time.monotonic()
+            try:
+                for chunk in self.read_remote_chunks(sftp, remote_path, file_size):
+                    checksum.update(chunk)
+                    bytes_transferred += len(chunk)
+                    valid, invalid = validator_feed(chunk)
+                    writer.write(valid)
+                    quarantine.write(invalid)
+                    bytes_written += _valid_size(valid)
+                valid, invalid = validator_close()
+                writer.write(valid)
+                quarantine.write(invalid)
+                bytes_written += _valid_size(valid)
+                
+                same_content = bool(previous) and previous.get('md5') == checksum.hexdigest()
+                if same_content and not force:
+                    writer.abort()
+                    quarantine.abort()
+                    bytes_landed = 0
+                else:
+                    bytes_landed = writer.close()
+                    quarantine.close()
+            except Exception:
+                writer.abort()
+                quarantine.abort()
+                raise
+            elapsed = time.monotonic() - start
             
-            # Cargar a GCS
-            gcs_path = self.upload_to_gcs(data, remote_filename)
+            if same_content and not force:
+                # Se conservan los objetos y la cuarentena ya publicados para este contenido
+                entry = {
+                    **previous,
+                    'size': file_size,
+                    'mtime': attrs.st_mtime,
+                    'ingested_at': datetime.utcnow().isoformat()
+                }
+                if manifest:
+                    manifest.record(remote_path, entry)
+                logger.info(f"Contenido idéntico al ya ingerido, no se republica: {remote_file}")
+                return self._skipped_result(entry, 'same_checksum')
             
+            if self.partition_by_claim_date:
+                gcs_paths = sorted(
+                    self.build_gcs_path(landed_filename, claim_date) for claim_date in writer.writers
+                )
+                gcs_path = self.build_gcs_path(landed_filename, '*')
+            else:
+                gcs_paths = [base_path]
+                gcs_path = base_path
+            if not quarantine.written:
+                quarantine_path = None
+            if previous:
+                # Objetos de la versión anterior que la nueva no reescribió
+                stale = set(_entry_gcs_paths(previous)) - set(gcs_paths)
+                if previous.get('quarantine_path') not in (None, quarantine_path):
+                    stale.add(previous['quarantine_path'])
+                self._delete_objects(sorted(stale))
+            
+            entry = {
+                'size': file_size,
+                'mtime': attrs.st_mtime,
+                'md5': checksum.hexdigest(),
+                'ingest_date': self.ingest_date,
+                'gcs_path': gcs_path,
+                'gcs_paths': gcs_paths,
+                'records': validator.valid_records,
+                'invalid_records': validator.invalid_records,
+                'quarantine_path': quarantine_path,
+                'ingested_at': datetime.utcnow().isoformat()
+            }
+            if manifest:
+                manifest.record(remote_path, entry)
+            
+            if validator.invalid_records:
+                logger.warning(
+                    f"{validator.invalid_records} líneas inválidas de {remote_file} enviadas a "
+                    f"gs://{self.gcs_bucket}/{quarantine_path}"
+                )
+            logger.info(
+                f"Archivo transferido en streaming: {remote_file} -> "
+                f"gs://{self.gcs_bucket}/{gcs_path} ({len(gcs_paths)} objetos, "
+                f"{bytes_transferred} bytes, {elapsed:.2f}s)"
+            )
+            return {
+                'gcs_path': gcs_path,
+                'gcs_paths': gcs_paths,
+                'ingest_date': self.ingest_date,
+                'skipped': False,
+                'bytes_transferred': bytes_transferred,
+                'bytes_written': bytes_written,
+                'bytes_landed': bytes_landed,
+                'landing_format': self.landing_format,
+                'download_mode': 'ranged' if self.use_ranged_download(file_size) else 'sequential',
+                'records': validator.valid_records,
+                'invalid_records': validator.invalid_records,
+                'quarantine_path': f"gs://{self.gcs_bucket}/{quarantine_path}" if quarantine_path else None,
+                'md5': entry['md5'],
+                'duration_seconds': round(elapsed, 3),
+                'throughput_mb_s': round(bytes_transferred / (1024 * 1024) / elapsed, 2) if elapsed > 0 else 0,
+                'rss_mb': _rss_mb()
+            }
+        except Exception as e:
+            logger.error(f"Error en transferencia streaming de {remote_file}: {str(e)}")
+            raise
+    
+    def _delete_objects(self, paths: List[str]) -> None:
+        """Eliminar objetos reemplazados (ignorando los que ya no existen)"""
+        for path in paths:
+            try:
+                self.bucket.blob(path).delete()
+                logger.info(f"Objeto reemplazado eliminado: gs://{self.gcs_bucket}/{path}")
+            except _gcs_exceptions().NotFound:
+                pass
+    
+    @staticmethod
+    def _skipped_result(entry: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        return {
+            'gcs_path': entry['gcs_path'],
+            'gcs_paths': _entry_gcs_paths(entry),
+            'ingest_date': entry.get('ingest_date'),
+            'skipped': True,
+            'skip_reason': reason,
+            'bytes_transferred': 0,
+            'bytes_written': 0,
+            'bytes_landed': 0,
+            'records': entry.get('records', 0),
+            'invalid_records': entry.get('invalid_records', 0),
+            'md5': entry.get('md5'),
+            'duration_seconds': 0,
+            'throughput_mb_s': 0,
+            'rss_mb': _rss_mb()
+        }
+    
+    def resolve_remote_files(
+        self,
+        sftp: paramiko.SFTPClient,
+        filenames: Optional[List[str]] = None,
+        pattern: Optional[str] = None,
+        directory: Optional[str] = None
+    ) -> List[str]:
+        """Resolver la lista de archivos del batch (relativos a sftp_remote_path).
+        
+        Acepta una lista explícita, un glob (p. ej. `stores/claims_*.json`) o un
+        directorio completo; en los dos últimos casos solo se listan archivos
+        regulares del directorio indicado (sin recursión).
+        """
+        if filenames:
+            return list(filenames)
+        
+        if pattern:
+            subdir, name_pattern = posixpath.split(pattern)
+        elif directory is not None:
+            subdir, name_pattern = directory.strip('/'), '*'
+        else:
+            raise ValueError("Se requiere 'filenames', 'pattern' o 'directory'")
+        
+        remote_dir = posixpath.join(self.sftp_remote_path, subdir) if subdir else self.sftp_remote_path
+        entries = sftp.listdir_attr(remote_dir)
+        return sorted(
+            posixpath.join(subdir, entry.filename) if subdir else entry.filename
+            for entry in entries
+            if stat.S_ISREG(entry.st_mode or 0) and fnmatch.fnmatch(entry.filename, name_pattern)
+        )
+    
+    def _transfer_from_pool(
+        self,
+        pool: SFTPChannelPool,
+        remote_file: str,
+        manifest: Optional[IngestionManifest],
+        force: bool
+    ) -> Dict[str, Any]:
+        """Transferir un archivo del batch aislando su error del resto"""
+        try:
+            with pool.channel() as sftp:
+                transfer = self.transfer_file(sftp, remote_file, manifest, force)
             return {
                 'status': 'success',
-                'gcs_path': f"gs://{self.gcs_bucket}/{gcs_path}",
+                'filename': remote_file,
+                **transfer,
+                'gcs_path': f"gs://{self.gcs_bucket}/{transfer['gcs_path']}",
+                'gcs_paths': [f"gs://{self.gcs_bucket}/{path}" for path in transfer['gcs_paths']]
+            }
+        except Exception as e:
+            return {
+                'status': 'error',
+                'filename': remote_file,
+                'error': str(e)
+            }
+    
+    def process_batch(
+        self,
+        filenames: Optional[List[str]] = None,
+        pattern: Optional[str] = None,
+        directory: Optional[str] = None,
+        force: bool = False,
+        timings: Optional[InvocationTimings] = None
+    ) -> Dict[str, Any]:
+        """Ingesta de varios archivos con una única sesión SSH.
+        
+        Se negocia un solo transporte SSH, se abren hasta
+        `max_concurrent_transfers` canales SFTP sobre él y las transferencias se
+        ejecutan en un pool de hilos acotado. Los archivos sin cambios según el
+        manifiesto se omiten. Devuelve resultados por archivo y tiempos agregados.
+        """
+        timings = timings or InvocationTimings()
+        start = time.monotonic()
+        try:
+            with self.ssh_session(timings) as ssh:
+                connect_seconds = time.monotonic() - start
+                pool = SFTPChannelPool(ssh.get_transport(), self.max_concurrent_transfers)
+                try:
+                    with timings.phase('transfer'):
+                        manifest = self.load_manifest()
+                        
+                        with pool.channel() as sftp:
+                            remote_files = self.resolve_remote_files(sftp, filenames, pattern, directory)
+                        logger.info(f"Batch de ingesta: {len(remote_files)} archivos")
+                        
+                        transfer_start = time.monotonic()
+                        with ThreadPoolExecutor(max_workers=self.max_concurrent_transfers) as executor:
+                            results = list(executor.map(
+                                lambda remote_file: self._transfer_from_pool(pool, remote_file, manifest, force),
+                                remote_files
+                            ))
+                        transfer_seconds = time.monotonic() - transfer_start
+                        if manifest:
+                            manifest.save()
+                finally:
+                    pool.close()
+            
+            succeeded = [r for r in results if r['status'] == 'success']
+            bytes_transferred = sum(r['bytes_transferred'] for r in succeeded)
+            if len(succeeded) == len(results):
+                status = 'success'
+            elif succeeded:
+                status = 'partial'
+            else:
+                status = 'error'
+            
+            return {
+                'status': status,
+                'files': results,
+                'summary': {
+                    'files_total': len(results),
+                    'files_succeeded': len(succeeded),
+                    'files_failed': len(results) - len(succeeded),
+                    'files_skipped': sum(1 for r in succeeded if r['skipped']),
+                    'bytes_transferred': bytes_transferred,
+                    # Tamaño de la entrada nueva del día (el DAG dimensiona el motor Silver con esto)
+                    'bytes_landed': sum(r['bytes_landed'] for r in succeeded),
+                    'records': sum(r['records'] for r in succeeded),
+                    'invalid_records': sum(r['invalid_records'] for r in succeeded),
+                    'connect_seconds': round(connect_seconds, 3),
+                    'transfer_seconds': round(transfer_seconds, 3),
+                    'total_seconds': round(time.monotonic() - start, 3),
+                    'throughput_mb_s': round(
+                        bytes_transferred / (1024 * 1024) / transfer_seconds, 2
+                    ) if transfer_seconds > 0 else 0,
+                    'rss_mb': _rss_mb()
+                },
+                'timings': timings.report(),
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        
+        except Exception as e:
+            logger.error(f"Error en batch de ingesta: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'timings': timings.report()
+            }
+    
+    def process(
+        self,
+        remote_filename: str,
+        force: bool = False,
+        timings: Optional[InvocationTimings] = None
+    ) -> Dict[str, Any]:
+        """Proceso principal de ingesta"""
+        timings = timings or InvocationTimings()
+        try:
+            with self.ssh_session(timings) as ssh:
+                with timings.phase('transfer'):
+                    manifest = self.load_manifest()
+                    
+                    # Descargar, validar y cargar a GCS en streaming (omitido si no cambió)
+                    transfer = self.stream_sftp_to_gcs(ssh, remote_filename, manifest, force)
+                    if manifest:
+                        manifest.save()
+            
+            return {
+                'status': 'success',
+                'gcs_path': f"gs://{self.gcs_bucket}/{transfer['gcs_path']}",
+                'gcs_paths': [f"gs://{self.gcs_bucket}/{path}" for path in transfer['gcs_paths']],
+                'ingest_date': transfer['ingest_date'],
                 'filename': remote_filename,
+                'skipped': transfer['skipped'],
+                'skip_reason': transfer.get('skip_reason'),
+                'bytes_transferred': transfer['bytes_transferred'],
+                'bytes_landed': transfer['bytes_landed'],
+                'records': transfer['records'],
+                'invalid_records': transfer['invalid_records'],
+                'quarantine_path': transfer.get('quarantine_path'),
+                'duration_seconds': transfer['duration_seconds'],
+                'throughput_mb_s': transfer['throughput_mb_s'],
+                'rss_mb': transfer['rss_mb'],
+                'timings': timings.report(),
                 'timestamp': datetime.utcnow().isoformat()
             }
             
@@ -113,16 +1606,15 @@ class SFTPToGCSIngestion:
             return {
                 'status': 'error',
                 'error': str(e),
-                'filename': remote_filename
+                'filename': remote_filename,
+                'timings': timings.report()
             }
-        finally:
-            if ssh:
-                ssh.close()
 
 
 @functions_framework.http
 def ingest_sftp_to_gcs(request):
     """Cloud Function HTTP trigger"""
+    timings = InvocationTimings(cold_start=_begin_invocation())
     try:
         # Leer configuración desde variables de entorno
         config = {
@@ -132,17 +1624,53 @@ def ingest_sftp_to_gcs(request):
             'sftp_password': os.getenv('SFTP_PASSWORD'),
             'sftp_remote_path': os.getenv('SFTP_REMOTE_PATH', '/retail-claims'),
             'gcs_bucket': os.getenv('GCS_BUCKET'),
-            'gcs_prefix': os.getenv('GCS_PREFIX', 'bronze/retail-claims')
+            # Sin GCS_PREFIX: la raíz del layout (BRONZE_PARTITION_BY_CLAIM_DATE)
+            'gcs_prefix': os.getenv('GCS_PREFIX'),
+            'chunk_size': int(os.getenv('TRANSFER_CHUNK_SIZE_MB', '8')) * 1024 * 1024,
+            'prefetch_chunks': int(os.getenv('TRANSFER_PREFETCH_CHUNKS', str(DEFAULT_PREFETCH_CHUNKS))),
+            'max_concurrent_transfers': int(
+                os.getenv('SFTP_MAX_CONCURRENT_TRANSFERS', str(DEFAULT_MAX_CONCURRENT_TRANSFERS))
+            ),
+            'range_concurrency': int(os.getenv('SFTP_RANGE_CONCURRENCY', str(DEFAULT_RANGE_CONCURRENCY))),
+            'range_min_file_bytes': int(os.getenv('SFTP_RANGE_MIN_FILE_MB', '64')) * 1024 * 1024,
+            'use_manifest': os.getenv('INGESTION_MANIFEST_ENABLED', 'true').lower() == 'true',
+            'quarantine_prefix': os.getenv('QUARANTINE_PREFIX', 'quarantine/retail-claims'),
+            'upload_staging_prefix': os.getenv('UPLOAD_STAGING_PREFIX'),
+            'landing_format': os.getenv('BRONZE_LANDING_FORMAT', DEFAULT_LANDING_FORMAT),
+            'parquet_row_group_bytes': int(os.getenv('PARQUET_ROW_GROUP_MB', '32')) * 1024 * 1024,
+            'partition_by_claim_date': os.getenv('BRONZE_PARTITION_BY_CLAIM_DATE', 'false').lower() == 'true',
+            'reuse_ssh_transport': os.getenv('SFTP_TRANSPORT_CACHE_ENABLED', 'false').lower() == 'true',
+            'ssh_keepalive_seconds': int(os.getenv('SFTP_KEEPALIVE_SECONDS', str(DEFAULT_SSH_KEEPALIVE_SECONDS))),
+            'ssh_max_idle_seconds': int(
+                os.getenv('SFTP_TRANSPORT_MAX_IDLE_SECONDS', str(DEFAULT_SSH_MAX_IDLE_SECONDS))
+            )
         }
+        if os.getenv('INGESTION_MANIFEST_PATH'):
+            config['manifest_path'] = os.getenv('INGESTION_MANIFEST_PATH')
         
         request_json = request.get_json(silent=True) or {}
-        remote_filename = request_json.get('filename', 'claims.json')
+        # ingest_date fija la partición de aterrizaje (el DAG envía la fecha lógica de la corrida)
+        config['ingest_date'] = request_json.get('ingest_date')
+        # force=true reingesta aunque el manifiesto indique que no hubo cambios
+        force = bool(request_json.get('force', False))
+        with timings.phase('client_init'):
+            ingestion = SFTPToGCSIngestion(config)
         
-        ingestion = SFTPToGCSIngestion(config)
-        result = ingestion.process(remote_filename)
+        # Modo batch: lista de archivos, glob o directorio completo
+        if any(key in request_json for key in ('filenames', 'pattern', 'directory')):
+            result = ingestion.process_batch(
+                filenames=request_json.get('filenames'),
+                pattern=request_json.get('pattern'),
+                directory=request_json.get('directory'),
+                force=force,
+                timings=timings
+            )
+        else:
+            remote_filename = request_json.get('filename', 'claims.json')
+            result = ingestion.process(remote_filename, force=force, timings=timings)
         
         return {
-            'statusCode': 200 if result['status'] == 'success' else 400,
+            'statusCode': 200 if result['status'] == 'success' else (207 if result['status'] == 'partial' else 400),
             'body': json.dumps(result)
         }
         
@@ -150,5 +1678,9 @@ def ingest_sftp_to_gcs(request):
         logger.error(f"Error en Cloud Function: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+            'body': json.dumps({'error': str(e), 'timings': timings.report()})
         }
+
+
+# Duración de la carga del módulo en el arranque en frío de la instancia
+MODULE_IMPORT_SECONDS = time.perf_counter() - _MODULE_LOAD_START
@@ -0,0 +1,247 @@
+from datetime import datetime, timedelta
+from airflow import DAG
+from airflow.models.param import Param
+from airflow.providers.google.cloud.operators.functions import CloudFunctionsInvokeFunctionOperator
+from airflow.providers.google.cloud.operators.dataproc import (
+    DataprocSubmitJobOperator,
+    DataprocCreateClusterOperator,
+    DataprocDeleteClusterOperator
+)
+from airflow.providers.google.cloud.operators.bigquery import BigQueryInsertJobOperator
+from airflow.providers.google.cloud.hooks.gcs import GCSHook
+from airflow.operators.python import PythonOperator
+from airflow.models import Variable
+from airflow.exceptions import AirflowException
+import json
+import logging
+
+# Módulos desplegados junto al DAG
+from backfill_plan import (
+    aging_script, backfill_days, backfill_job_args, check_silver_retention, gold_merge_query, ingest_requests
+)
+from silver_sizing import ingestion_input, ingestion_payload, plan_silver_run, sizing_model
+
+logger = logging.getLogger(__name__)
+
+# Configuración (la misma que el DAG diario)
+PROJECT_ID = Variable.get("GCP_PROJECT_ID", "your-project-id")
+GCS_BUCKET = Variable.get("GCS_BUCKET_NAME", "retail-claims-etl")
+BRONZE_TABLE = Variable.get("BRONZE_TABLE", "claims_external")
+# Clúster propio: el backfill puede coincidir con la corrida diaria
+DATAPROC_CLUSTER_NAME = "retail-claims-backfill-cluster"
+CLOUD_FUNCTION_NAME = "ingest-sftp-to-gcs"
+REGION = "us-central1"
+# Invocaciones de la ingesta en paralelo
+INGEST_CONCURRENCY = int(Variable.get("BACKFILL_INGEST_CONCURRENCY", "8"))
+BACKFILL_METRICS_OBJECT = "metrics/bronze_to_silver_backfill/{{ params.date_from }}_{{ params.date_to }}/{{ ts_nodash }}.json"
+BACKFILL_PLAN = "ti.xcom_pull(task_ids='plan_backfill')"
+BACKFILL_SIZING = "ti.xcom_pull(task_ids='size_backfill_cluster', key='silver_sizing')"
+
+default_args = {
+    'owner': 'data-engineering',
+    'depends_on_past': False,
+    'start_date': datetime(2024, 1, 1),
+    'email': ['data-alerts@company.com'],
+    'email_on_failure': True,
+    'email_on_retry': False,
+    'retries': 1,
+    'retry_delay': timedelta(minutes=5),
+}
+
+# Backfill de un rango de particiones ingest_date en una sola corrida: ingesta en
+# paralelo, un job PySpark sobre todos los días y una MERGE de Gold por el rango
+# desde Silver (el staging de Gold vence a los 7 días).
+# Se dispara manualmente con {"date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD"}
+dag = DAG(
+    'retail_claims_backfill',
+    default_args=default_args,
+    description='Backfill por rango: SFTP -> GCS -> PySpark Silver (un job) -> MERGE Gold (una vez)',
+    schedule_interval=None,
+    catchup=False,
+    tags=['retail', 'etl', 'backfill'],
+    max_active_runs=1,
+    params={
+        'date_from': Param(type='string', format='date', description='Primera partición ingest_date'),
+        'date_to': Param(type='string', format='date', description='Última partición ingest_date (inclusive)'),
+    },
+    # Lista de días, argumentos del job y clúster salen del XCom como objetos
+    render_template_as_native_obj=True
+)
+
+
+def plan_backfill(**context):
+    """Días del rango e invocaciones de la ingesta"""
+    params = context['params']
+    try:
+        days = backfill_days(params['date_from'], params['date_to'])
+        check_silver_retention(days, datetime.utcnow().date())
+    except ValueError as e:
+        raise AirflowException(f"❌ {e}")
+
+    logger.info(f"🚀 Backfill de {len(days)} días: {days[0]} -> {days[-1]}")
+    requests = ingest_requests(days)
+    # Clave propia para la ingesta expandida: plan.output['ingest_requests'] lee esa
+    # clave de XCom, no un elemento del dict devuelto (return_value)
+    context['task_instance'].xcom_push(key='ingest_requests', value=requests)
+    return {
+        'days': days,
+        'ingest_requests': requests,
+        'gold_merge_query': gold_merge_query(PROJECT_ID, days),
+        'aging_script': aging_script(PROJECT_ID, days),
+        'job_args': backfill_job_args(
+            PROJECT_ID, GCS_BUCKET, BRONZE_TABLE, days,
+            f"gs://{GCS_BUCKET}/{context['task'].render_template(BACKFILL_METRICS_OBJECT, context)}"
+        )
+    }
+
+
+def size_backfill_cluster(**context):
+    """Validar la ingesta de todos los días y dimensionar el clúster con su entrada total"""
+    task_instance = context['task_instance']
+    payloads = [ingestion_payload(result) for result in task_instance.xcom_pull(task_ids='ingest_sftp_to_gcs') or []]
+
+    failed = [p for p in payloads if p.get('status') != 'success']
+    if failed:
+        raise AirflowException(f"❌ Ingesta falló en {len(failed)} días: {[p.get('error') for p in failed]}")
+
+    inputs = {'files': 0, 'bytes_landed': 0, 'records': 0}
+    for payload in payloads:
+        for key, value in ingestion_input(payload).items():
+            inputs[key] += value
+
+    model = sizing_model(Variable.get("SILVER_SIZING_MODEL", {}, deserialize_json=True))
+    # Siempre Dataproc: el backfill reemplaza particiones de varios días en un solo job
+    plan = plan_silver_run(inputs, model, 'spark')
+    logger.info(f"📐 Dimensionamiento backfill: {json.dumps({'inputs': inputs, 'plan': plan})}")
+    task_instance.xcom_push(key='silver_sizing', value={**plan, 'inputs': inputs, 'model': model})
+
+
+def publish_backfill_metrics(**context):
+    """Métricas del job con el throughput por día procesado"""
+    object_name = context['task'].render_template(BACKFILL_METRICS_OBJECT, context)
+    hook = GCSHook()
+    if not hook.exists(GCS_BUCKET, object_name):
+        logger.warning(f"⚠️ Sin métricas del backfill en gs://{GCS_BUCKET}/{object_name}")
+        return None
+
+    metrics = json.loads(hook.download(GCS_BUCKET, object_name))
+    logger.info(
+        f"📊 Backfill: {metrics.get('days')} días, {metrics.get('records')} registros en "
+        f"{metrics.get('wall_seconds')} s ({metrics.get('seconds_per_day')} s/día, "
+        f"{metrics.get('records_per_second')} registros/s)"
+    )
+    for day, records in (metrics.get('records_by_day') or {}).items():
+        logger.info(f"   {day}: {records} registros")
+    metrics['sizing'] = context['task_instance'].xcom_pull(task_ids='size_backfill_cluster', key='silver_sizing')
+    return metrics
+
+
+# Tareas
+
+# 1. Días del rango
+plan = PythonOperator(
+    task_id='plan_backfill',
+    python_callable=plan_backfill,
+    dag=dag
+)
+
+# 2. Ingesta de todos los días en paralelo (una invocación por día)
+ingest_sftp = CloudFunctionsInvokeFunctionOperator.partial(
+    task_id='ingest_sftp_to_gcs',
+    function_name=CLOUD_FUNCTION_NAME,
+    location=REGION,
+    max_active_tis_per_dagrun=INGEST_CONCURRENCY,
+    dag=dag
+).expand(input_data=plan.output['ingest_requests'])
+
+# 3. Validar la ingesta y dimensionar el clúster
+size_cluster = PythonOperator(
+    task_id='size_backfill_cluster',
+    python_callable=size_backfill_cluster,
+    dag=dag
+)
+
+# 4. Crear cluster Dataproc
+create_cluster = DataprocCreateClusterOperator(
+    task_id='create_dataproc_cluster',
+    cluster_name=DATAPROC_CLUSTER_NAME,
+    project_id=PROJECT_ID,
+    region=REGION,
+    cluster_config="{{ " + BACKFILL_SIZING + "['cluster_config'] }}",
+    dag=dag
+)
+
+# 5. Un job PySpark para todos los días (processing_date = ingest_date, reemplazo por día, sin staging de Gold)
+submit_pyspark_job = DataprocSubmitJobOperator(
+    task_id='bronze_to_silver_backfill',
+    job={
+        'reference': {
+            'project_id': PROJECT_ID
+        },
+        'placement': {
+            'cluster_name': DATAPROC_CLUSTER_NAME
+        },
+        'pyspark_job': {
+            'main_python_file_uri': f'gs://{GCS_BUCKET}/jobs/bronze_to_silver_transform.py',
+            'python_file_uris': [
+                f'gs://{GCS_BUCKET}/jobs/claims_schema.py',
+                f'gs://{GCS_BUCKET}/jobs/business_rules.py'
+            ],
+            'args': "{{ " + BACKFILL_PLAN + "['job_args'] }}",
+            'properties': "{{ " + BACKFILL_SIZING + "['spark_properties'] }}"
+        }
+    },
+    region=REGION,
+    project_id=PROJECT_ID,
+    dag=dag
+)
+
+# 5a. Throughput por día
+publish_metrics = PythonOperator(
+    task_id='publish_backfill_metrics',
+    python_callable=publish_backfill_metrics,
+    trigger_rule='all_done',
+    dag=dag
+)
+
+# 6. Eliminar cluster (también tras un fallo del job)
+delete_cluster = DataprocDeleteClusterOperator(
+    task_id='delete_dataproc_cluster',
+    cluster_name=DATAPROC_CLUSTER_NAME,
+    project_id=PROJECT_ID,
+    region=REGION,
+    trigger_rule='all_done',
+    dag=dag
+)
+
+# 7. Una MERGE de Gold por todo el rango, leyendo Silver: las particiones del staging
+# de días con más de 7 días de antigüedad ya vencieron
+merge_gold = BigQueryInsertJobOperator(
+    task_id='silver_to_gold_business_rules',
+    configuration={
+        'query': {
+            'query': "{{ " + BACKFILL_PLAN + "['gold_merge_query'] }}",
+            'useLegacySql': False
+        }
+    },
+    location=REGION,
+    dag=dag
+)
+
+# 7a. Escalar los PENDING vencidos: un script con una llamada por día del rango, en orden
+age_pending_claims = BigQueryInsertJobOperator(
+    task_id='age_pending_claims',
+    configuration={
+        'query': {
+            'query': "{{ " + BACKFILL_PLAN + "['aging_script'] }}",
+            'useLegacySql': False
+        }
+    },
+    location=REGION,
+    dag=dag
+)
+
+# Dependencias
+plan >> ingest_sftp >> size_cluster >> create_cluster >> submit_pyspark_job
+submit_pyspark_job >> [publish_metrics, delete_cluster]
+submit_pyspark_job >> merge_gold >> age_pending_claims
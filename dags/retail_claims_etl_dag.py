@@ -7,21 +7,43 @@ from airflow.providers.google.cloud.operators.dataproc import (
     DataprocDeleteClusterOperator
 )
 from airflow.providers.google.cloud.operators.bigquery import BigQueryInsertJobOperator
-from airflow.operators.python import PythonOperator
+from airflow.providers.google.cloud.hooks.gcs import GCSHook
+from airflow.operators.python import BranchPythonOperator, PythonOperator
 from airflow.models import Variable
 from airflow.exceptions import AirflowException
+import json
 import logging
 
+# Módulo desplegado junto al DAG
+from silver_sizing import bronze_uris, ingestion_input, ingestion_payload, plan_silver_run, sizing_model
+
 logger = logging.getLogger(__name__)
 
 # Configuración
 PROJECT_ID = Variable.get("GCP_PROJECT_ID", "your-project-id")
 GCS_BUCKET = Variable.get("GCS_BUCKET_NAME", "retail-claims-etl")
 GCS_TEMP_PATH = f"{GCS_BUCKET}/temp"
+# Tabla externa Bronze según el formato de aterrizaje de la ingesta (json, ndjson.gz, parquet)
+# y su layout (tablas *_by_claim_day con BRONZE_PARTITION_BY_CLAIM_DATE=true)
+BRONZE_TABLE = Variable.get("BRONZE_TABLE", "claims_external")
+# Raíz Bronze del mismo layout (bronze/retail-claims-by-claim-day con claim_day)
+BRONZE_PREFIX = Variable.get("BRONZE_PREFIX", "bronze/retail-claims")
 DATAPROC_CLUSTER_NAME = "retail-claims-cluster"
+# Motor Bronze -> Silver por defecto: auto (según la entrada del día, ver silver_sizing.py),
+# spark (Dataproc) o polars (un solo nodo). Se puede forzar por corrida con
+# dag_run.conf = {"silver_engine": "polars"}; el modelo de costos se ajusta con la
+# Variable SILVER_SIZING_MODEL (JSON)
+SILVER_ENGINE = Variable.get("SILVER_ENGINE", "auto")
+# Watermark incremental Bronze -> Silver, compartido por ambos motores: los días
+# hechos con Polars no vuelven a leerse en la siguiente corrida Spark
+SILVER_WATERMARK_URI = f"gs://{GCS_BUCKET}/checkpoints/bronze_to_silver/watermark.json"
 DATAPROC_ZONE = "us-central1-a"
 CLOUD_FUNCTION_NAME = "ingest-sftp-to-gcs"
 REGION = "us-central1"
+# Métricas por fase y por stage del job PySpark, una por corrida (sin ':' para rutas Hadoop)
+SILVER_METRICS_OBJECT = "metrics/bronze_to_silver/{{ ds }}/{{ ts_nodash }}.json"
+# Decisión de dimensionamiento de la corrida (render nativo: dicts, no strings)
+SILVER_SIZING = "ti.xcom_pull(task_ids='choose_silver_engine', key='silver_sizing')"
 
 # Argumentos por defecto
 default_args = {
@@ -43,7 +65,9 @@ dag = DAG(
     schedule_interval='0 2 * * *',
     catchup=False,
     tags=['retail', 'etl', 'daily'],
-    max_active_runs=1
+    max_active_runs=1,
+    # El clúster y las propiedades del job salen del XCom de dimensionamiento como dicts
+    render_template_as_native_obj=True
 )
 
 
@@ -56,14 +80,75 @@ def log_pipeline_start(**context):
 def validate_ingestion_result(**context):
     """Validar resultado de ingesta"""
     task_instance = context['task_instance']
-    result = task_instance.xcom_pull(task_ids='ingest_sftp_to_gcs')
+    result = ingestion_payload(task_instance.xcom_pull(task_ids='ingest_sftp_to_gcs'))
     
-    if result and isinstance(result, dict) and result.get('status') != 'success':
+    if result and result.get('status') != 'success':
         raise AirflowException(f"❌ Ingesta falló: {result.get('error', 'Error desconocido')}")
     
     logger.info(f"✅ Ingesta exitosa")
 
 
+def choose_silver_engine(**context):
+    """Elegir el motor Bronze -> Silver y dimensionar el clúster según la entrada del día"""
+    dag_run = context.get('dag_run')
+    conf = (dag_run.conf if dag_run else None) or {}
+    engine = conf.get('silver_engine', SILVER_ENGINE)
+    task_instance = context['task_instance']
+
+    payload = ingestion_payload(task_instance.xcom_pull(task_ids='ingest_sftp_to_gcs'))
+    inputs = ingestion_input(payload)
+    model = sizing_model(Variable.get("SILVER_SIZING_MODEL", {}, deserialize_json=True))
+    try:
+        plan = plan_silver_run(inputs, model, engine)
+    except ValueError as e:
+        raise AirflowException(f"❌ {e}")
+
+    # Entradas y decisión en una línea JSON, para calibrar el modelo contra las métricas del job
+    logger.info(f"📐 Dimensionamiento Silver: {json.dumps({'engine': engine, 'inputs': inputs, 'plan': plan})}")
+    task_instance.xcom_push(
+        key='silver_sizing', value={**plan, 'inputs': inputs, 'model': model, 'bronze_uris': bronze_uris(payload)}
+    )
+    return 'bronze_to_silver_polars' if plan['engine'] == 'polars' else 'create_dataproc_cluster'
+
+
+def run_polars_transformation(**context):
+    """Bronze -> Silver con Polars en el worker de Composer (sin clúster Dataproc)"""
+    # bronze_to_silver_polars, claims_schema y business_rules se despliegan junto al DAG
+    from bronze_to_silver_polars import BigQueryLoadSink, PolarsBronzeToSilverTransformer
+
+    transformer = PolarsBronzeToSilverTransformer(
+        project_id=PROJECT_ID,
+        bronze_root=f"gs://{GCS_BUCKET}/{BRONZE_PREFIX}",
+        ingest_dates=[context['data_interval_end'].strftime('%Y-%m-%d')],
+        # Append deduplicado por record_hash contra Silver: una re-ejecución no duplica lo
+        # escrito ni reemplaza los días pendientes que otra corrida escribió hoy
+        write_mode='append',
+        # Reglas de Gold calculadas en la misma pasada; la MERGE solo lee el staging
+        gold_sink=BigQueryLoadSink(f"{PROJECT_ID}.retail_claims_gold.claims_business_rules_staging"),
+        # Suma los días pendientes desde el watermark y lo avanza tras escribir Silver
+        checkpoint_uri=SILVER_WATERMARK_URI
+    )
+    return transformer.transform()
+
+
+def publish_silver_metrics(**context):
+    """Publicar en XCom las métricas que el job PySpark dejó en GCS"""
+    object_name = context['task'].render_template(SILVER_METRICS_OBJECT, context)
+    hook = GCSHook()
+    if not hook.exists(GCS_BUCKET, object_name):
+        logger.warning(f"⚠️ Sin métricas del job en gs://{GCS_BUCKET}/{object_name}")
+        return None
+    
+    metrics = json.loads(hook.download(GCS_BUCKET, object_name))
+    # Junto a la decisión de dimensionamiento que la produjo
+    metrics['sizing'] = context['task_instance'].xcom_pull(task_ids='choose_silver_engine', key='silver_sizing')
+    logger.info(
+        f"📊 Silver: {metrics.get('records')} registros en {metrics.get('wall_seconds')} s "
+        f"({metrics.get('records_per_second')} registros/s)"
+    )
+    return metrics
+
+
 def log_pipeline_end(**context):
     """Registrar fin del pipeline"""
     logger.info("✅ Pipeline de ETL completado exitosamente")
@@ -83,7 +168,9 @@ ingest_sftp = CloudFunctionsInvokeFunctionOperator(
     task_id='ingest_sftp_to_gcs',
     function_name=CLOUD_FUNCTION_NAME,
     input_data={
-        'filename': 'claims_{{ ds }}.json'
+        'filename': 'claims_{{ ds }}.json',
+        # Partición Bronze ingest_date que luego lee el job PySpark
+        'ingest_date': '{{ data_interval_end | ds }}'
     },
     location=REGION,
     dag=dag
@@ -96,25 +183,28 @@ validate_ingestion = PythonOperator(
     dag=dag
 )
 
-# 4. Crear cluster Dataproc
+# 4. Elegir motor Bronze -> Silver y dimensionar el clúster
+choose_engine = BranchPythonOperator(
+    task_id='choose_silver_engine',
+    python_callable=choose_silver_engine,
+    dag=dag
+)
+
+# 4a. Motor Polars (días pequeños)
+polars_transformation = PythonOperator(
+    task_id='bronze_to_silver_polars',
+    python_callable=run_polars_transformation,
+    dag=dag
+)
+
+# 4b. Crear cluster Dataproc
 create_cluster = DataprocCreateClusterOperator(
     task_id='create_dataproc_cluster',
     cluster_name=DATAPROC_CLUSTER_NAME,
     project_id=PROJECT_ID,
     region=REGION,
-    cluster_config={
-        'master_config': {
-            'num_instances': 1,
-            'machine_type_uri': 'n1-standard-4'
-        },
-        'worker_config': {
-            'num_instances': 2,
-            'machine_type_uri': 'n1-standard-4'
-        },
-        'software_config': {
-            'image_version': '2.1-debian11'
-        }
-    },
+    # Workers y tipo de máquina según la entrada del día (choose_silver_engine)
+    cluster_config="{{ " + SILVER_SIZING + "['cluster_config'] }}",
     dag=dag
 )
 
@@ -130,13 +220,23 @@ submit_pyspark_job = DataprocSubmitJobOperator(
         },
         'pyspark_job': {
             'main_python_file_uri': f'gs://{GCS_BUCKET}/jobs/bronze_to_silver_transform.py',
-            'args': [PROJECT_ID, GCS_BUCKET],
-            'properties': {
-                'spark.executor.cores': '4',
-                'spark.driver.cores': '4',
-                'spark.executor.memory': '8g',
-                'spark.driver.memory': '8g'
-            }
+            'python_file_uris': [
+                f'gs://{GCS_BUCKET}/jobs/claims_schema.py',
+                f'gs://{GCS_BUCKET}/jobs/business_rules.py'
+            ],
+            'args': [
+                PROJECT_ID, GCS_BUCKET,
+                '--bronze-table', BRONZE_TABLE,
+                # Incremental: particiones posteriores al watermark hasta la del día
+                '--checkpoint-uri', SILVER_WATERMARK_URI,
+                '--until-ingest-date', '{{ data_interval_end | ds }}',
+                # Archivos que aterrizó la ingesta: el job los lee sin la tabla externa si
+                # cubren las particiones pendientes (vacío: tabla externa)
+                '--bronze-uri', "{{ " + SILVER_SIZING + "['bronze_uris'] | join(',') }}",
+                '--metrics-uri', f'gs://{GCS_BUCKET}/{SILVER_METRICS_OBJECT}'
+            ],
+            # Executors y spark.sql.shuffle.partitions según la entrada del día
+            'properties': "{{ " + SILVER_SIZING + "['spark_properties'] }}"
         }
     },
     region=REGION,
@@ -144,22 +244,54 @@ submit_pyspark_job = DataprocSubmitJobOperator(
     dag=dag
 )
 
+# 5a. Métricas del job a XCom (para graficar throughput y alertar de ralentizaciones)
+publish_metrics = PythonOperator(
+    task_id='publish_silver_metrics',
+    python_callable=publish_silver_metrics,
+    # También si el job falló (publica las fases completadas hasta el fallo), no con el motor Polars
+    trigger_rule='none_skipped',
+    dag=dag
+)
+
 # 6. Eliminar cluster
 delete_cluster = DataprocDeleteClusterOperator(
     task_id='delete_dataproc_cluster',
     cluster_name=DATAPROC_CLUSTER_NAME,
     project_id=PROJECT_ID,
     region=REGION,
-    trigger_rule='all_done',
+    # También tras un fallo del job, pero no si la corrida usó el motor Polars
+    trigger_rule='none_skipped',
     dag=dag
 )
 
-# 7. Stored Procedure
+# 7. Stored Procedure: MERGE a Gold del staging que escribió el motor (reglas ya calculadas)
 execute_stored_procedure = BigQueryInsertJobOperator(
     task_id='silver_to_gold_business_rules',
     configuration={
         'query': {
-            'query': f'CALL `{PROJECT_ID}.retail_claims_gold.sp_silver_to_gold_transformation`()',
+            # Particiones del staging escritas desde el fin del intervalo (incluye re-ejecuciones tardías)
+            'query': (
+                f"CALL `{PROJECT_ID}.retail_claims_gold.sp_merge_gold_staging`("
+                "DATE '{{ data_interval_end | ds }}', CURRENT_DATE())"
+            ),
+            'useLegacySql': False
+        }
+    },
+    location=REGION,
+    # Solo una de las ramas de motor se ejecuta
+    trigger_rule='none_failed_min_one_success',
+    dag=dag
+)
+
+# 7a. Escalar los PENDING que superan los 7 días a la fecha de la corrida (solo el índice de pendientes)
+age_pending_claims = BigQueryInsertJobOperator(
+    task_id='age_pending_claims',
+    configuration={
+        'query': {
+            'query': (
+                f"CALL `{PROJECT_ID}.retail_claims_gold.sp_age_pending_claims`("
+                "DATE '{{ data_interval_end | ds }}')"
+            ),
             'useLegacySql': False
         }
     },
@@ -175,5 +307,8 @@ log_end = PythonOperator(
 )
 
 # Dependencias
-log_start >> ingest_sftp >> validate_ingestion >> create_cluster >> \
-    submit_pyspark_job >> delete_cluster >> execute_stored_procedure >> log_end
+log_start >> ingest_sftp >> validate_ingestion >> choose_engine
+choose_engine >> create_cluster >> submit_pyspark_job >> delete_cluster
+submit_pyspark_job >> publish_metrics
+choose_engine >> polars_transformation
+[delete_cluster, polars_transformation] >> execute_stored_procedure >> age_pending_claims >> log_end
@@ -0,0 +1,175 @@
+"""
+Dimensionamiento del motor Bronze -> Silver según la entrada del día.
+
+Con los bytes aterrizados y los registros que informa la ingesta se estima el
+volumen de la corrida y, con un modelo de costos ajustable (Variable de Airflow
+SILVER_SIZING_MODEL, JSON que se combina con DEFAULT_SIZING_MODEL), se decide:
+
+- motor Polars en el worker de Composer si la entrada es pequeña (sin Dataproc),
+- si no, cantidad y tipo de workers, executors por worker, memoria por
+  executor y spark.sql.shuffle.partitions del job PySpark.
+
+Del mismo resultado salen los objetos Bronze aterrizados, que el job lee
+directamente en lugar de la tabla externa.
+
+Sin dependencias de Airflow: el DAG solo llama a estas funciones, y los tests
+las ejecutan sin entorno de Composer.
+"""
+
+import json
+import math
+from typing import Any, Dict, List, Optional
+
+MB = 1024 * 1024
+
+DEFAULT_SIZING_MODEL = {
+    # Tamaño en memoria estimado por registro: Parquet/gzip aterrizan comprimidos,
+    # así que la entrada es el mayor de bytes aterrizados y registros * este valor
+    'bytes_per_record': 400,
+    # Hasta este tamaño la corrida va al motor Polars (un solo nodo)
+    'single_node_max_mb': 256,
+    # Entrada que procesa cada núcleo de executor en una corrida
+    'mb_per_core': 512,
+    'min_workers': 2,
+    'max_workers': 16,
+    # (núcleos, tipo de máquina, memoria GB), de menor a mayor
+    'worker_machine_types': [
+        [4, 'n1-standard-4', 15],
+        [8, 'n1-standard-8', 30],
+        [16, 'n1-standard-16', 60],
+    ],
+    'master_machine_type': 'n1-standard-4',
+    'image_version': '2.1-debian11',
+    'executor_cores': 4,
+    # Fracción de la memoria del worker que YARN asigna a contenedores, y
+    # sobrecarga de memoria de Spark por executor (spark.executor.memoryOverhead)
+    'yarn_memory_fraction': 0.8,
+    'executor_memory_overhead': 0.1,
+    'driver_cores': 4,
+    'driver_memory': '8g',
+    # Particiones de shuffle de ~este tamaño, redondeadas a múltiplo de los núcleos
+    'shuffle_partition_mb': 128,
+    'min_shuffle_partitions': 8,
+}
+
+
+def sizing_model(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Modelo por defecto con los valores ajustados por la Variable"""
+    model = dict(DEFAULT_SIZING_MODEL)
+    model.update(overrides or {})
+    return model
+
+
+def ingestion_payload(result: Any) -> Dict[str, Any]:
+    """Resultado de la ingesta desde el XCom de la Cloud Function.
+
+    Acepta el dict de la ingesta, la respuesta HTTP de la función
+    ({'statusCode', 'body'}) o la respuesta de la invocación ({'result': ...}),
+    con el contenido como dict o como JSON.
+    """
+    if isinstance(result, (str, bytes)):
+        result = json.loads(result)
+    if not isinstance(result, dict):
+        return {}
+    for key in ('result', 'body'):
+        if key in result and 'status' not in result:
+            return ingestion_payload(result[key])
+    return result
+
+
+def ingestion_input(payload: Dict[str, Any]) -> Dict[str, int]:
+    """Bytes aterrizados y registros nuevos del día (los archivos omitidos ya se procesaron)"""
+    files = payload.get('files')
+    if files is None:
+        files = [payload] if payload else []
+    landed = [f for f in files if f.get('status', 'success') == 'success' and not f.get('skipped')]
+    return {
+        'files': len(landed),
+        'bytes_landed': sum(f.get('bytes_landed', f.get('bytes_transferred', 0)) or 0 for f in landed),
+        'records': sum(f.get('records', 0) or 0 for f in landed),
+    }
+
+
+def bronze_uris(payload: Dict[str, Any]) -> List[str]:
+    """Objetos Bronze nuevos del día (gs://...), para que el job los lea sin la tabla externa.
+
+    Sin los omitidos por el manifiesto ni los fallidos: el job lista cada
+    partición y vuelve a la tabla externa si tiene archivos fuera de esta lista.
+    """
+    files = payload.get('files')
+    if files is None:
+        files = [payload] if payload else []
+    uris = []
+    for f in files:
+        if f.get('status', 'success') == 'success' and not f.get('skipped'):
+            uris.extend(f.get('gcs_paths') or ([f['gcs_path']] if f.get('gcs_path') else []))
+    return uris
+
+
+def plan_silver_run(inputs: Dict[str, int], model: Dict[str, Any], engine: str = 'auto') -> Dict[str, Any]:
+    """Decisión de motor y tamaño de clúster para la entrada del día.
+
+    engine: 'auto' (según el modelo), o 'spark' / 'polars' forzado por la corrida.
+    """
+    if engine not in ('auto', 'spark', 'polars'):
+        raise ValueError(f"Motor Silver desconocido: {engine}")
+
+    input_mb = max(inputs.get('bytes_landed', 0), inputs.get('records', 0) * model['bytes_per_record']) / MB
+    if engine == 'auto':
+        engine = 'polars' if input_mb <= model['single_node_max_mb'] else 'spark'
+
+    plan = {'engine': engine, 'input_mb': round(input_mb, 1)}
+    if engine == 'polars':
+        return plan
+
+    cores_needed = max(1, math.ceil(input_mb / model['mb_per_core']))
+    machine_types = model['worker_machine_types']
+    # Máquina más chica que cubre la entrada sin pasar de max_workers; si ninguna, la mayor al máximo
+    for cores, machine_type, memory_gb in machine_types:
+        workers = math.ceil(cores_needed / cores)
+        if workers <= model['max_workers']:
+            break
+    workers = min(max(workers, model['min_workers']), model['max_workers'])
+
+    executor_cores = min(model['executor_cores'], cores)
+    executors_per_worker = cores // executor_cores
+    executor_memory_gb = max(1, int(
+        memory_gb * model['yarn_memory_fraction'] / executors_per_worker / (1 + model['executor_memory_overhead'])
+    ))
+    executor_instances = workers * executors_per_worker
+    total_cores = executor_instances * executor_cores
+    shuffle_partitions = max(model['min_shuffle_partitions'], math.ceil(input_mb / model['shuffle_partition_mb']))
+    shuffle_partitions = math.ceil(shuffle_partitions / total_cores) * total_cores
+
+    plan.update({
+        'workers': workers,
+        'worker_machine_type': machine_type,
+        'executor_instances': executor_instances,
+        'executor_cores': executor_cores,
+        'executor_memory': f'{executor_memory_gb}g',
+        'shuffle_partitions': shuffle_partitions,
+        'cluster_config': {
+            'master_config': {
+                'num_instances': 1,
+                'machine_type_uri': model['master_machine_type']
+            },
+            'worker_config': {
+                'num_instances': workers,
+                'machine_type_uri': machine_type
+            },
+            'software_config': {
+                'image_version': model['image_version']
+            }
+        },
+        'spark_properties': {
+            'spark.executor.instances': str(executor_instances),
+            'spark.executor.cores': str(executor_cores),
+            'spark.executor.memory': f'{executor_memory_gb}g',
+            'spark.driver.cores': str(model['driver_cores']),
+            'spark.driver.memory': model['driver_memory'],
+            'spark.sql.shuffle.partitions': str(shuffle_partitions),
+            # El layout calculado es el que corre (Dataproc activa la asignación dinámica por defecto)
+            'spark.dynamicAllocation.enabled': 'false'
+        }
+    })
+    return plan
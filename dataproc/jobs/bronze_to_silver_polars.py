@@ -0,0 +1,743 @@
+"""
+Motor Polars/Arrow de la transformación Bronze -> Silver para días pequeños.
+
+Misma semántica que BronzeToSilverTransformer (PySpark): esquema declarado
+al leer, limpieza, columnas técnicas con el mismo record_hash byte a byte y
+reporte de calidad con las mismas claves. Se ejecuta en un solo proceso sobre
+LazyFrames de Polars, sin clúster Dataproc: lee los archivos de las
+particiones ingest_date directamente de GCS (o de un directorio local) y
+escribe Silver con load jobs de BigQuery.
+
+Diferencias con el motor Spark:
+- approx_distinct es exacto (n_unique),
+- la deduplicación por record_hash contra Silver (dedup_lookback_days) es un
+  anti-join exacto con los hashes de la ventana, sin Bloom filter: como en
+  Spark, una re-ejecución agrega solo lo que Silver aún no tiene y no toca
+  lo escrito por otras corridas en la misma partición processing_date,
+- con checkpoint_uri comparte el watermark del motor Spark: suma los días
+  pendientes posteriores al watermark y lo avanza tras escribir Silver, para
+  que la siguiente corrida Spark no vuelva a leer los días hechos con Polars.
+"""
+
+import argparse
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import polars as pl
+
+from business_rules import MIN_GOLD_QUALITY_SCORE, apply_rules_arrow
+from claims_schema import (
+    BRONZE_PARTITION_COLUMNS, CLAIM_FIELDS, CLUSTERING_COLUMNS, GOLD_STAGING_COLUMNS, QUALITY_COLUMNS,
+    RECORD_HASH_COLUMNS, RECORD_HASH_SEPARATOR, SILVER_COLUMNS, claim_field_types
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tipos Polars de los tipos BigQuery usados por el contrato de reclamos
+POLARS_TYPES: Dict[str, pl.PolarsDataType] = {
+    'STRING': pl.Utf8,
+    'DATE': pl.Date,
+    'FLOAT64': pl.Float64,
+    'TIMESTAMP': pl.Datetime("us", "UTC"),
+}
+
+# Tipos con los que se leen los campos del NDJSON de Bronze (como claims_external_gz)
+BRONZE_SOURCE_TYPES: Dict[str, pl.PolarsDataType] = {
+    'STRING': pl.Utf8,
+    'DATE': pl.Utf8,
+    'FLOAT64': pl.Float64,
+    'TIMESTAMP': pl.Utf8,
+}
+
+BRONZE_EXTENSIONS = ('.json', '.json.gz', '.parquet')
+
+# Formatos de timestamp que Spark convierte con zona de sesión UTC:
+# (formato tras normalizar 'T' y 'Z', incluye desplazamiento)
+TIMESTAMP_FORMATS = (
+    ("%Y-%m-%d %H:%M:%S%.f%:z", True),
+    ("%Y-%m-%d %H:%M:%S%.f", False),
+    ("%Y-%m-%d", False),
+)
+
+WRITE_MODES = ('append', 'overwrite_partitions')
+
+# Días de particiones processing_date de Silver contra los que se deduplica (como en el job PySpark)
+DEFAULT_DEDUP_LOOKBACK_DAYS = 7
+
+
+def _parse_timestamp(expr: pl.Expr) -> pl.Expr:
+    normalized = expr.str.replace("T", " ").str.replace("Z$", "+00:00")
+    candidates = []
+    for fmt, has_offset in TIMESTAMP_FORMATS:
+        parsed = normalized.str.to_datetime(
+            fmt, strict=False, time_unit="us", time_zone=None if has_offset else "UTC"
+        )
+        candidates.append(parsed.dt.convert_time_zone("UTC") if has_offset else parsed)
+    return pl.coalesce(candidates)
+
+
+def _accepts(source: pl.PolarsDataType, bq_type: str) -> bool:
+    """Tipos de Bronze convertibles al de Silver (mismas reglas que el motor Spark)"""
+    if bq_type == 'FLOAT64':
+        return source in pl.NUMERIC_DTYPES
+    if bq_type in ('DATE', 'TIMESTAMP'):
+        return source in (pl.Utf8, pl.Date) or isinstance(source, pl.Datetime)
+    return source == POLARS_TYPES[bq_type]
+
+
+def _conform(name: str, source: pl.PolarsDataType, bq_type: str) -> pl.Expr:
+    target = POLARS_TYPES[bq_type]
+    if source == target:
+        return pl.col(name)
+    if source == pl.Utf8 and bq_type == 'DATE':
+        return pl.col(name).str.to_date("%Y-%m-%d", strict=False)
+    if source == pl.Utf8 and bq_type == 'TIMESTAMP':
+        return _parse_timestamp(pl.col(name))
+    if bq_type == 'TIMESTAMP':
+        if isinstance(source, pl.Datetime) and source.time_zone:
+            return pl.col(name).dt.convert_time_zone("UTC").dt.cast_time_unit("us")
+        return pl.col(name).cast(pl.Datetime("us")).dt.replace_time_zone("UTC")
+    return pl.col(name).cast(target)
+
+
+def _hash_field(name: str, bq_type: str) -> pl.Expr:
+    """Forma canónica de un campo en record_hash (ver claims_schema.RECORD_HASH_COLUMNS)"""
+    if bq_type == 'FLOAT64':
+        return (pl.col(name) * 100).round(0).cast(pl.Int64).cast(pl.Utf8)
+    if bq_type == 'TIMESTAMP':
+        return pl.col(name).dt.epoch("us").cast(pl.Utf8)
+    return pl.col(name).cast(pl.Utf8)
+
+
+def _md5(values: pl.Series) -> pl.Series:
+    return pl.Series([hashlib.md5(value.encode("utf-8")).hexdigest() for value in values], dtype=pl.Utf8)
+
+
+def _bound(expr: pl.Expr, bq_type: str) -> pl.Expr:
+    # Misma representación que el reporte del motor Spark
+    if bq_type == 'DATE':
+        return expr.cast(pl.Utf8)
+    if bq_type == 'TIMESTAMP':
+        return expr.dt.strftime("%Y-%m-%d %H:%M:%S")
+    return expr
+
+
+QUALITY_METRICS: Dict[str, Callable[[str, str], List[Tuple[str, pl.Expr]]]] = {
+    'nulls': lambda c, t: [('nulls', pl.col(c).null_count().cast(pl.Int64))],
+    'range': lambda c, t: [('min', _bound(pl.col(c).min(), t)), ('max', _bound(pl.col(c).max(), t))],
+    # Exacto en Polars (en Spark es HyperLogLog++)
+    'approx_distinct': lambda c, t: [('approx_distinct', pl.col(c).drop_nulls().n_unique().cast(pl.Int64))],
+}
+
+
+class LocalParquetFileSink:
+    """Silver en archivos Parquet locales `processing_date=YYYY-MM-DD/part-*.parquet` (pruebas y benchmarks)"""
+
+    name = "local-parquet"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> pl.DataFrame:
+        files = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(self.path) for name in names if name.endswith(".parquet")
+        ]
+        return pl.concat([pl.read_parquet(f) for f in sorted(files)]) if files else pl.DataFrame()
+
+    def read_hashes(self, since: date, before: Optional[date] = None) -> pl.Series:
+        """record_hash de las particiones processing_date en [since, before) (solo esa columna)"""
+        if not os.path.isdir(self.path):
+            return pl.Series("record_hash", [], dtype=pl.Utf8)
+        files = [
+            os.path.join(self.path, partition, name)
+            for partition in sorted(os.listdir(self.path))
+            if partition.startswith("processing_date=")
+            and since <= date.fromisoformat(partition.split("=", 1)[1]) < (before or date.max)
+            for name in os.listdir(os.path.join(self.path, partition)) if name.endswith(".parquet")
+        ]
+        frames = [pl.read_parquet(f, columns=["record_hash"]) for f in files]
+        return pl.concat(frames)["record_hash"] if frames else pl.Series("record_hash", [], dtype=pl.Utf8)
+
+    def write(self, df: pl.DataFrame, mode: str = "append") -> Dict[str, Any]:
+        started = time.perf_counter()
+        output_bytes = 0
+        commit_seconds = 0.0
+        for part in df.partition_by("processing_date"):
+            processing_date = part["processing_date"][0]
+            directory = os.path.join(self.path, f"processing_date={processing_date.isoformat()}")
+            os.makedirs(directory, exist_ok=True)
+            previous = os.listdir(directory)
+            name = f"part-{uuid.uuid4().hex}.parquet"
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            part.write_parquet(tmp_path)
+            output_bytes += os.path.getsize(tmp_path)
+
+            commit_started = time.perf_counter()
+            # El archivo aparece completo con su nombre definitivo
+            os.replace(tmp_path, os.path.join(directory, name))
+            if mode == "overwrite_partitions":
+                for old in previous:
+                    os.remove(os.path.join(directory, old))
+            commit_seconds += time.perf_counter() - commit_started
+        return {
+            'sink': self.name,
+            'mode': mode,
+            'rows': df.height,
+            'bytes': output_bytes,
+            'write_seconds': round(time.perf_counter() - started, 3),
+            'commit_seconds': round(commit_seconds, 3)
+        }
+
+
+class BigQueryLoadSink:
+    """Load jobs de BigQuery desde Parquet en memoria.
+
+    En overwrite_partitions cada partición processing_date se reemplaza con su
+    propio load job (WRITE_TRUNCATE sobre el decorador `tabla$YYYYMMDD`), que
+    BigQuery aplica de forma atómica.
+    """
+
+    name = "bigquery-load"
+
+    def __init__(self, table: str):
+        self.table = table
+
+    def read_hashes(self, since: date, before: Optional[date] = None) -> pl.Series:
+        """record_hash de las particiones processing_date en [since, before) (poda de particiones en BigQuery)"""
+        bigquery = importlib.import_module("google.cloud.bigquery")
+        query = (
+            f"SELECT DISTINCT record_hash FROM `{self.table}` "
+            f"WHERE processing_date >= DATE '{since.isoformat()}'"
+        )
+        if before is not None:
+            query += f" AND processing_date < DATE '{before.isoformat()}'"
+        return pl.from_arrow(bigquery.Client().query(query).to_arrow())["record_hash"]
+
+    def write(self, df: pl.DataFrame, mode: str = "append") -> Dict[str, Any]:
+        bigquery = importlib.import_module("google.cloud.bigquery")
+        client = bigquery.Client()
+        started = time.perf_counter()
+
+        if mode == "overwrite_partitions":
+            targets = [
+                (f"{self.table}${part['processing_date'][0]:%Y%m%d}", part, bigquery.WriteDisposition.WRITE_TRUNCATE)
+                for part in df.partition_by("processing_date")
+            ]
+        else:
+            targets = [(self.table, df, bigquery.WriteDisposition.WRITE_APPEND)]
+
+        output_bytes = 0
+        commit_seconds = 0.0
+        for destination, part, disposition in targets:
+            buffer = io.BytesIO()
+            part.write_parquet(buffer)
+            output_bytes += buffer.tell()
+            buffer.seek(0)
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition=disposition
+            )
+            commit_started = time.perf_counter()
+            client.load_table_from_file(buffer, destination, job_config=job_config).result()
+            commit_seconds += time.perf_counter() - commit_started
+        return {
+            'sink': self.name,
+            'mode': mode,
+            'rows': df.height,
+            'bytes': output_bytes,
+            'write_seconds': round(time.perf_counter() - started, 3),
+            'commit_seconds': round(commit_seconds, 3)
+        }
+
+
+class WatermarkFile:
+    """Checkpoint JSON del watermark Bronze -> Silver (gs://... o ruta local).
+
+    Mismo documento que WatermarkStore del motor Spark, leído y escrito sin
+    Hadoop: el cliente de GCS reemplaza el objeto de forma atómica.
+    """
+
+    def __init__(self, uri: str):
+        self.uri = uri
+
+    def _blob(self):
+        bucket_name, _, name = self.uri[len("gs://"):].partition("/")
+        return importlib.import_module("google.cloud.storage").Client().bucket(bucket_name).blob(name)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Documento guardado o None si aún no existe"""
+        try:
+            if self.uri.startswith("gs://"):
+                blob = self._blob()
+                return json.loads(blob.download_as_text()) if blob.exists() else None
+            if not os.path.exists(self.uri):
+                return None
+            with open(self.uri) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error leyendo watermark {self.uri}: {str(e)}")
+            raise
+
+    def save(self, document: Dict[str, Any]) -> None:
+        """Reemplazar el documento de forma atómica"""
+        payload = json.dumps(document, indent=2)
+        try:
+            if self.uri.startswith("gs://"):
+                self._blob().upload_from_string(payload, content_type="application/json")
+            else:
+                directory = os.path.dirname(os.path.abspath(self.uri))
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.uri)}-")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        f.write(payload)
+                    os.replace(tmp_path, self.uri)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            logger.info(f"Watermark guardado en {self.uri}")
+        except Exception as e:
+            logger.error(f"Error guardando watermark {self.uri}: {str(e)}")
+            raise
+
+
+class PolarsBronzeToSilverTransformer:
+    """Transformación de datos de capa Bronze a Silver usando Polars en un solo nodo"""
+
+    def __init__(self, project_id: str, bronze_root: str, ingest_dates: List[str],
+                 quality_columns: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 sink=None, write_mode: str = "append", gold_sink=None,
+                 checkpoint_uri: Optional[str] = None,
+                 dedup_lookback_days: int = DEFAULT_DEDUP_LOOKBACK_DAYS):
+        self.project_id = project_id
+        # gs://bucket/bronze/retail-claims o un directorio local con el mismo layout
+        self.bronze_root = bronze_root.rstrip("/")
+        if not ingest_dates:
+            raise ValueError("El motor Polars requiere al menos una partición ingest_date")
+        self.ingest_dates = [date.fromisoformat(d).isoformat() for d in ingest_dates]
+        self.quality_columns = quality_columns if quality_columns is not None else QUALITY_COLUMNS
+        self.sink = sink or BigQueryLoadSink(f"{project_id}.retail_claims_silver.claims_structured")
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f"Modo de escritura no soportado por el motor Polars: {write_mode}")
+        self.write_mode = write_mode
+        self.sink_report: Optional[Dict[str, Any]] = None
+        # Staging de Gold con las reglas de negocio (None: sin staging)
+        self.gold_sink = gold_sink
+        self.gold_report: Optional[Dict[str, Any]] = None
+        self.field_types = claim_field_types()
+        # Watermark compartido con el motor Spark (None: no se lee ni se avanza)
+        self.watermark_file = WatermarkFile(checkpoint_uri) if checkpoint_uri else None
+        self.watermark: Optional[str] = None
+        # Ventana de deduplicación contra Silver (0: solo los repetidos del lote)
+        self.dedup_lookback_days = dedup_lookback_days
+
+    def load_watermark(self) -> Optional[str]:
+        """Leer el watermark y sumar los días pendientes entre él y las particiones pedidas.
+
+        Una corrida previa fallida deja particiones sin procesar que el motor
+        Spark leería en modo incremental; Polars las procesa en el mismo lote.
+        """
+        if self.watermark_file is None:
+            return None
+        checkpoint = self.watermark_file.load()
+        self.watermark = checkpoint['ingest_date'] if checkpoint else None
+        logger.info(f"Watermark Bronze -> Silver: {self.watermark or 'sin checkpoint'}")
+        if self.watermark:
+            first = date.fromisoformat(self.watermark) + timedelta(days=1)
+            pending = (date.fromisoformat(min(self.ingest_dates)) - first).days
+            gap = [(first + timedelta(days=n)).isoformat() for n in range(pending)]
+            if gap:
+                logger.info(f"Particiones pendientes desde el watermark: {gap}")
+                self.ingest_dates = gap + self.ingest_dates
+        return self.watermark
+
+    def advance_watermark(self, quality: Dict[str, Any]) -> Optional[str]:
+        """Registrar la partición más reciente escrita en Silver (solo tras escribir)"""
+        if self.watermark_file is None:
+            return None
+        processed = quality.get('max_ingest_date')
+        if not processed or (self.watermark and processed <= self.watermark):
+            logger.info("Sin particiones nuevas: el watermark no cambia")
+            return self.watermark
+        self.watermark_file.save({
+            'ingest_date': processed,
+            'engine': 'polars',
+            'bronze_root': self.bronze_root,
+            'records': quality['total_records'],
+            'full_refresh': False,
+            'updated_at': datetime.utcnow().isoformat()
+        })
+        self.watermark = processed
+        return processed
+
+    def bronze_files(self) -> List[Tuple[str, str]]:
+        """(ingest_date, ruta) de los archivos Bronze de las particiones a procesar"""
+        files = []
+        if self.bronze_root.startswith("gs://"):
+            bucket_name, _, prefix = self.bronze_root[len("gs://"):].partition("/")
+            client = importlib.import_module("google.cloud.storage").Client()
+            for ingest_date in self.ingest_dates:
+                for blob in client.list_blobs(bucket_name, prefix=f"{prefix}/ingest_date={ingest_date}/"):
+                    if blob.name.endswith(BRONZE_EXTENSIONS):
+                        files.append((ingest_date, f"gs://{bucket_name}/{blob.name}"))
+            return files
+
+        for ingest_date in self.ingest_dates:
+            partition = os.path.join(self.bronze_root, f"ingest_date={ingest_date}")
+            for root, _, names in os.walk(partition):
+                files.extend(
+                    (ingest_date, os.path.join(root, name))
+                    for name in sorted(names) if name.endswith(BRONZE_EXTENSIONS)
+                )
+        return files
+
+    def _read_bytes(self, path: str) -> bytes:
+        bucket_name, _, name = path[len("gs://"):].partition("/")
+        client = importlib.import_module("google.cloud.storage").Client()
+        return client.bucket(bucket_name).blob(name).download_as_bytes()
+
+    def _scan_file(self, path: str) -> pl.LazyFrame:
+        schema = {name: BRONZE_SOURCE_TYPES[bq_type] for name, bq_type, _ in CLAIM_FIELDS}
+        remote = path.startswith("gs://")
+        if path.endswith(".parquet"):
+            return pl.read_parquet(io.BytesIO(self._read_bytes(path))).lazy() if remote else pl.scan_parquet(path)
+        if path.endswith(".json") and not remote:
+            return pl.scan_ndjson(path, schema=schema)
+        content = self._read_bytes(path) if remote else open(path, "rb").read()
+        if path.endswith(".gz"):
+            content = gzip.decompress(content)
+        return pl.read_ndjson(io.BytesIO(content), schema=schema).lazy()
+
+    def read_bronze_data(self) -> pl.LazyFrame:
+        """Leer los archivos de las particiones ingest_date con el esquema declarado"""
+        try:
+            frames = [
+                self._scan_file(path).with_columns(pl.lit(date.fromisoformat(ingest_date)).alias("ingest_date"))
+                for ingest_date, path in self.bronze_files()
+            ]
+            if not frames:
+                raise ValueError(f"Sin archivos Bronze en {self.bronze_root} para {self.ingest_dates}")
+
+            logger.info(f"Lectura Bronze configurada: {len(frames)} archivos de {self.ingest_dates}")
+            return pl.concat(frames, how="diagonal")
+        except Exception as e:
+            logger.error(f"Error leyendo datos Bronze: {str(e)}")
+            raise
+
+    def apply_bronze_schema(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Validar Bronze contra el contrato de reclamos y proyectar solo las columnas de Silver"""
+        source = lf.schema
+        columns, missing, incompatible = [], [], []
+        for name, bq_type, nullable in CLAIM_FIELDS:
+            if name not in source:
+                if nullable:
+                    logger.warning(f"Columna opcional ausente en Bronze: {name}")
+                    columns.append(pl.lit(None).cast(POLARS_TYPES[bq_type]).alias(name))
+                else:
+                    missing.append(name)
+            elif not _accepts(source[name], bq_type):
+                incompatible.append(f"{name} ({source[name]} -> {bq_type})")
+            else:
+                columns.append(_conform(name, source[name], bq_type).alias(name))
+
+        if missing or incompatible:
+            raise ValueError(
+                f"Drift de esquema en Bronze: columnas faltantes {missing}, tipos incompatibles {incompatible}"
+            )
+        columns.extend(pl.col(name) for name in BRONZE_PARTITION_COLUMNS if name in source)
+        return lf.select(columns)
+
+    def clean_and_standardize(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Limpiar y estandarizar datos (trim de espacios como el de Spark)"""
+        try:
+            lf = lf.with_columns(
+                pl.col("claim_id").str.strip_chars(" "),
+                pl.col("customer_id").str.strip_chars(" "),
+                pl.col("store_id").str.strip_chars(" "),
+                pl.col("description").str.strip_chars(" "),
+                pl.col("status").str.strip_chars(" ").str.to_uppercase()
+            )
+
+            logger.info("Limpieza y estandarización completadas")
+            return lf
+        except Exception as e:
+            logger.error(f"Error en limpieza: {str(e)}")
+            raise
+
+    def add_technical_columns(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Agregar columnas técnicas"""
+        try:
+            now = datetime.utcnow()
+            hashed_fields = pl.concat_list([
+                _hash_field(c, self.field_types[c]) for c in RECORD_HASH_COLUMNS
+            ]).list.eval(pl.element().drop_nulls()).list.join(RECORD_HASH_SEPARATOR)
+            lf = lf.with_columns(
+                pl.lit(now).cast(pl.Datetime("us")).dt.replace_time_zone("UTC").alias("ingestion_timestamp"),
+                pl.lit(now.date()).alias("processing_date"),
+                hashed_fields.map_batches(_md5, return_dtype=pl.Utf8).alias("record_hash"),
+                pl.when(
+                    pl.col("claim_id").is_not_null() &
+                    pl.col("customer_id").is_not_null() &
+                    (pl.col("claim_amount") > 0)
+                ).then(1.0).otherwise(0.5).alias("data_quality_score")
+            )
+
+            logger.info("Columnas técnicas agregadas")
+            return lf
+        except Exception as e:
+            logger.error(f"Error agregando columnas técnicas: {str(e)}")
+            raise
+
+    def quality_metric_exprs(self, lf: pl.LazyFrame) -> List[pl.Expr]:
+        """Expresiones de agregación del reporte de calidad (una sola pasada)"""
+        exprs = [
+            pl.count().cast(pl.Int64).alias("total_records"),
+            (pl.col("claim_amount") < 0).sum().cast(pl.Int64).alias("negative_amounts")
+        ]
+        if "ingest_date" in lf.columns:
+            exprs.append(pl.col("ingest_date").max().cast(pl.Utf8).alias("max_ingest_date"))
+        for column, metrics in self.quality_columns.items():
+            for metric in metrics:
+                for suffix, expr in QUALITY_METRICS[metric](column, self.field_types[column]):
+                    exprs.append(expr.alias(f"{column}__{suffix}"))
+        return exprs
+
+    def build_quality_report(self, metrics: Dict[str, Any]) -> dict:
+        """Reporte de calidad con las mismas claves que el motor Spark"""
+        total_records = metrics['total_records']
+        null_claim_ids = metrics.get('claim_id__nulls') or 0
+        null_amounts = metrics.get('claim_amount__nulls') or 0
+        negative_amounts = metrics['negative_amounts'] or 0
+
+        columns: Dict[str, Dict[str, Any]] = {}
+        for name, value in metrics.items():
+            if '__' in name:
+                column, suffix = name.split('__', 1)
+                columns.setdefault(column, {})[suffix] = value
+
+        report = {
+            'total_records': total_records,
+            'null_claim_ids': null_claim_ids,
+            'null_amounts': null_amounts,
+            'negative_amounts': negative_amounts,
+            'quality_percentage': round(
+                ((total_records - null_claim_ids - null_amounts - negative_amounts) / total_records * 100), 2
+            ) if total_records > 0 else 0,
+            'columns': columns
+        }
+        if 'max_ingest_date' in metrics:
+            report['max_ingest_date'] = metrics['max_ingest_date']
+        return report
+
+    def validate_data_quality(self, lf: pl.LazyFrame) -> dict:
+        """Validar calidad de datos con una única agregación"""
+        try:
+            metrics = lf.select(self.quality_metric_exprs(lf)).collect().row(0, named=True)
+            quality_report = self.build_quality_report(metrics)
+
+            logger.info(f"Reporte de calidad: {quality_report}")
+            return quality_report
+        except Exception as e:
+            logger.error(f"Error validando calidad: {str(e)}")
+            raise
+
+    def silver_frame(self) -> pl.LazyFrame:
+        """Plan completo Bronze -> Silver (sin ejecutar)"""
+        lf = self.apply_bronze_schema(self.read_bronze_data())
+        return self.add_technical_columns(self.clean_and_standardize(lf))
+
+    def deduplicate(self, df: pl.DataFrame) -> Tuple[pl.DataFrame, Dict[str, Any]]:
+        """Descartar registros ya presentes en Silver y repetidos dentro del lote.
+
+        Los hashes de las particiones processing_date de la ventana se leen
+        una sola vez y se descartan con un anti-join exacto (mismas claves que
+        el reporte de deduplicación del motor Spark).
+        """
+        try:
+            started = time.perf_counter()
+            existing = pl.Series("record_hash", [], dtype=pl.Utf8)
+            if self.dedup_lookback_days:
+                # Misma fecha UTC que processing_date; en overwrite_partitions la partición
+                # del día se reemplaza y sus hashes no cuentan
+                today = datetime.utcnow().date()
+                since = today - timedelta(days=self.dedup_lookback_days)
+                before = today if self.write_mode == "overwrite_partitions" else None
+                existing = self.sink.read_hashes(since, before).unique()
+            build_seconds = round(time.perf_counter() - started, 3)
+
+            is_existing = df["record_hash"].is_in(existing)
+            existing_duplicates = int(is_existing.sum())
+            deduplicated = df.filter(~is_existing).unique(subset=["record_hash"], keep="first", maintain_order=True)
+            report = {
+                'existing_hashes': existing.len(),
+                'build_seconds': build_seconds,
+                'written_records': deduplicated.height,
+                'incoming_records': df.height,
+                'existing_duplicates': existing_duplicates,
+                'batch_duplicates': df.height - existing_duplicates - deduplicated.height,
+                'duplicate_rate': round(
+                    (df.height - deduplicated.height) / df.height * 100, 2
+                ) if df.height > 0 else 0
+            }
+            logger.info(f"Reporte de deduplicación: {report}")
+            return deduplicated, report
+        except Exception as e:
+            logger.error(f"Error deduplicando contra Silver: {str(e)}")
+            raise
+
+    def write_to_silver(self, df: pl.DataFrame, mode: str = "append"):
+        """Escribir datos a capa Silver a través del sink configurado"""
+        try:
+            self.sink_report = self.sink.write(df, mode)
+
+            logger.info(f"Datos escritos a capa Silver: {self.sink_report}")
+        except Exception as e:
+            logger.error(f"Error escribiendo a Silver: {str(e)}")
+            raise
+
+    def gold_frame(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Reclamos aptos para Gold con las reglas de negocio (versión Arrow de business_rules)"""
+        df = df.filter(pl.col("data_quality_score") >= MIN_GOLD_QUALITY_SCORE)
+        reference_date = df["processing_date"][0] if df.height else datetime.utcnow().date()
+        gold = pl.from_arrow(apply_rules_arrow(df.to_arrow(), reference_date))
+        return gold.with_columns(
+            pl.lit(datetime.now(timezone.utc)).cast(pl.Datetime("us", "UTC")).alias("processing_timestamp")
+        ).select(GOLD_STAGING_COLUMNS)
+
+    def write_to_gold(self, df: pl.DataFrame):
+        """Escribir el staging de Gold reemplazando sus particiones processing_date"""
+        try:
+            self.gold_report = self.gold_sink.write(df, "overwrite_partitions")
+
+            logger.info(f"Staging de Gold escrito: {self.gold_report}")
+        except Exception as e:
+            logger.error(f"Error escribiendo el staging de Gold: {str(e)}")
+            raise
+
+    def transform(self):
+        """Ejecutar transformación completa"""
+        try:
+            logger.info("Iniciando transformación Bronze -> Silver (Polars)")
+            phases = []
+
+            def timed(name: str, run: Callable[[], Any]) -> Any:
+                started = time.perf_counter()
+                output = run()
+                phases.append({'name': name, 'wall_seconds': round(time.perf_counter() - started, 3)})
+                return output
+
+            self.load_watermark()
+            # Bronze se lee una sola vez: calidad y escritura usan el resultado en memoria
+            df = timed('transform', lambda: self.silver_frame().collect())
+            df, dedup_report = timed('dedup', lambda: self.deduplicate(df))
+            quality = timed('quality', lambda: self.validate_data_quality(df.lazy()))
+            # Un archivo por processing_date, ordenado por las columnas de clustering de Silver
+            silver = df.select(SILVER_COLUMNS).sort(["processing_date", *CLUSTERING_COLUMNS])
+            # Gold antes que Silver: si la escritura de Silver falla, el reintento vuelve a
+            # generar el mismo staging; al revés, la deduplicación descartaría esos reclamos
+            if self.gold_sink is not None:
+                timed('gold', lambda: self.write_to_gold(self.gold_frame(df)))
+            timed('write', lambda: self.write_to_silver(silver, self.write_mode))
+            watermark = None
+            if self.watermark_file is not None:
+                watermark = timed('watermark', lambda: self.advance_watermark(quality))
+
+            # Mismas claves que el documento de métricas del motor Spark (sin detalle por stage)
+            wall_seconds = round(sum(phase['wall_seconds'] for phase in phases), 3)
+            metrics = {
+                'status': 'success',
+                'engine': 'polars',
+                'wall_seconds': wall_seconds,
+                'phases': phases,
+                'records': df.height,
+                'records_per_second': round(df.height / wall_seconds, 1) if wall_seconds > 0 else None
+            }
+
+            logger.info("Transformación completada exitosamente")
+            return {
+                'status': 'success',
+                'engine': 'polars',
+                'quality_report': quality,
+                'sink_report': self.sink_report,
+                'gold_report': self.gold_report,
+                'dedup_report': dedup_report,
+                'watermark': watermark,
+                'metrics': metrics,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Error en transformación: {str(e)}")
+            raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transformación Bronze -> Silver con Polars (un solo nodo)")
+    parser.add_argument("project_id")
+    parser.add_argument("gcs_bucket")
+    parser.add_argument(
+        "--ingest-date",
+        action="append",
+        dest="ingest_dates",
+        required=True,
+        help="Partición ingest_date (YYYY-MM-DD) a procesar; repetible"
+    )
+    parser.add_argument(
+        "--bronze-prefix",
+        default="bronze/retail-claims",
+        help="Prefijo de Bronze en el bucket"
+    )
+    parser.add_argument(
+        "--write-mode",
+        choices=WRITE_MODES,
+        default="append",
+        help="append o reemplazo de las particiones processing_date del lote"
+    )
+    parser.add_argument(
+        "--dedup-lookback-days",
+        type=int,
+        default=DEFAULT_DEDUP_LOOKBACK_DAYS,
+        help="Días de particiones processing_date de Silver contra los que deduplicar por record_hash (0: desactivado)"
+    )
+    parser.add_argument(
+        "--checkpoint-uri",
+        help="Checkpoint JSON del watermark del motor Spark (gs://... o ruta local) a leer y avanzar"
+    )
+    parser.add_argument(
+        "--sink-path",
+        help="Escribir Silver en este directorio Parquet local en lugar de BigQuery"
+    )
+    parser.add_argument(
+        "--gold-sink-path",
+        help="Escribir el staging de Gold en este directorio Parquet local en lugar de BigQuery"
+    )
+    args = parser.parse_args()
+
+    transformer = PolarsBronzeToSilverTransformer(
+        project_id=args.project_id,
+        bronze_root=f"gs://{args.gcs_bucket}/{args.bronze_prefix}",
+        ingest_dates=args.ingest_dates,
+        sink=LocalParquetFileSink(args.sink_path) if args.sink_path else None,
+        write_mode=args.write_mode,
+        gold_sink=LocalParquetFileSink(args.gold_sink_path) if args.gold_sink_path else BigQueryLoadSink(
+            f"{args.project_id}.retail_claims_gold.claims_business_rules_staging"
+        ),
+        checkpoint_uri=args.checkpoint_uri,
+        dedup_lookback_days=args.dedup_lookback_days
+    )
+
+    result = transformer.transform()
+    print(result)
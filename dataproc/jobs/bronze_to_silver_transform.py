@@ -1,57 +1,1013 @@
 import logging
-from pyspark.sql import SparkSession
+from pyspark import StorageLevel
+from pyspark.sql import Column, Observation, SparkSession
 from pyspark.sql.functions import (
     col, to_date, to_timestamp, trim, upper, 
-    when, coalesce, current_timestamp, md5, concat_ws
+    when, coalesce, current_timestamp, md5, concat_ws, pmod,
+    approx_count_distinct, broadcast, count, lit, regexp_extract, unix_micros, xxhash64,
+    max as spark_max, min as spark_min, round as spark_round, sum as spark_sum
+)
+from pyspark.sql.types import (
+    StructType, StructField, StringType, DoubleType, TimestampType, DateType, DataType, NumericType
+)
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from business_rules import MIN_GOLD_QUALITY_SCORE, spark_rule_columns
+from claims_schema import (
+    BRONZE_PARTITION_COLUMNS, CLAIM_FIELDS, CLUSTERING_COLUMNS, GOLD_STAGING_COLUMNS, QUALITY_COLUMNS,
+    RECORD_HASH_COLUMNS, RECORD_HASH_SEPARATOR, SILVER_COLUMNS
 )
-from pyspark.sql.types import StructType, StructField, StringType, FloatType, TimestampType
-from datetime import datetime
-import sys
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _count_where(condition: Column) -> Column:
+    return spark_sum(when(condition, 1).otherwise(0))
+
+
+def _bound(expr: Column, data_type: DataType) -> Column:
+    # observe() devuelve fechas como objetos Java: se reportan como texto ISO
+    if isinstance(data_type, (DateType, TimestampType)):
+        return expr.cast("string")
+    return expr
+
+
+# Métricas por columna disponibles en el reporte de calidad. Cada una devuelve
+# (sufijo, expresión de agregación); todas se evalúan en la misma pasada.
+QUALITY_METRICS: Dict[str, Callable[[str, DataType], List[Tuple[str, Column]]]] = {
+    'nulls': lambda c, t: [('nulls', _count_where(col(c).isNull()))],
+    'range': lambda c, t: [('min', _bound(spark_min(c), t)), ('max', _bound(spark_max(c), t))],
+    # Cardinalidad aproximada (HyperLogLog++, error relativo ~5%): admitida por observe()
+    'approx_distinct': lambda c, t: [('approx_distinct', approx_count_distinct(c))],
+}
+
+# Cálculo del reporte de calidad:
+# - observe: métricas adjuntas a la escritura (sin pasada extra ni persistencia)
+# - aggregate: una agregación antes de escribir sobre el DataFrame persistido
+#   (el reporte está disponible antes de la escritura, p. ej. para bloquearla)
+QUALITY_MODES = ('observe', 'aggregate')
+
+# Tipos Spark de los tipos BigQuery usados por el contrato de reclamos
+SPARK_TYPES: Dict[str, DataType] = {
+    'STRING': StringType(),
+    'DATE': DateType(),
+    'FLOAT64': DoubleType(),
+    'TIMESTAMP': TimestampType(),
+}
+
+# Columnas de negocio de Silver (claims_schema.CLAIM_FIELDS). Se aplica al leer
+# Bronze: solo estas columnas se leen.
+CLAIMS_SCHEMA = StructType([
+    StructField(name, SPARK_TYPES[bq_type], nullable) for name, bq_type, nullable in CLAIM_FIELDS
+])
+
+
+def _accepts(source: DataType, target: DataType) -> bool:
+    """Tipos de Bronze (declarados o autodetectados por BigQuery) convertibles al de Silver"""
+    if isinstance(target, DoubleType):
+        return isinstance(source, NumericType)
+    if isinstance(target, (DateType, TimestampType)):
+        return isinstance(source, (StringType, DateType, TimestampType))
+    return source == target
+
+
+def _conform(name: str, source: DataType, target: DataType) -> Column:
+    if source == target:
+        return col(name)
+    if isinstance(target, DateType) and isinstance(source, StringType):
+        return to_date(col(name), "yyyy-MM-dd")
+    return col(name).cast(target)
+
+
+def _hash_field(name: str, data_type: DataType) -> Column:
+    """Forma canónica de un campo en record_hash (ver claims_schema.RECORD_HASH_COLUMNS)"""
+    if isinstance(data_type, DoubleType):
+        return spark_round(col(name) * 100).cast("bigint").cast("string")
+    if isinstance(data_type, TimestampType):
+        return unix_micros(col(name)).cast("string")
+    return col(name).cast("string")
+
+
+# Probabilidad de falso positivo del Bloom filter de deduplicación
+DEFAULT_DEDUP_FPP = 0.01
+
+# Layout de escritura de Silver: clientes frecuentes repartidos en este número de archivos
+DEFAULT_SALT_BUCKETS = 8
+# freqItems no admite soportes menores
+MIN_HOT_KEY_SUPPORT = 1e-4
+
+# Lectura de Bronze desde los archivos de la ingesta (streaming y lectura directa): esquema explícito
+# (montos float y el resto texto, igual en JSON y en Parquet) más la partición
+# ingest_date de la ruta. Sin inferencia, el esquema no cambia entre micro-lotes.
+BRONZE_FILE_SCHEMA = StructType(
+    [
+        StructField(name, DoubleType() if bq_type == 'FLOAT64' else StringType(), True)
+        for name, bq_type, _ in CLAIM_FIELDS
+    ] + [StructField("ingest_date", DateType(), True)]
+)
+STREAM_FORMATS = ('json', 'parquet')
+# Micro-lotes que conserva el documento de métricas del streaming
+STREAM_METRICS_BATCHES = 100
+
+# Lectura directa de los archivos que informa la ingesta (sin la tabla externa):
+# formato según la extensión y partición ingest_date según la ruta hive
+BRONZE_FILE_FORMATS = (
+    ('.parquet', 'parquet'),
+    ('.json', 'json'), ('.json.gz', 'json'),
+    ('.ndjson', 'json'), ('.ndjson.gz', 'json'),
+    ('.jsonl', 'json'), ('.jsonl.gz', 'json'),
+)
+INGEST_DATE_IN_PATH = r'ingest_date=(\d{4}-\d{2}-\d{2})'
+
+
+def _bronze_file_format(uri: str) -> str:
+    """Formato de lectura de un archivo Bronze según su extensión (.json.gz se descomprime al leer)"""
+    name = uri.lower()
+    for extension, source_format in BRONZE_FILE_FORMATS:
+        if name.endswith(extension):
+            return source_format
+    raise ValueError(f"Formato de archivo Bronze no soportado: {uri}")
+
+
+def _uri_ingest_date(uri: str) -> Optional[str]:
+    """Partición ingest_date de la ruta del archivo (None si no sigue el layout hive)"""
+    match = re.search(INGEST_DATE_IN_PATH, uri)
+    return match.group(1) if match else None
+
+
+def _estimated_size(df: 'pyspark.sql.DataFrame') -> Optional[int]:
+    """Tamaño estimado por el optimizador (None si la fuente no lo reporta)"""
+    try:
+        size = int(str(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes()))
+    except Exception:
+        return None
+    # Sin estadísticas Spark usa spark.sql.defaultSizeInBytes (Long.MaxValue)
+    return size if size < 2 ** 62 else None
+
+
+def _bloom_might_contain(spark: SparkSession, bloom_filter: bytes, value: Column) -> Column:
+    """Expresión nativa de Spark que prueba `xxhash64(value)` contra un Bloom filter serializado.
+    
+    El filtro viaja como literal del plan, dentro del binario de la tarea que
+    Spark difunde (broadcast) una vez por stage a los ejecutores.
+    """
+    jvm = spark.sparkContext._jvm
+    expressions = jvm.org.apache.spark.sql.catalyst.expressions
+    literal = expressions.Literal.create(bytearray(bloom_filter), jvm.org.apache.spark.sql.types.DataTypes.BinaryType)
+    return Column(jvm.org.apache.spark.sql.Column(
+        expressions.BloomFilterMightContain(literal, xxhash64(value)._jc.expr())
+    ))
+
+
+class JsonDocumentStore:
+    """Documento JSON en una ruta gs:// (u otro esquema de Hadoop) o local.
+    
+    En GCS el objeto se publica completo al cerrar la escritura; en local se
+    escribe un temporal y se reemplaza con os.replace. En ambos casos un
+    lector ve el documento anterior o el nuevo, nunca uno parcial.
+    """
+    
+    label = "documento"
+    
+    def __init__(self, spark: SparkSession, uri: str):
+        self.spark = spark
+        self.uri = uri
+    
+    @property
+    def local_path(self) -> Optional[str]:
+        if self.uri.startswith("file://"):
+            return self.uri[len("file://"):]
+        if "://" not in self.uri:
+            return self.uri
+        return None
+    
+    def _hadoop_path(self):
+        jvm = self.spark.sparkContext._jvm
+        path = jvm.org.apache.hadoop.fs.Path(self.uri)
+        return path, path.getFileSystem(self.spark.sparkContext._jsc.hadoopConfiguration())
+    
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Documento guardado o None si aún no existe"""
+        try:
+            if self.local_path is not None:
+                if not os.path.exists(self.local_path):
+                    return None
+                with open(self.local_path) as f:
+                    return json.load(f)
+            
+            path, fs = self._hadoop_path()
+            if not fs.exists(path):
+                return None
+            stream = fs.open(path)
+            try:
+                content = self.spark.sparkContext._jvm.org.apache.commons.io.IOUtils.toString(stream, "UTF-8")
+            finally:
+                stream.close()
+            return json.loads(content)
+        except Exception as e:
+            logger.error(f"Error leyendo {self.label} {self.uri}: {str(e)}")
+            raise
+    
+    def save(self, document: Dict[str, Any]) -> None:
+        """Reemplazar el documento de forma atómica"""
+        payload = json.dumps(document, indent=2)
+        try:
+            if self.local_path is not None:
+                directory = os.path.dirname(os.path.abspath(self.local_path))
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.local_path)}-")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        f.write(payload)
+                    os.replace(tmp_path, self.local_path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            else:
+                path, fs = self._hadoop_path()
+                stream = fs.create(path, True)
+                try:
+                    stream.write(bytearray(payload.encode("utf-8")))
+                finally:
+                    stream.close()
+            logger.info(f"{self.label.capitalize()} guardado en {self.uri}")
+        except Exception as e:
+            logger.error(f"Error guardando {self.label} {self.uri}: {str(e)}")
+            raise
+
+
+class WatermarkStore(JsonDocumentStore):
+    """Checkpoint JSON con la última partición ingest_date procesada"""
+    
+    label = "watermark"
+
+
+class MetricsStore(JsonDocumentStore):
+    """Documento JSON con las métricas por fase y por stage de una corrida"""
+    
+    label = "reporte de métricas"
+
+
+class StreamCommitStore(JsonDocumentStore):
+    """Último micro-lote escrito en Silver por el streaming (junto al checkpoint de Spark)"""
+    
+    label = "commit de streaming"
+
+
+# Modos de escritura de Silver:
+# - append: agrega las filas del lote
+# - overwrite_partitions: reemplaza solo las particiones processing_date del lote
+# - overwrite: reemplaza la tabla completa (--full-refresh)
+WRITE_MODES = ('append', 'overwrite_partitions', 'overwrite')
+
+
+@contextmanager
+def _spark_conf(spark: SparkSession, key: str, value: str) -> Iterator[None]:
+    """Fijar una configuración de sesión durante el bloque y restaurar la anterior"""
+    previous = spark.conf.get(key, None)
+    spark.conf.set(key, value)
+    try:
+        yield
+    finally:
+        if previous is None:
+            spark.conf.unset(key)
+        else:
+            spark.conf.set(key, previous)
+
+
+def _job_group_output(spark: SparkSession, group: str) -> Tuple[int, Optional[float]]:
+    """Bytes escritos por las tareas del grupo y fin (epoch) de su último job"""
+    sc = spark.sparkContext
+    store = sc._jsc.sc().statusStore()
+    output_bytes = 0
+    last_completion = None
+    for job_id in sc.statusTracker().getJobIdsForGroup(group):
+        job = store.job(job_id)
+        if job.completionTime().isDefined():
+            completed = job.completionTime().get().getTime() / 1000
+            last_completion = max(last_completion or completed, completed)
+        for stage_id in sc.statusTracker().getJobInfo(job_id).stageIds:
+            try:
+                output_bytes += store.lastStageAttempt(stage_id).outputBytes()
+            except Exception:
+                # Stages omitidos (shuffle reutilizado) no siempre quedan registrados
+                continue
+    return output_bytes, last_completion
+
+
+# Contadores de cada stage de Spark que se suman por fase del job
+STAGE_COUNTERS = (
+    'executorRunTime', 'inputBytes', 'inputRecords', 'outputBytes', 'outputRecords',
+    'shuffleReadBytes', 'shuffleWriteBytes', 'memoryBytesSpilled', 'diskBytesSpilled', 'jvmGcTime'
+)
+
+
+class StageMetricsCollector:
+    """Métricas por fase del job y por stage de Spark.
+
+    Las métricas salen del AppStatusStore de Spark, que alimenta el
+    AppStatusListener del driver (el mismo SparkListener que sirve la UI), de
+    modo que no hace falta registrar un listener propio. Cada fase (`phase`)
+    se cronometra y se queda con los jobs lanzados durante el bloque,
+    incluidos los de broadcast que AQE lanza en otros hilos. Un stage omitido
+    (shuffle reutilizado) cuenta solo en la fase que lo ejecutó.
+
+    Las transformaciones son perezosas: en modo observe la lectura de Bronze,
+    la limpieza y la calidad se ejecutan dentro de la fase de escritura.
+    """
+
+    def __init__(self, spark: SparkSession):
+        self.spark = spark
+        self.phases: List[Dict[str, Any]] = []
+
+    def _drain(self) -> None:
+        # Los eventos llegan al listener de forma asíncrona
+        try:
+            self.spark.sparkContext._jsc.sc().listenerBus().waitUntilEmpty()
+        except Exception as e:
+            logger.warning(f"No se pudo esperar al bus de eventos de Spark: {str(e)}")
+
+    def _next_job_id(self) -> int:
+        self._drain()
+        # jobsList devuelve los jobs del más reciente al más antiguo
+        latest = self.spark.sparkContext._jsc.sc().statusStore().jobsList(None).headOption()
+        return latest.get().jobId() + 1 if latest.isDefined() else 0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Cronometrar un bloque y asociarle los jobs de Spark que lance"""
+        first_job = self._next_job_id()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                'name': name,
+                'wall_seconds': round(time.perf_counter() - started, 3),
+                'jobs': list(range(first_job, self._next_job_id()))
+            })
+
+    def stage_metrics(self, stage_id: int) -> Optional[Dict[str, Any]]:
+        store = self.spark.sparkContext._jsc.sc().statusStore()
+        try:
+            stage = store.lastStageAttempt(stage_id)
+        except Exception:
+            # Stages omitidos no siempre quedan registrados
+            return None
+        if str(stage.status()) == "SKIPPED":
+            return None
+
+        metrics = {
+            'stage_id': stage_id,
+            'attempt': stage.attemptId(),
+            'name': stage.name(),
+            'status': str(stage.status()),
+            'tasks': stage.numTasks(),
+            'wall_seconds': round(
+                (stage.completionTime().get().getTime() - stage.submissionTime().get().getTime()) / 1000, 3
+            ) if stage.submissionTime().isDefined() and stage.completionTime().isDefined() else None,
+            'peakExecutionMemory': stage.peakExecutionMemory()
+        }
+        for counter in STAGE_COUNTERS:
+            metrics[counter] = getattr(stage, counter)()
+        return metrics
+
+    def report(self) -> Dict[str, Any]:
+        """Documento con los totales por fase y el detalle por stage"""
+        self._drain()
+        tracker = self.spark.sparkContext.statusTracker()
+        seen = set()
+        phases, stages = [], []
+        for phase in self.phases:
+            totals = {counter: 0 for counter in STAGE_COUNTERS}
+            phase_stages = 0
+            for job_id in phase['jobs']:
+                job = tracker.getJobInfo(job_id)
+                for stage_id in (job.stageIds if job else []):
+                    if stage_id in seen:
+                        continue
+                    metrics = self.stage_metrics(stage_id)
+                    if metrics is None:
+                        continue
+                    seen.add(stage_id)
+                    phase_stages += 1
+                    stages.append({'phase': phase['name'], **metrics})
+                    for counter in STAGE_COUNTERS:
+                        totals[counter] += metrics[counter]
+            phases.append({
+                'name': phase['name'],
+                'wall_seconds': phase['wall_seconds'],
+                'jobs': len(phase['jobs']),
+                'stages': phase_stages,
+                **totals
+            })
+        return {
+            'application_id': self.spark.sparkContext.applicationId,
+            'wall_seconds': round(sum(p['wall_seconds'] for p in phases), 3),
+            'phases': phases,
+            'stages': stages
+        }
+
+
+class SilverSink:
+    """Destino de escritura de la capa Silver.
+    
+    Las subclases implementan `_save`. `write` agrega a cada escritura las
+    filas (observadas durante la propia escritura), los bytes escritos por las
+    tareas de Spark y el tiempo de commit: lo que transcurre entre el fin del
+    último job de Spark y el fin de `_save` (carga o commit en BigQuery,
+    publicación del manifiesto en el sink local).
+    """
+    
+    name = "sink"
+    supported_modes: Tuple[str, ...] = WRITE_MODES
+    
+    def write(self, df: 'pyspark.sql.DataFrame', mode: str = "append") -> Dict[str, Any]:
+        if mode not in self.supported_modes:
+            raise ValueError(f"Modo de escritura no soportado por {self.name}: {mode}")
+        spark = df.sparkSession
+        sc = spark.sparkContext
+        previous_group = sc.getLocalProperty("spark.jobGroup.id")
+        previous_description = sc.getLocalProperty("spark.job.description")
+        group = f"silver-sink-{uuid.uuid4().hex}"
+        observation = Observation("silver_sink")
+        
+        started = time.perf_counter()
+        sc.setJobGroup(group, f"Escritura Silver ({self.name}, {mode})")
+        try:
+            details = self._save(df.observe(observation, count(lit(1)).alias("rows")), mode) or {}
+        finally:
+            sc.setLocalProperty("spark.jobGroup.id", previous_group)
+            sc.setLocalProperty("spark.job.description", previous_description)
+        finished_at = time.time()
+        
+        output_bytes, last_job_completion = _job_group_output(spark, group)
+        report = {
+            'sink': self.name,
+            'mode': mode,
+            'rows': observation.get['rows'],
+            'bytes': output_bytes,
+            'write_seconds': round(time.perf_counter() - started, 3),
+            'commit_seconds': round(max(finished_at - last_job_completion, 0.0), 3)
+            if last_job_completion else None
+        }
+        report.update(details)
+        return report
+    
+    def read(self, spark: SparkSession, condition: Optional[str] = None) -> Optional['pyspark.sql.DataFrame']:
+        """Contenido actual de Silver, opcionalmente filtrado (condición SQL); None si aún no existe"""
+        raise NotImplementedError
+    
+    def _save(self, df: 'pyspark.sql.DataFrame', mode: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+def _read_bigquery_table(spark: SparkSession, table: str, condition: Optional[str]) -> 'pyspark.sql.DataFrame':
+    reader = spark.read.format("bigquery").option("table", table)
+    if condition:
+        # Enviado a BigQuery: solo se leen las particiones que cumplen el filtro
+        reader = reader.option("filter", condition)
+    return reader.load()
+
+
+class BigQueryIndirectSink(SilverSink):
+    """Escritura indirecta: archivos temporales en GCS y un load job de BigQuery.
+    
+    En overwrite_partitions el conector reemplaza, en una única operación de
+    BigQuery, solo las particiones processing_date presentes en el lote.
+    """
+    
+    name = "bigquery-indirect"
+    
+    def __init__(self, table: str, temporary_gcs_bucket: str):
+        self.table = table
+        self.temporary_gcs_bucket = temporary_gcs_bucket
+    
+    def read(self, spark: SparkSession, condition: Optional[str] = None) -> 'pyspark.sql.DataFrame':
+        return _read_bigquery_table(spark, self.table, condition)
+    
+    def _save(self, df: 'pyspark.sql.DataFrame', mode: str) -> None:
+        writer = df.write \
+            .format("bigquery") \
+            .option("table", self.table) \
+            .option("temporaryGcsBucket", self.temporary_gcs_bucket)
+        if mode == "overwrite_partitions":
+            with _spark_conf(df.sparkSession, "spark.sql.sources.partitionOverwriteMode", "dynamic"):
+                writer.mode("overwrite").save()
+        else:
+            writer.mode(mode).save()
+
+
+class BigQueryDirectSink(SilverSink):
+    """Escritura directa con la Storage Write API, sin archivos intermedios en GCS.
+    
+    Los streams se crean en modo pendiente y se confirman juntos al final de
+    la escritura. Las tareas no escriben archivos, por lo que no hay bytes
+    de salida que reportar.
+    """
+    
+    name = "bigquery-direct"
+    supported_modes = ('append', 'overwrite')
+    
+    def __init__(self, table: str):
+        self.table = table
+    
+    def read(self, spark: SparkSession, condition: Optional[str] = None) -> 'pyspark.sql.DataFrame':
+        return _read_bigquery_table(spark, self.table, condition)
+    
+    def _save(self, df: 'pyspark.sql.DataFrame', mode: str) -> Dict[str, Any]:
+        df.write \
+            .format("bigquery") \
+            .mode(mode) \
+            .option("table", self.table) \
+            .option("writeMethod", "direct") \
+            .save()
+        return {'bytes': None}
+
+
+class LocalParquetSink(SilverSink):
+    """Directorio Parquet particionado con registro de commits, para pruebas y benchmarks.
+    
+    Cada escritura se genera en `_staging/<commit>` y sus particiones se mueven
+    a `<columna>=<valor>/commit=<commit>`. Solo el manifiesto
+    `_commits/<versión>.json` define qué directorios forman la tabla, y se
+    publica con un enlace exclusivo: las particiones de un lote se hacen
+    visibles juntas o no se hacen visibles, y dos commits concurrentes no
+    pueden publicar la misma versión. `read` devuelve la última versión.
+    """
+    
+    name = "local-parquet"
+    
+    def __init__(self, path: str, partition_column: str = "processing_date"):
+        self.path = path
+        self.partition_column = partition_column
+    
+    @property
+    def commits_path(self) -> str:
+        return os.path.join(self.path, "_commits")
+    
+    def latest_version(self) -> int:
+        if not os.path.isdir(self.commits_path):
+            return 0
+        versions = [int(name[:-5]) for name in os.listdir(self.commits_path) if name.endswith(".json")]
+        return max(versions, default=0)
+    
+    def snapshot(self, version: Optional[int] = None) -> Dict[str, List[str]]:
+        """Directorios (relativos) de cada partición en la versión indicada o la última"""
+        version = self.latest_version() if version is None else version
+        if version == 0:
+            return {}
+        with open(os.path.join(self.commits_path, f"{version:020d}.json")) as f:
+            return json.load(f)['partitions']
+    
+    def read(self, spark: SparkSession, condition: Optional[str] = None) -> Optional['pyspark.sql.DataFrame']:
+        paths = [os.path.join(self.path, path) for paths in self.snapshot().values() for path in paths]
+        if not paths:
+            return None
+        df = spark.read.option("basePath", self.path).parquet(*paths).drop("commit")
+        return df.filter(condition) if condition else df
+    
+    def _publish(self, version: int, partitions: Dict[str, List[str]]) -> None:
+        os.makedirs(self.commits_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.commits_path, prefix=".commit-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({'version': version, 'partitions': partitions,
+                           'committed_at': datetime.utcnow().isoformat()}, f, indent=2)
+            # link falla si otra escritura ya publicó esta versión
+            os.link(tmp_path, os.path.join(self.commits_path, f"{version:020d}.json"))
+        finally:
+            os.remove(tmp_path)
+    
+    def _save(self, df: 'pyspark.sql.DataFrame', mode: str) -> Dict[str, Any]:
+        commit_id = uuid.uuid4().hex
+        staging = os.path.join(self.path, "_staging", commit_id)
+        moved: List[str] = []
+        try:
+            df.write.partitionBy(self.partition_column).parquet(staging)
+            
+            commit_started = time.perf_counter()
+            version = self.latest_version()
+            previous = self.snapshot(version)
+            written: Dict[str, str] = {}
+            output_bytes = 0
+            for entry in sorted(os.listdir(staging)):
+                if not entry.startswith(f"{self.partition_column}="):
+                    continue
+                relative = os.path.join(entry, f"commit={commit_id}")
+                os.makedirs(os.path.join(self.path, entry), exist_ok=True)
+                os.rename(os.path.join(staging, entry), os.path.join(self.path, relative))
+                moved.append(relative)
+                written[entry] = relative
+                for root, _, files in os.walk(os.path.join(self.path, relative)):
+                    output_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+            
+            partitions = {} if mode == "overwrite" else dict(previous)
+            for entry, relative in written.items():
+                kept = partitions.get(entry, []) if mode == "append" else []
+                partitions[entry] = kept + [relative]
+            self._publish(version + 1, partitions)
+            moved = []
+            
+            # Directorios que ya no forman parte de la tabla
+            current = {path for paths in partitions.values() for path in paths}
+            for path in {path for paths in previous.values() for path in paths} - current:
+                self._remove(path)
+            
+            return {
+                'bytes': output_bytes,
+                'version': version + 1,
+                'partitions': sorted(written),
+                'commit_seconds': round(time.perf_counter() - commit_started, 3)
+            }
+        finally:
+            # Un commit fallido no deja datos visibles ni huérfanos
+            for relative in moved:
+                self._remove(relative)
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    def _remove(self, relative: str) -> None:
+        """Eliminar un directorio de commit y su partición si queda vacía"""
+        shutil.rmtree(os.path.join(self.path, relative), ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(os.path.join(self.path, relative)))
+        except OSError:
+            pass
+
+
+SINKS = ('bigquery-indirect', 'bigquery-direct', 'local-parquet')
+
+
+def build_sink(name: str, table: str, temporary_gcs_bucket: str, path: Optional[str] = None) -> SilverSink:
+    """Sink de Silver por nombre (opción --sink)"""
+    if name == 'bigquery-indirect':
+        return BigQueryIndirectSink(table, temporary_gcs_bucket)
+    if name == 'bigquery-direct':
+        return BigQueryDirectSink(table)
+    if name == 'local-parquet':
+        if not path:
+            raise ValueError("El sink local-parquet requiere una ruta")
+        return LocalParquetSink(path)
+    raise ValueError(f"Sink no soportado: {name}")
+
+
 class BronzeToSilverTransformer:
     """Transformación de datos de capa Bronze a Silver usando PySpark"""
     
-    def __init__(self, project_id: str, dataset_id: str, gcs_temp_path: str):
+    def __init__(self, project_id: str, dataset_id: str, gcs_temp_path: str,
+                 bronze_table: str = "claims_external",
+                 ingest_dates: Optional[List[str]] = None,
+                 quality_mode: str = "observe",
+                 quality_columns: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 checkpoint_uri: Optional[str] = None,
+                 until_ingest_date: Optional[str] = None,
+                 full_refresh: bool = False,
+                 dedup_lookback_days: Optional[int] = None,
+                 dedup_fpp: float = DEFAULT_DEDUP_FPP,
+                 sink: Optional[SilverSink] = None,
+                 write_mode: str = "append",
+                 claim_date_from: Optional[str] = None,
+                 claim_date_to: Optional[str] = None,
+                 metrics_uri: Optional[str] = None,
+                 target_file_mb: Optional[int] = None,
+                 salt_buckets: int = DEFAULT_SALT_BUCKETS,
+                 gold_sink: Optional[SilverSink] = None,
+                 backfill: bool = False,
+                 bronze_uris: Optional[List[str]] = None):
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.gcs_temp_path = gcs_temp_path
+        # claims_external (JSON), claims_external_gz o claims_external_parquet
+        self.bronze_table = bronze_table
+        # Particiones ingest_date a leer (None: historia completa)
+        self.ingest_dates = [date.fromisoformat(d).isoformat() for d in ingest_dates or []]
+        if quality_mode not in QUALITY_MODES:
+            raise ValueError(f"Modo de calidad no soportado: {quality_mode}")
+        self.quality_mode = quality_mode
+        self.quality_columns = quality_columns if quality_columns is not None else QUALITY_COLUMNS
+        # Modo incremental: se leen las particiones posteriores al watermark y
+        # hasta until_ingest_date (inclusive). Con ingest_dates explícitas el
+        # watermark no se lee ni se avanza (reproceso puntual).
+        self.checkpoint_uri = checkpoint_uri
+        self.until_ingest_date = date.fromisoformat(until_ingest_date).isoformat() if until_ingest_date else None
+        # Ignora el watermark, reescribe Silver completo y reinicia el checkpoint
+        self.full_refresh = full_refresh
+        self.watermark: Optional[str] = None
+        # Deduplicación por record_hash contra las particiones processing_date
+        # de Silver de los últimos N días (None/0: sin deduplicación)
+        self.dedup_lookback_days = dedup_lookback_days
+        self.dedup_fpp = dedup_fpp
+        # Destino de Silver (por defecto la escritura indirecta a BigQuery)
+        self.sink = sink or BigQueryIndirectSink(
+            f"{project_id}.retail_claims_silver.claims_structured", gcs_temp_path
+        )
+        if write_mode not in self.sink.supported_modes:
+            raise ValueError(f"Modo de escritura no soportado por {self.sink.name}: {write_mode}")
+        self.write_mode = write_mode
+        self.sink_report: Optional[Dict[str, Any]] = None
+        # Rango de claim_date a leer (inclusive), enviado a BigQuery junto al de ingest_date
+        self.claim_date_from = date.fromisoformat(claim_date_from).isoformat() if claim_date_from else None
+        self.claim_date_to = date.fromisoformat(claim_date_to).isoformat() if claim_date_to else None
+        # Layout de escritura: archivos de ~target_file_mb por processing_date, ordenados por las
+        # columnas de clustering de Silver (None/0: se escribe el particionado de la lectura)
+        self.target_file_bytes = target_file_mb * 1024 * 1024 if target_file_mb else None
+        self.salt_buckets = salt_buckets
+        self.layout_report: Optional[Dict[str, Any]] = None
+        # Staging de Gold: reclamos aptos con las reglas de negocio calculadas en la misma
+        # pasada (None: Gold vuelve a leer Silver)
+        self.gold_sink = gold_sink
+        self.gold_report: Optional[Dict[str, Any]] = None
+        # Backfill de varios días en un solo job: processing_date = ingest_date de cada
+        # partición Bronze, y cada día reemplaza sus particiones de Silver y del staging
+        if backfill and (not self.ingest_dates or write_mode != "overwrite_partitions" or full_refresh):
+            raise ValueError("El backfill requiere ingest_dates explícitas y write_mode overwrite_partitions")
+        self.backfill = backfill
+        self.days_report: Optional[Dict[str, int]] = None
+        # Archivos Bronze que informó la ingesta (gs://... o rutas locales): si cubren las
+        # particiones a procesar se leen directamente, sin pasar por la tabla externa
+        self.bronze_uris = list(bronze_uris or [])
+        for uri in self.bronze_uris:
+            _bronze_file_format(uri)
+        self.bronze_read_report: Optional[Dict[str, Any]] = None
         
         self.spark = SparkSession.builder \
             .appName("BronzeToSilverTransform") \
             .config("spark.sql.parquet.compression.codec", "snappy") \
             .config("spark.sql.adaptive.enabled", "true") \
+            .config("spark.sql.session.timeZone", "UTC") \
             .getOrCreate()
         
+        self.watermark_store = WatermarkStore(self.spark, checkpoint_uri) if checkpoint_uri else None
+        # Métricas por fase y por stage de la corrida (gs://... o ruta local; None: solo en el resultado)
+        self.metrics = StageMetricsCollector(self.spark)
+        self.metrics_store = MetricsStore(self.spark, metrics_uri) if metrics_uri else None
+        
         logger.info("SparkSession inicializada")
     
+    @property
+    def incremental(self) -> bool:
+        return self.watermark_store is not None and not self.ingest_dates
+    
+    def bronze_partition_filter(self) -> Optional[str]:
+        """Filtro sobre la columna de partición hive ingest_date de la tabla externa"""
+        if self.ingest_dates:
+            dates = ", ".join(f"DATE '{d}'" for d in self.ingest_dates)
+            return f"ingest_date IN ({dates})"
+        
+        conditions = []
+        if self.watermark and not self.full_refresh:
+            conditions.append(f"ingest_date > DATE '{self.watermark}'")
+        if self.until_ingest_date:
+            conditions.append(f"ingest_date <= DATE '{self.until_ingest_date}'")
+        return " AND ".join(conditions) or None
+    
+    def load_watermark(self) -> Optional[str]:
+        """Última partición ingest_date procesada según el checkpoint"""
+        if not self.incremental or self.full_refresh:
+            return None
+        checkpoint = self.watermark_store.load()
+        self.watermark = checkpoint['ingest_date'] if checkpoint else None
+        logger.info(f"Watermark Bronze -> Silver: {self.watermark or 'sin checkpoint'}")
+        return self.watermark
+    
+    def advance_watermark(self, quality: Dict[str, Any]) -> Optional[str]:
+        """Registrar la partición más reciente escrita en Silver.
+        
+        Solo se llama tras una escritura exitosa: si la escritura falla, la
+        próxima corrida vuelve a leer las mismas particiones.
+        """
+        if not self.incremental:
+            return None
+        processed = quality.get('max_ingest_date')
+        if not processed or (self.watermark and processed <= self.watermark):
+            logger.info("Sin particiones nuevas: el watermark no cambia")
+            return self.watermark
+        self.watermark_store.save({
+            'ingest_date': processed,
+            'bronze_table': self.bronze_table,
+            'records': quality['total_records'],
+            'full_refresh': self.full_refresh,
+            'updated_at': datetime.utcnow().isoformat()
+        })
+        self.watermark = processed
+        return processed
+    
+    def claim_date_filter(self, columns: List[str]) -> Optional[str]:
+        """Filtro por claim_date y, si Bronze tiene la subpartición claim_day, también por ella"""
+        conditions = []
+        for operator, bound in ((">=", self.claim_date_from), ("<=", self.claim_date_to)):
+            if bound:
+                conditions.append(f"claim_date {operator} '{bound}'")
+                if "claim_day" in columns:
+                    conditions.append(f"claim_day {operator} DATE '{bound}'")
+        return " AND ".join(conditions) or None
+    
+    def bronze_files_cover(self) -> bool:
+        """Las URIs de Bronze incluyen todas las particiones ingest_date a procesar.
+        
+        Con ingest_dates explícitas cada una debe tener archivos; en modo
+        incremental, cada día posterior al watermark hasta until_ingest_date (una
+        corrida previa fallida deja particiones que la ingesta del día no
+        informa). Además, ninguna de esas particiones puede tener archivos fuera
+        de las URIs (ver unlisted_bronze_files). Un full refresh siempre lee la
+        tabla externa.
+        """
+        if not self.bronze_uris or self.full_refresh:
+            return False
+        days = {_uri_ingest_date(uri) for uri in self.bronze_uris}
+        if self.ingest_dates:
+            pending = set(self.ingest_dates)
+        elif self.incremental:
+            if not self.watermark or not self.until_ingest_date:
+                return False
+            first = date.fromisoformat(self.watermark) + timedelta(days=1)
+            count = (date.fromisoformat(self.until_ingest_date) - first).days + 1
+            pending = {(first + timedelta(days=n)).isoformat() for n in range(count)}
+        else:
+            pending = days
+        if not pending <= days:
+            return False
+        unlisted = self.unlisted_bronze_files(pending)
+        if unlisted:
+            # Archivos de una corrida anterior sin procesar, u omitidos por el manifiesto
+            logger.warning(f"Archivos Bronze fuera de las URIs de la ingesta: {unlisted[:10]}")
+            return False
+        return True
+    
+    def unlisted_bronze_files(self, days: Set[str]) -> List[str]:
+        """Archivos Bronze de las particiones ingest_date de days que no están en bronze_uris.
+        
+        La ingesta solo informa los archivos que aterrizó en esta corrida: una
+        partición también puede tener archivos de una corrida previa fallida.
+        """
+        jvm = self.spark.sparkContext._jvm
+        conf = self.spark.sparkContext._jsc.hadoopConfiguration()
+        
+        def qualified(uri: str):
+            path = jvm.org.apache.hadoop.fs.Path(uri)
+            fs = path.getFileSystem(conf)
+            return fs, fs.makeQualified(path)
+        
+        listed = set()
+        prefixes = {}
+        for uri in self.bronze_uris:
+            match = re.search(INGEST_DATE_IN_PATH, uri)
+            if match and match.group(1) in days:
+                prefixes[match.group(1)] = uri[:match.end()]
+            listed.add(qualified(uri)[1].toString())
+        
+        unlisted = []
+        for day, prefix in sorted(prefixes.items()):
+            fs, partition = qualified(prefix)
+            if not fs.exists(partition):
+                continue
+            files = fs.listFiles(partition, True)
+            while files.hasNext():
+                path = files.next().getPath()
+                name = path.toString()
+                # Como Spark y BigQuery, se ignoran los archivos ocultos (._*)
+                if path.getName().startswith(('.', '_')) or name in listed:
+                    continue
+                if name.lower().endswith(tuple(ext for ext, _ in BRONZE_FILE_FORMATS)):
+                    unlisted.append(name)
+        return unlisted
+    
+    def read_bronze_files(self) -> 'pyspark.sql.DataFrame':
+        """Leer los archivos Bronze de bronze_uris con el esquema declarado.
+        
+        Spark divide cada archivo JSON sin comprimir y cada Parquet (por row
+        group) en tareas de hasta spark.sql.files.maxPartitionBytes; los .json.gz
+        se leen en una tarea por archivo. ingest_date sale de la ruta hive.
+        """
+        try:
+            by_format: Dict[str, List[str]] = {}
+            for uri in self.bronze_uris:
+                by_format.setdefault(_bronze_file_format(uri), []).append(uri)
+            file_schema = StructType(
+                [f for f in BRONZE_FILE_SCHEMA.fields if f.name not in BRONZE_PARTITION_COLUMNS]
+            )
+            df = None
+            for source_format, uris in sorted(by_format.items()):
+                frame = self.spark.read.schema(file_schema).format(source_format).load(uris)
+                frame = frame.withColumn(
+                    "ingest_date", to_date(regexp_extract(col("_metadata.file_path"), INGEST_DATE_IN_PATH, 1))
+                )
+                df = frame if df is None else df.unionByName(frame)
+            
+            # Mismos filtros que en BigQuery: un archivo omitido por la ingesta puede ser de otra partición
+            partition_filter = self.bronze_partition_filter()
+            if partition_filter:
+                df = df.filter(partition_filter)
+            date_filter = self.claim_date_filter(df.columns)
+            if date_filter:
+                df = df.filter(date_filter)
+            
+            compressed = sum(1 for uri in self.bronze_uris if uri.lower().endswith('.gz'))
+            self.bronze_read_report = {
+                'source': 'files',
+                'files': len(self.bronze_uris),
+                'formats': {source_format: len(uris) for source_format, uris in by_format.items()},
+                'unsplittable_files': compressed,
+                # Planificación sin jobs: el listado de archivos ya se hizo en load()
+                'read_partitions': df.rdd.getNumPartitions()
+            }
+            logger.info(f"Lectura Bronze directa de archivos: {self.bronze_read_report}")
+            return df
+        except Exception as e:
+            logger.error(f"Error leyendo archivos Bronze: {str(e)}")
+            raise
+    
     def read_bronze_data(self) -> 'pyspark.sql.DataFrame':
-        """Leer datos de la tabla externa Bronze"""
+        """Leer datos Bronze: archivos de la ingesta si cubren la corrida, si no la tabla externa.
+        
+        Los filtros por ingest_date y claim_date se envían a BigQuery, que solo
+        lista y lee los archivos de esas particiones.
+        """
+        if self.bronze_files_cover():
+            return self.read_bronze_files()
+        if self.bronze_uris:
+            logger.warning("Las URIs de Bronze no cubren las particiones a procesar: se lee la tabla externa")
         try:
-            df = self.spark.read.format("bigquery") \
-                .option("table", f"{self.project_id}.retail_claims_bronze.claims_external") \
-                .load()
+            reader = self.spark.read.format("bigquery") \
+                .option("table", f"{self.project_id}.retail_claims_bronze.{self.bronze_table}")
+            partition_filter = self.bronze_partition_filter()
+            if partition_filter:
+                reader = reader.option("filter", partition_filter)
+                logger.info(f"Lectura Bronze limitada a: {partition_filter}")
+            df = reader.load()
+            
+            # load() solo consulta los metadatos de la tabla; el conector envía
+            # este filtro de Spark a BigQuery junto con el de la opción filter
+            date_filter = self.claim_date_filter(df.columns)
+            if date_filter:
+                df = df.filter(date_filter)
+                logger.info(f"Lectura Bronze filtrada por fecha de reclamo: {date_filter}")
             
-            logger.info(f"Datos Bronze leídos: {df.count()} registros")
+            self.bronze_read_report = {'source': 'bigquery', 'table': self.bronze_table}
+            # Sin count(): cada acción volvería a leer Bronze desde BigQuery
+            logger.info(f"Lectura Bronze configurada: {self.bronze_table}")
             return df
         except Exception as e:
             logger.error(f"Error leyendo datos Bronze: {str(e)}")
             raise
     
+    def apply_bronze_schema(self, df: 'pyspark.sql.DataFrame') -> 'pyspark.sql.DataFrame':
+        """Validar Bronze contra CLAIMS_SCHEMA y proyectar solo las columnas de Silver.
+        
+        El esquema de origen sale de los metadatos de la tabla (sin pasada de
+        inferencia), así que el drift se detecta antes de lanzar ningún job.
+        La proyección y las conversiones quedan en el plan de lectura: el
+        conector solo pide a BigQuery estas columnas.
+        """
+        source = {field.name: field.dataType for field in df.schema.fields}
+        columns, missing, incompatible = [], [], []
+        for field in CLAIMS_SCHEMA.fields:
+            if field.name not in source:
+                if field.nullable:
+                    logger.warning(f"Columna opcional ausente en Bronze: {field.name}")
+                    columns.append(lit(None).cast(field.dataType).alias(field.name))
+                else:
+                    missing.append(field.name)
+            elif not _accepts(source[field.name], field.dataType):
+                incompatible.append(
+                    f"{field.name} ({source[field.name].simpleString()} -> {field.dataType.simpleString()})"
+                )
+            else:
+                columns.append(_conform(field.name, source[field.name], field.dataType).alias(field.name))
+        
+        if missing or incompatible:
+            raise ValueError(
+                f"Drift de esquema en {self.bronze_table}: columnas faltantes {missing}, "
+                f"tipos incompatibles {incompatible}"
+            )
+        
+        unused = sorted(set(source) - set(CLAIMS_SCHEMA.fieldNames()) - {"claim_day", *BRONZE_PARTITION_COLUMNS})
+        if unused:
+            logger.info(f"Columnas Bronze no leídas: {unused}")
+        columns.extend(col(name) for name in BRONZE_PARTITION_COLUMNS if name in source)
+        return df.select(*columns)
+    
     def clean_and_standardize(self, df: 'pyspark.sql.DataFrame') -> 'pyspark.sql.DataFrame':
-        """Limpiar y estandarizar datos"""
+        """Limpiar y estandarizar datos (los tipos ya vienen de apply_bronze_schema)"""
         try:
             df = df \
                 .withColumn("claim_id", trim(col("claim_id"))) \
                 .withColumn("customer_id", trim(col("customer_id"))) \
                 .withColumn("store_id", trim(col("store_id"))) \
                 .withColumn("description", trim(col("description"))) \
-                .withColumn("status", upper(trim(col("status")))) \
-                .withColumn("claim_amount", col("claim_amount").cast(FloatType())) \
-                .withColumn("claim_date", to_date(col("claim_date"), "yyyy-MM-dd"))
+                .withColumn("status", upper(trim(col("status"))))
             
             logger.info("Limpieza y estandarización completadas")
             return df
@@ -64,18 +1020,16 @@ class BronzeToSilverTransformer:
         try:
             df = df \
                 .withColumn("ingestion_timestamp", current_timestamp()) \
-                .withColumn("processing_date", to_date(current_timestamp())) \
+                .withColumn("processing_date", self.processing_date_column(df)) \
                 .withColumn("record_hash", md5(
-                    concat_ws("|", 
-                        col("claim_id"), 
-                        col("customer_id"), 
-                        col("claim_amount")
-                    )
+                    concat_ws(RECORD_HASH_SEPARATOR, *[
+                        _hash_field(c, CLAIMS_SCHEMA[c].dataType) for c in RECORD_HASH_COLUMNS
+                    ])
                 )) \
                 .withColumn("data_quality_score", 
                     when(col("claim_id").isNotNull() & 
                          col("customer_id").isNotNull() & 
-                         col("claim_amount") > 0, 1.0).otherwise(0.5)
+                         (col("claim_amount") > 0), 1.0).otherwise(0.5)
                 )
             
             logger.info("Columnas técnicas agregadas")
@@ -84,23 +1038,173 @@ class BronzeToSilverTransformer:
             logger.error(f"Error agregando columnas técnicas: {str(e)}")
             raise
     
+    def processing_date_column(self, df: 'pyspark.sql.DataFrame') -> Column:
+        """Fecha de la corrida, o en backfill la partición ingest_date de cada registro"""
+        if not self.backfill:
+            return to_date(current_timestamp())
+        if "ingest_date" not in df.columns:
+            raise ValueError("El backfill requiere la columna de partición ingest_date de Bronze")
+        return col("ingest_date").cast("date")
+    
+    def read_silver_hashes(self) -> Optional['pyspark.sql.DataFrame']:
+        """record_hash de Silver en la ventana de deduplicación (solo esa columna y esas particiones)"""
+        if self.backfill:
+            # dedup_lookback_days antes del primer día y después del último (esas particiones se
+            # deduplicaron contra el contenido previo de los días reemplazados); las del backfill
+            # se reemplazan y no cuentan. El costo depende del rango y la ventana, no de su antigüedad
+            lookback = timedelta(days=self.dedup_lookback_days)
+            since = date.fromisoformat(min(self.ingest_dates)) - lookback
+            until = date.fromisoformat(max(self.ingest_dates)) + lookback
+            days = ", ".join(f"DATE '{d}'" for d in self.ingest_dates)
+            condition = (
+                f"processing_date >= DATE '{since.isoformat()}' AND processing_date <= DATE '{until.isoformat()}' "
+                f"AND processing_date NOT IN ({days})"
+            )
+        else:
+            # Misma fecha UTC que processing_date (sesión en UTC), no la hora local del clúster
+            since = datetime.utcnow().date() - timedelta(days=self.dedup_lookback_days)
+            condition = f"processing_date >= DATE '{since.isoformat()}'"
+        silver = self.sink.read(self.spark, condition)
+        return silver.select("record_hash") if silver is not None else None
+    
+    def build_bloom_filter(self, hashes: 'pyspark.sql.DataFrame', expected_items: int) -> bytes:
+        """Bloom filter de xxhash64(record_hash) construido en los ejecutores, serializado"""
+        jvm = self.spark.sparkContext._jvm
+        bloom_filter = hashes.select(xxhash64("record_hash").alias("hash"))._jdf.stat() \
+            .bloomFilter("hash", expected_items, self.dedup_fpp)
+        output = jvm.java.io.ByteArrayOutputStream()
+        bloom_filter.writeTo(output)
+        return bytes(output.toByteArray())
+    
+    def deduplicate(
+        self, df: 'pyspark.sql.DataFrame'
+    ) -> Tuple['pyspark.sql.DataFrame', Dict[str, Any]]:
+        """Descartar registros ya presentes en Silver y repetidos dentro del lote.
+        
+        Los hashes existentes se resumen en un Bloom filter que se prueba sobre
+        cada registro entrante sin shuffle; solo los positivos del filtro se
+        comprueban de forma exacta (semi-join contra Silver, cuyo resultado
+        se difunde para marcar y descartar los duplicados). Las métricas se observan durante la escritura:
+        `dedup_report` las resume una vez escrito el lote.
+        """
+        try:
+            context: Dict[str, Any] = {'existing_hashes': 0, 'bloom_filter_bytes': 0, 'build_seconds': 0.0}
+            if self.full_refresh:
+                # Silver se reescribe: solo se eliminan los repetidos del lote
+                return df.dropDuplicates(["record_hash"]), context
+            
+            started = time.perf_counter()
+            existing = self.read_silver_hashes()
+            expected_items = existing.count() if existing is not None else 0
+            context['existing_hashes'] = expected_items
+            if expected_items == 0:
+                context['build_seconds'] = round(time.perf_counter() - started, 3)
+                return df.dropDuplicates(["record_hash"]), context
+            
+            bloom_filter = self.build_bloom_filter(existing, expected_items)
+            context['bloom_filter_bytes'] = len(bloom_filter)
+            context['build_seconds'] = round(time.perf_counter() - started, 3)
+            
+            flagged = df.withColumn(
+                "_bloom_hit", _bloom_might_contain(self.spark, bloom_filter, col("record_hash"))
+            )
+            duplicates = flagged \
+                .filter(col("_bloom_hit")) \
+                .select("record_hash") \
+                .join(existing, "record_hash", "left_semi") \
+                .distinct() \
+                .withColumn("_duplicate", lit(True))
+            
+            # Las métricas se observan en la rama principal: si no hay duplicados,
+            # AQE poda la rama difundida y una observación allí nunca se reportaría
+            context['observation'] = Observation("silver_dedup")
+            deduplicated = flagged \
+                .join(broadcast(duplicates), "record_hash", "left") \
+                .observe(context['observation'],
+                         count(lit(1)).alias("incoming"),
+                         _count_where(col("_bloom_hit")).alias("bloom_positives"),
+                         _count_where(col("_duplicate").isNotNull()).alias("existing_duplicates")) \
+                .filter(col("_duplicate").isNull()) \
+                .drop("_bloom_hit", "_duplicate") \
+                .dropDuplicates(["record_hash"])
+            return deduplicated, context
+        except Exception as e:
+            logger.error(f"Error en deduplicación: {str(e)}")
+            raise
+    
+    def dedup_report(self, context: Dict[str, Any], written_records: int) -> Dict[str, Any]:
+        """Tasas de deduplicación una vez escrito el lote"""
+        report = {
+            'existing_hashes': context['existing_hashes'],
+            'bloom_filter_bytes': context['bloom_filter_bytes'],
+            'build_seconds': context['build_seconds'],
+            'written_records': written_records
+        }
+        if 'observation' in context:
+            metrics = context['observation'].get
+            incoming = metrics['incoming']
+            existing_duplicates = metrics['existing_duplicates']
+            report.update({
+                'incoming_records': incoming,
+                'bloom_positives': metrics['bloom_positives'],
+                'existing_duplicates': existing_duplicates,
+                'bloom_false_positives': metrics['bloom_positives'] - existing_duplicates,
+                'batch_duplicates': incoming - existing_duplicates - written_records,
+                'duplicate_rate': round(
+                    (incoming - written_records) / incoming * 100, 2
+                ) if incoming > 0 else 0
+            })
+        logger.info(f"Reporte de deduplicación: {report}")
+        return report
+    
+    def quality_metric_exprs(self, df: 'pyspark.sql.DataFrame') -> List[Column]:
+        """Expresiones de agregación del reporte de calidad (una sola pasada)"""
+        types = {field.name: field.dataType for field in df.schema.fields}
+        exprs = [
+            count(lit(1)).alias("total_records"),
+            _count_where(col("claim_amount") < 0).alias("negative_amounts")
+        ]
+        if "ingest_date" in df.columns:
+            # Nuevo watermark calculado en la misma pasada que la calidad
+            exprs.append(spark_max("ingest_date").cast("string").alias("max_ingest_date"))
+        for column, metrics in self.quality_columns.items():
+            for metric in metrics:
+                for suffix, expr in QUALITY_METRICS[metric](column, types[column]):
+                    exprs.append(expr.alias(f"{column}__{suffix}"))
+        return exprs
+    
+    def build_quality_report(self, metrics: Dict[str, Any]) -> dict:
+        """Reporte de calidad a partir de las métricas agregadas"""
+        total_records = metrics['total_records']
+        null_claim_ids = metrics.get('claim_id__nulls') or 0
+        null_amounts = metrics.get('claim_amount__nulls') or 0
+        negative_amounts = metrics['negative_amounts'] or 0
+        
+        columns: Dict[str, Dict[str, Any]] = {}
+        for name, value in metrics.items():
+            if '__' in name:
+                column, suffix = name.split('__', 1)
+                columns.setdefault(column, {})[suffix] = value
+        
+        report = {
+            'total_records': total_records,
+            'null_claim_ids': null_claim_ids,
+            'null_amounts': null_amounts,
+            'negative_amounts': negative_amounts,
+            'quality_percentage': round(
+                ((total_records - null_claim_ids - null_amounts - negative_amounts) / total_records * 100), 2
+            ) if total_records > 0 else 0,
+            'columns': columns
+        }
+        if 'max_ingest_date' in metrics:
+            report['max_ingest_date'] = metrics['max_ingest_date']
+        return report
+    
     def validate_data_quality(self, df: 'pyspark.sql.DataFrame') -> dict:
-        """Validar calidad de datos"""
-        try:
-            total_records = df.count()
-            null_claim_ids = df.filter(col("claim_id").isNull()).count()
-            null_amounts = df.filter(col("claim_amount").isNull()).count()
-            negative_amounts = df.filter(col("claim_amount") < 0).count()
-            
-            quality_report = {
-                'total_records': total_records,
-                'null_claim_ids': null_claim_ids,
-                'null_amounts': null_amounts,
-                'negative_amounts': negative_amounts,
-                'quality_percentage': round(
-                    ((total_records - null_claim_ids - null_amounts - negative_amounts) / total_records * 100), 2
-                ) if total_records > 0 else 0
-            }
+        """Validar calidad de datos con una única agregación"""
+        try:
+            metrics = df.agg(*self.quality_metric_exprs(df)).first().asDict()
+            quality_report = self.build_quality_report(metrics)
             
             logger.info(f"Reporte de calidad: {quality_report}")
             return quality_report
@@ -108,60 +1212,598 @@ class BronzeToSilverTransformer:
             logger.error(f"Error validando calidad: {str(e)}")
             raise
     
-    def write_to_silver(self, df: 'pyspark.sql.DataFrame'):
-        """Escribir datos a capa Silver en BigQuery"""
+    def observe_data_quality(
+        self, df: 'pyspark.sql.DataFrame'
+    ) -> Tuple['pyspark.sql.DataFrame', Observation]:
+        """Adjuntar las métricas de calidad al plan; se calculan durante la escritura"""
+        observation = Observation("silver_quality")
+        return df.observe(observation, *self.quality_metric_exprs(df)), observation
+    
+    def plan_silver_layout(
+        self, batch: 'pyspark.sql.DataFrame', detect_skew: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Número de archivos de salida y clientes a repartir (salting) para el lote.
+        
+        El número de archivos sale del tamaño que estima el optimizador para el
+        lote (en memoria, sin comprimir: los Parquet escritos son menores). Con
+        `detect_skew` el lote está persistido: se materializa (la caché da su
+        tamaño real) y se buscan con freqItems, en una pasada sin shuffle sobre
+        la caché, los clientes con más filas de las que caben en un archivo.
+        """
+        if not self.target_file_bytes:
+            return None
         try:
-            df.write \
-                .format("bigquery") \
-                .mode("append") \
-                .option("table", f"{self.project_id}.retail_claims_silver.claims_structured") \
-                .option("temporaryGcsBucket", self.gcs_temp_path) \
-                .save()
+            if detect_skew:
+                batch.count()
+            estimated_bytes = _estimated_size(batch)
+            if estimated_bytes is None:
+                files = batch.rdd.getNumPartitions()
+            else:
+                files = max(1, -(-estimated_bytes // self.target_file_bytes))
             
-            logger.info("Datos escritos a capa Silver")
+            hot_customers: List[str] = []
+            if detect_skew and files > 1:
+                support = max(1 / files, MIN_HOT_KEY_SUPPORT)
+                row = batch.stat.freqItems(["customer_id"], support).first()
+                hot_customers = sorted(c for c in row[0] if c is not None)
+            
+            layout = {
+                'estimated_bytes': estimated_bytes,
+                'files': files,
+                'salted_customers': len(hot_customers),
+                'hot_customers': hot_customers
+            }
+            logger.info(f"Layout de Silver: {files} archivos, {len(hot_customers)} clientes con salting")
+            return layout
+        except Exception as e:
+            logger.error(f"Error planificando el layout de Silver: {str(e)}")
+            raise
+    
+    def layout_for_silver(
+        self, df: 'pyspark.sql.DataFrame', layout: Optional[Dict[str, Any]]
+    ) -> 'pyspark.sql.DataFrame':
+        """Repartir por processing_date y hash de customer_id y ordenar por las columnas de clustering.
+        
+        Cada archivo contiene clientes completos y ordenados, de modo que la
+        carga en BigQuery llega agrupada por la clave de clustering. Las filas
+        de los clientes más frecuentes se reparten en `salt_buckets` archivos
+        (salt derivado de record_hash, determinista entre reintentos).
+        """
+        if layout is None:
+            return df
+        keys = [col("processing_date"), col("customer_id")]
+        if layout['hot_customers']:
+            df = df.withColumn(
+                "_salt",
+                when(
+                    col("customer_id").isin(layout['hot_customers']),
+                    pmod(xxhash64(col("record_hash")), lit(self.salt_buckets))
+                ).otherwise(lit(0))
+            )
+            keys.append(col("_salt"))
+        return df.repartition(layout['files'], *keys) \
+            .drop("_salt") \
+            .sortWithinPartitions(*CLUSTERING_COLUMNS)
+    
+    def records_by_day(self, batch: 'pyspark.sql.DataFrame') -> Dict[str, int]:
+        """Registros escritos por processing_date (sobre el lote persistido)"""
+        try:
+            rows = batch.groupBy("processing_date").count().collect()
+            return {row['processing_date'].isoformat(): row['count'] for row in sorted(rows)}
+        except Exception as e:
+            logger.error(f"Error contando registros por día: {str(e)}")
+            raise
+    
+    def select_silver_columns(self, df: 'pyspark.sql.DataFrame') -> 'pyspark.sql.DataFrame':
+        """Proyectar el esquema de Silver (descarta columnas de partición de Bronze)"""
+        return df.select(*SILVER_COLUMNS)
+    
+    def write_to_silver(self, df: 'pyspark.sql.DataFrame', mode: str = "append"):
+        """Escribir datos a capa Silver a través del sink configurado"""
+        try:
+            self.sink_report = self.sink.write(df, mode)
+            
+            logger.info(f"Datos escritos a capa Silver: {self.sink_report}")
         except Exception as e:
             logger.error(f"Error escribiendo a Silver: {str(e)}")
             raise
     
+    def build_gold_staging(self, df: 'pyspark.sql.DataFrame') -> 'pyspark.sql.DataFrame':
+        """Reclamos del lote aptos para Gold con las reglas de negocio (business_rules)"""
+        # Fecha de referencia: processing_date del lote, la misma que usa Gold para particionar
+        rules = spark_rule_columns(col("processing_date"))
+        df = df.where(col("data_quality_score") >= MIN_GOLD_QUALITY_SCORE) \
+            .withColumns({**rules, 'processing_timestamp': current_timestamp()})
+        return df.select(*GOLD_STAGING_COLUMNS)
+    
+    def write_to_gold(self, df: 'pyspark.sql.DataFrame', mode: Optional[str] = None):
+        """Escribir el staging de Gold (reemplaza sus particiones processing_date si el sink lo admite)"""
+        try:
+            if mode is None:
+                mode = "overwrite_partitions" if "overwrite_partitions" in self.gold_sink.supported_modes else "append"
+            self.gold_report = self.gold_sink.write(df, mode)
+            
+            logger.info(f"Staging de Gold escrito: {self.gold_report}")
+        except Exception as e:
+            logger.error(f"Error escribiendo el staging de Gold: {str(e)}")
+            raise
+    
+    def build_metrics(self, status: str, quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Documento de métricas de la corrida: parámetros, fases, stages y throughput"""
+        metrics = {
+            'status': status,
+            'engine': 'spark',
+            'bronze_table': self.bronze_table,
+            'bronze_filter': self.bronze_partition_filter(),
+            'quality_mode': self.quality_mode,
+            'sink': self.sink.name,
+            'write_mode': "overwrite" if self.full_refresh else self.write_mode,
+            **self.metrics.report()
+        }
+        records = quality['total_records'] if quality else None
+        metrics['records'] = records
+        metrics['records_per_second'] = round(
+            records / metrics['wall_seconds'], 1
+        ) if records and metrics['wall_seconds'] > 0 else None
+        if self.sink_report:
+            metrics['sink_report'] = self.sink_report
+        if self.layout_report:
+            metrics['layout_report'] = self.layout_report
+        if self.gold_report:
+            metrics['gold_report'] = self.gold_report
+        if self.bronze_read_report:
+            metrics['bronze_read_report'] = self.bronze_read_report
+        if self.days_report is not None:
+            # Throughput por día procesado del backfill
+            days = len(self.days_report)
+            metrics['days'] = days
+            metrics['records_by_day'] = self.days_report
+            metrics['seconds_per_day'] = round(metrics['wall_seconds'] / days, 3) if days else None
+        metrics['timestamp'] = datetime.utcnow().isoformat()
+        return metrics
+    
+    def publish_metrics(self, metrics: Dict[str, Any]) -> None:
+        """Guardar el documento de métricas si se configuró metrics_uri"""
+        if self.metrics_store is not None:
+            self.metrics_store.save(metrics)
+    
     def transform(self):
         """Ejecutar transformación completa"""
+        quality = None
         try:
             logger.info("Iniciando transformación Bronze -> Silver")
             
-            # Leer datos
-            df = self.read_bronze_data()
+            # Leer datos (solo particiones posteriores al watermark en modo incremental)
+            with self.metrics.phase('read'):
+                self.load_watermark()
+                df = self.apply_bronze_schema(self.read_bronze_data())
             
             # Transformar
-            df = self.clean_and_standardize(df)
-            df = self.add_technical_columns(df)
+            with self.metrics.phase('transform'):
+                df = self.clean_and_standardize(df)
+                df = self.add_technical_columns(df)
             
-            # Validar calidad
-            quality = self.validate_data_quality(df)
+            # Calidad + escritura: Bronze se lee una sola vez. En modo observe las
+            # métricas viajan con la escritura; en modo aggregate el linaje se
+            # persiste para la agregación y la escritura, y se libera al terminar.
+            write_mode = "overwrite" if self.full_refresh else self.write_mode
+            persisted = []
+            dedup = None
+            try:
+                if self.dedup_lookback_days:
+                    # El lote se lee en la prueba del Bloom filter y en la escritura
+                    df = df.persist(StorageLevel.MEMORY_AND_DISK)
+                    persisted.append(df)
+                    with self.metrics.phase('dedup'):
+                        df, dedup = self.deduplicate(df)
+                
+                if self.quality_mode == 'aggregate' or self.gold_sink is not None or self.backfill:
+                    # El lote final se lee también en la agregación de calidad, en el staging de
+                    # Gold o en el conteo por día del backfill
+                    df = df.persist(StorageLevel.MEMORY_AND_DISK)
+                    persisted.append(df)
+                batch = df
+                if self.quality_mode == 'aggregate':
+                    with self.metrics.phase('quality'):
+                        quality = self.validate_data_quality(df)
+                
+                # Tamaño y clientes frecuentes del lote persistido (antes de deduplicar)
+                with self.metrics.phase('layout'):
+                    self.layout_report = self.plan_silver_layout(
+                        persisted[0] if persisted else df, detect_skew=bool(persisted)
+                    )
+                
+                # Gold antes que Silver: si la escritura de Silver falla, el reintento vuelve a
+                # generar el mismo staging; al revés, la deduplicación descartaría esos reclamos
+                if self.gold_sink is not None:
+                    with self.metrics.phase('gold'):
+                        self.write_to_gold(self.build_gold_staging(df))
+                
+                if self.quality_mode == 'aggregate':
+                    with self.metrics.phase('write'):
+                        self.write_to_silver(
+                            self.select_silver_columns(self.layout_for_silver(df, self.layout_report)), write_mode
+                        )
+                else:
+                    df, observation = self.observe_data_quality(df)
+                    with self.metrics.phase('write'):
+                        self.write_to_silver(
+                            self.select_silver_columns(self.layout_for_silver(df, self.layout_report)), write_mode
+                        )
+                    quality = self.build_quality_report(observation.get)
+                    logger.info(f"Reporte de calidad: {quality}")
+                
+                if self.backfill:
+                    with self.metrics.phase('days'):
+                        self.days_report = self.records_by_day(batch)
+            finally:
+                for cached in persisted:
+                    cached.unpersist()
+            
+            dedup_report = self.dedup_report(dedup, quality['total_records']) if dedup is not None else None
+            with self.metrics.phase('watermark'):
+                watermark = self.advance_watermark(quality)
             
-            # Escribir
-            self.write_to_silver(df)
+            metrics = self.build_metrics('success', quality)
+            self.publish_metrics(metrics)
             
             logger.info("Transformación completada exitosamente")
             return {
                 'status': 'success',
                 'quality_report': quality,
+                'watermark': watermark,
+                'dedup_report': dedup_report,
+                'sink_report': self.sink_report,
+                'layout_report': self.layout_report,
+                'gold_report': self.gold_report,
+                'days_report': self.days_report,
+                'metrics': metrics,
                 'timestamp': datetime.utcnow().isoformat()
             }
             
         except Exception as e:
             logger.error(f"Error en transformación: {str(e)}")
+            try:
+                # Las fases completadas hasta el fallo también sirven para diagnosticar
+                self.publish_metrics({**self.build_metrics('failed', quality), 'error': str(e)})
+            except Exception as metrics_error:
+                logger.warning(f"No se pudieron publicar las métricas del fallo: {str(metrics_error)}")
+            raise
+    
+    def read_bronze_stream(self, source_path: str, source_format: str = "json",
+                           max_files_per_trigger: Optional[int] = None) -> 'pyspark.sql.DataFrame':
+        """Archivos nuevos del prefijo Bronze (gs://... o directorio local) como fuente de streaming.
+        
+        Cada registro lleva la hora de modificación de su archivo (llegada a
+        Bronze), con la que se mide la latencia de punta a punta del micro-lote.
+        """
+        if source_format not in STREAM_FORMATS:
+            raise ValueError(f"Formato de streaming no soportado: {source_format}")
+        try:
+            reader = self.spark.readStream.schema(BRONZE_FILE_SCHEMA).format(source_format)
+            if max_files_per_trigger:
+                reader = reader.option("maxFilesPerTrigger", max_files_per_trigger)
+            df = reader.load(source_path) \
+                .withColumn("_file_modification_time", col("_metadata.file_modification_time"))
+            logger.info(f"Streaming Bronze desde {source_path} ({source_format})")
+            return df
+        except Exception as e:
+            logger.error(f"Error configurando el streaming Bronze: {str(e)}")
+            raise
+    
+    def process_micro_batch(self, batch: 'pyspark.sql.DataFrame', batch_id: int) -> None:
+        """Escribir un micro-lote en Silver (foreachBatch) con la misma lógica que el batch.
+        
+        Spark puede repetir un micro-lote tras un fallo: si ya se registró su
+        commit se omite, y si falló entre la escritura y el commit la
+        deduplicación por record_hash (dedup_lookback_days) descarta lo escrito
+        en Silver. El staging de Gold (append) lleva su propio commit por
+        batch_id: un micro-lote que falló después de escribirlo no lo repite.
+        """
+        committed = self.stream_commits.load()
+        if committed is not None and batch_id <= committed['batch_id']:
+            logger.info(f"Micro-lote {batch_id} ya escrito en Silver: se omite")
+            return
+        
+        started = time.perf_counter()
+        batch = batch.persist(StorageLevel.MEMORY_AND_DISK)
+        persisted = [batch]
+        try:
+            arrival = batch.agg(
+                spark_min("_file_modification_time").alias("first"),
+                spark_max("_file_modification_time").alias("last")
+            ).first()
+            df = self.add_technical_columns(self.clean_and_standardize(self.apply_bronze_schema(batch)))
+            dedup = None
+            if self.dedup_lookback_days:
+                df, dedup = self.deduplicate(df)
+            if self.gold_sink is not None:
+                df = df.persist(StorageLevel.MEMORY_AND_DISK)
+                persisted.append(df)
+                staged = self.gold_commits.load()
+                if staged is not None and batch_id <= staged['batch_id']:
+                    logger.info(f"Staging de Gold del micro-lote {batch_id} ya escrito: se omite")
+                else:
+                    # Staging en append: cada micro-lote agrega sus reclamos a la partición del día
+                    self.write_to_gold(self.build_gold_staging(df), "append")
+                    self.gold_commits.save({'batch_id': batch_id, 'committed_at': datetime.utcnow().isoformat()})
+            df, observation = self.observe_data_quality(df)
+            self.write_to_silver(self.select_silver_columns(df), "append")
+            quality = self.build_quality_report(observation.get)
+            self.stream_commits.save({'batch_id': batch_id, 'committed_at': datetime.utcnow().isoformat()})
+        finally:
+            for cached in persisted:
+                cached.unpersist()
+        
+        # PySpark entrega los timestamps en la hora local del driver, sin zona
+        committed_at = datetime.now() if arrival['first'] else None
+        report = {
+            'batch_id': batch_id,
+            'records': quality['total_records'],
+            'written_records': (self.sink_report or {}).get('rows'),
+            'processing_seconds': round(time.perf_counter() - started, 3),
+            # Desde la llegada a Bronze del archivo más antiguo / más reciente hasta el commit en Silver
+            'max_latency_seconds': round((committed_at - arrival['first']).total_seconds(), 3)
+            if committed_at else None,
+            'min_latency_seconds': round((committed_at - arrival['last']).total_seconds(), 3)
+            if committed_at else None,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        if dedup is not None:
+            report['dedup_report'] = self.dedup_report(dedup, quality['total_records'])
+        self.stream_batches = (self.stream_batches + [report])[-STREAM_METRICS_BATCHES:]
+        logger.info(f"Micro-lote {batch_id}: {report}")
+        self.publish_metrics(self.build_stream_metrics('running'))
+    
+    def build_stream_metrics(self, status: str) -> Dict[str, Any]:
+        """Documento de métricas del streaming: últimos micro-lotes y su latencia"""
+        latencies = [b['max_latency_seconds'] for b in self.stream_batches if b['max_latency_seconds'] is not None]
+        return {
+            'status': status,
+            'engine': 'spark-streaming',
+            'sink': self.sink.name,
+            'batches': self.stream_batches,
+            'records': sum(b['records'] for b in self.stream_batches),
+            'max_latency_seconds': max(latencies) if latencies else None,
+            'last_latency_seconds': latencies[-1] if latencies else None,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
+    def transform_stream(self, source_path: str, checkpoint_location: str, source_format: str = "json",
+                         trigger_seconds: int = 60, max_files_per_trigger: Optional[int] = None,
+                         available_now: bool = False, timeout_seconds: Optional[int] = None):
+        """Bronze -> Silver en streaming: un micro-lote cada trigger_seconds con los archivos nuevos.
+        
+        available_now procesa los archivos pendientes (en micro-lotes de
+        max_files_per_trigger) y termina: sirve para ponerse al día o para
+        ejecuciones locales. El checkpoint de Spark registra los archivos ya leídos.
+        """
+        self.stream_commits = StreamCommitStore(self.spark, f"{checkpoint_location.rstrip('/')}/silver_commit.json")
+        self.gold_commits = StreamCommitStore(self.spark, f"{checkpoint_location.rstrip('/')}/gold_commit.json")
+        self.stream_batches: List[Dict[str, Any]] = []
+        try:
+            writer = self.read_bronze_stream(source_path, source_format, max_files_per_trigger).writeStream \
+                .queryName("bronze_to_silver_stream") \
+                .foreachBatch(self.process_micro_batch) \
+                .option("checkpointLocation", checkpoint_location)
+            if available_now:
+                writer = writer.trigger(availableNow=True)
+            else:
+                writer = writer.trigger(processingTime=f"{trigger_seconds} seconds")
+            query = writer.start()
+            logger.info(f"Streaming iniciado (checkpoint {checkpoint_location})")
+            
+            query.awaitTermination(timeout_seconds)
+            if query.isActive:
+                query.stop()
+            if query.exception() is not None:
+                raise RuntimeError(str(query.exception()))
+            
+            metrics = self.build_stream_metrics('stopped')
+            self.publish_metrics(metrics)
+            return {
+                'status': 'success',
+                'batches': len(self.stream_batches),
+                'metrics': metrics,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Error en streaming Bronze -> Silver: {str(e)}")
+            try:
+                self.publish_metrics({**self.build_stream_metrics('failed'), 'error': str(e)})
+            except Exception as metrics_error:
+                logger.warning(f"No se pudieron publicar las métricas del fallo: {str(metrics_error)}")
             raise
 
 
 if __name__ == "__main__":
-    project_id = sys.argv[1]
-    gcs_bucket = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Transformación Bronze -> Silver")
+    parser.add_argument("project_id")
+    parser.add_argument("gcs_bucket")
+    parser.add_argument(
+        "--bronze-table",
+        default="claims_external",
+        help="Tabla externa Bronze a leer (claims_external, claims_external_gz, claims_external_parquet)"
+    )
+    parser.add_argument(
+        "--quality-mode",
+        choices=QUALITY_MODES,
+        default="observe",
+        help="observe: métricas durante la escritura; aggregate: una agregación previa sobre datos persistidos"
+    )
+    parser.add_argument(
+        "--ingest-date",
+        action="append",
+        dest="ingest_dates",
+        help="Partición ingest_date (YYYY-MM-DD) a leer; repetible. Tiene prioridad sobre el watermark"
+    )
+    parser.add_argument(
+        "--checkpoint-uri",
+        help="Checkpoint JSON del watermark (gs://... o ruta local); activa el modo incremental"
+    )
+    parser.add_argument(
+        "--until-ingest-date",
+        help="Última partición ingest_date (YYYY-MM-DD, inclusive) a procesar"
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Ignorar el watermark, reescribir Silver con todo Bronze y reiniciar el checkpoint"
+    )
+    parser.add_argument(
+        "--dedup-lookback-days",
+        type=int,
+        default=7,
+        help="Días de particiones processing_date de Silver contra los que deduplicar por record_hash (0: desactivado)"
+    )
+    parser.add_argument(
+        "--dedup-fpp",
+        type=float,
+        default=DEFAULT_DEDUP_FPP,
+        help="Probabilidad de falso positivo del Bloom filter de deduplicación"
+    )
+    parser.add_argument(
+        "--sink",
+        choices=SINKS,
+        default="bigquery-indirect",
+        help="Destino de Silver: BigQuery indirecto (GCS + load job), directo (Storage Write API) o Parquet local"
+    )
+    parser.add_argument(
+        "--sink-path",
+        help="Directorio del sink local-parquet"
+    )
+    parser.add_argument(
+        "--write-mode",
+        choices=('append', 'overwrite_partitions'),
+        default="append",
+        help="append o reemplazo de las particiones processing_date del lote"
+    )
+    parser.add_argument(
+        "--claim-date-from",
+        help="Primera fecha de reclamo (YYYY-MM-DD, inclusive) a leer de Bronze"
+    )
+    parser.add_argument(
+        "--claim-date-to",
+        help="Última fecha de reclamo (YYYY-MM-DD, inclusive) a leer de Bronze"
+    )
+    parser.add_argument(
+        "--target-file-mb",
+        type=int,
+        default=256,
+        help="Tamaño objetivo (MB estimados en memoria) de cada archivo de Silver por processing_date (0: sin layout)"
+    )
+    parser.add_argument(
+        "--salt-buckets",
+        type=int,
+        default=DEFAULT_SALT_BUCKETS,
+        help="Archivos entre los que se reparten las filas de cada cliente frecuente"
+    )
+    parser.add_argument(
+        "--gold-staging-table",
+        help="Tabla del staging de Gold (por defecto <proyecto>.retail_claims_gold.claims_business_rules_staging)"
+    )
+    parser.add_argument(
+        "--gold-sink-path",
+        help="Directorio del staging de Gold con el sink local-parquet"
+    )
+    parser.add_argument(
+        "--no-gold-staging",
+        action="store_true",
+        help="No calcular las reglas de Gold en el job (Gold las calcula leyendo Silver)"
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Backfill de las --ingest-date indicadas: processing_date = ingest_date y reemplazo por día"
+    )
+    parser.add_argument(
+        "--bronze-uri",
+        action="append",
+        dest="bronze_uris",
+        help="Archivo Bronze (gs://... o ruta local) informado por la ingesta; repetible o separados por comas. "
+             "Se leen directamente si cubren las particiones a procesar (si no, la tabla externa)"
+    )
+    parser.add_argument(
+        "--stream-source",
+        help="Modo streaming: prefijo Bronze a vigilar (gs://bucket/bronze/retail-claims o directorio local)"
+    )
+    parser.add_argument(
+        "--stream-format",
+        choices=STREAM_FORMATS,
+        default="json",
+        help="Formato de los archivos aterrizados (json incluye .ndjson.gz)"
+    )
+    parser.add_argument(
+        "--stream-checkpoint",
+        help="Checkpoint del streaming (archivos leídos y último micro-lote escrito)"
+    )
+    parser.add_argument(
+        "--trigger-seconds",
+        type=int,
+        default=60,
+        help="Intervalo entre micro-lotes del streaming"
+    )
+    parser.add_argument(
+        "--max-files-per-trigger",
+        type=int,
+        help="Máximo de archivos nuevos por micro-lote"
+    )
+    parser.add_argument(
+        "--available-now",
+        action="store_true",
+        help="Procesar los archivos pendientes y terminar (en lugar de un streaming continuo)"
+    )
+    parser.add_argument(
+        "--metrics-uri",
+        help="Documento JSON (gs://... o ruta local) con las métricas por fase y por stage de la corrida"
+    )
+    args = parser.parse_args()
+    if args.stream_source and not args.stream_checkpoint:
+        parser.error("--stream-source requiere --stream-checkpoint")
     
     transformer = BronzeToSilverTransformer(
-        project_id=project_id,
+        project_id=args.project_id,
         dataset_id="retail_claims_silver",
-        gcs_temp_path=f"{gcs_bucket}/temp"
+        gcs_temp_path=f"{args.gcs_bucket}/temp",
+        bronze_table=args.bronze_table,
+        ingest_dates=args.ingest_dates,
+        quality_mode=args.quality_mode,
+        checkpoint_uri=args.checkpoint_uri,
+        until_ingest_date=args.until_ingest_date,
+        full_refresh=args.full_refresh,
+        dedup_lookback_days=args.dedup_lookback_days,
+        dedup_fpp=args.dedup_fpp,
+        sink=build_sink(
+            args.sink,
+            f"{args.project_id}.retail_claims_silver.claims_structured",
+            f"{args.gcs_bucket}/temp",
+            args.sink_path
+        ),
+        write_mode=args.write_mode,
+        claim_date_from=args.claim_date_from,
+        claim_date_to=args.claim_date_to,
+        metrics_uri=args.metrics_uri,
+        target_file_mb=args.target_file_mb,
+        salt_buckets=args.salt_buckets,
+        gold_sink=None if args.no_gold_staging else build_sink(
+            args.sink,
+            args.gold_staging_table or f"{args.project_id}.retail_claims_gold.claims_business_rules_staging",
+            f"{args.gcs_bucket}/temp",
+            args.gold_sink_path
+        ),
+        backfill=args.backfill,
+        bronze_uris=[uri for value in args.bronze_uris or [] for uri in value.split(",") if uri]
     )
     
-    result = transformer.transform()
+    if args.stream_source:
+        result = transformer.transform_stream(
+            args.stream_source,
+            args.stream_checkpoint,
+            source_format=args.stream_format,
+            trigger_seconds=args.trigger_seconds,
+            max_files_per_trigger=args.max_files_per_trigger,
+            available_now=args.available_now
+        )
+    else:
+        result = transformer.transform()
     print(result)
@@ -0,0 +1,157 @@
+"""
+Reglas de negocio de Gold sobre los reclamos de Silver.
+
+Mismas reglas que aplicaba sp_silver_to_gold_transformation en BigQuery,
+definidas una sola vez como tablas de umbrales y evaluadas por dos motores:
+
+- spark_rule_columns: expresiones nativas de Spark (job de Dataproc),
+- apply_rules_arrow: versión vectorizada con NumPy sobre tablas Arrow
+  (motor Polars y tests, sin JVM).
+
+Ambas reproducen la semántica de nulos del CASE de SQL: una comparación con
+NULL no se cumple y cae en el ELSE.
+"""
+
+from datetime import date
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Regla 1: prioridad por monto (primer umbral que cumple claim_amount <= umbral)
+PRIORITY_THRESHOLDS = ((100, 'LOW'), (500, 'MEDIUM'), (2000, 'HIGH'))
+DEFAULT_PRIORITY = 'CRITICAL'
+
+# Regla 3: escalado de reclamos pendientes antiguos o de monto alto
+ESCALATION_STATUS = 'PENDING'
+ESCALATION_AFTER_DAYS = 7
+ESCALATION_AMOUNT = 2000
+
+# Regla 4: período de claim_date (DAYOFWEEK: 1 = domingo ... 7 = sábado)
+HOLIDAY_MONTHS = (11, 12)
+POST_HOLIDAY_MONTHS = (1,)
+WEEKEND_DAYS = (6, 7)
+
+# Regla 5: score de riesgo = factor por estado * multiplicador por monto (claim_amount > umbral)
+STATUS_RISK = {'REJECTED': 0.8, 'PENDING': 0.6, 'APPROVED': 0.2, 'CLOSED': 0.1}
+DEFAULT_STATUS_RISK = 0.5
+AMOUNT_RISK_MULTIPLIERS = ((5000, 1.5), (1000, 1.2))
+DEFAULT_AMOUNT_RISK = 1.0
+
+# Solo los registros de Silver con esta calidad pasan a Gold
+MIN_GOLD_QUALITY_SCORE = 0.7
+
+RULE_COLUMNS = ('claim_priority', 'days_since_claim', 'requires_escalation', 'period_category', 'risk_score')
+
+
+def spark_rule_columns(reference_date: Optional[Any] = None) -> Dict[str, Any]:
+    """Columnas de reglas como expresiones de Spark (reference_date: Column de fecha; por defecto current_date)"""
+    from pyspark.sql import functions as F
+
+    today = reference_date if reference_date is not None else F.current_date()
+    amount = F.col("claim_amount")
+    status = F.col("status")
+    claim_date = F.col("claim_date")
+
+    priority = None
+    for threshold, label in PRIORITY_THRESHOLDS:
+        condition = amount <= threshold
+        priority = F.when(condition, label) if priority is None else priority.when(condition, label)
+    priority = priority.otherwise(DEFAULT_PRIORITY)
+
+    # DATE(created_at) en UTC, como en BigQuery (la sesión del job usa UTC)
+    days_since_claim = F.datediff(today, F.to_date(F.col("created_at")))
+
+    requires_escalation = F.when(
+        (status == ESCALATION_STATUS) & (days_since_claim > ESCALATION_AFTER_DAYS), True
+    ).when(amount > ESCALATION_AMOUNT, True).otherwise(False)
+
+    period_category = F.when(F.month(claim_date).isin(*HOLIDAY_MONTHS), 'HOLIDAY_SEASON') \
+        .when(F.month(claim_date).isin(*POST_HOLIDAY_MONTHS), 'POST_HOLIDAY') \
+        .when(F.dayofweek(claim_date).isin(*WEEKEND_DAYS), 'WEEKEND') \
+        .otherwise('REGULAR')
+
+    status_risk = None
+    for value, factor in STATUS_RISK.items():
+        condition = status == value
+        status_risk = F.when(condition, factor) if status_risk is None else status_risk.when(condition, factor)
+    amount_risk = None
+    for threshold, multiplier in AMOUNT_RISK_MULTIPLIERS:
+        condition = amount > threshold
+        amount_risk = F.when(condition, multiplier) if amount_risk is None else amount_risk.when(condition, multiplier)
+    risk_score = status_risk.otherwise(DEFAULT_STATUS_RISK) * amount_risk.otherwise(DEFAULT_AMOUNT_RISK)
+
+    return {
+        'claim_priority': priority,
+        'days_since_claim': days_since_claim.cast("long"),
+        'requires_escalation': requires_escalation,
+        'period_category': period_category,
+        'risk_score': risk_score,
+    }
+
+
+def _column(table, name: str) -> np.ndarray:
+    return table.column(name).to_numpy(zero_copy_only=False)
+
+
+def apply_rules_arrow(table, reference_date: date):
+    """Agregar las columnas de reglas a una tabla Arrow (pyarrow.Table) con NumPy vectorizado"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    amount = np.asarray(_column(table, 'claim_amount'), dtype=float)  # nulos -> NaN (comparaciones falsas)
+    status = np.asarray(_column(table, 'status'), dtype=object)
+
+    priority = np.select(
+        [amount <= threshold for threshold, _ in PRIORITY_THRESHOLDS],
+        [label for _, label in PRIORITY_THRESHOLDS],
+        DEFAULT_PRIORITY
+    ).astype(object)
+
+    created = pc.cast(table.column('created_at'), pa.date32())
+    created_valid = np.asarray(pc.is_valid(created).to_numpy(zero_copy_only=False), dtype=bool)
+    created_days = np.asarray(pc.fill_null(created, date(1970, 1, 1)).to_numpy(zero_copy_only=False)) \
+        .astype('datetime64[D]').astype(np.int64)
+    days_since_claim = np.datetime64(reference_date, 'D').astype(np.int64) - created_days
+
+    requires_escalation = (
+        (status == ESCALATION_STATUS) & created_valid & (days_since_claim > ESCALATION_AFTER_DAYS)
+    ) | (amount > ESCALATION_AMOUNT)
+
+    claim_date = table.column('claim_date')
+    date_valid = np.asarray(pc.is_valid(claim_date).to_numpy(zero_copy_only=False), dtype=bool)
+    epoch_days = np.asarray(pc.fill_null(claim_date, date(1970, 1, 1)).to_numpy(zero_copy_only=False)) \
+        .astype('datetime64[D]')
+    month = epoch_days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    # 1970-01-01 fue jueves (DAYOFWEEK 5)
+    day_of_week = (epoch_days.astype(np.int64) + 4) % 7 + 1
+    period_category = np.select(
+        [
+            date_valid & np.isin(month, HOLIDAY_MONTHS),
+            date_valid & np.isin(month, POST_HOLIDAY_MONTHS),
+            date_valid & np.isin(day_of_week, WEEKEND_DAYS),
+        ],
+        ['HOLIDAY_SEASON', 'POST_HOLIDAY', 'WEEKEND'],
+        'REGULAR'
+    ).astype(object)
+
+    status_risk = np.select(
+        [status == value for value in STATUS_RISK],
+        list(STATUS_RISK.values()),
+        DEFAULT_STATUS_RISK
+    )
+    amount_risk = np.select(
+        [amount > threshold for threshold, _ in AMOUNT_RISK_MULTIPLIERS],
+        [multiplier for _, multiplier in AMOUNT_RISK_MULTIPLIERS],
+        DEFAULT_AMOUNT_RISK
+    )
+
+    columns = {
+        'claim_priority': pa.array(priority, type=pa.string()),
+        'days_since_claim': pa.array(days_since_claim, type=pa.int64(), mask=~created_valid),
+        'requires_escalation': pa.array(requires_escalation, type=pa.bool_()),
+        'period_category': pa.array(period_category, type=pa.string()),
+        'risk_score': pa.array(status_risk * amount_risk, type=pa.float64()),
+    }
+    for name in RULE_COLUMNS:
+        table = table.append_column(name, columns[name])
+    return table
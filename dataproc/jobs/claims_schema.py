@@ -0,0 +1,72 @@
+"""
+Contrato de columnas de reclamos compartido por los motores Bronze -> Silver.
+
+Sin dependencias (ni PySpark ni Polars) para que lo importen tanto el job de
+Dataproc como el motor Polars. Tipos y nulabilidad siguen a
+bigquery/schemas/silver_schema.sql (los tests verifican que coincidan).
+"""
+
+# Columnas de negocio de Silver: (columna, tipo BigQuery, admite nulos)
+CLAIM_FIELDS = (
+    ('claim_id', 'STRING', False),
+    ('customer_id', 'STRING', False),
+    ('store_id', 'STRING', False),
+    ('claim_date', 'DATE', False),
+    ('claim_amount', 'FLOAT64', False),
+    ('description', 'STRING', True),
+    ('status', 'STRING', False),
+    ('created_at', 'TIMESTAMP', True),
+    ('updated_at', 'TIMESTAMP', True),
+)
+
+# Columna de partición hive de Bronze que se conserva (watermark incremental)
+BRONZE_PARTITION_COLUMNS = ('ingest_date',)
+
+# Columnas de retail_claims_silver.claims_structured. Las columnas de partición
+# hive de Bronze (ingest_date, claim_day) no se escriben en Silver.
+SILVER_COLUMNS = (
+    'claim_id', 'customer_id', 'store_id', 'claim_date', 'claim_amount', 'description',
+    'status', 'created_at', 'updated_at', 'ingestion_timestamp', 'processing_date',
+    'record_hash', 'data_quality_score'
+)
+
+# PARTITION BY processing_date CLUSTER BY customer_id, store_id: orden de escritura de Silver
+CLUSTERING_COLUMNS = ('customer_id', 'store_id')
+
+# Campos de negocio cubiertos por record_hash: un cambio en cualquiera de ellos
+# (p. ej. una actualización de estado) produce un registro nuevo en Silver.
+#
+# record_hash = md5 de los campos no nulos unidos por RECORD_HASH_SEPARATOR,
+# cada uno en una forma canónica que ambos motores producen byte a byte:
+# texto tal cual, fechas YYYY-MM-DD, montos en centavos enteros (redondeo
+# half-up) y timestamps en microsegundos desde epoch (UTC).
+RECORD_HASH_COLUMNS = (
+    'claim_id', 'customer_id', 'store_id', 'claim_date', 'claim_amount',
+    'description', 'status', 'created_at', 'updated_at'
+)
+RECORD_HASH_SEPARATOR = '|'
+
+# Columnas de retail_claims_gold.claims_business_rules_staging: los reclamos
+# aptos para Gold del lote con las reglas de negocio ya calculadas
+# (business_rules). La MERGE de Gold solo lee esta tabla, no Silver.
+GOLD_STAGING_COLUMNS = (
+    'claim_id', 'customer_id', 'store_id', 'claim_date', 'claim_amount', 'description',
+    'status', 'created_at', 'updated_at', 'claim_priority', 'days_since_claim',
+    'requires_escalation', 'period_category', 'risk_score', 'processing_timestamp',
+    'processing_date'
+)
+
+# Métricas del reporte de calidad calculadas por columna Silver
+QUALITY_COLUMNS = {
+    'claim_id': ('nulls', 'approx_distinct'),
+    'customer_id': ('nulls', 'approx_distinct'),
+    'store_id': ('nulls', 'approx_distinct'),
+    'claim_date': ('nulls', 'range'),
+    'claim_amount': ('nulls', 'range'),
+    'status': ('nulls', 'approx_distinct'),
+}
+
+
+def claim_field_types() -> dict:
+    """Tipo BigQuery de cada columna de negocio"""
+    return {name: bq_type for name, bq_type, _ in CLAIM_FIELDS}
@@ -28,6 +28,10 @@ gcloud config set project $PROJECT_ID
 echo "✓ Creando buckets GCS..."
 gsutil mb -p $PROJECT_ID -l $REGION gs://$GCS_BUCKET || echo "  ⚠️  Bucket ya existe"
 gsutil mb -p $PROJECT_ID -l $REGION gs://${GCS_BUCKET}-temp || echo "  ⚠️  Bucket temporal ya existe"
+# Subidas temporales de la ingesta que quedaron huérfanas (p. ej. por un timeout de la función)
+echo '{"rule": [{"action": {"type": "Delete"}, "condition": {"age": 1, "matchesPrefix": ["uploads/"]}}]}' \
+  > /tmp/retail_claims_lifecycle.json
+gsutil lifecycle set /tmp/retail_claims_lifecycle.json gs://$GCS_BUCKET
 
 # 3. Crear datasets BigQuery
 echo "✓ Creando datasets BigQuery..."
@@ -62,7 +66,7 @@ bq query --use_legacy_sql=false < bigquery/stored_procedures/silver_to_gold_busi
 
 # 5. Subir job PySpark a GCS
 echo "✓ Subiendo job PySpark..."
-gsutil cp dataproc/jobs/bronze_to_silver_transform.py gs://$GCS_BUCKET/jobs/
+gsutil cp dataproc/jobs/bronze_to_silver_transform.py dataproc/jobs/claims_schema.py dataproc/jobs/business_rules.py gs://$GCS_BUCKET/jobs/
 
 # 6. Desplegar Cloud Function
 echo "✓ Desplegando Cloud Function..."
@@ -83,7 +87,9 @@ gcloud composer environments create $COMPOSER_ENV \
 
 # 8. Subir DAG
 echo "✓ Subiendo DAG a Cloud Composer..."
-gsutil cp dags/retail_claims_etl_dag.py gs://${REGION}-${COMPOSER_ENV}-bucket/dags/
+gsutil cp dags/retail_claims_etl_dag.py dags/silver_sizing.py dags/retail_claims_backfill_dag.py dags/backfill_plan.py gs://${REGION}-${COMPOSER_ENV}-bucket/dags/
+# Motor Polars: se ejecuta en los workers de Composer
+gsutil cp dataproc/jobs/bronze_to_silver_polars.py dataproc/jobs/claims_schema.py dataproc/jobs/business_rules.py gs://${REGION}-${COMPOSER_ENV}-bucket/dags/
 
 echo ""
 echo "✅ Despliegue completado exitosamente!"
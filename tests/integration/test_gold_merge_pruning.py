@@ -0,0 +1,282 @@
+"""
+Dry-run de la MERGE de Gold sobre una tabla Gold sintética en BigQuery.
+
+Compara los bytes procesados de la MERGE de sp_merge_gold_batch (origen:
+staging) con los de la misma MERGE sin el filtro de partición sobre Gold (la
+forma anterior, que leía la tabla completa en cada corrida), y ejecuta la poda
+sobre reclamos con claim_date corregida o futura, con y sin created_at, y con
+versiones más antiguas que las de Gold. Requiere credenciales y las
+variables BIGQUERY_TEST_PROJECT y BIGQUERY_TEST_DATASET (dataset de pruebas
+donde se crean las tablas sintéticas); sin ellas solo se ejecutan las
+pruebas del renderizado.
+
+    BIGQUERY_TEST_PROJECT=mi-proyecto BIGQUERY_TEST_DATASET=scratch \\
+        pytest tests/integration/test_gold_merge_pruning.py -s
+"""
+
+import os
+import re
+import unittest
+from datetime import date
+
+PROCEDURES_SQL = os.path.join(
+    os.path.dirname(__file__), '../../bigquery/stored_procedures/silver_to_gold_business_rules.sql'
+)
+TARGET_FILTER = '      AND T.processing_date >= prune_date\n'
+
+TEST_PROJECT = os.environ.get('BIGQUERY_TEST_PROJECT')
+TEST_DATASET = os.environ.get('BIGQUERY_TEST_DATASET')
+
+try:
+    from google.cloud import bigquery
+    BIGQUERY_AVAILABLE = bool(TEST_PROJECT and TEST_DATASET)
+except ImportError:
+    BIGQUERY_AVAILABLE = False
+
+# Tabla Gold sintética: un año de particiones processing_date, con claim_date
+# hasta 3 días antes de su primera carga
+GOLD_ROWS = 2_000_000
+SYNTHETIC_GOLD = """
+CREATE OR REPLACE TABLE `{dataset}.claims_business_rules`
+PARTITION BY processing_date
+CLUSTER BY customer_id, claim_priority, requires_escalation
+AS
+SELECT
+  CONCAT('CLM', FORMAT('%010d', n)) AS claim_id,
+  CONCAT('CUST', FORMAT('%06d', MOD(n * 7919, 50000))) AS customer_id,
+  CONCAT('STORE', FORMAT('%04d', MOD(n, 500))) AS store_id,
+  DATE_SUB(processing_date, INTERVAL MOD(n, 4) DAY) AS claim_date,
+  ROUND(MOD(n * 31, 600000) / 100, 2) AS claim_amount,
+  'Producto defectuoso' AS description,
+  ['PENDING', 'APPROVED', 'REJECTED', 'CLOSED'][OFFSET(MOD(n, 4))] AS status,
+  'HIGH' AS claim_priority,
+  1 AS days_since_claim,
+  false AS requires_escalation,
+  'REGULAR' AS period_category,
+  0.5 AS risk_score,
+  CURRENT_TIMESTAMP() AS processing_timestamp,
+  processing_date,
+  CURRENT_TIMESTAMP() AS source_updated_at,
+  CURRENT_TIMESTAMP() AS updated_at
+FROM UNNEST(GENERATE_ARRAY(1, {rows})) AS n,
+  UNNEST([DATE_SUB(CURRENT_DATE(), INTERVAL MOD(n, 365) DAY)]) AS processing_date
+"""
+
+# Staging del día: reclamos nuevos y actualizaciones de estado de reclamos recientes
+SYNTHETIC_STAGING = """
+CREATE OR REPLACE TABLE `{dataset}.claims_business_rules_staging`
+PARTITION BY processing_date
+AS
+SELECT
+  claim_id, customer_id, store_id, claim_date, claim_amount, description,
+  'APPROVED' AS status, CAST(NULL AS TIMESTAMP) AS created_at, CURRENT_TIMESTAMP() AS updated_at,
+  claim_priority, days_since_claim, requires_escalation, period_category, risk_score,
+  CURRENT_TIMESTAMP() AS processing_timestamp, CURRENT_DATE() AS processing_date
+FROM `{dataset}.claims_business_rules`
+WHERE processing_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 2 DAY)
+"""
+
+# Lote del 2024-01-20 sobre una Gold con tres reclamos:
+# - CLM-CORRECTED: cargado el 2024-01-05, su claim_date se corrige al 2024-01-10,
+# - CLM-NO-CREATED: sin created_at, cargado el 2024-01-03 y corregido al 2024-01-12,
+# - CLM-NEWER: Gold ya tiene una versión posterior (2024-01-18) a la del lote,
+# y un reclamo con fecha futura (CLM-FUTURE) que no entra a Gold
+CORRECTION_GOLD = """
+CREATE OR REPLACE TABLE `{dataset}.claims_business_rules`
+PARTITION BY processing_date
+AS
+SELECT * FROM UNNEST([
+  STRUCT(
+    'CLM-CORRECTED' AS claim_id, 'CUST000001' AS customer_id, 'STORE0001' AS store_id,
+    DATE '2024-01-03' AS claim_date, 150.0 AS claim_amount, 'Producto defectuoso' AS description,
+    'PENDING' AS status, 'MEDIUM' AS claim_priority, 3 AS days_since_claim, false AS requires_escalation,
+    'POST_HOLIDAY' AS period_category, 0.6 AS risk_score, CURRENT_TIMESTAMP() AS processing_timestamp,
+    DATE '2024-01-05' AS processing_date, TIMESTAMP '2024-01-05 09:00:00' AS source_updated_at,
+    CURRENT_TIMESTAMP() AS updated_at
+  ),
+  ('CLM-NO-CREATED', 'CUST000003', 'STORE0001', DATE '2024-01-02', 90.0, 'Sin fecha de alta',
+   'PENDING', 'LOW', 1, false, 'POST_HOLIDAY', 0.6, CURRENT_TIMESTAMP(), DATE '2024-01-03',
+   TIMESTAMP '2024-01-03 09:00:00', CURRENT_TIMESTAMP()),
+  ('CLM-NEWER', 'CUST000004', 'STORE0001', DATE '2024-01-14', 300.0, 'Reembolso',
+   'CLOSED', 'MEDIUM', 1, false, 'POST_HOLIDAY', 0.1, CURRENT_TIMESTAMP(), DATE '2024-01-15',
+   TIMESTAMP '2024-01-18 12:00:00', CURRENT_TIMESTAMP())
+])
+"""
+
+CORRECTION_BATCH = """
+CREATE OR REPLACE TABLE `{dataset}.gold_batch` AS
+SELECT * FROM UNNEST([
+  STRUCT(
+    'CLM-CORRECTED' AS claim_id, 'CUST000001' AS customer_id, 'STORE0001' AS store_id,
+    DATE '2024-01-10' AS claim_date, 150.0 AS claim_amount, 'Producto defectuoso' AS description,
+    'APPROVED' AS status, TIMESTAMP '2024-01-04 10:00:00' AS created_at,
+    TIMESTAMP '2024-01-20 09:00:00' AS updated_at, 'MEDIUM' AS claim_priority, 16 AS days_since_claim,
+    false AS requires_escalation, 'POST_HOLIDAY' AS period_category, 0.2 AS risk_score,
+    CURRENT_TIMESTAMP() AS processing_timestamp, DATE '2024-01-20' AS processing_date
+  ),
+  ('CLM-NO-CREATED', 'CUST000003', 'STORE0001', DATE '2024-01-12', 90.0, 'Sin fecha de alta',
+   'APPROVED', CAST(NULL AS TIMESTAMP), TIMESTAMP '2024-01-20 09:00:00', 'LOW', NULL,
+   false, 'POST_HOLIDAY', 0.2, CURRENT_TIMESTAMP(), DATE '2024-01-20'),
+  ('CLM-NEWER', 'CUST000004', 'STORE0001', DATE '2024-01-14', 300.0, 'Reembolso',
+   'PENDING', TIMESTAMP '2024-01-14 10:00:00', TIMESTAMP '2024-01-16 10:00:00', 'MEDIUM', 6,
+   false, 'POST_HOLIDAY', 0.6, CURRENT_TIMESTAMP(), DATE '2024-01-20'),
+  ('CLM-FUTURE', 'CUST000002', 'STORE0001', DATE '2024-02-01', 80.0, 'Cambio de talla',
+   'PENDING', TIMESTAMP '2024-01-19 10:00:00', TIMESTAMP '2024-01-19 10:00:00', 'LOW', 1,
+   false, 'REGULAR', 0.6, CURRENT_TIMESTAMP(), DATE '2024-01-20')
+])
+"""
+
+
+def procedure_body(procedure: str) -> str:
+    with open(PROCEDURES_SQL) as f:
+        sql = f.read()
+    return sql.split(f'retail_claims_gold.{procedure}`(', 1)[1].split('\nEND;', 1)[0]
+
+
+def batch_statement(start: str) -> str:
+    """Sentencia de sp_merge_gold_batch que empieza por `start`, tal como está en el archivo SQL"""
+    body = procedure_body('sp_merge_gold_batch')
+    return start + body.split(start, 1)[1].split(';', 1)[0]
+
+
+def batch_script(start: str, end: str) -> str:
+    """Sentencias de sp_merge_gold_batch desde `start` hasta `end` (excluida), como script"""
+    body = procedure_body('sp_merge_gold_batch')
+    begin = body.index(start)
+    return body[begin:body.index(end, begin)]
+
+
+def gold_merge() -> str:
+    """MERGE sobre claims_business_rules de sp_merge_gold_batch tal como está en el archivo SQL"""
+    return batch_statement('MERGE INTO')
+
+
+def render(statement: str, dataset: str, **variables) -> str:
+    """Sentencia ejecutable por separado: tablas (y gold_batch) del dataset de pruebas y
+    variables como literales"""
+    statement = re.sub(r'\{project_id\}\.retail_claims_(silver|gold)', dataset, statement)
+    statement = re.sub(r'\bgold_batch\b', f'`{dataset}.gold_batch`', statement)
+    for name, value in variables.items():
+        statement = re.sub(rf'\b{name}\b', f"DATE '{value.isoformat()}'", statement)
+    return statement
+
+
+def render_merge(dataset: str, date_from: date, date_to: date, prune_date: date,
+                 prune_target: bool = True) -> str:
+    """MERGE ejecutable por separado con el staging del rango como origen"""
+    statement = gold_merge().replace('USING gold_batch S', (
+        'USING (SELECT * FROM `{project_id}.retail_claims_gold.claims_business_rules_staging` '
+        'WHERE processing_date BETWEEN date_from AND date_to) S'
+    ))
+    if not prune_target:
+        statement = statement.replace(TARGET_FILTER, '')
+    return render(statement, dataset, date_from=date_from, date_to=date_to, prune_date=prune_date)
+
+
+class TestMergeRendering(unittest.TestCase):
+
+    def test_merge_prunes_target(self):
+        statement = render_merge('scratch', date(2024, 3, 1), date(2024, 3, 2), date(2024, 2, 27))
+
+        self.assertIn("AND T.processing_date >= DATE '2024-02-27'", statement)
+        self.assertIn("WHERE processing_date BETWEEN DATE '2024-03-01' AND DATE '2024-03-02'", statement)
+        self.assertNotIn('{project_id}', statement)
+        self.assertNotIn(TARGET_FILTER, render_merge(
+            'scratch', date.today(), date.today(), date.today(), prune_target=False
+        ))
+
+    def test_both_sources_deduplicated_per_claim(self):
+        body = procedure_body('sp_merge_gold_batch')
+        self.assertEqual(body.count('PARTITION BY claim_id'), 2)
+        for procedure, source in (('sp_merge_gold_staging', 'staging'), ('sp_silver_to_gold_transformation', 'silver')):
+            self.assertIn(f"sp_merge_gold_batch`(date_from, date_to, '{source}')", procedure_body(procedure))
+
+    def test_prune_date_does_not_depend_on_claim_date_corrections(self):
+        body = procedure_body('sp_merge_gold_batch')
+        discard = body.index('DELETE FROM gold_batch')
+        self.assertLess(discard, body.index('SET prune_date'))
+        self.assertIn('WHERE claim_date > processing_date\n    OR DATE(created_at) > processing_date', body)
+        self.assertIn('SET prune_date = (SELECT MIN(DATE(created_at)) FROM gold_batch)', body)
+        # Sin created_at la poda baja hasta la partición actual del reclamo en Gold
+        lookup = body.split('WHERE created_at IS NULL) THEN', 1)[1].split('END IF;', 1)[0]
+        self.assertIn('SELECT MIN(processing_date)', lookup)
+        self.assertIn('WHERE claim_id IN (SELECT claim_id FROM gold_batch WHERE created_at IS NULL)', lookup)
+        # La poda vale mientras la MERGE conserve el processing_date de la primera carga
+        update = gold_merge().split('UPDATE SET', 1)[1].split('WHEN NOT MATCHED', 1)[0]
+        self.assertNotIn('processing_date', update)
+        self.assertNotIn('claim_date', update)
+        self.assertEqual(body.count('processing_date >= prune_date'), 4)
+
+    def test_older_versions_do_not_overwrite_gold(self):
+        body = procedure_body('sp_merge_gold_batch')
+        merge = gold_merge()
+        self.assertIn('WHEN MATCHED AND (\n      T.source_updated_at IS NULL OR S.updated_at >= T.source_updated_at\n    ) THEN', merge)
+        self.assertIn('source_updated_at = S.updated_at', merge)
+        # Las versiones antiguas salen del lote antes del delta de los agregados y del índice
+        stale = body.index('AND T.source_updated_at > IFNULL(S.updated_at')
+        self.assertLess(stale, body.index('CREATE TEMP TABLE gold_delta'))
+
+
+@unittest.skipUnless(BIGQUERY_AVAILABLE, 'BIGQUERY_TEST_PROJECT/BIGQUERY_TEST_DATASET no configurados')
+class TestMergeDryRun(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = bigquery.Client(project=TEST_PROJECT)
+        cls.dataset = f'{TEST_PROJECT}.{TEST_DATASET}'
+        cls.client.query(SYNTHETIC_GOLD.format(dataset=cls.dataset, rows=GOLD_ROWS)).result()
+        cls.client.query(SYNTHETIC_STAGING.format(dataset=cls.dataset)).result()
+        cls.today = next(iter(cls.client.query('SELECT CURRENT_DATE()').result()))[0]
+        cls.prune_date = next(iter(cls.client.query(
+            f'SELECT MIN(claim_date) FROM `{cls.dataset}.claims_business_rules_staging`'
+        ).result()))[0]
+
+    def bytes_processed(self, statement: str) -> int:
+        job = self.client.query(statement, job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False))
+        return job.total_bytes_processed
+
+    def test_pruned_merge_reads_recent_partitions_only(self):
+        def merge(prune_target):
+            return render_merge(self.dataset, self.today, self.today, self.prune_date, prune_target)
+
+        full = self.bytes_processed(merge(prune_target=False))
+        pruned = self.bytes_processed(merge(prune_target=True))
+
+        print(f'\nMERGE Gold: {full} bytes sin filtro, {pruned} bytes con filtro ({pruned / full:.1%})')
+        # El staging cubre ~5 de 365 particiones de Gold
+        self.assertLess(pruned, full * 0.1)
+
+
+@unittest.skipUnless(BIGQUERY_AVAILABLE, 'BIGQUERY_TEST_PROJECT/BIGQUERY_TEST_DATASET no configurados')
+class TestMergeClaimDateCorrections(unittest.TestCase):
+
+    def test_corrections_update_their_rows_and_older_versions_are_ignored(self):
+        client = bigquery.Client(project=TEST_PROJECT)
+        dataset = f'{TEST_PROJECT}.{TEST_DATASET}'
+        client.query(CORRECTION_GOLD.format(dataset=dataset)).result()
+        client.query(CORRECTION_BATCH.format(dataset=dataset)).result()
+
+        # Descartes, poda y versiones antiguas tal como los ejecuta el procedimiento
+        script = 'DECLARE prune_date DATE;\n' + batch_script(
+            'DELETE FROM gold_batch', '-- Delta del lote'
+        ) + '\nSELECT prune_date;'
+        prune_date = next(iter(client.query(render(script, dataset)).result()))[0]
+        # Partición actual de CLM-NO-CREATED: anterior a la fecha de alta de todo el lote
+        self.assertEqual(prune_date, date(2024, 1, 3))
+
+        client.query(render(gold_merge(), dataset, prune_date=prune_date)).result()
+
+        rows = {row.claim_id: row for row in client.query(
+            f'SELECT claim_id, COUNT(*) OVER (PARTITION BY claim_id) AS copies, status, processing_date '
+            f'FROM `{dataset}.claims_business_rules`'
+        ).result()}
+        self.assertEqual(set(rows), {'CLM-CORRECTED', 'CLM-NO-CREATED', 'CLM-NEWER'})
+        self.assertEqual({row.copies for row in rows.values()}, {1})
+        self.assertEqual(rows['CLM-CORRECTED'].status, 'APPROVED')
+        self.assertEqual(rows['CLM-CORRECTED'].processing_date, date(2024, 1, 5))
+        self.assertEqual(rows['CLM-NO-CREATED'].status, 'APPROVED')
+        # La versión del 2024-01-16 no pisa la del 2024-01-18
+        self.assertEqual(rows['CLM-NEWER'].status, 'CLOSED')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import importlib
+import os
+import re
+import sys
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../dags'))
+
+from backfill_plan import (
+    MAX_BACKFILL_DAYS, SILVER_RETENTION_DAYS, aging_script, backfill_days, backfill_job_args,
+    check_silver_retention, gold_merge_query, ingest_requests
+)
+
+try:
+    import airflow  # noqa: F401
+    AIRFLOW_AVAILABLE = True
+except ImportError:
+    AIRFLOW_AVAILABLE = False
+
+SCHEMAS = os.path.join(os.path.dirname(__file__), '../../bigquery/schemas')
+
+
+def table_option(schema_file: str, option: str) -> int:
+    with open(os.path.join(SCHEMAS, schema_file)) as f:
+        return int(re.search(rf'{option}=(\d+)', f.read()).group(1))
+
+
+class TestBackfillPlan(unittest.TestCase):
+
+    def test_days_of_range(self):
+        self.assertEqual(backfill_days('2024-02-28', '2024-03-01'), ['2024-02-28', '2024-02-29', '2024-03-01'])
+        self.assertEqual(backfill_days('2024-03-01', '2024-03-01'), ['2024-03-01'])
+
+    def test_invalid_range_rejected(self):
+        with self.assertRaises(ValueError):
+            backfill_days('2024-03-02', '2024-03-01')
+        with self.assertRaises(ValueError):
+            backfill_days('2024-01-01', '2024-12-31')
+        self.assertEqual(len(backfill_days('2024-01-01', '2024-12-31', max_days=366)), 366)
+        self.assertGreaterEqual(MAX_BACKFILL_DAYS, 31)
+
+    def test_ingest_requests_match_daily_run(self):
+        """Como la corrida diaria: claims_<ds>.json aterriza en ingest_date = ds + 1"""
+        self.assertEqual(ingest_requests(['2024-03-01']), [
+            {'filename': 'claims_2024-02-29.json', 'ingest_date': '2024-03-01'}
+        ])
+
+    def test_single_job_over_all_days(self):
+        args = backfill_job_args('p', 'b', 'claims_external', ['2024-03-01', '2024-03-02'], 'gs://b/m.json')
+
+        self.assertEqual(args[:2], ['p', 'b'])
+        self.assertIn('--backfill', args)
+        self.assertEqual(args[args.index('--write-mode') + 1], 'overwrite_partitions')
+        self.assertEqual([args[i + 1] for i, a in enumerate(args) if a == '--ingest-date'], ['2024-03-01', '2024-03-02'])
+        # Sin checkpoint: el backfill no mueve el watermark de la corrida diaria
+        self.assertNotIn('--checkpoint-uri', args)
+
+    def test_range_older_than_staging_expiration_merges_from_silver(self):
+        today = date(2024, 3, 31)
+        days = backfill_days('2024-03-01', '2024-03-10')
+        staging_days = table_option('gold_schema.sql', 'partition_expiration_days')
+        # Todo el rango cae en particiones del staging ya vencidas
+        self.assertGreater((today - date.fromisoformat(days[-1])).days, staging_days)
+
+        check_silver_retention(days, today)
+        args = backfill_job_args('p', 'b', 'claims_external', days, 'gs://b/m.json')
+
+        self.assertIn('--no-gold-staging', args)
+        self.assertEqual(gold_merge_query('p', days), (
+            "CALL `p.retail_claims_gold.sp_silver_to_gold_transformation`(DATE '2024-03-01', DATE '2024-03-10')"
+        ))
+
+    def test_range_beyond_silver_retention_rejected(self):
+        retention_ms = table_option('silver_schema.sql', 'partition_expiration_ms')
+        self.assertEqual(SILVER_RETENTION_DAYS, retention_ms // (24 * 3600 * 1000))
+
+        check_silver_retention(['2024-01-02'], date(2024, 3, 31))
+        with self.assertRaises(ValueError):
+            check_silver_retention(['2024-01-01', '2024-01-02'], date(2024, 3, 31))
+
+    def test_pending_claims_aged_once_per_day_in_order(self):
+        script = aging_script('p', backfill_days('2024-03-01', '2024-03-03'))
+
+        self.assertEqual(script.splitlines(), [
+            f"CALL `p.retail_claims_gold.sp_age_pending_claims`(DATE '{day}');"
+            for day in ('2024-03-01', '2024-03-02', '2024-03-03')
+        ])
+        self.assertNotIn('CURRENT_DATE', script)
+
+
+
+@unittest.skipUnless(AIRFLOW_AVAILABLE, 'Airflow no disponible')
+class TestBackfillDag(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch(
+            'airflow.models.Variable.get',
+            side_effect=lambda key, default_var=None, deserialize_json=False: default_var
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dag_module = importlib.import_module('retail_claims_backfill_dag')
+
+    def test_ingestion_expands_over_pushed_requests(self):
+        ingest = self.dag_module.dag.get_task('ingest_sftp_to_gcs')
+        # La clave del XComArg es una clave de XCom: plan_backfill debe publicarla por separado
+        requests = ingest.expand_input.value['input_data']
+        self.assertEqual(requests.operator.task_id, 'plan_backfill')
+        self.assertEqual(requests.key, 'ingest_requests')
+
+        day = (date.today() - timedelta(days=3)).isoformat()
+        task = mock.MagicMock()
+        task.render_template.side_effect = lambda template, context: template
+        task_instance = mock.MagicMock()
+        self.dag_module.plan_backfill(
+            params={'date_from': day, 'date_to': day}, task=task, task_instance=task_instance
+        )
+        task_instance.xcom_push.assert_called_once_with(key='ingest_requests', value=ingest_requests([day]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,924 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../dataproc/jobs'))
+
+try:
+    from pyspark.sql import SparkSession
+    SPARK_AVAILABLE = bool(shutil.which('java') or os.environ.get('JAVA_HOME'))
+except ImportError:
+    SPARK_AVAILABLE = False
+
+if SPARK_AVAILABLE:
+    import bronze_to_silver_transform as job
+
+
+@unittest.skipUnless(SPARK_AVAILABLE, 'pyspark/Java no disponibles')
+class SparkTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder \
+            .master('local[1]') \
+            .appName('tests') \
+            .config('spark.ui.enabled', 'false') \
+            .config('spark.sql.shuffle.partitions', '1') \
+            .getOrCreate()
+        cls.spark.sparkContext.setLogLevel('ERROR')
+
+    def bronze_df(self, rows):
+        return self.spark.createDataFrame(
+            rows, 'claim_id string, customer_id string, store_id string, claim_date string, '
+                  'claim_amount double, description string, status string, created_at string, '
+                  'updated_at string'
+        )
+
+    def transformer(self, **kwargs):
+        return job.BronzeToSilverTransformer('project', 'retail_claims_silver', 'bucket/temp', **kwargs)
+
+
+class TestDataQualityProfile(SparkTestCase):
+
+    ROWS = [
+        ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'pending', None, None),
+        ('CLM2', 'CUST1', 'STORE2', '2024-01-12', -5.0, 'b', 'APPROVED', None, None),
+        (None, 'CUST2', 'STORE1', '2024-01-11', None, 'c', 'REJECTED', None, None),
+        ('CLM4', None, 'STORE1', '2024-01-15', 0.0, 'd', 'CLOSED', None, None),
+    ]
+
+    def silver_df(self, transformer):
+        df = transformer.clean_and_standardize(transformer.apply_bronze_schema(self.bronze_df(self.ROWS)))
+        return transformer.add_technical_columns(df)
+
+    def run_transform(self, transformer):
+        jobs = []
+        sc = self.spark.sparkContext
+        group = f'silver-write-{id(transformer)}'
+
+        def write(df, mode='append'):
+            sc.setJobGroup(group, 'test')
+            df.write.format('noop').mode('overwrite').save()
+            jobs.extend(sc.statusTracker().getJobIdsForGroup(group))
+
+        with mock.patch.object(transformer, 'read_bronze_data', return_value=self.bronze_df(self.ROWS)), \
+                mock.patch.object(transformer, 'write_to_silver', side_effect=write):
+            result = transformer.transform()
+        return result['quality_report'], jobs
+
+    def test_report_in_single_aggregation(self):
+        """Los contadores históricos y las métricas por columna salen de una agregación"""
+        transformer = self.transformer()
+        report = transformer.validate_data_quality(self.silver_df(transformer))
+
+        self.assertEqual(report['total_records'], 4)
+        self.assertEqual(report['null_claim_ids'], 1)
+        self.assertEqual(report['null_amounts'], 1)
+        self.assertEqual(report['negative_amounts'], 1)
+        self.assertEqual(report['quality_percentage'], 25.0)
+        self.assertEqual(report['columns']['customer_id']['nulls'], 1)
+        self.assertEqual(report['columns']['status']['approx_distinct'], 4)
+        self.assertEqual(report['columns']['claim_date']['min'], '2024-01-10')
+        self.assertEqual(report['columns']['claim_amount']['max'], 100.0)
+
+    def test_observe_mode_computes_report_during_write(self):
+        """En modo observe el reporte no agrega acciones: solo la escritura lee Bronze"""
+        observed, jobs = self.run_transform(self.transformer(quality_mode='observe'))
+        aggregated, _ = self.run_transform(self.transformer(quality_mode='aggregate'))
+
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(observed, aggregated)
+
+    def test_aggregate_mode_unpersists(self):
+        transformer = self.transformer(quality_mode='aggregate')
+        self.run_transform(transformer)
+
+        self.assertEqual(len(self.spark.sparkContext._jsc.getPersistentRDDs()), 0)
+
+    def test_custom_column_metrics(self):
+        """Las métricas por columna son configurables sin pasadas adicionales"""
+        transformer = self.transformer(quality_columns={'store_id': ('approx_distinct',)})
+        report = transformer.validate_data_quality(self.silver_df(transformer))
+
+        self.assertEqual(report['columns'], {'store_id': {'approx_distinct': 2}})
+
+    def test_data_quality_score(self):
+        """El score exige ids y monto positivo (comparación con precedencia explícita)"""
+        transformer = self.transformer()
+        scores = {
+            row['claim_id']: row['data_quality_score']
+            for row in self.silver_df(transformer).collect()
+        }
+
+        self.assertEqual(scores['CLM1'], 1.0)
+        self.assertEqual(scores['CLM4'], 0.5)
+
+    def test_unknown_quality_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.transformer(quality_mode='sample')
+
+
+class TestIncrementalWatermark(SparkTestCase):
+
+    ROWS = [
+        ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'PENDING', None, None, '2024-01-14'),
+        ('CLM2', 'CUST2', 'STORE2', '2024-01-12', 50.0, 'b', 'APPROVED', None, None, '2024-01-15'),
+    ]
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.workdir, 'checkpoints', 'watermark.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def bronze_df(self, rows):
+        return self.spark.createDataFrame(
+            rows, 'claim_id string, customer_id string, store_id string, claim_date string, '
+                  'claim_amount double, description string, status string, created_at string, '
+                  'updated_at string, ingest_date string'
+        ).withColumn('ingest_date', job.to_date('ingest_date'))
+
+    def save_checkpoint(self, ingest_date):
+        job.WatermarkStore(self.spark, self.checkpoint).save({'ingest_date': ingest_date})
+
+    def load_checkpoint(self):
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def run_transform(self, transformer, write=None):
+        writes = []
+        filters = []
+
+        def read():
+            filters.append(transformer.bronze_partition_filter())
+            return self.bronze_df(self.ROWS)
+
+        def default_write(df, mode='append'):
+            df.write.format('noop').mode('overwrite').save()
+            writes.append((df.columns, mode))
+
+        with mock.patch.object(transformer, 'read_bronze_data', side_effect=read), \
+                mock.patch.object(transformer, 'write_to_silver', side_effect=write or default_write):
+            result = transformer.transform()
+        return result, filters[0], writes
+
+    def test_partition_filter(self):
+        transformer = self.transformer(checkpoint_uri=self.checkpoint, until_ingest_date='2024-01-15')
+        transformer.watermark = '2024-01-12'
+        self.assertEqual(
+            transformer.bronze_partition_filter(),
+            "ingest_date > DATE '2024-01-12' AND ingest_date <= DATE '2024-01-15'"
+        )
+
+        # Las particiones explícitas tienen prioridad y desactivan el watermark
+        explicit = self.transformer(checkpoint_uri=self.checkpoint, ingest_dates=['2024-01-13'])
+        self.assertEqual(explicit.bronze_partition_filter(), "ingest_date IN (DATE '2024-01-13')")
+        self.assertFalse(explicit.incremental)
+
+    def test_watermark_advances_after_write(self):
+        """Solo se leen particiones nuevas y el checkpoint avanza a la última escrita"""
+        self.save_checkpoint('2024-01-13')
+        transformer = self.transformer(checkpoint_uri=self.checkpoint)
+
+        result, partition_filter, writes = self.run_transform(transformer)
+
+        self.assertEqual(partition_filter, "ingest_date > DATE '2024-01-13'")
+        self.assertEqual(result['watermark'], '2024-01-15')
+        self.assertEqual(self.load_checkpoint()['ingest_date'], '2024-01-15')
+        self.assertEqual(self.load_checkpoint()['records'], 2)
+        # Las columnas de partición de Bronze no llegan a Silver
+        self.assertEqual(writes, [(list(job.SILVER_COLUMNS), 'append')])
+
+    def test_failed_write_keeps_watermark(self):
+        self.save_checkpoint('2024-01-13')
+        transformer = self.transformer(checkpoint_uri=self.checkpoint)
+
+        with self.assertRaises(RuntimeError):
+            self.run_transform(transformer, write=mock.Mock(side_effect=RuntimeError('BigQuery')))
+
+        self.assertEqual(self.load_checkpoint()['ingest_date'], '2024-01-13')
+
+    def test_full_refresh_ignores_and_resets_watermark(self):
+        self.save_checkpoint('2024-02-01')
+        transformer = self.transformer(checkpoint_uri=self.checkpoint, full_refresh=True)
+
+        result, partition_filter, writes = self.run_transform(transformer)
+
+        self.assertIsNone(partition_filter)
+        self.assertEqual(writes[0][1], 'overwrite')
+        self.assertEqual(self.load_checkpoint()['ingest_date'], '2024-01-15')
+        self.assertTrue(self.load_checkpoint()['full_refresh'])
+
+    def test_local_checkpoint_replaced_atomically(self):
+        store = job.WatermarkStore(self.spark, self.checkpoint)
+        self.assertIsNone(store.load())
+
+        store.save({'ingest_date': '2024-01-14'})
+        store.save({'ingest_date': '2024-01-15'})
+
+        self.assertEqual(store.load(), {'ingest_date': '2024-01-15'})
+        self.assertEqual(os.listdir(os.path.dirname(self.checkpoint)), ['watermark.json'])
+
+
+class TestSilverDeduplication(SparkTestCase):
+
+    ROWS = [
+        ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'PENDING', None, None),
+        ('CLM2', 'CUST2', 'STORE2', '2024-01-12', 50.0, 'b', 'APPROVED', None, None),
+        ('CLM3', 'CUST3', 'STORE1', '2024-01-13', 75.0, 'c', 'PENDING', None, None),
+    ]
+
+    def silver_hashes(self, transformer, rows):
+        df = transformer.apply_bronze_schema(self.bronze_df(rows))
+        return transformer.add_technical_columns(transformer.clean_and_standardize(df)).select('record_hash')
+
+    def run_transform(self, transformer, incoming, existing):
+        written = []
+
+        def write(df, mode='append'):
+            written.extend(row['claim_id'] for row in df.collect())
+
+        with mock.patch.object(transformer, 'read_bronze_data', return_value=self.bronze_df(incoming)), \
+                mock.patch.object(transformer, 'read_silver_hashes', return_value=existing), \
+                mock.patch.object(transformer, 'write_to_silver', side_effect=write):
+            result = transformer.transform()
+        return sorted(written), result['dedup_report']
+
+    def test_retried_batch_is_idempotent(self):
+        """Un reintento no duplica filas: se descartan las ya escritas y las repetidas del lote"""
+        transformer = self.transformer(dedup_lookback_days=7)
+        existing = self.silver_hashes(transformer, self.ROWS[:2])
+        incoming = self.ROWS + [self.ROWS[2]]
+
+        written, report = self.run_transform(transformer, incoming, existing)
+
+        self.assertEqual(written, ['CLM3'])
+        self.assertEqual(report['incoming_records'], 4)
+        self.assertEqual(report['existing_duplicates'], 2)
+        self.assertEqual(report['batch_duplicates'], 1)
+        self.assertEqual(report['duplicate_rate'], 75.0)
+        self.assertGreater(report['bloom_filter_bytes'], 0)
+
+    def test_status_change_is_not_a_duplicate(self):
+        transformer = self.transformer(dedup_lookback_days=7)
+        existing = self.silver_hashes(transformer, self.ROWS[:1])
+        approved = ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'APPROVED', None, None)
+
+        written, _ = self.run_transform(transformer, [approved], existing)
+
+        self.assertEqual(written, ['CLM1'])
+
+    def test_bloom_false_positives_are_checked_exactly(self):
+        """Con un filtro saturado, los falsos positivos no se descartan"""
+        transformer = self.transformer(dedup_lookback_days=7, dedup_fpp=0.9)
+        existing = self.spark.range(5000).select(job.md5(job.col('id').cast('string')).alias('record_hash'))
+
+        written, report = self.run_transform(transformer, self.ROWS, existing)
+
+        self.assertEqual(written, ['CLM1', 'CLM2', 'CLM3'])
+        self.assertEqual(report['existing_duplicates'], 0)
+        self.assertEqual(report['bloom_false_positives'], report['bloom_positives'])
+
+    def test_empty_silver_skips_bloom_filter(self):
+        transformer = self.transformer(dedup_lookback_days=7)
+        existing = self.silver_hashes(transformer, []).limit(0)
+
+        written, report = self.run_transform(transformer, self.ROWS + self.ROWS[:1], existing)
+
+        self.assertEqual(written, ['CLM1', 'CLM2', 'CLM3'])
+        self.assertEqual(report['existing_hashes'], 0)
+        self.assertNotIn('bloom_positives', report)
+
+    def test_window_uses_utc_processing_date(self):
+        """La ventana se cuenta desde la fecha UTC de processing_date, no desde la fecha local"""
+        sink = mock.Mock(supported_modes=('append',))
+        transformer = self.transformer(dedup_lookback_days=7, sink=sink)
+        utc_now = mock.Mock(utcnow=mock.Mock(return_value=datetime(2024, 1, 20, 23, 30)))
+
+        with mock.patch.object(job, 'datetime', utc_now):
+            transformer.read_silver_hashes()
+
+        sink.read.assert_called_once_with(self.spark, "processing_date >= DATE '2024-01-13'")
+
+    def test_full_refresh_does_not_read_silver(self):
+        transformer = self.transformer(dedup_lookback_days=7, full_refresh=True)
+        existing = mock.Mock()
+
+        written, _ = self.run_transform(transformer, self.ROWS + self.ROWS[:1], existing)
+
+        self.assertEqual(written, ['CLM1', 'CLM2', 'CLM3'])
+        existing.count.assert_not_called()
+        self.assertEqual(len(self.spark.sparkContext._jsc.getPersistentRDDs()), 0)
+
+
+class TestSilverSinks(SparkTestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.sink = job.LocalParquetSink(os.path.join(self.workdir, 'silver'))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def batch(self, rows):
+        return self.spark.createDataFrame(rows, 'claim_id string, processing_date string') \
+            .withColumn('processing_date', job.to_date('processing_date'))
+
+    def contents(self):
+        return sorted(
+            (row['claim_id'], row['processing_date'].isoformat())
+            for row in self.sink.read(self.spark).collect()
+        )
+
+    def test_append_reports_rows_bytes_and_commit(self):
+        self.sink.write(self.batch([('CLM1', '2024-01-14')]))
+        report = self.sink.write(self.batch([('CLM2', '2024-01-14'), ('CLM3', '2024-01-15')]))
+
+        self.assertEqual(self.contents(), [
+            ('CLM1', '2024-01-14'), ('CLM2', '2024-01-14'), ('CLM3', '2024-01-15')
+        ])
+        self.assertEqual(report['rows'], 2)
+        self.assertGreater(report['bytes'], 0)
+        self.assertIsNotNone(report['commit_seconds'])
+        self.assertEqual(report['version'], 2)
+
+    def test_overwrite_partitions_replaces_only_batch_partitions(self):
+        self.sink.write(self.batch([('CLM1', '2024-01-14'), ('CLM2', '2024-01-15')]))
+        self.sink.write(self.batch([('CLM3', '2024-01-15')]), 'overwrite_partitions')
+
+        self.assertEqual(self.contents(), [('CLM1', '2024-01-14'), ('CLM3', '2024-01-15')])
+        # Los archivos reemplazados se eliminan del directorio
+        self.assertEqual(len(os.listdir(os.path.join(self.sink.path, 'processing_date=2024-01-15'))), 1)
+
+    def test_overwrite_replaces_table(self):
+        self.sink.write(self.batch([('CLM1', '2024-01-14'), ('CLM2', '2024-01-15')]))
+        self.sink.write(self.batch([('CLM3', '2024-01-16')]), 'overwrite')
+
+        self.assertEqual(self.contents(), [('CLM3', '2024-01-16')])
+
+    def test_failed_commit_leaves_previous_version(self):
+        """Un commit fallido no publica ninguna partición ni deja archivos huérfanos"""
+        self.sink.write(self.batch([('CLM1', '2024-01-14')]))
+
+        with mock.patch.object(job.os, 'link', side_effect=FileExistsError('commit concurrente')):
+            with self.assertRaises(FileExistsError):
+                self.sink.write(self.batch([('CLM2', '2024-01-14'), ('CLM3', '2024-01-15')]))
+
+        self.assertEqual(self.contents(), [('CLM1', '2024-01-14')])
+        self.assertEqual(len(os.listdir(os.path.join(self.sink.path, 'processing_date=2024-01-14'))), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.sink.path, 'processing_date=2024-01-15')))
+
+    def test_transform_through_sink_is_idempotent(self):
+        """La deduplicación lee el mismo sink en el que escribe el job"""
+        rows = [('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'PENDING', None, None)]
+        reports = []
+        for _ in range(2):
+            transformer = self.transformer(sink=self.sink, dedup_lookback_days=7)
+            with mock.patch.object(transformer, 'read_bronze_data', return_value=self.bronze_df(rows)):
+                reports.append(transformer.transform()['sink_report'])
+
+        self.assertEqual([report['rows'] for report in reports], [1, 0])
+        self.assertEqual(self.sink.read(self.spark).columns[:3], ['claim_id', 'customer_id', 'store_id'])
+
+    def test_direct_sink_rejects_partition_overwrite(self):
+        with self.assertRaises(ValueError):
+            self.transformer(sink=job.BigQueryDirectSink('p.d.t'), write_mode='overwrite_partitions')
+
+
+class TestBronzeSchema(SparkTestCase):
+
+    SILVER_DDL = os.path.join(os.path.dirname(__file__), '../../bigquery/schemas/silver_schema.sql')
+    BIGQUERY_TYPES = {'STRING': 'string', 'DATE': 'date', 'FLOAT64': 'double', 'TIMESTAMP': 'timestamp'}
+    COLUMN_DDL = re.compile(r'^\s+(\w+) (STRING|DATE|FLOAT64|TIMESTAMP)\b( NOT NULL)?', re.MULTILINE)
+
+    def silver_ddl_columns(self):
+        with open(self.SILVER_DDL) as f:
+            ddl = f.read()
+        return [
+            (name, self.BIGQUERY_TYPES[bq_type], not not_null)
+            for name, bq_type, not_null in self.COLUMN_DDL.findall(ddl)
+        ]
+
+    def test_schema_matches_silver_ddl(self):
+        """CLAIMS_SCHEMA y SILVER_COLUMNS siguen a silver_schema.sql"""
+        ddl = self.silver_ddl_columns()
+
+        self.assertEqual(
+            [(f.name, f.dataType.simpleString(), f.nullable) for f in job.CLAIMS_SCHEMA.fields],
+            ddl[:len(job.CLAIMS_SCHEMA.fields)]
+        )
+        self.assertEqual(list(job.SILVER_COLUMNS), [name for name, _, _ in ddl if name != '_load_timestamp'])
+
+    def test_projects_and_casts_at_read(self):
+        wide = self.bronze_df([('CLM1', 'C', 'S', '2024-01-10', 10.0, 'd', 'PENDING', '2024-01-10T08:00:00Z', None)]) \
+            .withColumn('extra_payload', job.lit('x')) \
+            .withColumn('ingest_date', job.to_date(job.lit('2024-01-11'))) \
+            .withColumn('claim_day', job.to_date(job.lit('2024-01-10')))
+
+        df = self.transformer().apply_bronze_schema(wide)
+
+        self.assertEqual(df.columns, job.CLAIMS_SCHEMA.fieldNames() + ['ingest_date'])
+        self.assertEqual(
+            [f.dataType for f in df.schema.fields[:len(job.CLAIMS_SCHEMA.fields)]],
+            [f.dataType for f in job.CLAIMS_SCHEMA.fields]
+        )
+        row = df.first()
+        self.assertEqual(row['claim_date'].isoformat(), '2024-01-10')
+        self.assertIsNotNone(row['created_at'])
+
+    def test_drift_fails_before_any_job(self):
+        transformer = self.transformer()
+        sc = self.spark.sparkContext
+        jobs_before = len(sc.statusTracker().getJobIdsForGroup())
+        missing = self.bronze_df([]).drop('claim_id')
+        retyped = self.bronze_df([]).withColumn('claim_amount', job.col('claim_amount').cast('string'))
+
+        with self.assertRaisesRegex(ValueError, 'claim_id'):
+            transformer.apply_bronze_schema(missing)
+        with self.assertRaisesRegex(ValueError, 'claim_amount'):
+            transformer.apply_bronze_schema(retyped)
+        self.assertEqual(len(sc.statusTracker().getJobIdsForGroup()), jobs_before)
+
+    def test_missing_optional_column_is_null(self):
+        df = self.transformer().apply_bronze_schema(
+            self.bronze_df([('CLM1', 'C', 'S', '2024-01-10', 10.0, 'd', 'PENDING', None, None)]).drop('description')
+        )
+        self.assertIsNone(df.first()['description'])
+
+    def test_claim_date_filter_uses_claim_day_partition(self):
+        transformer = self.transformer(claim_date_from='2024-01-01', claim_date_to='2024-01-31')
+
+        self.assertEqual(
+            transformer.claim_date_filter(['claim_date']),
+            "claim_date >= '2024-01-01' AND claim_date <= '2024-01-31'"
+        )
+        self.assertIn("claim_day >= DATE '2024-01-01'", transformer.claim_date_filter(['claim_date', 'claim_day']))
+
+
+class TestRunMetrics(SparkTestCase):
+
+    ROWS = [
+        ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'PENDING', None, None),
+        ('CLM2', 'CUST2', 'STORE2', '2024-01-11', 50.0, 'b', 'APPROVED', None, None),
+    ]
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.metrics_path = os.path.join(self.workdir, 'metrics', 'run.json')
+        self.sink = job.LocalParquetSink(os.path.join(self.workdir, 'silver'))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def run_transform(self, transformer):
+        with mock.patch.object(transformer, 'read_bronze_data', return_value=self.bronze_df(self.ROWS)):
+            return transformer.transform()
+
+    def test_metrics_document_per_phase_and_stage(self):
+        transformer = self.transformer(sink=self.sink, metrics_uri=self.metrics_path, quality_mode='aggregate')
+
+        result = self.run_transform(transformer)
+
+        with open(self.metrics_path) as f:
+            saved = json.load(f)
+        self.assertEqual(saved, result['metrics'])
+        self.assertEqual(saved['status'], 'success')
+        self.assertEqual(saved['records'], 2)
+        phases = {phase['name']: phase for phase in saved['phases']}
+        self.assertEqual(list(phases), ['read', 'transform', 'quality', 'layout', 'write', 'watermark'])
+        # La escritura lanza jobs con stages medidos; las fases perezosas no
+        self.assertGreater(phases['write']['stages'], 0)
+        self.assertEqual(phases['write']['outputRecords'], 2)
+        self.assertEqual(phases['transform']['jobs'], 0)
+        self.assertTrue(all(stage['phase'] in phases for stage in saved['stages']))
+        self.assertEqual(len({stage['stage_id'] for stage in saved['stages']}), len(saved['stages']))
+
+    def test_failed_run_publishes_partial_metrics(self):
+        transformer = self.transformer(sink=self.sink, metrics_uri=self.metrics_path)
+
+        with mock.patch.object(self.sink, '_save', side_effect=RuntimeError('BigQuery no disponible')):
+            with self.assertRaises(RuntimeError):
+                self.run_transform(transformer)
+
+        with open(self.metrics_path) as f:
+            saved = json.load(f)
+        self.assertEqual(saved['status'], 'failed')
+        self.assertEqual(saved['error'], 'BigQuery no disponible')
+        self.assertEqual([phase['name'] for phase in saved['phases']], ['read', 'transform', 'layout', 'write'])
+
+
+class TestSilverLayout(SparkTestCase):
+
+    def batch(self, customers):
+        rows = [
+            (f'CLM{i}', customer, f'STORE{i % 3}', '2024-01-10', 10.0 + i, 'a', 'PENDING', None, None)
+            for i, customer in enumerate(customers)
+        ]
+        transformer = self.transformer()
+        return transformer.add_technical_columns(transformer.apply_bronze_schema(self.bronze_df(rows)))
+
+    def partitions(self, df):
+        return [
+            [(row['customer_id'], row['store_id']) for row in partition]
+            for partition in df.select('customer_id', 'store_id').rdd.glom().collect()
+        ]
+
+    def test_files_sized_from_estimate_and_sorted_by_clustering_keys(self):
+        batch = self.batch([f'CUST{i % 20:02d}' for i in range(200)]).persist()
+        batch.count()
+        transformer = self.transformer(target_file_mb=1)
+        transformer.target_file_bytes = job._estimated_size(batch) // 4 + 1
+
+        layout = transformer.plan_silver_layout(batch)
+        partitions = self.partitions(transformer.layout_for_silver(batch, layout))
+
+        self.assertEqual(layout['files'], 4)
+        self.assertEqual(len(partitions), 4)
+        for partition in partitions:
+            self.assertEqual(partition, sorted(partition))
+        # Sin salting cada cliente queda en un solo archivo
+        owners = {customer: i for i, partition in enumerate(partitions) for customer, _ in partition}
+        self.assertTrue(all(owners[c] == i for i, partition in enumerate(partitions) for c, _ in partition))
+        batch.unpersist()
+
+    def test_hot_customers_are_salted(self):
+        customers = ['CUST_HOT'] * 150 + [f'CUST{i:02d}' for i in range(50)]
+        batch = self.batch(customers).persist()
+        batch.count()
+        transformer = self.transformer(target_file_mb=1, salt_buckets=4)
+        transformer.target_file_bytes = job._estimated_size(batch) // 8 + 1
+
+        layout = transformer.plan_silver_layout(batch, detect_skew=True)
+        partitions = self.partitions(transformer.layout_for_silver(batch, layout))
+
+        self.assertIn('CUST_HOT', layout['hot_customers'])
+        self.assertGreater(sum(1 for partition in partitions if ('CUST_HOT', 'STORE0') in partition), 1)
+        self.assertEqual(sum(len(partition) for partition in partitions), 200)
+        batch.unpersist()
+
+    def test_layout_disabled_by_default(self):
+        transformer = self.transformer()
+        batch = self.batch(['CUST1'])
+
+        self.assertIsNone(transformer.plan_silver_layout(batch))
+        self.assertIs(transformer.layout_for_silver(batch, None), batch)
+
+
+
+class TestGoldStaging(SparkTestCase):
+
+    ROWS = [
+        ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 2500.0, 'a', 'PENDING', '2024-01-10T08:00:00Z', None),
+        ('CLM2', 'CUST2', 'STORE2', '2024-03-06', 50.0, 'b', 'APPROVED', None, None),
+        # data_quality_score 0.5: no pasa a Gold
+        ('CLM3', 'CUST3', 'STORE1', '2024-03-06', -5.0, 'c', 'CLOSED', None, None),
+    ]
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.sink = job.LocalParquetSink(os.path.join(self.workdir, 'silver'))
+        self.gold_sink = job.LocalParquetSink(os.path.join(self.workdir, 'gold'))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def run_transform(self, transformer):
+        with mock.patch.object(transformer, 'read_bronze_data', return_value=self.bronze_df(self.ROWS)) as read:
+            result = transformer.transform()
+        self.assertEqual(read.call_count, 1)
+        return result
+
+    def test_rules_computed_in_same_pass(self):
+        transformer = self.transformer(sink=self.sink, gold_sink=self.gold_sink, dedup_lookback_days=7)
+
+        result = self.run_transform(transformer)
+        gold = {row['claim_id']: row for row in self.gold_sink.read(self.spark).collect()}
+
+        self.assertEqual(tuple(self.gold_sink.read(self.spark).columns), job.GOLD_STAGING_COLUMNS)
+        self.assertEqual(sorted(gold), ['CLM1', 'CLM2'])
+        self.assertEqual(result['gold_report']['rows'], 2)
+        self.assertEqual(result['sink_report']['rows'], 3)
+        self.assertEqual((gold['CLM1']['claim_priority'], gold['CLM1']['requires_escalation']), ('CRITICAL', True))
+        self.assertEqual((gold['CLM2']['claim_priority'], gold['CLM2']['period_category']), ('LOW', 'REGULAR'))
+        self.assertIsNone(gold['CLM2']['days_since_claim'])
+        phases = [phase['name'] for phase in result['metrics']['phases']]
+        self.assertLess(phases.index('gold'), phases.index('write'))
+
+    def test_retry_after_silver_failure_rewrites_same_staging(self):
+        """Gold se escribe antes que Silver: un reintento no pierde reclamos por la deduplicación"""
+        failing = self.transformer(sink=self.sink, gold_sink=self.gold_sink, dedup_lookback_days=7)
+        with mock.patch.object(self.sink, '_save', side_effect=RuntimeError('BigQuery no disponible')):
+            with self.assertRaises(RuntimeError):
+                self.run_transform(failing)
+
+        self.run_transform(self.transformer(sink=self.sink, gold_sink=self.gold_sink, dedup_lookback_days=7))
+
+        self.assertEqual(sorted(row['claim_id'] for row in self.gold_sink.read(self.spark).collect()), ['CLM1', 'CLM2'])
+
+
+class TestBackfill(SparkTestCase):
+
+    ROWS = [
+        ('CLM1', 'CUST1', 'STORE1', '2024-01-10', 100.0, 'a', 'PENDING', None, None, '2024-01-14'),
+        ('CLM2', 'CUST2', 'STORE2', '2024-01-13', 50.0, 'b', 'APPROVED', None, None, '2024-01-14'),
+        ('CLM3', 'CUST3', 'STORE1', '2024-01-14', 75.0, 'c', 'PENDING', None, None, '2024-01-15'),
+    ]
+    DAYS = ['2024-01-14', '2024-01-15']
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.sink = job.LocalParquetSink(os.path.join(self.workdir, 'silver'))
+        self.gold_sink = job.LocalParquetSink(os.path.join(self.workdir, 'gold'))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def bronze_df(self, rows):
+        return self.spark.createDataFrame(
+            rows, 'claim_id string, customer_id string, store_id string, claim_date string, '
+                  'claim_amount double, description string, status string, created_at string, '
+                  'updated_at string, ingest_date string'
+        ).withColumn('ingest_date', job.to_date('ingest_date'))
+
+    def run_backfill(self, rows, days=DAYS):
+        transformer = self.transformer(
+            sink=self.sink, gold_sink=self.gold_sink, ingest_dates=days,
+            write_mode='overwrite_partitions', dedup_lookback_days=7, backfill=True
+        )
+        with mock.patch.object(transformer, 'read_bronze_data', return_value=self.bronze_df(rows)):
+            return transformer.transform()
+
+    def silver(self):
+        return sorted(
+            (row['claim_id'], row['processing_date'].isoformat()) for row in self.sink.read(self.spark).collect()
+        )
+
+    def test_each_day_replaces_its_partitions(self):
+        """Un solo job escribe cada día en su processing_date; repetirlo no duplica"""
+        for _ in range(2):
+            result = self.run_backfill(self.ROWS)
+
+        self.assertEqual(self.silver(), [('CLM1', '2024-01-14'), ('CLM2', '2024-01-14'), ('CLM3', '2024-01-15')])
+        self.assertEqual(
+            sorted(row['processing_date'].isoformat() for row in self.gold_sink.read(self.spark).collect()),
+            ['2024-01-14', '2024-01-14', '2024-01-15']
+        )
+        self.assertEqual(result['days_report'], {'2024-01-14': 2, '2024-01-15': 1})
+        metrics = result['metrics']
+        self.assertEqual((metrics['days'], metrics['records_by_day']), (2, result['days_report']))
+        self.assertAlmostEqual(metrics['seconds_per_day'], metrics['wall_seconds'] / 2, places=2)
+        self.assertIsNone(result['watermark'])
+
+    def test_dedups_against_days_before_range(self):
+        """Los registros ya escritos antes del rango se descartan"""
+        self.run_backfill([self.ROWS[0][:-1] + ('2024-01-12',)], days=['2024-01-12'])
+
+        result = self.run_backfill(self.ROWS)
+
+        self.assertEqual(self.silver(), [('CLM1', '2024-01-12'), ('CLM2', '2024-01-14'), ('CLM3', '2024-01-15')])
+        self.assertEqual(result['days_report'], {'2024-01-14': 1, '2024-01-15': 1})
+
+    def test_dedup_window_is_bounded_around_range(self):
+        """Solo las particiones a dedup_lookback_days del rango, no todas hasta hoy"""
+        sink = mock.Mock(supported_modes=('append', 'overwrite_partitions'))
+        transformer = self.transformer(
+            sink=sink, ingest_dates=self.DAYS, write_mode='overwrite_partitions', dedup_lookback_days=7, backfill=True
+        )
+
+        transformer.read_silver_hashes()
+
+        sink.read.assert_called_once_with(
+            self.spark,
+            "processing_date >= DATE '2024-01-07' AND processing_date <= DATE '2024-01-22' "
+            "AND processing_date NOT IN (DATE '2024-01-14', DATE '2024-01-15')"
+        )
+
+    def test_requires_explicit_days_and_partition_overwrite(self):
+        with self.assertRaises(ValueError):
+            self.transformer(backfill=True, write_mode='overwrite_partitions')
+        with self.assertRaises(ValueError):
+            self.transformer(backfill=True, ingest_dates=self.DAYS)
+
+
+class TestStreaming(SparkTestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.bronze = os.path.join(self.workdir, 'bronze')
+        self.checkpoint = os.path.join(self.workdir, 'checkpoint')
+        self.metrics_uri = os.path.join(self.workdir, 'metrics.json')
+        self.sink = job.LocalParquetSink(os.path.join(self.workdir, 'silver'))
+        self.gold_sink = job.LocalParquetSink(os.path.join(self.workdir, 'gold'))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def land(self, name, claims, ingest_date='2024-01-14'):
+        """Aterrizar un archivo NDJSON de forma atómica, como la ingesta"""
+        directory = os.path.join(self.bronze, f'ingest_date={ingest_date}')
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(self.workdir, name)
+        with open(tmp, 'w') as f:
+            for claim_id, amount, status in claims:
+                f.write(json.dumps({
+                    'claim_id': claim_id, 'customer_id': f'CUST{claim_id}', 'store_id': 'STORE1',
+                    'claim_date': '2024-01-10', 'claim_amount': amount, 'description': 'x',
+                    'status': status, 'created_at': '2024-01-10T08:00:00Z', 'updated_at': None
+                }) + '\n')
+        os.rename(tmp, os.path.join(directory, name))
+
+    def run_stream(self, **kwargs):
+        transformer = self.transformer(
+            sink=self.sink, gold_sink=self.gold_sink, dedup_lookback_days=7, metrics_uri=self.metrics_uri
+        )
+        result = transformer.transform_stream(
+            self.bronze, self.checkpoint, available_now=True, max_files_per_trigger=1, **kwargs
+        )
+        return transformer, result
+
+    def silver_ids(self):
+        return sorted(row['claim_id'] for row in self.sink.read(self.spark).collect())
+
+    def test_micro_batches_per_file_with_latency(self):
+        self.land('a.json', [('1', 100.0, 'pending'), ('2', 2500.0, 'APPROVED')])
+        self.land('b.json', [('3', 50.0, 'CLOSED')], ingest_date='2024-01-15')
+
+        _, result = self.run_stream()
+
+        self.assertEqual(self.silver_ids(), ['1', '2', '3'])
+        self.assertEqual(sorted(row['claim_id'] for row in self.gold_sink.read(self.spark).collect()), ['1', '2', '3'])
+        batches = result['metrics']['batches']
+        self.assertEqual(sorted(b['records'] for b in batches), [1, 2])
+        for batch in batches:
+            self.assertGreaterEqual(batch['min_latency_seconds'], 0)
+            self.assertGreaterEqual(batch['max_latency_seconds'], batch['min_latency_seconds'])
+        with open(self.metrics_uri) as f:
+            self.assertEqual(json.load(f)['engine'], 'spark-streaming')
+        # Misma limpieza que el batch
+        statuses = {row['claim_id']: row['status'] for row in self.sink.read(self.spark).collect()}
+        self.assertEqual(statuses['1'], 'PENDING')
+
+    def test_restart_reads_only_new_files(self):
+        self.land('a.json', [('1', 100.0, 'PENDING')])
+        self.run_stream()
+        self.land('b.json', [('2', 100.0, 'PENDING')])
+
+        _, result = self.run_stream()
+
+        self.assertEqual(self.silver_ids(), ['1', '2'])
+        self.assertEqual(result['batches'], 1)
+
+    def test_replayed_micro_batch_is_skipped(self):
+        """Un micro-lote repetido tras su commit no vuelve a escribirse"""
+        self.land('a.json', [('1', 100.0, 'PENDING')])
+        transformer, _ = self.run_stream()
+        replay = self.spark.read.schema(job.BRONZE_FILE_SCHEMA).json(self.bronze) \
+            .withColumn('_file_modification_time', job.current_timestamp())
+
+        transformer.process_micro_batch(replay, 0)
+
+        self.assertEqual(self.silver_ids(), ['1'])
+
+    def test_replay_after_silver_failure_does_not_restage_gold(self):
+        """Un micro-lote que falló tras escribir el staging no lo agrega dos veces al repetirse"""
+        self.land('a.json', [('1', 100.0, 'PENDING')])
+        transformer, _ = self.run_stream()
+        self.land('b.json', [('2', 100.0, 'PENDING')])
+        replay = self.spark.read.schema(job.BRONZE_FILE_SCHEMA) \
+            .json(os.path.join(self.bronze, 'ingest_date=2024-01-14', 'b.json')) \
+            .withColumn('_file_modification_time', job.current_timestamp())
+
+        with mock.patch.object(transformer, 'write_to_silver', side_effect=IOError('escritura fallida')):
+            with self.assertRaises(IOError):
+                transformer.process_micro_batch(replay, 1)
+        transformer.process_micro_batch(replay, 1)
+
+        self.assertEqual(self.silver_ids(), ['1', '2'])
+        self.assertEqual(sorted(row['claim_id'] for row in self.gold_sink.read(self.spark).collect()), ['1', '2'])
+
+    def test_micro_batch_releases_cached_frames(self):
+        """Ni el micro-lote ni el lote deduplicado quedan en caché, tampoco si falla"""
+        cache = self.spark._jsparkSession.sharedState().cacheManager()
+        self.land('a.json', [('1', 100.0, 'PENDING')])
+        transformer, _ = self.run_stream()
+        self.assertTrue(cache.isEmpty())
+
+        replay = self.spark.read.schema(job.BRONZE_FILE_SCHEMA).json(self.bronze) \
+            .withColumn('_file_modification_time', job.current_timestamp())
+        with mock.patch.object(transformer, 'write_to_silver', side_effect=IOError('escritura fallida')):
+            with self.assertRaises(IOError):
+                transformer.process_micro_batch(replay, 1)
+        self.assertTrue(cache.isEmpty())
+
+
+class TestBronzeFiles(SparkTestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.bronze = os.path.join(self.workdir, 'bronze')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def claims(self, *claim_ids):
+        return [
+            {
+                'claim_id': claim_id, 'customer_id': f'CUST{claim_id}', 'store_id': 'STORE1',
+                'claim_date': '2024-01-10', 'claim_amount': 100.0, 'description': 'x',
+                'status': 'pending', 'created_at': '2024-01-10T08:00:00Z', 'updated_at': None
+            }
+            for claim_id in claim_ids
+        ]
+
+    def land(self, name, claims, ingest_date='2024-01-14'):
+        """Archivo Bronze como lo aterriza la ingesta (.json, .json.gz o .parquet)"""
+        directory = os.path.join(self.bronze, f'ingest_date={ingest_date}')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        if name.endswith('.parquet'):
+            staging = os.path.join(self.workdir, 'staging')
+            schema = job.StructType([f for f in job.BRONZE_FILE_SCHEMA.fields if f.name != 'ingest_date'])
+            self.spark.createDataFrame(claims, schema).coalesce(1).write.parquet(staging)
+            part = [f for f in os.listdir(staging) if f.endswith('.parquet')][0]
+            os.rename(os.path.join(staging, part), path)
+            shutil.rmtree(staging)
+        else:
+            lines = ''.join(json.dumps(claim) + '\n' for claim in claims).encode()
+            with (gzip.open if name.endswith('.gz') else open)(path, 'wb') as f:
+                f.write(lines)
+        return path
+
+    def test_reads_landed_formats_without_bigquery(self):
+        uris = [
+            self.land('a.json', self.claims('1', '2')),
+            self.land('b.json.gz', self.claims('3')),
+            self.land('c.parquet', self.claims('4')),
+        ]
+        sink = job.LocalParquetSink(os.path.join(self.workdir, 'silver'))
+        transformer = self.transformer(bronze_uris=uris, ingest_dates=['2024-01-14'], sink=sink)
+
+        # Sin el conector de BigQuery en los tests: la corrida solo termina leyendo los archivos
+        result = transformer.transform()
+
+        rows = sink.read(self.spark).collect()
+        self.assertEqual(sorted(row['claim_id'] for row in rows), ['1', '2', '3', '4'])
+        self.assertEqual({row['status'] for row in rows}, {'PENDING'})
+        report = result['metrics']['bronze_read_report']
+        self.assertEqual(report['source'], 'files')
+        self.assertEqual(report['formats'], {'json': 2, 'parquet': 1})
+        self.assertEqual(report['unsplittable_files'], 1)
+        self.assertEqual(result['quality_report']['max_ingest_date'], '2024-01-14')
+
+    def test_partition_and_claim_date_filters_apply(self):
+        """Un archivo de otra partición (omitido por la ingesta) no entra en la corrida"""
+        uris = [self.land('a.json', self.claims('1')), self.land('b.json', self.claims('2'), '2024-01-13')]
+        transformer = self.transformer(bronze_uris=uris, ingest_dates=['2024-01-14'])
+
+        df = transformer.apply_bronze_schema(transformer.read_bronze_files())
+        self.assertEqual([(r['claim_id'], r['ingest_date'].isoformat()) for r in df.collect()], [('1', '2024-01-14')])
+
+        transformer = self.transformer(bronze_uris=uris, ingest_dates=['2024-01-14'], claim_date_from='2024-02-01')
+        self.assertEqual(transformer.read_bronze_files().count(), 0)
+
+    def test_falls_back_to_bigquery_when_partitions_missing(self):
+        uri = os.path.join(self.bronze, 'ingest_date=2024-01-14', 'a.json')
+        checkpoint = os.path.join(self.workdir, 'watermark.json')
+        incremental = self.transformer(bronze_uris=[uri], checkpoint_uri=checkpoint, until_ingest_date='2024-01-14')
+
+        incremental.watermark = '2024-01-13'
+        self.assertTrue(incremental.bronze_files_cover())
+        # Una corrida previa fallida dejó pendiente 2024-01-13
+        incremental.watermark = '2024-01-12'
+        self.assertFalse(incremental.bronze_files_cover())
+        incremental.watermark = None
+        self.assertFalse(incremental.bronze_files_cover())
+        two_days = self.transformer(bronze_uris=[uri], ingest_dates=['2024-01-13', '2024-01-14'])
+        self.assertFalse(two_days.bronze_files_cover())
+        self.assertFalse(self.transformer(bronze_uris=[uri], full_refresh=True).bronze_files_cover())
+        self.assertFalse(self.transformer().bronze_files_cover())
+        with self.assertRaisesRegex(ValueError, 'a.csv'):
+            self.transformer(bronze_uris=['gs://b/ingest_date=2024-01-14/a.csv'])
+
+    def test_falls_back_when_partition_has_unlisted_files(self):
+        """Una partición con archivos de una corrida anterior sin procesar no se cubre con las URIs del día"""
+        earlier = self.land('claims_2024-01-12.json', self.claims('1'))
+        today = self.land('claims_2024-01-13.json', self.claims('2'))
+        self.land('._staging.json', self.claims('3'))
+        transformer = self.transformer(bronze_uris=[today], ingest_dates=['2024-01-14'])
+
+        self.assertFalse(transformer.bronze_files_cover())
+        self.assertEqual([os.path.basename(f) for f in transformer.unlisted_bronze_files({'2024-01-14'})],
+                         ['claims_2024-01-12.json'])
+        self.assertTrue(self.transformer(bronze_uris=[earlier, today], ingest_dates=['2024-01-14']).bronze_files_cover())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,290 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../dataproc/jobs'))
+
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+try:
+    from pyspark.sql import SparkSession
+    SPARK_AVAILABLE = bool(shutil.which('java') or os.environ.get('JAVA_HOME'))
+except ImportError:
+    SPARK_AVAILABLE = False
+
+if POLARS_AVAILABLE:
+    import bronze_to_silver_polars as polars_job
+
+if SPARK_AVAILABLE:
+    import bronze_to_silver_transform as spark_job
+
+from claims_schema import CLAIM_FIELDS, GOLD_STAGING_COLUMNS, RECORD_HASH_COLUMNS, SILVER_COLUMNS
+
+# Casos que deben hashearse igual en ambos motores: espacios, nulos opcionales,
+# montos con redondeo de centavos y timestamps con y sin zona horaria
+ROWS = [
+    {'claim_id': ' CLM1 ', 'customer_id': 'CUST1', 'store_id': 'STORE1', 'claim_date': '2024-01-10',
+     'claim_amount': 100.0, 'description': ' Producto defectuoso ', 'status': 'pending',
+     'created_at': '2024-01-10T08:30:00Z', 'updated_at': '2024-01-11T09:00:00.123456Z'},
+    {'claim_id': 'CLM2', 'customer_id': 'CUST1', 'store_id': 'STORE2', 'claim_date': '2024-01-12',
+     'claim_amount': 1234.565, 'description': None, 'status': 'APPROVED',
+     'created_at': '2024-01-12 10:00:00', 'updated_at': '2024-01-12T10:00:00-05:00'},
+    {'claim_id': None, 'customer_id': 'CUST2', 'store_id': 'STORE1', 'claim_date': '2024-01-11',
+     'claim_amount': None, 'description': 'c', 'status': 'Rejected',
+     'created_at': None, 'updated_at': '2024-01-11'},
+    {'claim_id': 'CLM4', 'customer_id': None, 'store_id': 'STORE1', 'claim_date': 'no-date',
+     'claim_amount': -5.5, 'description': 'd', 'status': 'CLOSED',
+     'created_at': '2024-01-15T23:59:59.5+02:00', 'updated_at': 'invalido'},
+    {'claim_id': 'CLM5', 'customer_id': 'CUST3', 'store_id': 'STORE3', 'claim_date': '2024-02-29',
+     'claim_amount': 0.1, 'description': 'e|f', 'status': ' closed ',
+     'created_at': '2024-02-29T00:00:00.000001Z', 'updated_at': None},
+]
+
+
+def write_bronze(root, partitions):
+    """Bronze local con el layout de GCS: ingest_date=YYYY-MM-DD/*.json"""
+    for ingest_date, rows in partitions.items():
+        directory = os.path.join(root, f'ingest_date={ingest_date}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'claims.json'), 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+
+
+@unittest.skipUnless(POLARS_AVAILABLE, 'polars no disponible')
+class TestPolarsEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='polars_engine_')
+        self.bronze = os.path.join(self.workdir, 'bronze')
+        self.silver = os.path.join(self.workdir, 'silver')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def transformer(self, ingest_dates, **kwargs):
+        return polars_job.PolarsBronzeToSilverTransformer(
+            'project', self.bronze, ingest_dates, sink=polars_job.LocalParquetFileSink(self.silver), **kwargs
+        )
+
+    def test_reads_only_requested_partitions(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS[:2], '2024-01-11': ROWS[2:]})
+
+        df = self.transformer(['2024-01-11']).silver_frame().collect()
+
+        self.assertEqual(df.height, 3)
+        self.assertEqual(df['ingest_date'].unique().to_list(), [date(2024, 1, 11)])
+
+    def test_transform_writes_silver_columns(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+
+        result = self.transformer(['2024-01-10']).transform()
+        silver = polars_job.LocalParquetFileSink(self.silver).read()
+
+        self.assertEqual(result['engine'], 'polars')
+        self.assertEqual(result['sink_report']['rows'], len(ROWS))
+        self.assertEqual(tuple(silver.columns), SILVER_COLUMNS)
+        self.assertEqual(result['quality_report']['max_ingest_date'], '2024-01-10')
+        self.assertEqual([phase['name'] for phase in result['metrics']['phases']], ['transform', 'dedup', 'quality', 'write'])
+        self.assertEqual(result['metrics']['records'], len(ROWS))
+
+    def test_overwrite_partitions_is_idempotent(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+
+        for _ in range(2):
+            self.transformer(['2024-01-10'], write_mode='overwrite_partitions').transform()
+
+        self.assertEqual(polars_job.LocalParquetFileSink(self.silver).read().height, len(ROWS))
+
+    def test_rerun_appends_only_new_records(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+        self.transformer(['2024-01-10']).transform()
+
+        result = self.transformer(['2024-01-10']).transform()
+
+        self.assertEqual(result['sink_report']['rows'], 0)
+        self.assertEqual(result['dedup_report']['existing_duplicates'], len(ROWS))
+        self.assertEqual(polars_job.LocalParquetFileSink(self.silver).read().height, len(ROWS))
+
+    def test_same_day_rerun_keeps_rows_of_other_ingest_dates(self):
+        # Una corrida anterior del mismo día escribió los días pendientes en la misma partición processing_date
+        write_bronze(self.bronze, {'2024-01-09': ROWS[:2], '2024-01-10': ROWS[1:]})
+        self.transformer(['2024-01-09', '2024-01-10']).transform()
+
+        result = self.transformer(['2024-01-10']).transform()
+        silver = polars_job.LocalParquetFileSink(self.silver).read()
+
+        self.assertEqual(result['sink_report']['rows'], 0)
+        self.assertEqual(silver.height, len(ROWS))
+        self.assertEqual(silver['record_hash'].n_unique(), len(ROWS))
+
+    def test_dedup_window_excludes_older_partitions(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+        stale = self.transformer(['2024-01-10']).silver_frame().collect() \
+            .with_columns(pl.lit(date(2000, 1, 1)).alias('processing_date')).select(SILVER_COLUMNS)
+        polars_job.LocalParquetFileSink(self.silver).write(stale)
+
+        result = self.transformer(['2024-01-10'], dedup_lookback_days=7).transform()
+
+        self.assertEqual(result['dedup_report']['existing_hashes'], 0)
+        self.assertEqual(result['sink_report']['rows'], len(ROWS))
+
+    def test_parquet_drift_is_rejected(self):
+        # Parquet trae su propio esquema: un tipo incompatible falla antes de leer datos
+        directory = os.path.join(self.bronze, 'ingest_date=2024-01-10')
+        os.makedirs(directory)
+        pl.DataFrame(ROWS).with_columns(pl.col('claim_amount').cast(pl.Utf8)) \
+            .write_parquet(os.path.join(directory, 'claims.parquet'))
+
+        with self.assertRaisesRegex(ValueError, 'claim_amount'):
+            self.transformer(['2024-01-10']).silver_frame()
+
+    def test_gold_staging_written_in_same_pass(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+        gold_sink = polars_job.LocalParquetFileSink(os.path.join(self.workdir, 'gold'))
+
+        result = self.transformer(['2024-01-10'], gold_sink=gold_sink).transform()
+        gold = gold_sink.read()
+
+        # Solo los reclamos con data_quality_score >= 0.7 (sin CLM3 sin id ni CLM4 sin cliente)
+        self.assertEqual(tuple(gold.columns), GOLD_STAGING_COLUMNS)
+        self.assertEqual(sorted(gold['claim_id'].to_list()), ['CLM1', 'CLM2', 'CLM5'])
+        self.assertEqual(result['gold_report']['rows'], 3)
+        self.assertEqual([phase['name'] for phase in result['metrics']['phases']],
+                         ['transform', 'dedup', 'quality', 'gold', 'write'])
+
+    def test_requires_ingest_dates(self):
+        with self.assertRaises(ValueError):
+            self.transformer([])
+
+    def test_watermark_advances_after_silver_write(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+        checkpoint = os.path.join(self.workdir, 'checkpoints', 'watermark.json')
+
+        result = self.transformer(['2024-01-10'], checkpoint_uri=checkpoint).transform()
+
+        self.assertEqual(result['watermark'], '2024-01-10')
+        self.assertEqual(polars_job.WatermarkFile(checkpoint).load()['ingest_date'], '2024-01-10')
+        self.assertEqual(result['metrics']['phases'][-1]['name'], 'watermark')
+
+    def test_pending_days_since_watermark_are_processed(self):
+        # Un día fallido (2024-01-10) queda pendiente detrás del watermark
+        write_bronze(self.bronze, {'2024-01-09': ROWS[:1], '2024-01-10': ROWS[:2], '2024-01-11': ROWS[2:]})
+        checkpoint = os.path.join(self.workdir, 'watermark.json')
+        polars_job.WatermarkFile(checkpoint).save({'ingest_date': '2024-01-09'})
+
+        transformer = self.transformer(['2024-01-11'], checkpoint_uri=checkpoint)
+        result = transformer.transform()
+
+        self.assertEqual(transformer.ingest_dates, ['2024-01-10', '2024-01-11'])
+        self.assertEqual(result['sink_report']['rows'], len(ROWS))
+        self.assertEqual(polars_job.WatermarkFile(checkpoint).load()['ingest_date'], '2024-01-11')
+
+    def test_watermark_unchanged_when_silver_write_fails(self):
+        write_bronze(self.bronze, {'2024-01-10': ROWS})
+        checkpoint = os.path.join(self.workdir, 'watermark.json')
+        polars_job.WatermarkFile(checkpoint).save({'ingest_date': '2024-01-09'})
+        transformer = self.transformer(['2024-01-10'], checkpoint_uri=checkpoint)
+        transformer.sink.write = mock.Mock(side_effect=IOError('load job fallido'))
+
+        with self.assertRaises(IOError):
+            transformer.transform()
+        self.assertEqual(polars_job.WatermarkFile(checkpoint).load(), {'ingest_date': '2024-01-09'})
+
+
+@unittest.skipUnless(POLARS_AVAILABLE and SPARK_AVAILABLE, 'polars/pyspark/Java no disponibles')
+class TestEngineParity(unittest.TestCase):
+    """Mismos datos Bronze por ambos motores: Silver y reporte de calidad idénticos"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder \
+            .master('local[1]') \
+            .appName('tests') \
+            .config('spark.ui.enabled', 'false') \
+            .config('spark.sql.shuffle.partitions', '1') \
+            .config('spark.sql.session.timeZone', 'UTC') \
+            .getOrCreate()
+        cls.spark.sparkContext.setLogLevel('ERROR')
+
+        cls.workdir = tempfile.mkdtemp(prefix='engine_parity_')
+        bronze = os.path.join(cls.workdir, 'bronze')
+        write_bronze(bronze, {'2024-01-10': ROWS[:3], '2024-01-11': ROWS[3:]})
+
+        cls.polars_transformer = polars_job.PolarsBronzeToSilverTransformer(
+            'project', bronze, ['2024-01-10', '2024-01-11'], sink=polars_job.LocalParquetFileSink(cls.workdir)
+        )
+        cls.polars_df = cls.polars_transformer.silver_frame().collect()
+
+        source = ', '.join(
+            f"{name} {'double' if bq_type == 'FLOAT64' else 'string'}" for name, bq_type, _ in CLAIM_FIELDS
+        )
+        cls.spark_transformer = spark_job.BronzeToSilverTransformer('project', 'retail_claims_silver', 'bucket/temp')
+        bronze_df = cls.spark.read.schema(f'{source}, ingest_date date').json(bronze)
+        df = cls.spark_transformer.apply_bronze_schema(bronze_df)
+        cls.spark_df = cls.spark_transformer.add_technical_columns(cls.spark_transformer.clean_and_standardize(df))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    @staticmethod
+    def sorted_rows(rows):
+        # Spark devuelve timestamps sin zona en la hora local del proceso; Polars, con zona UTC
+        rows = [tuple(v.astimezone(timezone.utc) if isinstance(v, datetime) else v for v in row) for row in rows]
+        return sorted(rows, key=lambda row: tuple((v is None, str(v)) for v in row))
+
+    def spark_rows(self, columns):
+        return self.sorted_rows(self.spark_df.select(*columns).collect())
+
+    def polars_rows(self, columns):
+        return self.sorted_rows(self.polars_df.select(columns).rows())
+
+    def test_spark_reads_polars_watermark(self):
+        checkpoint = os.path.join(self.workdir, 'watermark.json')
+        write_bronze(os.path.join(self.workdir, 'bronze'), {'2024-01-12': ROWS})
+        polars_job.PolarsBronzeToSilverTransformer(
+            'project', os.path.join(self.workdir, 'bronze'), ['2024-01-12'],
+            sink=polars_job.LocalParquetFileSink(os.path.join(self.workdir, 'silver')), checkpoint_uri=checkpoint
+        ).transform()
+
+        spark_transformer = spark_job.BronzeToSilverTransformer(
+            'project', 'retail_claims_silver', 'bucket/temp', checkpoint_uri=checkpoint, until_ingest_date='2024-01-13'
+        )
+
+        self.assertEqual(spark_transformer.load_watermark(), '2024-01-12')
+        self.assertIn("ingest_date > DATE '2024-01-12'", spark_transformer.bronze_partition_filter())
+
+    def test_record_hash_is_identical(self):
+        columns = ['claim_id', 'record_hash']
+        self.assertEqual(self.polars_rows(columns), self.spark_rows(columns))
+
+    def test_cleaned_values_are_identical(self):
+        columns = list(RECORD_HASH_COLUMNS) + ['data_quality_score']
+        self.assertEqual(self.polars_rows(columns), self.spark_rows(columns))
+
+    def test_quality_report_is_identical(self):
+        spark_report = self.spark_transformer.validate_data_quality(self.spark_df)
+        polars_report = self.polars_transformer.validate_data_quality(self.polars_df.lazy())
+
+        self.assertEqual(polars_report, spark_report)
+
+    def test_gold_staging_is_identical(self):
+        columns = [c for c in GOLD_STAGING_COLUMNS if c != 'processing_timestamp']
+        spark_gold = self.spark_transformer.build_gold_staging(self.spark_df).select(*columns).collect()
+        polars_gold = self.polars_transformer.gold_frame(self.polars_df).select(columns).rows()
+
+        self.assertEqual(self.sorted_rows(polars_gold), self.sorted_rows(spark_gold))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,756 @@
+import gzip
+import io
+import json
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../cloud_functions/ingest_sftp_to_gcs'))
+
+import main
+import paramiko
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class FakeRemoteFile:
+    """Archivo SFTP en memoria con la interfaz readv de paramiko"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.readv_calls = []
+
+    def readv(self, chunks):
+        self.readv_calls.append(list(chunks))
+        for offset, size in chunks:
+            yield self.data[offset:offset + size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class FakeSFTP:
+    def __init__(self, files, mtimes=None):
+        self.files = files
+        self.mtimes = mtimes or {}
+        self.closed = False
+
+    def stat(self, path):
+        return mock.Mock(st_size=len(self.files[path]), st_mtime=self.mtimes.get(path, 1700000000))
+
+    def file(self, path, mode='r'):
+        return FakeRemoteFile(self.files[path])
+
+    def listdir_attr(self, path):
+        prefix = path.rstrip('/') + '/'
+        return [
+            mock.Mock(filename=name[len(prefix):], st_mode=stat.S_IFREG | 0o644)
+            for name in self.files
+            if name.startswith(prefix) and '/' not in name[len(prefix):]
+        ]
+
+    def get_channel(self):
+        return mock.Mock()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWriter(io.RawIOBase):
+    """BlobWriter en memoria: solo publica el contenido al cerrar.
+
+    No expone los atributos internos de BlobWriter (_buffer): el descarte de
+    una subida no puede depender de ellos.
+    """
+
+    def __init__(self, bucket, name):
+        super().__init__()
+        self.bucket = bucket
+        self.name = name
+        self._content = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self._content.closed:
+            raise ValueError('I/O operation on closed file.')
+        return self._content.write(data)
+
+    def tell(self):
+        return self._content.tell()
+
+    @property
+    def closed(self):
+        return self._content.closed
+
+    def close(self):
+        if not self._content.closed:
+            self.bucket.objects[self.name] = self._content.getvalue()
+            self.bucket.finalized.append(self.name)
+            self._content.close()
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = bucket.generations.get(name)
+
+    def open(self, mode, **kwargs):
+        return FakeWriter(self.bucket, self.name)
+
+    def download_as_bytes(self, if_generation_match=None):
+        return self.bucket.objects[self.name]
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if if_generation_match is not None and if_generation_match != self.bucket.generations.get(self.name, 0):
+            raise PreconditionFailed('generation mismatch')
+        self.bucket.objects[self.name] = data.encode() if isinstance(data, str) else data
+        self.bucket.generations[self.name] = self.bucket.generations.get(self.name, 0) + 1
+        self.generation = self.bucket.generations[self.name]
+
+    def delete(self):
+        if self.name not in self.bucket.objects:
+            raise NotFound('no existe')
+        del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    """Bucket en memoria con generaciones para las precondiciones del manifiesto"""
+
+    name = 'test-bucket'
+
+    def __init__(self):
+        self.objects = {}
+        self.generations = {}
+        self.finalized = []
+        self.published = []
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def copy_blob(self, blob, destination_bucket, new_name):
+        destination_bucket.objects[new_name] = self.objects[blob.name]
+        destination_bucket.published.append(new_name)
+        return FakeBlob(destination_bucket, new_name)
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+def make_ingestion(bucket=None, **overrides):
+    bucket = bucket or FakeBucket()
+    uploaded = bucket.objects
+    config = {
+        'sftp_host': 'sftp.example.com',
+        'sftp_remote_path': '/retail-claims',
+        'gcs_bucket': 'test-bucket',
+        'chunk_size': 64,
+        'prefetch_chunks': 2,
+        'use_manifest': False,
+    }
+    config.update(overrides)
+    client = mock.Mock()
+    client.bucket.return_value = bucket
+    with mock.patch.object(main, 'get_storage_client', return_value=client):
+        ingestion = main.SFTPToGCSIngestion(config)
+    return ingestion, uploaded
+
+
+def ndjson(records):
+    return b''.join(json.dumps(r).encode() + b'\n' for r in records)
+
+
+def claim(i, **overrides):
+    record = {
+        'claim_id': f'CLM{i:03d}',
+        'customer_id': f'CUST{i % 7:03d}',
+        'store_id': f'STORE{i % 3:03d}',
+        'claim_date': '2024-01-15',
+        'claim_amount': 100.0 + i,
+        'description': 'Producto defectuoso',
+        'status': 'PENDING',
+        'created_at': '2024-01-15T10:30:00Z',
+    }
+    record.update(overrides)
+    return record
+
+
+class TestNDJSONClaimsValidator(unittest.TestCase):
+
+    def test_lines_split_across_chunks(self):
+        """Valida registros aunque una línea quede partida entre bloques"""
+        data = ndjson([claim(i) for i in range(20)])
+        validator = main.NDJSONClaimsValidator()
+        output = b''
+        for start in range(0, len(data), 7):
+            valid, invalid = validator.feed(data[start:start + 7])
+            output += valid
+            self.assertEqual(invalid, [])
+        output += validator.close()[0]
+
+        self.assertEqual(validator.valid_records, 20)
+        self.assertEqual(output, data)
+
+    def test_invalid_lines_are_separated_with_line_numbers(self):
+        """Las líneas inválidas se reportan con número de línea sin rechazar el resto"""
+        lines = [
+            json.dumps(claim(1)),
+            '{"claim_id": ',
+            '',
+            json.dumps(claim(2, claim_amount='ciento cincuenta')),
+            json.dumps(claim(3, claim_date='15/01/2024')),
+            json.dumps(claim(4, status=None)),
+            json.dumps(claim(5, description=None)),
+            '[1, 2]',
+        ]
+        validator = main.NDJSONClaimsValidator()
+        valid, invalid = validator.feed('\n'.join(lines).encode())
+        tail_valid, tail_invalid = validator.close()
+
+        self.assertEqual(valid.count(b'\n'), 2)
+        self.assertEqual([line for line, _, _ in invalid + tail_invalid], [2, 4, 5, 6, 8])
+        self.assertIn('claim_amount', invalid[1][1])
+        self.assertIn('status', invalid[3][1])
+        self.assertEqual((validator.valid_records, validator.invalid_records), (2, 5))
+
+    def test_numeric_string_amounts_are_written_as_numbers(self):
+        """claim_amount como texto numérico se acepta y llega a Bronze como número"""
+        lines = [
+            json.dumps(claim(1, claim_amount='125.50')),
+            json.dumps(claim(2)),
+            json.dumps(claim(3, claim_amount=' 80 ')),
+            json.dumps(claim(4, claim_amount='NaN')),
+        ]
+        validator = main.NDJSONClaimsValidator()
+        valid, invalid = validator.feed('\n'.join(lines).encode() + b'\n')
+
+        records = [json.loads(line) for line in valid.splitlines()]
+        self.assertEqual([r['claim_amount'] for r in records], [125.5, 102.0, 80.0])
+        self.assertEqual([line for line, _, _ in invalid], [4])
+
+        grouped, _ = main.NDJSONClaimsValidator().feed_by_claim_date(lines[0].encode() + b'\n')
+        self.assertEqual(json.loads(grouped['2024-01-15'])['claim_amount'], 125.5)
+
+    def test_line_over_limit_is_rejected(self):
+        """El buffer de línea parcial está acotado"""
+        validator = main.NDJSONClaimsValidator(max_line_bytes=16)
+        with self.assertRaises(ValueError):
+            validator.feed(b'{"description": "' + b'x' * 32)
+
+
+class TestStreamingTransfer(unittest.TestCase):
+
+    def test_stream_uploads_in_bounded_windows(self):
+        """El archivo se transfiere completo en ventanas de prefetch acotadas"""
+        data = ndjson([claim(i) for i in range(50)])
+        ingestion, uploaded = make_ingestion()
+        sftp = FakeSFTP({'/retail-claims/claims.json': data})
+        ssh = mock.Mock(open_sftp=lambda: sftp)
+
+        result = ingestion.stream_sftp_to_gcs(ssh, 'claims.json')
+
+        self.assertEqual(uploaded[result['gcs_path']], data)
+        # El temporal de la subida se elimina tras publicar
+        self.assertEqual(list(uploaded), [result['gcs_path']])
+        self.assertEqual(result['bytes_transferred'], len(data))
+        self.assertEqual(result['records'], 50)
+        self.assertIn('throughput_mb_s', result)
+        self.assertGreater(result['rss_mb'], 0)
+        self.assertTrue(sftp.closed)
+
+    def test_invalid_lines_go_to_quarantine(self):
+        """Las líneas inválidas van a cuarentena y las válidas llegan a Bronze"""
+        good = ndjson([claim(1), claim(2)])
+        data = ndjson([claim(1)]) + b'not json\n' + ndjson([claim(2)])
+        ingestion, uploaded = make_ingestion()
+        ssh = mock.Mock(open_sftp=lambda: FakeSFTP({'/retail-claims/claims.json': data}))
+
+        result = ingestion.stream_sftp_to_gcs(ssh, 'claims.json')
+
+        self.assertEqual(uploaded[result['gcs_path']], good)
+        self.assertEqual((result['records'], result['invalid_records']), (2, 1))
+        quarantine_path = result['quarantine_path'].replace('gs://test-bucket/', '')
+        self.assertTrue(quarantine_path.startswith('quarantine/retail-claims/'))
+        quarantined = json.loads(uploaded[quarantine_path])
+        self.assertEqual(quarantined['line_number'], 2)
+        self.assertEqual(quarantined['raw'], 'not json')
+
+    def test_failed_transfer_is_not_published(self):
+        """Un error a mitad de la transferencia no deja un objeto parcial en GCS"""
+        data = ndjson([claim(1)]) + b'x' * (2 * 1024 * 1024)
+        ingestion, uploaded = make_ingestion(chunk_size=256 * 1024)
+        ssh = mock.Mock(open_sftp=lambda: FakeSFTP({'/retail-claims/claims.json': data}))
+
+        with self.assertRaises(ValueError):
+            ingestion.stream_sftp_to_gcs(ssh, 'claims.json')
+        self.assertEqual(uploaded, {})
+
+    def test_abort_does_not_use_blob_writer_internals(self):
+        """El descarte funciona con un BlobWriter sin _buffer: nada se publica en Bronze"""
+        self.assertFalse(hasattr(FakeWriter(FakeBucket(), 'x'), '_buffer'))
+        data = ndjson([claim(1)]) + b'x' * (2 * 1024 * 1024)
+        for landing_format in ('json', 'ndjson.gz'):
+            bucket = FakeBucket()
+            ingestion, uploaded = make_ingestion(bucket, chunk_size=256 * 1024, landing_format=landing_format)
+            ssh = mock.Mock(open_sftp=lambda: FakeSFTP({'/retail-claims/claims.json': data}))
+
+            with self.assertRaises(ValueError):
+                ingestion.stream_sftp_to_gcs(ssh, 'claims.json')
+            self.assertEqual(uploaded, {})
+            self.assertEqual(bucket.published, [])
+            # La subida temporal se finalizó y se eliminó, fuera del prefijo Bronze
+            self.assertTrue(bucket.finalized)
+            self.assertTrue(all(name.startswith('uploads/bronze/retail-claims/') for name in bucket.finalized))
+
+
+class TestLandingFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.data = ndjson([claim(i) for i in range(40)]) + b'no es json\n'
+        self.sftp = FakeSFTP({'/retail-claims/claims.json': self.data})
+
+    def test_gzip_landing(self):
+        """ndjson.gz comprime en streaming solo las líneas válidas"""
+        ingestion, uploaded = make_ingestion(landing_format='ndjson.gz')
+
+        result = ingestion.transfer_file(self.sftp, 'claims.json')
+
+        self.assertTrue(result['gcs_path'].endswith('/claims.json.gz'))
+        landed = uploaded[result['gcs_path']]
+        self.assertEqual(result['bytes_landed'], len(landed))
+        self.assertEqual(gzip.decompress(landed), ndjson([claim(i) for i in range(40)]))
+
+    @unittest.skipUnless(pq, 'pyarrow no instalado')
+    def test_parquet_landing(self):
+        """parquet usa el esquema explícito y corta row groups por tamaño"""
+        ingestion, uploaded = make_ingestion(landing_format='parquet', parquet_row_group_bytes=2048)
+
+        result = ingestion.transfer_file(self.sftp, 'claims.json')
+
+        self.assertTrue(result['gcs_path'].endswith('/claims.parquet'))
+        parquet_file = pq.ParquetFile(io.BytesIO(uploaded[result['gcs_path']]))
+        self.assertGreater(parquet_file.num_row_groups, 1)
+        table = parquet_file.read()
+        self.assertEqual(table.schema, main.bronze_arrow_schema())
+        self.assertEqual(table.num_rows, 40)
+        self.assertEqual(table.column('claim_amount').to_pylist()[:2], [100.0, 101.0])
+        self.assertEqual(result['invalid_records'], 1)
+
+    def test_parquet_abort_closes_writer_and_discards_upload(self):
+        """El ParquetWriter se cierra (aunque falle) y la subida se descarta sin publicar"""
+        bucket = FakeBucket()
+        upload = main.StagedUpload(bucket, 'bronze/retail-claims/ingest_date=2024-01-15/claims.parquet', 'uploads')
+        writer = main.ParquetBronzeWriter.__new__(main.ParquetBronzeWriter)
+        writer.blob_writer = upload
+        writer._writer = mock.Mock(close=mock.Mock(side_effect=OSError('stream closed')))
+        writer._blocks, writer._buffered = [b'{}\n'], 3
+
+        writer.abort()
+
+        writer._writer.close.assert_called_once()
+        self.assertEqual((writer._blocks, writer.buffered_bytes), ([], 0))
+        self.assertTrue(upload.closed)
+        self.assertEqual((bucket.objects, bucket.published), ({}, []))
+
+    @unittest.skipUnless(pq, 'pyarrow no instalado')
+    def test_failed_parquet_transfer_is_not_published(self):
+        data = ndjson([claim(1)]) + b'x' * (2 * 1024 * 1024)
+        bucket = FakeBucket()
+        ingestion, uploaded = make_ingestion(bucket, chunk_size=256 * 1024, landing_format='parquet')
+        ssh = mock.Mock(open_sftp=lambda: FakeSFTP({'/retail-claims/claims.json': data}))
+
+        with self.assertRaises(ValueError):
+            ingestion.stream_sftp_to_gcs(ssh, 'claims.json')
+        self.assertEqual((uploaded, bucket.published), ({}, []))
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            make_ingestion(landing_format='avro')
+
+
+class TestIngestionManifest(unittest.TestCase):
+
+    MANIFEST = 'manifests/bronze/retail-claims/ingestion_manifest.json'
+
+    def setUp(self):
+        self.bucket = FakeBucket()
+        self.files = {'/retail-claims/claims.json': ndjson([claim(1)])}
+        self.mtimes = {'/retail-claims/claims.json': 1700000000}
+
+    def run_ingestion(self, force=False):
+        ingestion, uploaded = make_ingestion(self.bucket, use_manifest=True)
+        ssh = mock.Mock(open_sftp=lambda: FakeSFTP(self.files, self.mtimes))
+        with mock.patch.object(ingestion, 'connect_sftp', return_value=ssh):
+            return ingestion.process('claims.json', force=force)
+
+    def bronze_objects(self):
+        return {k: v for k, v in self.bucket.objects.items() if k != self.MANIFEST}
+
+    def test_unchanged_file_is_not_transferred_again(self):
+        """Un reintento sobre el mismo archivo no lo vuelve a descargar"""
+        first = self.run_ingestion()
+        second = self.run_ingestion()
+
+        self.assertFalse(first['skipped'])
+        self.assertTrue(second['skipped'])
+        self.assertEqual(second['bytes_transferred'], 0)
+        self.assertEqual(second['gcs_path'], first['gcs_path'])
+        self.assertEqual(len(self.bronze_objects()), 1)
+        manifest = json.loads(self.bucket.objects[self.MANIFEST])
+        self.assertIn('/retail-claims/claims.json', manifest['files'])
+
+    def test_touched_file_with_same_content_is_not_republished(self):
+        """Un mtime nuevo con el mismo contenido no republica el objeto"""
+        self.run_ingestion()
+        self.mtimes['/retail-claims/claims.json'] += 60
+
+        result = self.run_ingestion()
+
+        self.assertTrue(result['skipped'])
+        self.assertEqual(result['skip_reason'], 'same_checksum')
+        self.assertEqual(len(self.bucket.published), 1)
+        manifest = json.loads(self.bucket.objects[self.MANIFEST])
+        self.assertEqual(manifest['files']['/retail-claims/claims.json']['mtime'], 1700000060)
+
+    def test_changed_file_replaces_previous_object(self):
+        """Un archivo modificado reemplaza su objeto previo en lugar de duplicarlo"""
+        first = self.run_ingestion()
+        self.files['/retail-claims/claims.json'] = ndjson([claim(1), claim(2)])
+        self.mtimes['/retail-claims/claims.json'] += 60
+
+        second = self.run_ingestion()
+
+        self.assertFalse(second['skipped'])
+        self.assertEqual(second['gcs_path'], first['gcs_path'])
+        self.assertEqual(list(self.bronze_objects().values()), [self.files['/retail-claims/claims.json']])
+
+    def test_concurrent_manifest_update_is_merged(self):
+        """Una escritura concurrente del manifiesto no pierde entradas"""
+        manifest = main.IngestionManifest(self.bucket, self.MANIFEST).load()
+        other = main.IngestionManifest(self.bucket, self.MANIFEST).load()
+        other.record('/retail-claims/a.json', {'size': 1})
+        other.save()
+
+        manifest.record('/retail-claims/b.json', {'size': 2})
+        manifest.save()
+
+        saved = json.loads(self.bucket.objects[self.MANIFEST])['files']
+        self.assertEqual(sorted(saved), ['/retail-claims/a.json', '/retail-claims/b.json'])
+
+
+class TestHivePartitionedLayout(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [
+            claim(i, claim_date=f'2024-01-{10 + i % 3:02d}') for i in range(12)
+        ]
+        self.sftp = FakeSFTP({'/retail-claims/claims.json': ndjson(self.records)})
+
+    def test_ingest_date_partition(self):
+        """El objeto aterriza bajo la partición hive ingest_date"""
+        ingestion, uploaded = make_ingestion(ingest_date='2024-01-16')
+
+        result = ingestion.transfer_file(self.sftp, 'claims.json')
+
+        self.assertEqual(result['gcs_path'], 'bronze/retail-claims/ingest_date=2024-01-16/claims.json')
+        self.assertEqual(result['gcs_paths'], [result['gcs_path']])
+        self.assertEqual(uploaded[result['gcs_path']], ndjson(self.records))
+
+    def test_invalid_ingest_date_is_rejected(self):
+        with self.assertRaises(ValueError):
+            make_ingestion(ingest_date='16/01/2024')
+
+    def test_split_by_claim_date(self):
+        """Con partition_by_claim_date cada fecha de reclamo va a su propio objeto"""
+        ingestion, uploaded = make_ingestion(ingest_date='2024-01-16', partition_by_claim_date=True)
+
+        result = ingestion.transfer_file(self.sftp, 'claims.json')
+
+        prefix = 'bronze/retail-claims-by-claim-day/ingest_date=2024-01-16'
+        self.assertEqual(result['gcs_path'], f'{prefix}/claim_day=*/claims.json')
+        self.assertEqual(result['gcs_paths'], [
+            f'{prefix}/claim_day=2024-01-{day}/claims.json' for day in ('10', '11', '12')
+        ])
+        for day in ('10', '11', '12'):
+            expected = [r for r in self.records if r['claim_date'] == f'2024-01-{day}']
+            self.assertEqual(uploaded[f'{prefix}/claim_day=2024-01-{day}/claims.json'], ndjson(expected))
+        self.assertEqual(result['bytes_landed'], len(ndjson(self.records)))
+
+    def test_claim_day_layout_has_its_own_root(self):
+        """Los dos layouts nunca comparten prefijo (la detección hive los rechazaría)"""
+        self.assertEqual(make_ingestion()[0].gcs_prefix, main.DEFAULT_BRONZE_PREFIX)
+        self.assertEqual(make_ingestion(partition_by_claim_date=True)[0].gcs_prefix, main.CLAIM_DAY_BRONZE_PREFIX)
+        with self.assertRaises(ValueError):
+            make_ingestion(partition_by_claim_date=True, gcs_prefix=main.DEFAULT_BRONZE_PREFIX)
+        with self.assertRaises(ValueError):
+            make_ingestion(gcs_prefix=main.CLAIM_DAY_BRONZE_PREFIX)
+
+    @unittest.skipUnless(pq, 'pyarrow no instalado')
+    def test_split_by_claim_date_parquet_bounds_buffers(self):
+        """Los row groups pendientes de todas las fechas comparten un presupuesto"""
+        ingestion, uploaded = make_ingestion(
+            landing_format='parquet', parquet_row_group_bytes=1024, partition_by_claim_date=True
+        )
+
+        result = ingestion.transfer_file(self.sftp, 'claims.json')
+
+        tables = [pq.read_table(io.BytesIO(uploaded[path])) for path in result['gcs_paths']]
+        self.assertEqual(sum(t.num_rows for t in tables), 12)
+        self.assertEqual(
+            sorted(set(t.column('claim_date').to_pylist()[0] for t in tables)),
+            ['2024-01-10', '2024-01-11', '2024-01-12']
+        )
+
+    def test_changed_file_moves_to_new_ingest_date(self):
+        """Una versión nueva se publica en la partición del día y se elimina la anterior"""
+        bucket = FakeBucket()
+        manifest_path = 'manifests/bronze/retail-claims/ingestion_manifest.json'
+        first, _ = make_ingestion(bucket, use_manifest=True, ingest_date='2024-01-15')
+        manifest = first.load_manifest()
+        first.transfer_file(self.sftp, 'claims.json', manifest)
+
+        self.sftp.files['/retail-claims/claims.json'] += ndjson([claim(99)])
+        self.sftp.mtimes['/retail-claims/claims.json'] = 1700000060
+        second, _ = make_ingestion(bucket, use_manifest=True, ingest_date='2024-01-16')
+        result = second.transfer_file(self.sftp, 'claims.json', manifest)
+
+        bronze = sorted(path for path in bucket.objects if path != manifest_path)
+        self.assertEqual(bronze, [result['gcs_path']])
+        self.assertIn('ingest_date=2024-01-16', result['gcs_path'])
+
+    def test_validator_groups_by_claim_date(self):
+        validator = main.NDJSONClaimsValidator()
+        groups, invalid = validator.feed_by_claim_date(ndjson(self.records[:4]) + b'{roto\n')
+
+        self.assertEqual(sorted(groups), ['2024-01-10', '2024-01-11', '2024-01-12'])
+        self.assertEqual(groups['2024-01-10'], ndjson([self.records[0], self.records[3]]))
+        self.assertEqual([line for line, _, _ in invalid], [5])
+
+
+class SlowRemoteFile(FakeRemoteFile):
+    """Rangos pares más lentos para que terminen fuera de orden"""
+
+    def readv(self, chunks):
+        for offset, size in chunks:
+            if offset == 64 and self.data.startswith(b'FAIL'):
+                raise IOError('lectura fallida')
+            time.sleep(0.01 if (offset // 64) % 2 == 0 else 0)
+            yield self.data[offset:offset + size]
+
+
+class TestRangedDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.channels = []
+        self.lock = threading.Lock()
+
+    def open_channel(self, data):
+        sftp = FakeSFTP({'/retail-claims/big.json': data})
+        sftp.file = lambda path, mode='r': SlowRemoteFile(sftp.files[path])
+        with self.lock:
+            self.channels.append(sftp)
+        return sftp
+
+    def test_ranges_are_reassembled_in_order(self):
+        """Los rangos leídos en paralelo se entregan en el orden del archivo"""
+        data = bytes(range(256)) * 40
+        reader = main.ParallelRangeReader(
+            lambda: self.open_channel(data), '/retail-claims/big.json', len(data),
+            chunk_size=64, concurrency=3
+        )
+
+        chunks = list(reader)
+
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(len(chunks), len(data) // 64)
+        self.assertEqual(len(self.channels), 3)
+        self.assertTrue(all(sftp.closed for sftp in self.channels))
+
+    def test_range_error_is_raised(self):
+        """Un rango fallido aborta la descarga y cierra los canales"""
+        data = b'FAIL' + b'x' * 1000
+        reader = main.ParallelRangeReader(
+            lambda: self.open_channel(data), '/retail-claims/big.json', len(data),
+            chunk_size=64, concurrency=2
+        )
+
+        with self.assertRaises(IOError):
+            list(reader)
+        self.assertTrue(all(sftp.closed for sftp in self.channels))
+
+    def test_large_files_use_ranged_download(self):
+        """transfer_file descarga por rangos los archivos sobre el umbral"""
+        data = ndjson([claim(i) for i in range(30)])
+        ingestion, uploaded = make_ingestion(range_concurrency=3, range_min_file_bytes=1024)
+        with mock.patch.object(
+            paramiko.SFTPClient, 'from_transport', side_effect=lambda t: self.open_channel(data)
+        ):
+            result = ingestion.transfer_file(FakeSFTP({'/retail-claims/big.json': data}), 'big.json')
+
+        self.assertEqual(result['download_mode'], 'ranged')
+        self.assertEqual(uploaded[result['gcs_path']], data)
+        self.assertEqual(result['records'], 30)
+        self.assertEqual(len(self.channels), 3)
+
+
+class TestBatchIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.files = {
+            f'/retail-claims/store_{i:02d}.json': ndjson([claim(i)])
+            for i in range(6)
+        }
+        self.files['/retail-claims/readme.txt'] = b'no es un reclamo'
+        self.files['/retail-claims/store_99.json'] = b'{roto\n'
+        self.channels = []
+
+        def open_channel(transport):
+            sftp = FakeSFTP(self.files)
+            self.channels.append(sftp)
+            return sftp
+
+        patcher = mock.patch.object(paramiko.SFTPClient, 'from_transport', side_effect=open_channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_glob_batch_reuses_one_session(self):
+        """Un batch por glob usa una sola conexión SSH y canales acotados"""
+        ingestion, uploaded = make_ingestion(max_concurrent_transfers=3)
+        ssh = mock.Mock()
+        with mock.patch.object(ingestion, 'connect_sftp', return_value=ssh) as connect:
+            result = ingestion.process_batch(pattern='store_*.json')
+
+        connect.assert_called_once()
+        ssh.close.assert_called_once()
+        self.assertLessEqual(len(self.channels), 3)
+        self.assertTrue(all(sftp.closed for sftp in self.channels))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['summary']['files_total'], 7)
+        self.assertEqual(result['summary']['records'], 6)
+        self.assertEqual(result['summary']['invalid_records'], 1)
+        self.assertEqual(len([path for path in uploaded if path.startswith('bronze/')]), 7)
+
+    def test_explicit_list_batch(self):
+        """Un batch con lista explícita transfiere solo esos archivos"""
+        ingestion, uploaded = make_ingestion()
+        with mock.patch.object(ingestion, 'connect_sftp', return_value=mock.Mock()):
+            result = ingestion.process_batch(filenames=['store_00.json', 'store_98.json', 'store_01.json'])
+
+        self.assertEqual(result['status'], 'partial')
+        self.assertEqual(
+            [(r['filename'], r['status']) for r in result['files']],
+            [('store_00.json', 'success'), ('store_98.json', 'error'), ('store_01.json', 'success')]
+        )
+        self.assertEqual(result['summary']['files_failed'], 1)
+        self.assertEqual(result['summary']['records'], 2)
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def test_heavy_libraries_are_not_imported_at_load(self):
+        """Cargar el módulo no importa paramiko ni google.cloud.storage"""
+        code = (
+            "import sys, main; "
+            "print(sorted(m for m in ('paramiko', 'google.cloud.storage') if m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=os.path.dirname(main.__file__),
+            capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_storage_client_is_shared_across_instances(self):
+        with mock.patch.object(main, '_storage_client', None), \
+                mock.patch('google.cloud.storage.Client') as client_class:
+            first = main.get_storage_client()
+            second = main.get_storage_client()
+
+        client_class.assert_called_once()
+        self.assertIs(first, second)
+
+    def test_ssh_transport_is_reused_per_host(self):
+        """Con la caché activa la segunda invocación no vuelve a conectar"""
+        ssh = mock.Mock()
+        ssh.get_transport.return_value.is_active.return_value = True
+        sftp = FakeSFTP({'/retail-claims/claims.json': ndjson([claim(1)])})
+        ssh.open_sftp.return_value = sftp
+        ingestion, _ = make_ingestion(reuse_ssh_transport=True)
+        cache = main.SSHTransportCache()
+
+        with mock.patch.object(main, '_ssh_transports', cache), \
+                mock.patch.object(ingestion, 'connect_sftp', return_value=ssh) as connect:
+            first = ingestion.process('claims.json')
+            second = ingestion.process('claims.json')
+
+        connect.assert_called_once()
+        ssh.get_transport.return_value.set_keepalive.assert_called_once_with(30)
+        ssh.close.assert_not_called()
+        self.assertFalse(first['timings']['ssh_transport_reused'])
+        self.assertTrue(second['timings']['ssh_transport_reused'])
+        self.assertEqual(second['timings']['connect_seconds'], 0)
+
+    def test_inactive_transport_is_replaced(self):
+        stale, fresh = mock.Mock(), mock.Mock()
+        stale.get_transport.return_value.is_active.return_value = False
+        cache = main.SSHTransportCache()
+        key = ('sftp.example.com', 22, 'user')
+        with cache.connection(key, lambda: stale, 30, 300):
+            pass
+
+        with cache.connection(key, lambda: fresh, 30, 300) as (ssh, reused):
+            self.assertIs(ssh, fresh)
+            self.assertFalse(reused)
+        stale.close.assert_called_once()
+
+    def test_response_reports_cold_and_warm_timings(self):
+        """La respuesta HTTP separa arranque en frío y en caliente por fase"""
+        ssh = mock.Mock(open_sftp=lambda: FakeSFTP({'/retail-claims/claims.json': ndjson([claim(1)])}))
+        client = mock.Mock()
+        client.bucket.return_value = FakeBucket()
+        request = mock.Mock()
+        request.get_json.return_value = {'filename': 'claims.json'}
+        env = {'GCS_BUCKET': 'test-bucket', 'INGESTION_MANIFEST_ENABLED': 'false'}
+
+        with mock.patch.object(main, '_invocation_count', 0), \
+                mock.patch.dict(os.environ, env), \
+                mock.patch.object(main, 'get_storage_client', return_value=client), \
+                mock.patch.object(main.SFTPToGCSIngestion, 'connect_sftp', return_value=ssh):
+            cold = json.loads(main.ingest_sftp_to_gcs(request)['body'])['timings']
+            warm = json.loads(main.ingest_sftp_to_gcs(request)['body'])['timings']
+
+        self.assertTrue(cold['cold_start'])
+        self.assertGreater(cold['module_import_seconds'], 0)
+        self.assertFalse(warm['cold_start'])
+        self.assertEqual(warm['module_import_seconds'], 0)
+        for key in ('lazy_import_seconds', 'client_init_seconds', 'connect_seconds',
+                    'transfer_seconds', 'total_seconds'):
+            self.assertIn(key, warm)
+
+    def test_memory_is_sampled_per_invocation(self):
+        """La RSS de la invocación no arrastra el pico de invocaciones anteriores"""
+        with mock.patch.object(main, '_rss_mb', side_effect=[120.0, 150.5]), \
+                mock.patch.object(main, '_process_peak_rss_mb', return_value=900.0):
+            report = main.InvocationTimings().report()
+
+        self.assertEqual((report['rss_start_mb'], report['rss_end_mb']), (120.0, 150.5))
+        self.assertEqual(report['rss_delta_mb'], 30.5)
+        self.assertEqual(report['process_peak_rss_mb'], 900.0)
+        self.assertGreater(main._rss_mb(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
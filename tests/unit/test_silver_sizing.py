@@ -0,0 +1,153 @@
+import importlib
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../dags'))
+
+from silver_sizing import (
+    DEFAULT_SIZING_MODEL, MB, bronze_uris, ingestion_input, ingestion_payload, plan_silver_run, sizing_model
+)
+
+try:
+    import airflow  # noqa: F401
+    AIRFLOW_AVAILABLE = True
+except ImportError:
+    AIRFLOW_AVAILABLE = False
+
+MODEL = sizing_model()
+
+
+def batch_result(*files):
+    return {'status': 'success', 'files': list(files), 'summary': {}}
+
+
+def landed(bytes_landed, records, **extra):
+    return {'status': 'success', 'skipped': False, 'bytes_landed': bytes_landed, 'records': records, **extra}
+
+
+class TestIngestionInput(unittest.TestCase):
+
+    def test_unwraps_function_response(self):
+        """La respuesta HTTP y la de la invocación llevan el resultado como JSON"""
+        result = batch_result(landed(10 * MB, 1000))
+        http = {'statusCode': 200, 'body': json.dumps(result)}
+
+        self.assertEqual(ingestion_payload(http), result)
+        self.assertEqual(ingestion_payload({'executionId': 'x', 'result': json.dumps(http)}), result)
+        self.assertEqual(ingestion_payload(None), {})
+
+    def test_counts_only_new_data(self):
+        """Archivos omitidos o fallidos no agregan entrada"""
+        payload = batch_result(
+            landed(10 * MB, 1000),
+            landed(0, 5000, skipped=True),
+            {'status': 'error', 'filename': 'b.json', 'error': 'timeout'},
+            landed(2 * MB, 200)
+        )
+
+        self.assertEqual(ingestion_input(payload), {'files': 2, 'bytes_landed': 12 * MB, 'records': 1200})
+        # Modo de un solo archivo: el resultado es el archivo
+        self.assertEqual(ingestion_input(landed(MB, 10))['bytes_landed'], MB)
+
+    def test_bronze_uris_of_landed_files(self):
+        """Los objetos de los archivos omitidos ya se procesaron en otra corrida"""
+        payload = batch_result(
+            landed(MB, 10, gcs_path='gs://b/bronze/ingest_date=2024-01-02/a.json',
+                   gcs_paths=['gs://b/bronze/ingest_date=2024-01-02/claim_day=2024-01-01/a.json',
+                              'gs://b/bronze/ingest_date=2024-01-02/claim_day=2024-01-02/a.json']),
+            landed(0, 10, skipped=True, gcs_path='gs://b/bronze/ingest_date=2024-01-01/b.json'),
+            {'status': 'error', 'filename': 'c.json', 'error': 'timeout'}
+        )
+
+        self.assertEqual(bronze_uris(payload), [
+            'gs://b/bronze/ingest_date=2024-01-02/claim_day=2024-01-01/a.json',
+            'gs://b/bronze/ingest_date=2024-01-02/claim_day=2024-01-02/a.json'
+        ])
+        self.assertEqual(bronze_uris(landed(MB, 10, gcs_path='gs://b/x.json')), ['gs://b/x.json'])
+        self.assertEqual(bronze_uris({}), [])
+
+
+class TestPlanSilverRun(unittest.TestCase):
+
+    def test_small_input_skips_dataproc(self):
+        plan = plan_silver_run({'bytes_landed': 5 * MB, 'records': 10000}, MODEL)
+
+        self.assertEqual(plan['engine'], 'polars')
+        self.assertNotIn('cluster_config', plan)
+
+    def test_compressed_input_sized_by_records(self):
+        """Parquet comprimido: los registros estiman el volumen real"""
+        plan = plan_silver_run({'bytes_landed': 50 * MB, 'records': 5_000_000}, MODEL)
+
+        self.assertEqual(plan['engine'], 'spark')
+        self.assertAlmostEqual(plan['input_mb'], 5_000_000 * DEFAULT_SIZING_MODEL['bytes_per_record'] / MB, places=0)
+
+    def test_cluster_grows_with_input(self):
+        medium = plan_silver_run({'bytes_landed': 2 * 1024 * MB, 'records': 0}, MODEL)
+        large = plan_silver_run({'bytes_landed': 50 * 1024 * MB, 'records': 0}, MODEL)
+        huge = plan_silver_run({'bytes_landed': 500 * 1024 * MB, 'records': 0}, MODEL)
+
+        self.assertEqual((medium['workers'], medium['worker_machine_type']), (2, 'n1-standard-4'))
+        self.assertEqual((large['workers'], large['worker_machine_type']), (13, 'n1-standard-8'))
+        # Ningún tipo alcanza: el mayor con max_workers
+        self.assertEqual((huge['workers'], huge['worker_machine_type']), (16, 'n1-standard-16'))
+        self.assertLess(medium['shuffle_partitions'], large['shuffle_partitions'])
+
+    def test_executor_layout_fits_workers(self):
+        plan = plan_silver_run({'bytes_landed': 50 * 1024 * MB, 'records': 0}, MODEL)
+        properties = plan['spark_properties']
+
+        # n1-standard-8: 2 executors de 4 núcleos por worker, 30 GB * 0.8 / 2 / 1.1
+        self.assertEqual(properties['spark.executor.instances'], str(plan['workers'] * 2))
+        self.assertEqual(properties['spark.executor.memory'], '10g')
+        self.assertEqual(int(properties['spark.sql.shuffle.partitions']) % (plan['executor_instances'] * 4), 0)
+        self.assertEqual(plan['cluster_config']['worker_config']['num_instances'], plan['workers'])
+
+    def test_forced_engine_and_overrides(self):
+        tiny = {'bytes_landed': MB, 'records': 10}
+
+        self.assertEqual(plan_silver_run(tiny, MODEL, 'spark')['workers'], MODEL['min_workers'])
+        self.assertEqual(plan_silver_run(tiny, sizing_model({'single_node_max_mb': 0}))['engine'], 'spark')
+        with self.assertRaises(ValueError):
+            plan_silver_run(tiny, MODEL, 'dask')
+
+
+@unittest.skipUnless(AIRFLOW_AVAILABLE, 'Airflow no disponible')
+class TestChooseSilverEngineTask(unittest.TestCase):
+
+    def setUp(self):
+        variables = {'SILVER_SIZING_MODEL': {'single_node_max_mb': 100}}
+        patcher = mock.patch(
+            'airflow.models.Variable.get',
+            side_effect=lambda key, default_var=None, deserialize_json=False: variables.get(key, default_var)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dag_module = importlib.import_module('retail_claims_etl_dag')
+
+    def run_task(self, ingestion, conf=None):
+        task_instance = mock.MagicMock()
+        task_instance.xcom_pull.return_value = {'statusCode': 200, 'body': json.dumps(ingestion)}
+        dag_run = mock.MagicMock(conf=conf or {})
+        branch = self.dag_module.choose_silver_engine(task_instance=task_instance, dag_run=dag_run)
+        sizing = task_instance.xcom_push.call_args.kwargs['value']
+        return branch, sizing
+
+    def test_branch_and_sizing_from_ingestion(self):
+        branch, sizing = self.run_task(batch_result(landed(200 * MB, 1000)))
+
+        self.assertEqual(branch, 'create_dataproc_cluster')
+        self.assertEqual(sizing['inputs']['bytes_landed'], 200 * MB)
+        self.assertEqual(sizing['model']['single_node_max_mb'], 100)
+        self.assertIn('spark.sql.shuffle.partitions', sizing['spark_properties'])
+        self.assertEqual(sizing['bronze_uris'], [])
+
+        branch, _ = self.run_task(batch_result(landed(200 * MB, 1000)), conf={'silver_engine': 'polars'})
+        self.assertEqual(branch, 'bronze_to_silver_polars')
+
+
+if __name__ == '__main__':
+    unittest.main()
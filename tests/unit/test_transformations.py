@@ -1,74 +1,167 @@
 import unittest
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+import re
+import shutil
 import sys
 import os
 
+import pyarrow as pa
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../dataproc/jobs'))
 
+import business_rules
+from claims_schema import GOLD_STAGING_COLUMNS
+
+try:
+    from pyspark.sql import SparkSession
+    SPARK_AVAILABLE = bool(shutil.which('java') or os.environ.get('JAVA_HOME'))
+except ImportError:
+    SPARK_AVAILABLE = False
+
+TODAY = date(2024, 3, 20)
+
+RULES_SCHEMA = pa.schema([
+    ('claim_amount', pa.float64()),
+    ('status', pa.string()),
+    ('claim_date', pa.date32()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+])
+
+
+def claim(amount=50.0, status='APPROVED', claim_date=date(2024, 3, 6), days_old=0):
+    created_at = datetime.combine(TODAY - timedelta(days=days_old), datetime.min.time(), timezone.utc) \
+        if days_old is not None else None
+    return {'claim_amount': amount, 'status': status, 'claim_date': claim_date, 'created_at': created_at}
+
+
+def evaluate(claims):
+    """Reglas de business_rules (versión Arrow) sobre una lista de reclamos"""
+    table = business_rules.apply_rules_arrow(pa.Table.from_pylist(claims, schema=RULES_SCHEMA), TODAY)
+    return table.select(list(business_rules.RULE_COLUMNS)).to_pylist()
+
+
 # Tests unitarios
 class TestDataTransformations(unittest.TestCase):
-    
+
     def test_priority_classification(self):
         """Prueba clasificación de prioridad por monto"""
         test_cases = [
             (50.0, 'LOW'),
+            (100.0, 'LOW'),
             (250.0, 'MEDIUM'),
             (1000.0, 'HIGH'),
+            (2000.0, 'HIGH'),
             (3000.0, 'CRITICAL'),
+            # Como el CASE de SQL: un monto nulo cae en el ELSE
+            (None, 'CRITICAL'),
         ]
-        
-        for amount, expected_priority in test_cases:
-            # Lógica de clasificación
-            if amount <= 100:
-                priority = 'LOW'
-            elif amount <= 500:
-                priority = 'MEDIUM'
-            elif amount <= 2000:
-                priority = 'HIGH'
-            else:
-                priority = 'CRITICAL'
-            
-            self.assertEqual(priority, expected_priority)
-    
+
+        results = evaluate([claim(amount=amount) for amount, _ in test_cases])
+        for (amount, expected_priority), result in zip(test_cases, results):
+            self.assertEqual(result['claim_priority'], expected_priority, amount)
+
     def test_escalation_logic(self):
         """Prueba lógica de escalado"""
-        today = datetime.now()
-        old_date = today - timedelta(days=10)
-        recent_date = today - timedelta(days=3)
-        
-        # Caso 1: Pendiente + viejo = requiere escalación
-        requires_escalation = 'PENDING' == 'PENDING' and (today - old_date).days > 7
-        self.assertTrue(requires_escalation)
-        
-        # Caso 2: Pendiente + reciente = NO requiere escalación
-        requires_escalation = 'PENDING' == 'PENDING' and (today - recent_date).days > 7
-        self.assertFalse(requires_escalation)
-        
-        # Caso 3: Monto crítico = siempre requiere escalación
-        requires_escalation = 2500 > 2000
-        self.assertTrue(requires_escalation)
-    
+        results = evaluate([
+            # Caso 1: Pendiente + viejo = requiere escalación
+            claim(status='PENDING', days_old=10),
+            # Caso 2: Pendiente + reciente = NO requiere escalación
+            claim(status='PENDING', days_old=3),
+            # Caso 3: Monto crítico = siempre requiere escalación
+            claim(amount=2500.0, status='APPROVED'),
+            # Caso 4: Pendiente sin created_at = sin antigüedad conocida
+            claim(status='PENDING', days_old=None),
+        ])
+
+        self.assertEqual([r['requires_escalation'] for r in results], [True, False, True, False])
+        self.assertEqual([r['days_since_claim'] for r in results], [10, 3, 0, None])
+
     def test_risk_score_calculation(self):
         """Prueba cálculo de score de riesgo"""
         test_cases = [
-            ('REJECTED', 5000, 0.8 * 1.5),
+            # El multiplicador 1.5 exige superar 5000: en el límite aplica 1.2
+            ('REJECTED', 5000, 0.8 * 1.2),
+            ('REJECTED', 6000, 0.8 * 1.5),
             ('PENDING', 1500, 0.6 * 1.2),
             ('APPROVED', 100, 0.2 * 1.0),
             ('CLOSED', 300, 0.1 * 1.0),
+            ('DESCONOCIDO', 300, 0.5 * 1.0),
+        ]
+
+        results = evaluate([claim(amount=float(amount), status=status) for status, amount, _ in test_cases])
+        for (status, amount, expected_score), result in zip(test_cases, results):
+            self.assertAlmostEqual(result['risk_score'], expected_score, places=6, msg=(status, amount))
+
+    def test_period_category(self):
+        """Prueba categoría de período (DAYOFWEEK de BigQuery: 6 = viernes, 7 = sábado)"""
+        test_cases = [
+            (date(2024, 11, 5), 'HOLIDAY_SEASON'),
+            (date(2024, 12, 28), 'HOLIDAY_SEASON'),
+            (date(2024, 1, 13), 'POST_HOLIDAY'),
+            (date(2024, 3, 8), 'WEEKEND'),
+            (date(2024, 3, 9), 'WEEKEND'),
+            (date(2024, 3, 10), 'REGULAR'),
+            (date(2024, 3, 6), 'REGULAR'),
+            (None, 'REGULAR'),
+        ]
+
+        results = evaluate([claim(claim_date=claim_date) for claim_date, _ in test_cases])
+        for (claim_date, expected), result in zip(test_cases, results):
+            self.assertEqual(result['period_category'], expected, claim_date)
+
+
+class TestGoldStagingContract(unittest.TestCase):
+
+    GOLD_DDL = os.path.join(os.path.dirname(__file__), '../../bigquery/schemas/gold_schema.sql')
+
+    def test_staging_columns_match_gold_ddl(self):
+        """GOLD_STAGING_COLUMNS sigue a la tabla claims_business_rules_staging"""
+        with open(self.GOLD_DDL) as f:
+            ddl = f.read()
+        staging = ddl.split('claims_business_rules_staging` (', 1)[1].split('\n)', 1)[0]
+        self.assertEqual(tuple(re.findall(r'^\s+(\w+) [A-Z0-9]+', staging, re.MULTILINE)), GOLD_STAGING_COLUMNS)
+
+    def test_pending_index_escalates_on_first_overdue_day(self):
+        """claims_pending_index vence el primer día en que la regla de escalado se cumple"""
+        procedures = os.path.join(os.path.dirname(__file__), '../../bigquery/stored_procedures/silver_to_gold_business_rules.sql')
+        with open(procedures) as f:
+            intervals = set(re.findall(r'DATE_ADD\(DATE\(S\.created_at\), INTERVAL (\d+) DAY\)', f.read()))
+        self.assertEqual(len(intervals), 1)
+        days = int(intervals.pop())
+
+        escalated = [r['requires_escalation'] for r in evaluate([
+            claim(status='PENDING', days_old=days - 1), claim(status='PENDING', days_old=days)
+        ])]
+        self.assertEqual(escalated, [False, True])
+
+
+@unittest.skipUnless(SPARK_AVAILABLE, 'pyspark/Java no disponibles')
+class TestSparkRulesParity(unittest.TestCase):
+
+    def test_spark_expressions_match_arrow_rules(self):
+        """spark_rule_columns y apply_rules_arrow dan el mismo resultado, nulos incluidos"""
+        from pyspark.sql.functions import lit
+
+        spark = SparkSession.builder \
+            .master('local[1]') \
+            .appName('tests') \
+            .config('spark.ui.enabled', 'false') \
+            .config('spark.sql.session.timeZone', 'UTC') \
+            .getOrCreate()
+        claims = [
+            claim(amount=amount, status=status, claim_date=claim_date, days_old=days_old)
+            for amount in (None, 99.5, 500.0, 1800.0, 2000.01, 5000.0, 7000.0)
+            for status, days_old in (('PENDING', 8), ('PENDING', 7), ('REJECTED', 0), (None, None))
+            for claim_date in (date(2024, 1, 31), date(2024, 3, 8), date(2024, 12, 1), None)
         ]
-        
-        for status, amount, expected_score in test_cases:
-            status_score = {
-                'REJECTED': 0.8,
-                'PENDING': 0.6,
-                'APPROVED': 0.2,
-                'CLOSED': 0.1,
-            }.get(status, 0.5)
-            
-            amount_multiplier = 1.5 if amount > 5000 else (1.2 if amount > 1000 else 1.0)
-            risk_score = status_score * amount_multiplier
-            
-            self.assertAlmostEqual(risk_score, expected_score, places=2)
+        df = spark.createDataFrame(
+            [tuple(c.values()) for c in claims],
+            'claim_amount double, status string, claim_date date, created_at timestamp'
+        )
+        rules = business_rules.spark_rule_columns(lit(TODAY))
+        rows = df.select(*[rules[name].alias(name) for name in business_rules.RULE_COLUMNS]).collect()
+
+        self.assertEqual([row.asDict() for row in rows], evaluate(claims))
 
 
 if __name__ == '__main__':